@@ -76,6 +76,7 @@ config.Agent.agentNumber = 0
 config.Agent.useMsgService = False
 config.Agent.useTrigger = False
 config.Agent.useHeartbeat = True
+config.Agent.heartbeatFlushInterval = 30
 config.Agent.isDocker = False
 
 config.section_("General")
@@ -176,6 +177,13 @@ config.JobCreator.pollInterval = 120
 config.JobCreator.jobCacheDir = config.General.workDir + "/JobCache"
 config.JobCreator.defaultJobType = "Processing"
 config.JobCreator.workerThreads = 1
+# optionally keep the available files of each subscription in memory across
+# cycles, rebuilding the index every few cycles to pick up location changes.
+# File locations can be stale in between, thus it is disabled by default
+config.JobCreator.useAvailabilityIndex = False
+config.JobCreator.availabilityIndexRebuildCycles = 20
+# number of workload specs kept in memory by the JobCreator process
+config.JobCreator.specCacheSize = 100
 # glidein restrictions used for resource estimation (per core)
 config.JobCreator.GlideInRestriction = {"MinWallTimeSecs": 1 * 3600,  # 1h
                                         "MaxWallTimeSecs": 45 * 3600,  # pilot lifetime is usually 48h
@@ -317,6 +325,10 @@ config.ArchiveDataReporter.pollInterval = 300
 config.ArchiveDataReporter.WMArchiveURL = None
 config.ArchiveDataReporter.numDocsRetrievePerPolling = 1000  # number of documents needed to be polled each time
 config.ArchiveDataReporter.numDocsUploadPerCall = 200  # number of documents upload each time in bulk to WMArchive
+config.ArchiveDataReporter.maxPagesPerPolling = 10  # number of document pages processed each time
+config.ArchiveDataReporter.numUploadThreads = 4  # maximum number of concurrent uploads to WMArchive
+config.ArchiveDataReporter.numConvertProcesses = 0  # processes converting the documents, 0 to do it in the component
+config.ArchiveDataReporter.compressUploads = False  # gzip compress the documents uploaded to WMArchive
 
 # AgentStatusWatcher has to be the last one in the config to avoid false alarms during startup
 config.component_("AgentStatusWatcher")
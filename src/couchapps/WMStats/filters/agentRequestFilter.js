@@ -0,0 +1,4 @@
+function(doc, req) {
+  // agent_request documents, and deleted documents since their type is unknown
+  return doc._deleted || doc.type == 'agent_request';
+}
@@ -17,6 +17,7 @@ from Utils.Utilities import numberCouchProcess
 from Utils.PortForward import PortForward
 from WMComponent.AgentStatusWatcher.DrainStatusPoller import DrainStatusPoller
 from WMComponent.AnalyticsDataCollector.DataCollectAPI import WMAgentDBData, initAgentInfo
+from WMCore.Agent.HeartbeatAPI import getHeartbeatWriter
 from WMCore.Credential.Proxy import Proxy
 from WMCore.Database.CMSCouch import CouchMonitor
 from WMCore.Lexicon import sanitizeURL
@@ -195,6 +196,21 @@ class AgentStatusPoller(BaseWorkerThread):
 
         return couchInfo
 
+    @staticmethod
+    def updateLocalWorkers(workers):
+        """
+        Update the database info of the workers of this process with their
+        latest heartbeat, still held in memory by the heartbeat writer
+        :param workers: list of worker dictionaries, as returned by the MonitorWorkers DAO
+        """
+        localStatus = getHeartbeatWriter().workerStatus()
+        for worker in workers:
+            status = localStatus.get(worker['name'])
+            if status and status['last_updated'] > (worker['last_updated'] or 0):
+                worker['last_updated'] = status['last_updated']
+                worker['state'] = status.get('state', worker['state'])
+                worker['cycle_time'] = status.get('cycle_time', worker['cycle_time'])
+
     def collectAgentInfo(self):
         """
         Monitors the general health of the agent, as:
@@ -209,6 +225,7 @@ class AgentStatusPoller(BaseWorkerThread):
         logging.info("Getting agent info ...")
         agentInfo = self.wmagentDB.getComponentStatus(self.config)
         agentInfo.update(self.agentInfo)
+        self.updateLocalWorkers(agentInfo['workers'])
 
         agentInfo['disk_warning'] = listDiskUsageOverThreshold(self.config, updateDB=True)
 
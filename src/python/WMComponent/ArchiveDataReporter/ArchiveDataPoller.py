@@ -5,12 +5,10 @@ ArchiveDataPoller
 from __future__ import (division, print_function)
 import logging
 import traceback
-from Utils.IteratorTools import grouper
 from Utils.Timers import timeFunction
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
-from WMCore.Services.WMArchive.DataMap import createArchiverDoc
-from WMCore.Services.WMArchive.WMArchive import WMArchive
 from WMCore.Services.FWJRDB.FWJRDBAPI import FWJRDBAPI
+from WMComponent.ArchiveDataReporter.ArchiveUploadPipeline import ArchiveUploadPipeline
 
 
 class ArchiveDataPoller(BaseWorkerThread):
@@ -33,9 +31,16 @@ class ArchiveDataPoller(BaseWorkerThread):
         dbname = "%s/fwjrs" % getattr(self.config.JobStateMachine, "couchDBName")
 
         self.fwjrAPI = FWJRDBAPI(baseURL, dbname)
-        self.wmarchiver = WMArchive(self.config.ArchiveDataReporter.WMArchiveURL)
         self.numDocsRetrievePerPolling = getattr(self.config.ArchiveDataReporter, "numDocsRetrievePerPolling", 1000)
         self.numDocsUploadPerCall = getattr(self.config.ArchiveDataReporter, "numDocsUploadPerCall", 200)
+        reporterConfig = self.config.ArchiveDataReporter
+        self.pipeline = ArchiveUploadPipeline(self.fwjrAPI, reporterConfig.WMArchiveURL,
+                                              pageSize=self.numDocsRetrievePerPolling,
+                                              sliceSize=self.numDocsUploadPerCall,
+                                              maxPages=getattr(reporterConfig, "maxPagesPerPolling", 10),
+                                              numUploadThreads=getattr(reporterConfig, "numUploadThreads", 4),
+                                              numConvertProcesses=getattr(reporterConfig, "numConvertProcesses", 0),
+                                              compress=getattr(reporterConfig, "compressUploads", False))
 
     @timeFunction
     def algorithm(self, parameters):
@@ -43,31 +48,12 @@ class ArchiveDataPoller(BaseWorkerThread):
         get information from wmbs, workqueue and local couch
         """
         try:
-            data = self.fwjrAPI.getFWJRByArchiveStatus('ready', limit=self.numDocsRetrievePerPolling)['rows']
-            logging.info("Found %i not archived documents from FWRJ db to upload to WMArchive.", len(data))
-
-            for slicedData in grouper(data, self.numDocsUploadPerCall):
-                jobIDs = []
-                archiveDocs = []
-                for job in slicedData:
-                    doc = createArchiverDoc(job)
-                    archiveDocs.append(doc)
-                    jobIDs.append(job["id"])
-
-                response = self.wmarchiver.archiveData(archiveDocs)
-
-                # Partial success is not allowed either all the insert is successful or none is
-                if response[0]['status'] == "ok" and len(response[0]['ids']) == len(jobIDs):
-                    archiveIDs = response[0]['ids']
-                    for docID in jobIDs:
-                        self.fwjrAPI.updateArchiveUploadedStatus(docID)
-                    logging.info("...successfully uploaded %d docs", len(jobIDs))
-                    logging.debug("JobIDs uploaded: %s", jobIDs)
-                    logging.debug("Archived IDs returned: %s", archiveIDs)
-                else:
-                    logging.warning("Upload failed and it will be retried in the next cycle: %s: %s.",
-                                    response[0]['status'], response[0]['reason'])
-                    logging.debug("failed JobIds %s", jobIDs)
+            stats = self.pipeline.run('ready')
+            logging.info("Found %i not archived documents from FWRJ db (%i already uploaded).",
+                         stats['fetched'] - stats['skipped'], stats['skipped'])
+            logging.info("...successfully uploaded %d docs in %.1f secs (%.1f docs/sec), %d failed uploads, "
+                         "%d failed status updates", stats['uploaded'], stats['elapsed'], stats['docsPerSec'],
+                         stats['uploadFailed'], stats['updateFailed'])
         except Exception as ex:
             logging.error("Error occurred, will retry later:")
             logging.error(str(ex))
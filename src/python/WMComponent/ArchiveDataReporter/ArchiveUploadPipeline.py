@@ -0,0 +1,151 @@
+"""
+_ArchiveUploadPipeline_
+
+Upload the FWJR documents ready to be archived to WMArchive:
+  * FWJR docs are paged from CouchDB, ordered by doc id;
+  * each page is split in slices, which are converted to the WMArchive format,
+    optionally in a pool of processes;
+  * slices are uploaded with a bounded number of concurrent calls, optionally
+    gzip compressed;
+  * the docs of each uploaded slice are marked as uploaded with a single bulk update.
+"""
+
+from __future__ import (division, print_function)
+
+from builtins import map, object
+
+import logging
+import threading
+import time
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from Utils.IteratorTools import grouper
+from WMCore.Services.WMArchive.DataMap import createArchiverDoc
+from WMCore.Services.WMArchive.WMArchive import WMArchive
+
+
+def convertSlice(rows):
+    """
+    Convert a slice of FWJR view rows to WMArchive docs. It's a module
+    function such that it can be used by the conversion processes.
+    """
+    return [createArchiverDoc(row) for row in rows]
+
+
+class ArchiveUploadPipeline(object):
+    """
+    Page, convert, upload and mark as uploaded FWJR docs
+    """
+
+    def __init__(self, fwjrAPI, wmarchiveURL, pageSize=1000, sliceSize=200, maxPages=10,
+                 numUploadThreads=4, numConvertProcesses=0, compress=False, logger=None):
+        """
+        :param fwjrAPI: FWJRDBAPI instance
+        :param wmarchiveURL: WMArchive endpoint
+        :param pageSize: number of FWJR docs retrieved per CouchDB call
+        :param sliceSize: number of docs uploaded per WMArchive call
+        :param maxPages: maximum number of pages processed per run
+        :param numUploadThreads: maximum number of concurrent WMArchive calls
+        :param numConvertProcesses: number of conversion processes, 0 to convert in this process
+        :param compress: gzip compress the uploaded data
+        """
+        self.fwjrAPI = fwjrAPI
+        self.wmarchiveURL = wmarchiveURL
+        self.pageSize = pageSize
+        self.sliceSize = sliceSize
+        self.maxPages = maxPages
+        self.numUploadThreads = max(1, numUploadThreads)
+        self.numConvertProcesses = numConvertProcesses
+        self.compress = compress
+        self.logger = logger or logging.getLogger()
+        self._local = threading.local()
+        self.stats = {}
+
+    def _getArchiver(self):
+        """
+        Return the WMArchive client of the current thread, since
+        the HTTP clients cannot be shared among threads
+        """
+        archiver = getattr(self._local, 'archiver', None)
+        if archiver is None:
+            archiver = self._local.archiver = WMArchive(self.wmarchiveURL)
+        return archiver
+
+    def iterPages(self, status='ready'):
+        """
+        Yield pages of FWJR view rows (with docs) with a given archive status
+        """
+        startDocID = None
+        for _ in range(self.maxPages):
+            result = self.fwjrAPI.getFWJRByArchiveStatusPage(status, self.pageSize, startDocID)
+            rows = result['rows']
+            if not rows:
+                return
+            startDocID = result['nextDocID']
+            numRows = len(rows)
+            self.stats['fetched'] += numRows
+            # the view can be stale, skip the docs whose status already changed
+            rows = [row for row in rows if row.get('doc') and row['doc'].get('archivestatus') == status]
+            self.stats['skipped'] += numRows - len(rows)
+            if rows:
+                yield rows
+            if startDocID is None:
+                return
+
+    def _uploadSlice(self, sliceData):
+        """
+        Upload a converted slice, returning the slice rows and whether the upload succeeded
+        """
+        rows, archiveDocs = sliceData
+        try:
+            response = self._getArchiver().archiveData(archiveDocs, compress=self.compress)
+        except Exception as ex:
+            self.logger.warning("Upload failed and it will be retried in the next cycle: %s", str(ex))
+            return rows, False
+
+        # Partial success is not allowed either all the insert is successful or none is
+        if response[0]['status'] == "ok" and len(response[0]['ids']) == len(rows):
+            return rows, True
+        self.logger.warning("Upload failed and it will be retried in the next cycle: %s: %s.",
+                            response[0]['status'], response[0].get('reason'))
+        return rows, False
+
+    def run(self, status='ready'):
+        """
+        Process up to maxPages pages of FWJR docs. Returns the statistics of the run,
+        including the number of uploaded docs per second.
+        """
+        self.stats = dict.fromkeys(['fetched', 'skipped', 'uploaded', 'uploadFailed', 'updateFailed'], 0)
+        startTime = time.time()
+        convertPool = Pool(self.numConvertProcesses) if self.numConvertProcesses > 0 else None
+        uploadPool = ThreadPool(self.numUploadThreads)
+        try:
+            for rows in self.iterPages(status):
+                slices = list(grouper(rows, self.sliceSize))
+                if convertPool:
+                    converted = convertPool.imap(convertSlice, slices)
+                else:
+                    converted = map(convertSlice, slices)
+                # status updates are done here, one bulk update per uploaded slice
+                for sliceRows, uploaded in uploadPool.imap_unordered(self._uploadSlice, zip(slices, converted)):
+                    if not uploaded:
+                        self.stats['uploadFailed'] += len(sliceRows)
+                        continue
+                    self.stats['uploaded'] += len(sliceRows)
+                    failedIDs = self.fwjrAPI.bulkUpdateArchiveUploadedStatus([row['doc'] for row in sliceRows])
+                    self.stats['updateFailed'] += len(failedIDs)
+                    self.logger.debug("JobIDs uploaded: %s", [row['id'] for row in sliceRows])
+                    if failedIDs:
+                        self.logger.warning("Failed to mark %d uploaded docs, they will be uploaded again: %s",
+                                            len(failedIDs), failedIDs)
+        finally:
+            uploadPool.close()
+            uploadPool.join()
+            if convertPool:
+                convertPool.close()
+                convertPool.join()
+
+        self.stats['elapsed'] = time.time() - startTime
+        self.stats['docsPerSec'] = self.stats['uploaded'] / self.stats['elapsed'] if self.stats['elapsed'] else 0
+        return self.stats
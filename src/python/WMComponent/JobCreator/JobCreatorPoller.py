@@ -23,21 +23,24 @@ from WMComponent.JobCreator.CreateWorkArea import CreateWorkArea
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.DAOFactory import DAOFactory
 from WMCore.WMException import WMException
+from WMCore.JobSplitting.FileAvailabilityIndex import FileAvailabilityIndex
 from WMCore.JobSplitting.Generators.GeneratorManager import GeneratorManager
 from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMCore.JobSplitting.SplitterFactory import SplitterFactory
 from WMCore.WMBS.Subscription import Subscription
 from WMCore.WMBS.Workflow import Workflow
+from WMCore.WMSpec.SpecCache import getSpecCache
 from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper
 from WMCore.FwkJobReport.Report import Report
 from WMCore.WMExceptions import WM_JOB_ERROR_CODES
 
 
-def retrieveWMSpec(workflow=None, wmWorkloadURL=None):
+def retrieveWMSpec(workflow=None, wmWorkloadURL=None, specCache=None):
     """
     _retrieveWMSpec_
 
-    Given a subscription, this function loads the WMSpec associated with that workload
+    Given a subscription, this function loads the WMSpec associated with that workload.
+    If a SpecCache is provided, the workload is read from it and must not be modified.
     """
     if not wmWorkloadURL and workflow:
         wmWorkloadURL = workflow.spec
@@ -46,6 +49,9 @@ def retrieveWMSpec(workflow=None, wmWorkloadURL=None):
         logging.error("WMWorkloadURL %s is empty", wmWorkloadURL)
         return None
 
+    if specCache is not None:
+        return specCache.workload(wmWorkloadURL)
+
     wmWorkload = WMWorkloadHelper(WMWorkload("workload"))
     wmWorkload.load(wmWorkloadURL)
 
@@ -377,6 +383,11 @@ class JobCreatorPoller(BaseWorkerThread):
         self.agentNumber = int(getattr(config.Agent, 'agentNumber', 0))
         self.agentName = getattr(config.Agent, 'hostName', '')
         self.glideinLimits = getattr(config.JobCreator, 'GlideInRestriction', None)
+        self.useAvailabilityIndex = getattr(config.JobCreator, 'useAvailabilityIndex', False)
+        self.indexRebuildCycles = getattr(config.JobCreator, 'availabilityIndexRebuildCycles', 20)
+        self.specCache = getSpecCache(getattr(config.JobCreator, 'specCacheSize', 100))
+        # available files of each subscription, kept across cycles
+        self.availabilityIndexes = {}
 
         try:
             self.jobCacheDir = getattr(config.JobCreator, 'jobCacheDir',
@@ -458,6 +469,10 @@ class JobCreatorPoller(BaseWorkerThread):
         # First, get list of Subscriptions
         subscriptions = self.subscriptionList.execute()
 
+        # forget about the subscriptions which are complete
+        for subscriptionID in set(self.availabilityIndexes).difference(subscriptions):
+            del self.availabilityIndexes[subscriptionID]
+
         # Okay, now we have a list of subscriptions
         for subscriptionID in subscriptions:
             wmbsSubscription = Subscription(id=subscriptionID)
@@ -475,7 +490,7 @@ class JobCreatorPoller(BaseWorkerThread):
             workflow = Workflow(id=wmbsSubscription["workflow"].id)
             workflow.load()
             wmbsSubscription['workflow'] = workflow
-            wmWorkload = retrieveWMSpec(workflow=workflow)
+            wmWorkload = retrieveWMSpec(workflow=workflow, specCache=self.specCache)
 
             if not workflow.task or not wmWorkload:
                 # Then we have a problem
@@ -525,6 +540,11 @@ class JobCreatorPoller(BaseWorkerThread):
                                              subscription=wmbsSubscription,
                                              generators=seederList,
                                              limit=self.limit)
+            if self.useAvailabilityIndex:
+                if subscriptionID not in self.availabilityIndexes:
+                    self.availabilityIndexes[subscriptionID] = FileAvailabilityIndex(subscriptionID, self.daoFactory,
+                                                                                     self.indexRebuildCycles)
+                wmbsJobFactory.availabilityIndex = self.availabilityIndexes[subscriptionID]
 
             # Turn on the jobFactory --> get available files for that subscription, keep result proxies
             wmbsJobFactory.open()
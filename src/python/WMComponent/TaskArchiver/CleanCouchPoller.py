@@ -21,12 +21,13 @@ from contextlib import closing
 from Utils.Timers import timeFunction
 from WMComponent.JobCreator.CreateWorkArea import getMasterName
 from WMComponent.JobCreator.JobCreatorPoller import retrieveWMSpec
+from WMComponent.TaskArchiver.CouchCleaner import CouchCleaner
 from WMComponent.TaskArchiver.DataCache import DataCache
 from WMCore.Algorithms import MathAlgos
 from WMCore.DAOFactory import DAOFactory
 from WMCore.DataStructs.LumiList import LumiList
 from WMCore.DataStructs.MathStructs.DiscreteSummaryHistogram import DiscreteSummaryHistogram
-from WMCore.Database.CMSCouch import CouchServer, CouchNotFoundError
+from WMCore.Database.CMSCouch import CouchServer
 from WMCore.Lexicon import sanitizeURL
 from WMCore.Services.FWJRDB.FWJRDBAPI import FWJRDBAPI
 from WMCore.Services.ReqMgr.ReqMgr import ReqMgr
@@ -138,6 +139,22 @@ class CleanCouchPoller(BaseWorkerThread):
         statSummaryDBName = self.config.JobStateMachine.summaryStatsDBName
         self.statsumdatabase = self.jobCouchdb.connectDatabase(statSummaryDBName)
 
+        # bulk deletion of the workflow documents from the local couch databases
+        databases = {"JobDump": {"database": self.jobsdatabase, "design": "JobDump",
+                                 "view": "jobsByWorkflowName", "mode": "range"},
+                     "FWJRDump": {"database": self.fwjrdatabase, "design": "FWJRDump",
+                                  "view": "fwjrsByWorkflowName", "mode": "range"},
+                     "SummaryStats": {"database": self.statsumdatabase, "mode": "ids"},
+                     "WMStatsAgent": {"database": self.wmstatsCouchDB.getDBInstance(), "design": "WMStatsAgent",
+                                      "view": "allWorkflows", "mode": "keys"}}
+        self.couchCleaner = CouchCleaner(databases,
+                                         numThreads=getattr(self.config.TaskArchiver, 'cleanupThreads', 4),
+                                         bulkSize=getattr(self.config.TaskArchiver, 'cleanupBulkSize', 1000),
+                                         purge=getattr(self.config.TaskArchiver, 'cleanupWithPurge', False),
+                                         compactThreshold=getattr(self.config.TaskArchiver,
+                                                                  'compactAfterDeletions', 0),
+                                         logger=logging)
+
         logging.debug("Using url %s/%s for job", jobDBurl, jobDBName)
         logging.debug("Writing to  %s/%s for workloadSummary", sanitizeURL(workDBurl)['url'], workDBName)
 
@@ -189,15 +206,13 @@ class CleanCouchPoller(BaseWorkerThread):
             logging.exception(msg)
 
     def archiveWorkflows(self, workflows, archiveState):
+        workflows = [workflowName for workflowName in workflows if self.isUploadedToWMArchive(workflowName)]
         updated = 0
-        for workflowName in workflows:
-            if not self.isUploadedToWMArchive(workflowName):
-                continue
-            if self.cleanAllLocalCouchDB(workflowName):
-                if not self.useReqMgrForCompletionCheck:
-                    #  only update tier0 case, for Prodcuction/Processing reqmgr will update status
-                    self.centralRequestDBWriter.updateRequestStatus(workflowName, archiveState)
-                updated += 1
+        for workflowName in self.cleanLocalCouchDBs(workflows):
+            if not self.useReqMgrForCompletionCheck:
+                #  only update tier0 case, for Prodcuction/Processing reqmgr will update status
+                self.centralRequestDBWriter.updateRequestStatus(workflowName, archiveState)
+            updated += 1
         return updated
 
     def archiveSummaryAndPublishToDashBoard(self, finishedwfsWithLogCollectAndCleanUp):
@@ -256,88 +271,25 @@ class CleanCouchPoller(BaseWorkerThread):
         numUpdated = self.archiveWorkflows(rejectedWorkflows, "rejected-archived")
         logging.info("archive rejected %s workflows", numUpdated)
 
-    def deleteWorkflowFromJobCouch(self, workflowName, db):
+    def cleanLocalCouchDBs(self, workflows):
         """
-        _deleteWorkflowFromCouch_
+        _cleanLocalCouchDBs_
 
-        If we are asked to delete the workflow from couch, delete it
-        to clear up some space.
-
-        Load the document IDs and revisions out of couch by workflowName,
-        then order a delete on them.
+        Delete the documents of many workflows from all the local couch databases,
+        with bulk requests. Return the workflows which were successfully deleted
+        from the JobDump, FWJRDump and WMStatsAgent databases.
         """
-        options = {"startkey": [workflowName], "endkey": [workflowName, {}], "reduce": False}
-
-        if db == "JobDump":
-            couchDB = self.jobsdatabase
-            view = "jobsByWorkflowName"
-        elif db == "FWJRDump":
-            couchDB = self.fwjrdatabase
-            view = "fwjrsByWorkflowName"
-        elif db == "SummaryStats":
-            couchDB = self.statsumdatabase
-            view = None
-        elif db == "WMStatsAgent":
-            couchDB = self.wmstatsCouchDB.getDBInstance()
-            view = "allWorkflows"
-            options = {"key": workflowName, "reduce": False}
-
-        if view is None:
-            try:
-                committed = couchDB.delete_doc(workflowName)
-            except CouchNotFoundError as ex:
-                return {'status': 'warning', 'message': "%s: %s" % (workflowName, str(ex))}
-        else:
-            try:
-                jobs = couchDB.loadView(db, view, options=options)['rows']
-            except Exception as ex:
-                errorMsg = "Error on loading jobs for %s" % workflowName
-                logging.warning("%s/n%s", str(ex), errorMsg)
-                return {'status': 'error', 'message': errorMsg}
-
-            for j in jobs:
-                doc = {}
-                doc["_id"] = j['value']['id']
-                doc["_rev"] = j['value']['rev']
-                couchDB.queueDelete(doc)
-            committed = couchDB.commit()
-
-        if committed:
-            # create the error report
-            errorReport = {}
-            deleted = 0
-            status = "ok"
-            for data in committed:
-                if 'error' in data:
-                    errorReport.setdefault(data['error'], 0)
-                    errorReport[data['error']] += 1
-                    status = "error"
-                else:
-                    deleted += 1
-            return {'status': status, 'delete': deleted, 'message': errorReport}
-        else:
-            return {'status': 'warning', 'message': "no %s exist" % workflowName}
-
-    def cleanAllLocalCouchDB(self, workflowName):
-        logging.info("Deleting %s from JobCouch", workflowName)
-
-        jobReport = self.deleteWorkflowFromJobCouch(workflowName, "JobDump")
-        logging.debug("%s docs deleted from JobDump", jobReport)
-
-        fwjrReport = self.deleteWorkflowFromJobCouch(workflowName, "FWJRDump")
-        logging.debug("%s docs deleted from FWJRDump", fwjrReport)
-
-        summaryReport = self.deleteWorkflowFromJobCouch(workflowName, "SummaryStats")
-        logging.debug("%s docs deleted from SummaryStats", summaryReport)
-
-        wmstatsReport = self.deleteWorkflowFromJobCouch(workflowName, "WMStatsAgent")
-        logging.debug("%s docs deleted from wmagent_summary", wmstatsReport)
-
-        # if one of the procedure fails return False
-        if jobReport["status"] == "error" or fwjrReport["status"] == "error" or wmstatsReport["status"] == "error":
-            return False
-        # other wise return True.
-        return True
+        if not workflows:
+            return []
+        logging.info("Deleting %d workflows from JobCouch", len(workflows))
+        reports = self.couchCleaner.deleteWorkflows(workflows)
+        cleaned = []
+        for workflowName in workflows:
+            logging.debug("%s docs deleted: %s", workflowName, reports[workflowName])
+            # if one of the procedure fails the workflow is not cleaned
+            if all(reports[workflowName][db]["status"] != "error" for db in ("JobDump", "FWJRDump", "WMStatsAgent")):
+                cleaned.append(workflowName)
+        return cleaned
 
     def isUploadedToWMArchive(self, workflowName):
 
@@ -365,10 +317,10 @@ class CleanCouchPoller(BaseWorkerThread):
 
             workflowDict = self.centralRequestDBReader.getStatusAndTypeByRequest(requestNames)
 
-            for request, value in viewitems(workflowDict):
-                if value[0].endswith("-archived"):
-                    self.cleanAllLocalCouchDB(request)
-                    numDeletedRequests += 1
+            archivedRequests = [request for request, value in viewitems(workflowDict)
+                                if value[0].endswith("-archived")]
+            self.cleanLocalCouchDBs(archivedRequests)
+            numDeletedRequests = len(archivedRequests)
 
         except Exception as ex:
             errorMsg = "Error on loading workflow list from wmagent_summary db"
@@ -763,10 +715,10 @@ class CleanCouchPoller(BaseWorkerThread):
 
         The couch performance stuff is convoluted enough I think I want to handle it separately.
         """
-        perf = self.fwjrdatabase.loadView("FWJRDump", "performanceByWorkflowName",
+        perf = self.fwjrdatabase.iterView("FWJRDump", "performanceByWorkflowName",
                                           options={"startkey": [workflowName],
                                                    "endkey": [workflowName],
-                                                   "stale": "update_after"})['rows']
+                                                   "stale": "update_after"})
 
         failedJobs = self.getFailedJobs(workflowName)
 
@@ -890,14 +842,16 @@ class CleanCouchPoller(BaseWorkerThread):
 
     def getFailedJobs(self, workflowName):
         # We want ALL the jobs, and I'm sorry, CouchDB doesn't support wildcards, above-than-absurd values will do:
-        errorView = self.fwjrdatabase.loadView("FWJRDump", "errorsByWorkflowName",
+        errorView = self.fwjrdatabase.iterView("FWJRDump", "errorsByWorkflowName",
                                                options={"startkey": [workflowName, 0, 0],
                                                         "endkey": [workflowName, 999999999, 999999],
-                                                        "stale": "update_after"})['rows']
+                                                        "stale": "update_after"})
         failedJobs = []
+        seenJobs = set()
         for row in errorView:
             jobId = row['value']['jobid']
-            if jobId not in failedJobs:
+            if jobId not in seenJobs:
+                seenJobs.add(jobId)
                 failedJobs.append(jobId)
 
         return failedJobs
@@ -0,0 +1,197 @@
+"""
+_CouchCleaner_
+
+Delete the documents of many workflows at once from the agent couch databases.
+"""
+from __future__ import division
+
+import logging
+import time
+from multiprocessing.pool import ThreadPool
+
+from Utils.IteratorTools import grouper
+
+
+class CouchCleaner(object):
+    """
+    Bulk deletion of the workflow documents from several couch databases.
+
+    Each database is described by a dictionary with:
+      * database: the CMSCouch Database object
+      * design and view: the view used to find the workflow documents
+      * mode: how the view is queried, one of
+          - 'range': the view keys are [workflowName, ...], read with one range
+            request per workflow
+          - 'keys': the view keys are the workflow names, read with multi-key requests
+          - 'ids': the document ids are the workflow names, read from _all_docs
+        The view rows have {'id': docId, 'rev': docRev} as value, unless the mode is 'ids'.
+
+    The documents are found and deleted with _bulk_docs (or _purge) requests
+    running concurrently within and across the databases.
+    """
+
+    def __init__(self, databases, numThreads=4, bulkSize=1000, purge=False,
+                 compactThreshold=0, logger=None):
+        """
+        :param databases: dictionary of database descriptions, keyed by a label
+        :param numThreads: number of concurrent couch requests
+        :param bulkSize: maximum number of documents per deletion request
+        :param purge: purge the documents instead of deleting them
+        :param compactThreshold: trigger the compaction of a database once this
+            number of documents was removed from it. 0 disables the compaction
+        :param logger: logger object
+        """
+        self.databases = databases
+        self.numThreads = numThreads
+        self.bulkSize = bulkSize
+        self.purge = purge
+        self.compactThreshold = compactThreshold
+        self.logger = logger or logging.getLogger()
+        self.removedSinceCompaction = dict((label, 0) for label in databases)
+
+    def _map(self, func, items):
+        """
+        Map func over items with up to numThreads threads, keeping the order
+        """
+        numThreads = min(self.numThreads, len(items))
+        if numThreads <= 1:
+            return [func(item) for item in items]
+        pool = ThreadPool(numThreads)
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _findDocs(self, task):
+        """
+        Find the documents of a slice of workflows in a database
+        :param task: tuple with the database label and the list of workflows
+        :return: a list of (workflowName, docId, docRev) tuples, or None on failures
+        """
+        label, workflows = task
+        try:
+            return self._findWorkflowDocs(label, workflows)
+        except Exception as ex:
+            self.logger.warning("Failed to find the docs of %d workflows in %s: %s", len(workflows), label, str(ex))
+            return None
+
+    def _findWorkflowDocs(self, label, workflows):
+        """
+        See _findDocs
+        """
+        dbInfo = self.databases[label]
+        couchDB = dbInfo['database']
+        docs = []
+        if dbInfo['mode'] == 'range':
+            for workflowName in workflows:
+                options = {"startkey": [workflowName], "endkey": [workflowName, {}], "reduce": False}
+                for row in couchDB.loadView(dbInfo['design'], dbInfo['view'], options)['rows']:
+                    docs.append((workflowName, row['value']['id'], row['value']['rev']))
+        elif dbInfo['mode'] == 'keys':
+            rows = couchDB.loadView(dbInfo['design'], dbInfo['view'], {"reduce": False}, workflows)['rows']
+            for row in rows:
+                docs.append((row['key'], row['value']['id'], row['value']['rev']))
+        else:
+            for row in couchDB.allDocs(keys=workflows)['rows']:
+                if 'value' in row and not row['value'].get('deleted'):
+                    docs.append((row['key'], row['id'], row['value']['rev']))
+        return docs
+
+    def _removeDocs(self, task):
+        """
+        Delete or purge a batch of documents from a database
+        :param task: tuple with the database label and a list of (workflowName, docId, docRev)
+        :return: a list of (workflowName, error) tuples, error being None for removed documents
+        """
+        label, docs = task
+        try:
+            return self._removeWorkflowDocs(label, docs)
+        except Exception as ex:
+            self.logger.warning("Failed to remove %d docs from %s: %s", len(docs), label, str(ex))
+            return [(workflowName, 'exception') for workflowName, _, _ in docs]
+
+    def _removeWorkflowDocs(self, label, docs):
+        """
+        See _removeDocs
+        """
+        couchDB = self.databases[label]['database']
+        if self.purge:
+            data = {}
+            for _, docId, docRev in docs:
+                data.setdefault(docId, []).append(docRev)
+            purged = couchDB.purge(data).get('purged', {})
+            return [(workflowName, None if docId in purged else 'not_purged') for workflowName, docId, _ in docs]
+        data = {'docs': [{'_id': docId, '_rev': docRev, '_deleted': True} for _, docId, docRev in docs]}
+        results = couchDB.post('/%s/_bulk_docs/' % couchDB.name, data)
+        return [(workflowName, result.get('error')) for (workflowName, _, _), result in zip(docs, results)]
+
+    def deleteWorkflows(self, workflows):
+        """
+        Delete all the documents of the given workflows from all the databases
+        :param workflows: list of workflow names
+        :return: a dictionary keyed by workflow name, with a report per database label
+            like {'status': 'ok'|'warning'|'error', 'delete': numDocs, 'message': errors}
+        """
+        workflows = list(workflows)
+        reports = dict((workflowName, dict((label, {'status': 'warning', 'delete': 0, 'message': {}})
+                                           for label in self.databases))
+                       for workflowName in workflows)
+        if not workflows:
+            return reports
+        startTime = time.time()
+
+        findTasks = []
+        for label, dbInfo in self.databases.items():
+            # range requests are made per workflow, the other ones for many workflows
+            sliceSize = 1 if dbInfo['mode'] == 'range' else self.bulkSize
+            findTasks.extend((label, wfSlice) for wfSlice in grouper(workflows, sliceSize))
+        removeTasks = []
+        numFound = dict((label, 0) for label in self.databases)
+        for (label, wfSlice), docs in zip(findTasks, self._map(self._findDocs, findTasks)):
+            if docs is None:
+                for workflowName in wfSlice:
+                    reports[workflowName][label] = {'status': 'error', 'delete': 0, 'message': {'find_failed': 1}}
+                continue
+            numFound[label] += len(docs)
+            removeTasks.extend((label, batch) for batch in grouper(docs, self.bulkSize))
+
+        numRemoved = 0
+        for (label, _), results in zip(removeTasks, self._map(self._removeDocs, removeTasks)):
+            for workflowName, error in results:
+                report = reports[workflowName][label]
+                if error:
+                    report['message'].setdefault(error, 0)
+                    report['message'][error] += 1
+                    report['status'] = 'error'
+                else:
+                    report['delete'] += 1
+                    if report['status'] == 'warning':
+                        report['status'] = 'ok'
+                    self.removedSinceCompaction[label] += 1
+                    numRemoved += 1
+
+        elapsed = time.time() - startTime
+        self.logger.info("Removed %d docs of %d workflows in %.1f secs (%.1f docs/sec). Docs found per db: %s",
+                         numRemoved, len(workflows), elapsed, numRemoved / elapsed if elapsed else 0, numFound)
+        self.compact()
+        return reports
+
+    def compact(self):
+        """
+        Trigger the compaction of the databases from which at least
+        compactThreshold documents were removed since their last compaction
+        """
+        if not self.compactThreshold:
+            return
+        for label, numRemoved in self.removedSinceCompaction.items():
+            if numRemoved < self.compactThreshold:
+                continue
+            dbInfo = self.databases[label]
+            try:
+                views = [dbInfo['design']] if dbInfo.get('design') else []
+                dbInfo['database'].compact(views=views)
+                self.logger.info("Triggered the compaction of %s after the removal of %d docs", label, numRemoved)
+                self.removedSinceCompaction[label] = 0
+            except Exception as ex:
+                self.logger.warning("Failed to trigger the compaction of %s: %s", label, str(ex))
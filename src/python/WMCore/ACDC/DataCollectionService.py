@@ -19,7 +19,9 @@ import WMCore.Database.CouchUtils as CouchUtils
 from WMCore.ACDC.CouchCollection import CouchCollection
 from WMCore.ACDC.CouchFileset import CouchFileset
 from WMCore.ACDC.CouchService import CouchService
+from WMCore.ACDC.FileMerger import FileMerger
 from WMCore.DAOFactory import DAOFactory
+from WMCore.DataStructs.CompiledLumiMask import CompiledLumiMask
 from WMCore.DataStructs.File import File
 from WMCore.DataStructs.LumiList import LumiList
 from WMCore.DataStructs.Run import Run
@@ -35,78 +37,16 @@ def mergeFilesInfo(chunkFiles):
     section (for the same file) in case ErrorHandler happened to upload the
     same job error document twice.
     """
-    mergedFiles = {}
-
-    # Merge ACDC docs without any real input data (aka MCFakeFile)
     if chunkFiles[0]['lfn'].startswith('MCFakeFile'):
         logging.info("Merging %d ACDC FakeFiles...", len(chunkFiles))
-        for acdcFile in chunkFiles:
-            fName = acdcFile['lfn']
-            if fName not in mergedFiles:
-                mergedFiles[fName] = acdcFile
-            else:
-                lumiSet = set(acdcFile['runs'][0]['lumis'])
-                if lumiSet.issubset(set(mergedFiles[fName]['runs'][0]['lumis'])):
-                    # every element in lumiSet is already in mergedFiles, it's a dup!
-                    continue
-                mergedFiles[fName]['events'] += acdcFile['events']
-                mergedFiles[fName]['runs'][0]['lumis'].extend(acdcFile['runs'][0]['lumis'])
     else:
         logging.info("Merging %d real input files...", len(chunkFiles))
-        for acdcFile in chunkFiles:
-            fName = acdcFile['lfn']
-            if fName not in mergedFiles:
-                mergedFiles[fName] = acdcFile
-            else:
-                # if one run/lumi pair is there, then it's a duplicate job
-                runNum = acdcFile['runs'][0]['run_number']
-                lumiSet = set(acdcFile['runs'][0]['lumis'])
-                if _isRunMaskDuplicate(runNum, lumiSet, mergedFiles[fName]['runs']):
-                    continue
-                # union of parents
-                allParents = list(set(mergedFiles[fName]['parents']).union(acdcFile['parents']))
-                mergedFiles[fName]['parents'] = allParents
-                # just add up run/lumi pairs (don't try to merge them)
-                mergedFiles[fName]['runs'].extend(acdcFile['runs'])
-        _mergeRealDataRunLumis(mergedFiles)
-
-    logging.info(" ... resulted in %d unique files.", len(mergedFiles))
-    return listvalues(mergedFiles)
-
-
-def _isRunMaskDuplicate(run, lumis, runLumis):
-    """
-    Test whether run and lumi is a subset of one of the
-    runLumi pairs in runLumis
-    :param run: integer run number
-    :param lumi: set of lumis
-    :param runLumis: list of dictionaries containing run and lumis
-    """
-    for runLumi in runLumis:
-        if run == runLumi['run_number']:
-            if lumis.issubset(runLumi['lumis']):
-                return True
-    return False
 
+    merger = FileMerger()
+    merger.addFiles(chunkFiles)
 
-def _mergeRealDataRunLumis(mergedFiles):
-    """
-    Function to scan and merge run/lumi pairs in the same file, thus
-    getting rid of duplicate lumi sections in real data.
-    :param mergedFiles: list of dictionaries with ACDC file info
-    :return: update data structure in place
-    """
-    for fname in mergedFiles:
-        runLumis = {}
-        for item in mergedFiles[fname]['runs']:
-            runLumis.setdefault(item['run_number'], [])
-            runLumis[item['run_number']].extend(item['lumis'])
-        # now write those back to the original data structure
-        mergedFiles[fname]['runs'] = []
-        for run, lumis in viewitems(runLumis):
-            mergedFiles[fname]['runs'].append({'run_number': run,
-                                               'lumis': list(set(lumis))})
-    return
+    logging.info(" ... resulted in %d unique files.", len(merger))
+    return merger.files()
 
 
 def fixupMCFakeLumis(files, acdcVersion):
@@ -214,26 +154,42 @@ class DataCollectionService(CouchService):
         fileInfo["locations"].sort()
         return fileInfo["locations"]
 
+    @CouchUtils.connectToCouch
+    def _iterFilesetFiles(self, collectionName, filesetName, pageSize=500):
+        """
+        Generator over the file records of the ACDC documents matching the
+        collection and fileset names. The documents are fetched from the
+        ACDC Server in pages of pageSize documents.
+        """
+        key = [collectionName, filesetName]
+        option = {"include_docs": True, "reduce": False,
+                  "startkey": key, "endkey": key, "limit": pageSize + 1}
+        while True:
+            rows = self.couchdb.loadView("ACDC", "coll_fileset_docs", option)["rows"]
+            for row in rows[:pageSize]:
+                files = row["doc"].get("files", {})
+                fixupMCFakeLumis(files, row['doc'].get("acdc_version", 1))
+                for fileInfo in listvalues(files):
+                    yield fileInfo
+            if len(rows) <= pageSize:
+                break
+            # the extra row is the first one of the next page
+            option["startkey_docid"] = rows[pageSize]["id"]
+
+    def _sortedFilesetFiles(self, fileInfos):
+        """
+        Sort file records by location and lfn, which defines the chunk offsets
+        """
+        # primary location sort, then lfn (python sort is stable for the rest)
+        return sorted(fileInfos, key=lambda x: ("".join(self._sortLocationInPlace(x)), x["lfn"]))
+
     @CouchUtils.connectToCouch
     def _getFilesetInfo(self, collectionName, filesetName, chunkOffset=None, chunkSize=None):
         """
         Fetches all the data from the ACDC Server that matches the collection
         and fileset names.
         """
-        option = {"include_docs": True, "reduce": False}
-        keys = [[collectionName, filesetName]]
-        results = self.couchdb.loadView("ACDC", "coll_fileset_docs", option, keys)
-
-        filesInfo = []
-        for row in results["rows"]:
-            files = row["doc"].get("files", [])
-            fixupMCFakeLumis(files, row['doc'].get("acdc_version", 1))
-            filesInfo.extend(listvalues(files))
-
-        # second lfn sort
-        filesInfo.sort(key=lambda x: x["lfn"])
-        # primary location sort (python preserve sort result)
-        filesInfo.sort(key=lambda x: "".join(self._sortLocationInPlace(x)))
+        filesInfo = self._sortedFilesetFiles(self._iterFilesetFiles(collectionName, filesetName))
 
         if chunkOffset is not None and chunkSize is not None:
             return filesInfo[chunkOffset: chunkOffset + chunkSize]
@@ -241,17 +197,20 @@ class DataCollectionService(CouchService):
             return filesInfo
 
     @CouchUtils.connectToCouch
-    def chunkFileset(self, collectionName, filesetName, chunkSize=100):
+    def iterChunks(self, collectionName, filesetName, chunkSize=100):
         """
-        _chunkFileset_
+        _iterChunks_
 
-        Split all of the fileset in a given collection/task into chunks.  This
-        will return a list of dictionaries that contain the offset into the
-        fileset and a summary of files/events/lumis that are in the fileset
-        chunk.
+        Generator version of chunkFileset, yielding one chunk at a time. Only the
+        file summaries (locations, events and number of lumis) are kept in memory.
         """
-        chunks = []
-        results = self._getFilesetInfo(collectionName, filesetName)
+        summaries = []
+        for fileInfo in self._iterFilesetFiles(collectionName, filesetName):
+            numLumis = 0
+            for runLumi in fileInfo["runs"]:
+                numLumis += len(runLumi["lumis"])
+            summaries.append({"lfn": fileInfo["lfn"], "locations": fileInfo["locations"],
+                              "events": fileInfo["events"], "lumis": numLumis})
 
         totalFiles = 0
         currentLocation = None
@@ -259,13 +218,13 @@ class DataCollectionService(CouchService):
         numLumisInBlock = 0
         numEventsInBlock = 0
 
-        for value in results:
+        for value in self._sortedFilesetFiles(summaries):
             if currentLocation is None:
                 currentLocation = value["locations"]
             if numFilesInBlock == chunkSize or currentLocation != value["locations"]:
-                chunks.append({"offset": totalFiles, "files": numFilesInBlock,
-                               "events": numEventsInBlock, "lumis": numLumisInBlock,
-                               "locations": currentLocation})
+                yield {"offset": totalFiles, "files": numFilesInBlock,
+                       "events": numEventsInBlock, "lumis": numLumisInBlock,
+                       "locations": currentLocation}
                 totalFiles += numFilesInBlock
                 currentLocation = value["locations"]
                 numFilesInBlock = 0
@@ -273,17 +232,24 @@ class DataCollectionService(CouchService):
                 numEventsInBlock = 0
 
             numFilesInBlock += 1
-            lumis = 0
-            for runLumi in value["runs"]:
-                lumis += len(runLumi["lumis"])
-            numLumisInBlock += lumis
+            numLumisInBlock += value["lumis"]
             numEventsInBlock += value["events"]
 
         if numFilesInBlock > 0:
-            chunks.append({"offset": totalFiles, "files": numFilesInBlock,
-                           "events": numEventsInBlock, "lumis": numLumisInBlock,
-                           "locations": currentLocation})
-        return chunks
+            yield {"offset": totalFiles, "files": numFilesInBlock,
+                   "events": numEventsInBlock, "lumis": numLumisInBlock,
+                   "locations": currentLocation}
+
+    def chunkFileset(self, collectionName, filesetName, chunkSize=100):
+        """
+        _chunkFileset_
+
+        Split all of the fileset in a given collection/task into chunks.  This
+        will return a list of dictionaries that contain the offset into the
+        fileset and a summary of files/events/lumis that are in the fileset
+        chunk.
+        """
+        return list(self.iterChunks(collectionName, filesetName, chunkSize))
 
     @CouchUtils.connectToCouch
     def singleChunkFileset(self, collectionName, filesetName):
@@ -414,39 +380,13 @@ class DataCollectionService(CouchService):
         files = self._getFilesetInfo(collectionID, taskName)
 
         allRuns = {}
-        whiteList = {}
-
         for fileInfo in files:
             for run in fileInfo["runs"]:
-                if run["run_number"] not in allRuns:
-                    allRuns[run["run_number"]] = []
-                allRuns[run["run_number"]].extend(run["lumis"])
-
-        for run in allRuns:
-            lumis = []
-            lumis.extend(set(allRuns[run]))
-            lumis.sort()
-
-            whiteList[str(run)] = []
-            lastLumi = None
-            currentSet = None
-
-            while len(lumis) > 0:
-                currentLumi = lumis.pop(0)
-                if currentLumi - 1 != lastLumi:
-                    if currentSet is None:
-                        currentSet = [currentLumi]
-                    else:
-                        currentSet.append(lastLumi)
-                        whiteList[str(run)].append(currentSet)
-                        currentSet = [currentLumi]
-
-                lastLumi = currentLumi
-
-            currentSet.append(lastLumi)
-            whiteList[str(run)].append(currentSet)
-
-        return whiteList
+                allRuns.setdefault(run["run_number"], []).extend([lumi, lumi] for lumi in run["lumis"])
+
+        # the compiled mask merges the lumis into ranges
+        compactList = CompiledLumiMask(allRuns).getCompactList()
+        return dict((str(run), lumiRanges) for run, lumiRanges in viewitems(compactList))
 
     def getLumilistWhitelist(self, collectionID, taskName):
         """
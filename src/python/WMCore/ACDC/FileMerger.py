@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+_FileMerger_
+
+Incremental merge of the ACDC file records belonging to the same file.
+
+ACDC documents are uploaded per failed job, so the same input file usually
+shows up in many documents, each one with a few run/lumi pairs. The merger
+accepts those records one at a time (e.g. while they are streamed from
+CouchDB), keeping per file and run the lumis already merged as interval sets,
+and the run entries of the merged records to detect the duplicate ones.
+"""
+
+from bisect import bisect_right
+
+from future.utils import viewitems, listvalues
+
+
+class LumiIntervals(object):
+    """
+    _LumiIntervals_
+
+    Set of lumi section numbers stored as sorted, disjoint and inclusive
+    [first, last] ranges. Membership tests are done with a binary search.
+    """
+
+    def __init__(self, lumis=None):
+        self._starts = []
+        self._ends = []
+        if lumis:
+            self.update(lumis)
+
+    def __contains__(self, lumi):
+        idx = bisect_right(self._starts, lumi) - 1
+        return idx >= 0 and lumi <= self._ends[idx]
+
+    def __len__(self):
+        return sum(end - start + 1 for start, end in zip(self._starts, self._ends))
+
+    def __iter__(self):
+        for start, end in zip(self._starts, self._ends):
+            for lumi in range(start, end + 1):
+                yield lumi
+
+    def ranges(self):
+        """
+        Return the list of [first, last] lumi ranges
+        """
+        return [[start, end] for start, end in zip(self._starts, self._ends)]
+
+    def issuperset(self, lumis):
+        """
+        Return True if all the given lumis are already in the set
+        """
+        for lumi in lumis:
+            if lumi not in self:
+                return False
+        return True
+
+    def add(self, lumi):
+        """
+        Add a single lumi, merging it with the adjacent ranges
+        """
+        idx = bisect_right(self._starts, lumi) - 1
+        if idx >= 0 and lumi <= self._ends[idx]:
+            return
+        joinLeft = idx >= 0 and self._ends[idx] == lumi - 1
+        joinRight = idx + 1 < len(self._starts) and self._starts[idx + 1] == lumi + 1
+        if joinLeft and joinRight:
+            self._ends[idx] = self._ends[idx + 1]
+            del self._starts[idx + 1]
+            del self._ends[idx + 1]
+        elif joinLeft:
+            self._ends[idx] = lumi
+        elif joinRight:
+            self._starts[idx + 1] = lumi
+        else:
+            self._starts.insert(idx + 1, lumi)
+            self._ends.insert(idx + 1, lumi)
+
+    def update(self, lumis):
+        """
+        Add many lumis
+        """
+        for lumi in sorted(lumis):
+            self.add(lumi)
+
+
+class FileMerger(object):
+    """
+    _FileMerger_
+
+    Merge ACDC file records with the same LFN. For MCFakeFiles the events are
+    added up and the lumis appended, for real input files the parents and the
+    run/lumi pairs are merged. MCFakeFiles records whose lumis were all seen
+    before for that file are considered duplicates and dropped. Real input file
+    records are duplicates when the lumis of their first run are all in a
+    single run entry of a record merged before for that file.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._lumis = {}
+        self._runEntries = {}
+        self._parents = {}
+        self._fakeFiles = None
+
+    def __len__(self):
+        return len(self._files)
+
+    def add(self, acdcFile):
+        """
+        Merge a single ACDC file record
+        """
+        if self._fakeFiles is None:
+            self._fakeFiles = acdcFile['lfn'].startswith('MCFakeFile')
+        if self._fakeFiles:
+            self._addFakeFile(acdcFile)
+        else:
+            self._addFile(acdcFile)
+
+    def addFiles(self, acdcFiles):
+        """
+        Merge an iterable of ACDC file records
+        """
+        for acdcFile in acdcFiles:
+            self.add(acdcFile)
+
+    def _addFakeFile(self, acdcFile):
+        """
+        MCFakeFiles have a single run, lumis are kept in their original order
+        """
+        fName = acdcFile['lfn']
+        lumis = acdcFile['runs'][0]['lumis']
+        if fName not in self._files:
+            self._files[fName] = acdcFile
+            self._lumis[fName] = LumiIntervals(lumis)
+            return
+
+        knownLumis = self._lumis[fName]
+        if knownLumis.issuperset(lumis):
+            # every lumi is already there, it's a dup!
+            return
+        mergedFile = self._files[fName]
+        mergedFile['events'] += acdcFile['events']
+        mergedFile['runs'][0]['lumis'].extend(lumis)
+        knownLumis.update(lumis)
+
+    def _addFile(self, acdcFile):
+        """
+        Real input files, where run/lumis pairs are merged per run
+        """
+        fName = acdcFile['lfn']
+        runLumis = self._lumis.get(fName)
+        if runLumis is None:
+            self._files[fName] = acdcFile
+            self._parents[fName] = set(acdcFile['parents'])
+            runLumis = self._lumis[fName] = {}
+            runEntries = self._runEntries[fName] = {}
+        else:
+            # if one run/lumi pair is there, then it's a duplicate job
+            runEntries = self._runEntries[fName]
+            firstRun = acdcFile['runs'][0]
+            lumiSet = set(firstRun['lumis'])
+            for entry in runEntries.get(firstRun['run_number'], []):
+                if lumiSet.issubset(entry):
+                    return
+            self._parents[fName].update(acdcFile['parents'])
+
+        for run in acdcFile['runs']:
+            runLumis.setdefault(run['run_number'], LumiIntervals()).update(run['lumis'])
+            runEntries.setdefault(run['run_number'], []).append(frozenset(run['lumis']))
+
+    def files(self):
+        """
+        Return the list of merged file records
+        """
+        if not self._fakeFiles:
+            for fName, mergedFile in viewitems(self._files):
+                mergedFile['parents'] = list(self._parents[fName])
+                mergedFile['runs'] = [{'run_number': run, 'lumis': list(lumis)}
+                                      for run, lumis in viewitems(self._lumis[fName])]
+        return listvalues(self._files)
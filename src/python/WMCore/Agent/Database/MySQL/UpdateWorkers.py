@@ -0,0 +1,33 @@
+"""
+_UpdateWorkers_
+
+MySQL implementation of UpdateWorkers: batched version of UpdateWorker
+"""
+from __future__ import division
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+
+class UpdateWorkers(DBFormatter):
+    """
+    Update the heartbeat of many workers at once. Each bind must have the
+    worker_name and last_updated keys, and optionally state, cycle_time and outcome.
+    Binds with the same keys are written with a single statement.
+    """
+    sqlpart1 = """UPDATE wm_workers
+                      SET last_updated = :last_updated"""
+    sqlpart3 = """ WHERE name = :worker_name"""
+    columns = ("state", "cycle_time", "outcome")
+
+    def execute(self, binds, conn=None, transaction=False):
+        bindGroups = {}
+        for bind in binds:
+            columns = tuple(column for column in self.columns if column in bind)
+            bindGroups.setdefault(columns, []).append(bind)
+
+        for columns, groupBinds in bindGroups.items():
+            sqlpart2 = "".join(", %s = :%s" % (column, column) for column in columns)
+            sql = self.sqlpart1 + sqlpart2 + self.sqlpart3
+            self.dbi.processData(sql, groupBinds, conn=conn,
+                                 transaction=transaction)
+        return
@@ -0,0 +1,11 @@
+"""
+_UpdateWorkers_
+
+Oracle implementation of UpdateWorkers
+"""
+
+from WMCore.Agent.Database.MySQL.UpdateWorkers import UpdateWorkers as UpdateWorkersMySQL
+
+
+class UpdateWorkers(UpdateWorkersMySQL):
+    pass
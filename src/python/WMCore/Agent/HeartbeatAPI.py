@@ -4,19 +4,153 @@ _HartbeatAPI_
 A simple object representing a file in WMBS.
 """
 
+import logging
 import os
+import threading
+import time
 
 from WMCore.Database.DBExceptionHandler import db_exception_handler
 from WMCore.WMConnectionBase import WMConnectionBase
 
 
+class HeartbeatWriter(object):
+    """
+    Per process aggregation of the worker heartbeats and cycle updates.
+
+    Worker threads only record their updates in memory, and a background
+    thread writes the latest update of each worker to wm_workers with
+    batched statements, every flushInterval seconds. The last_updated
+    value written is the time of the update, not the time of the flush.
+    The latest status of the workers of the process can be read from
+    memory with workerStatus.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger()
+        self.flushInterval = None
+        self.updateDAO = None
+        self._pending = {}
+        self._status = {}
+        self._lock = threading.Lock()
+        # held while writing to the database, see HeartbeatAPI.updateWorkerError
+        self.flushLock = threading.Lock()
+        self._stopFlag = threading.Event()
+        self._thread = None
+        self.stats = {"updates": 0, "flushes": 0, "rowsWritten": 0, "failures": 0}
+
+    def start(self, updateDAO, flushInterval):
+        """
+        Start the flushing thread, if not started yet. The shortest flush
+        interval requested is used.
+        :param updateDAO: UpdateWorkers DAO object
+        :param flushInterval: maximum number of seconds an update is kept in memory
+        """
+        with self._lock:
+            if self.flushInterval is None or flushInterval < self.flushInterval:
+                self.flushInterval = flushInterval
+            self.updateDAO = self.updateDAO or updateDAO
+            if self._thread is None or not self._thread.is_alive():
+                self._stopFlag.clear()
+                self._thread = threading.Thread(target=self._run, name="HeartbeatWriter")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopFlag.wait(self.flushInterval):
+            self.flush()
+
+    def stop(self):
+        """
+        Stop the flushing thread and write the pending updates
+        """
+        self._stopFlag.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def update(self, workerName, state=None, timeSpent=None, results=None):
+        """
+        Record the heartbeat of a worker, and its last cycle if timeSpent is given
+        """
+        with self._lock:
+            binds = self._pending.setdefault(workerName, {"worker_name": workerName})
+            binds["last_updated"] = int(time.time())
+            if state:
+                binds["state"] = state
+            if timeSpent is not None:
+                binds["cycle_time"] = timeSpent
+                binds["outcome"] = results
+            self._status.setdefault(workerName, {}).update(binds)
+            self.stats["updates"] += 1
+
+    def discard(self, workerName):
+        """
+        Drop the pending updates of a worker
+        """
+        with self._lock:
+            self._pending.pop(workerName, None)
+
+    def flush(self):
+        """
+        Write all the pending updates with batched statements. Failed updates
+        are kept for the next flush, unless the worker got a newer update.
+        """
+        with self.flushLock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending or self.updateDAO is None:
+                return
+            try:
+                self.updateDAO.execute(list(pending.values()))
+            except Exception as ex:
+                self.logger.warning("Heartbeat flush of %d workers failed! Retrying next time...:\n%s",
+                                    len(pending), str(ex))
+                with self._lock:
+                    self.stats["failures"] += 1
+                    for workerName, binds in pending.items():
+                        newBinds = self._pending.get(workerName)
+                        self._pending[workerName] = dict(binds, **newBinds) if newBinds else binds
+                return
+            with self._lock:
+                self.stats["flushes"] += 1
+                self.stats["rowsWritten"] += len(pending)
+
+    def workerStatus(self):
+        """
+        Return the latest heartbeat of each worker of the process, keyed by
+        worker name, with a 'pending' flag for the updates not written yet
+        """
+        with self._lock:
+            return dict((workerName, dict(status, pending=workerName in self._pending))
+                        for workerName, status in self._status.items())
+
+
+_HEARTBEAT_WRITER = {"pid": None, "writer": None}
+_HEARTBEAT_WRITER_LOCK = threading.Lock()
+
+
+def getHeartbeatWriter():
+    """
+    _getHeartbeatWriter_
+
+    Return the heartbeat writer of the current process
+    """
+    with _HEARTBEAT_WRITER_LOCK:
+        if _HEARTBEAT_WRITER["pid"] != os.getpid():
+            # a forked process does not inherit the flushing thread
+            _HEARTBEAT_WRITER["pid"] = os.getpid()
+            _HEARTBEAT_WRITER["writer"] = HeartbeatWriter()
+        return _HEARTBEAT_WRITER["writer"]
+
+
 class HeartbeatAPI(WMConnectionBase):
     """
     Generic methods used by all of the WMBS classes.
     """
 
     def __init__(self, componentName, pollInterval=None, heartbeatTimeout=7200,
-                 logger=None, dbi=None):
+                 logger=None, dbi=None, flushInterval=0):
         """
         ___init___
 
@@ -26,6 +160,8 @@ class HeartbeatAPI(WMConnectionBase):
         a different polling interval and a different heartbeat timeout.
         Finally, check to see if a transaction object has been created.
         If none exists, create one but leave the transaction closed.
+        With a flushInterval, the heartbeat and cycle updates are written
+        asynchronously by the HeartbeatWriter of the process.
         """
         self.componentName = componentName
         self.pollInterval = pollInterval
@@ -43,6 +179,11 @@ class HeartbeatAPI(WMConnectionBase):
         self.getHeartbeat = self.daofactory(classname="GetHeartbeatInfo")
         self.getAllHeartbeat = self.daofactory(classname="GetAllHeartbeatInfo")
 
+        self.heartbeatWriter = None
+        if flushInterval:
+            self.heartbeatWriter = getHeartbeatWriter()
+            self.heartbeatWriter.start(self.daofactory(classname="UpdateWorkers"), flushInterval)
+
     def registerComponent(self):
         """
         Deletes any leftover for a component with the same name and then
@@ -73,6 +214,9 @@ class HeartbeatAPI(WMConnectionBase):
         """
         Update a worker's heartbeat and its state
         """
+        if self.heartbeatWriter:
+            self.heartbeatWriter.update(workerName, state)
+            return
         try:
             self.updateWorker.execute(workerName, state, conn=self.getDBConn(),
                                       transaction=self.existingTransaction())
@@ -85,6 +229,9 @@ class HeartbeatAPI(WMConnectionBase):
         Update a worker's heartbeat as well as the time spent on that
         cycle and any results returned.
         """
+        if self.heartbeatWriter:
+            self.heartbeatWriter.update(workerName, "Running", timeSpent, results)
+            return
         self.updateWorker.execute(workerName, "Running", timeSpent, results,
                                   conn=self.getDBConn(),
                                   transaction=self.existingTransaction())
@@ -92,6 +239,14 @@ class HeartbeatAPI(WMConnectionBase):
     @db_exception_handler
     def updateWorkerError(self, workerName, errorMessage):
 
+        if self.heartbeatWriter:
+            # a pending Running state must not overwrite the error
+            with self.heartbeatWriter.flushLock:
+                self.heartbeatWriter.discard(workerName)
+                self.updateErrorWorker.execute(self.componentName, workerName, errorMessage,
+                                               conn=self.getDBConn(),
+                                               transaction=self.existingTransaction())
+            return
         self.updateErrorWorker.execute(self.componentName, workerName, errorMessage,
                                        conn=self.getDBConn(),
                                        transaction=self.existingTransaction())
@@ -109,3 +264,10 @@ class HeartbeatAPI(WMConnectionBase):
                                                transaction=self.existingTransaction())
 
         return results
+
+    def flushHeartbeats(self):
+        """
+        Write the pending heartbeat updates of the process, if any
+        """
+        if self.heartbeatWriter:
+            self.heartbeatWriter.flush()
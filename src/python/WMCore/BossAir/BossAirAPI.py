@@ -83,6 +83,7 @@ class BossAirAPI(WMConnectionBase):
         self.stateDAO = self.daoFactory(classname="NewState")
         self.loadByWMBSDAO = self.daoFactory(classname="LoadByWMBSID")
         self.updateDAO = self.daoFactory(classname="UpdateJobs")
+        self.updateStatusDAO = self.daoFactory(classname="UpdateStatus")
         self.newJobDAO = self.daoFactory(classname="NewJobs")
         self.runningJobDAO = self.daoFactory(classname="LoadRunning")
         self.completeJobDAO = self.daoFactory(classname="LoadComplete")
@@ -188,6 +189,21 @@ class BossAirAPI(WMConnectionBase):
 
         return runJobs
 
+    def _iterRunningJobs(self):
+        """
+        _iterRunningJobs_
+
+        Generator yielding the active runjobs one at a time, streaming
+        them from the database instead of loading the whole table at once
+        """
+        runJobDicts = self.runningJobDAO.execute(conn=self.getDBConn(),
+                                                 transaction=self.existingTransaction(),
+                                                 stream=True)
+        for jDict in runJobDicts:
+            rj = RunJob()
+            rj.update(jDict)
+            yield rj
+
     def _loadByStatus(self, status, complete='1'):
         """
         _loadByStatus_
@@ -255,6 +271,30 @@ class BossAirAPI(WMConnectionBase):
 
         return
 
+    def _updateJobStatus(self, jobs):
+        """
+        _updateJobStatus_
+
+        Update only the status (and status time) of jobs in the BossAir
+        database, recording the location change of the jobs that got one.
+        """
+        if len(jobs) < 1:
+            # Nothing to do
+            return
+
+        existingTransaction = self.beginTransaction()
+
+        self.updateStatusDAO.execute(jobs=jobs, conn=self.getDBConn(),
+                                     transaction=self.existingTransaction())
+
+        jobsWithLocation = [job for job in jobs if job.get('location') is not None]
+        if jobsWithLocation:
+            self.stateMachine.recordLocationChange(jobsWithLocation)
+
+        self.commitTransaction(existingTransaction)
+
+        return
+
     def _deleteJobs(self, jobs):
         """
         _deleteJobs_
@@ -432,32 +472,27 @@ class BossAirAPI(WMConnectionBase):
 
         jobsToTrack = {}
 
-        runningJobs = self._listRunJobs(active=True)
-
         if runJobIDs:
-            for job in runningJobs:
-                if job['id'] not in runJobIDs:
-                    runningJobs.remove(job)
+            runJobIDs = set(runJobIDs)
         if wmbsIDs:
-            for job in runningJobs:
-                if job['jobid'] not in wmbsIDs:
-                    runningJobs.remove(job)
+            wmbsIDs = set(wmbsIDs)
 
-        if len(runningJobs) < 1:
+        # Stream the running jobs straight into the per plugin lists,
+        # they already carry everything the plugins need to track them
+        numJobs = 0
+        for runningJob in self._iterRunningJobs():
+            if runJobIDs and runningJob['id'] not in runJobIDs:
+                continue
+            if wmbsIDs and runningJob['jobid'] not in wmbsIDs:
+                continue
+            jobsToTrack.setdefault(runningJob['plugin'], []).append(runningJob)
+            numJobs += 1
+
+        if numJobs < 1:
             # Then we have no running jobs
             return returnList
 
-        logging.info("About to start building running jobs")
-
-        loadedJobs = self._buildRunningJobsFromRunJobs(runJobs=runningJobs)
-
-        logging.info("About to look for %i loadedJobs.", len(loadedJobs))
-
-        for runningJob in loadedJobs:
-            plugin = runningJob['plugin']
-            if plugin not in jobsToTrack:
-                jobsToTrack[plugin] = []
-            jobsToTrack[plugin].append(runningJob)
+        logging.info("About to look for %i loadedJobs.", numJobs)
 
         for plugin in jobsToTrack:
             if plugin not in self.plugins:
@@ -490,7 +525,8 @@ class BossAirAPI(WMConnectionBase):
         logging.info("About to complete %i jobs", len(jobsToComplete))
         logging.debug("JobsToComplete: %s", jobsToComplete)
 
-        self._updateJobs(jobs=jobsToChange)
+        # plugins only report the jobs whose status changed
+        self._updateJobStatus(jobs=jobsToChange)
         self._complete(jobs=jobsToComplete)
 
         # We should have a globalState variable for changed jobs
@@ -742,13 +778,10 @@ class BossAirAPI(WMConnectionBase):
         finalJobs = []
 
         loadedJobs = self._loadByID(jobs=runJobs)
+        runJobsByID = dict((rj['id'], rj) for rj in runJobs)
 
         for loadJob in loadedJobs:
-            runJob = None
-            for rj in runJobs:
-                if rj['id'] == loadJob['id']:
-                    runJob = rj
-                    break
+            runJob = runJobsByID[loadJob['id']]
             # We should have two instances of the job
             for key in runJob:
                 # Fill one from the other
@@ -19,19 +19,24 @@ class LoadRunning(DBFormatter):
                st.name status, rj.retry_count retry_count, rj.id id,
                rj.status_time status_time, wu.cert_dn AS userdn,
                wu.group_name AS usergroup, wu.role_name AS userrole,
-               wj.cache_dir AS cache_dir
+               wj.cache_dir AS cache_dir, wl.plugin AS plugin
              FROM bl_runjob rj
              INNER JOIN bl_status st ON rj.sched_status = st.id
              LEFT OUTER JOIN wmbs_users wu ON wu.id = rj.user_id
              INNER JOIN wmbs_job wj ON wj.id = rj.wmbs_id
+             LEFT OUTER JOIN wmbs_location wl ON wl.id = wj.location
              WHERE rj.status = 1
              """
 
-    def execute(self, conn = None, transaction = False):
+    def execute(self, conn = None, transaction = False, stream = False):
         """
         _execute_
 
+        If stream is True, return a generator yielding one row at a time
         """
+        if stream:
+            return self.streamDict(self.sql, conn = conn, transaction = transaction)
+
         result = self.dbi.processData(self.sql, binds = {}, conn = conn,
                                       transaction = transaction)
 
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+_UpdateStatus_
+
+MySQL implementation for updating the scheduler status of jobs
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+
+class UpdateStatus(DBFormatter):
+    """
+    _UpdateStatus_
+
+    Update only the scheduler status and status time of jobs,
+    which is all that changes while tracking them
+    """
+
+    sql = """UPDATE bl_runjob SET status_time = :status_time,
+               sched_status = (SELECT id FROM bl_status WHERE name = :status)
+               WHERE id = :id
+               """
+
+    def execute(self, jobs, conn=None, transaction=False):
+        """
+        _execute_
+
+        Update the status of a list of RunJob like dictionaries.
+        The binds are executed in chunks by the DB interface.
+        """
+
+        if len(jobs) == 0:
+            return
+
+        binds = []
+        for job in jobs:
+            binds.append({'id': job['id'], 'status': job['status'],
+                          'status_time': job.get('status_time', None)})
+
+        self.dbi.processData(self.sql, binds, conn=conn, transaction=transaction)
+
+        return
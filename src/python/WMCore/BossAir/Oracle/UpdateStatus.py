@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+"""
+_UpdateStatus_
+
+Oracle implementation for updating the scheduler status of jobs
+"""
+
+from WMCore.BossAir.MySQL.UpdateStatus import UpdateStatus as MySQLUpdateStatus
+
+
+class UpdateStatus(MySQLUpdateStatus):
+    """
+    _UpdateStatus_
+
+    Update only the scheduler status and status time of jobs
+    """
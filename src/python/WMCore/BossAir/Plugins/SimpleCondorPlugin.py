@@ -133,6 +133,17 @@ class SimpleCondorPlugin(BasePlugin):
         else:
             self.reqStr = None
 
+        # Incremental tracking: keep the condor job status map in memory between
+        # cycles and only fetch the job ads that changed since the last poll
+        self.incrementalTracking = getattr(config.BossAir, 'incrementalTracking', False)
+        # how often (in seconds) the whole map is refreshed from the schedd
+        self.fullTrackingInterval = getattr(config.BossAir, 'fullTrackingInterval', 3600)
+        # safety margin (in seconds) applied to the EnteredCurrentStatus constraint
+        self.trackingOverlap = getattr(config.BossAir, 'trackingOverlap', 60)
+        self.condorJobInfo = {}
+        self.lastTrackTime = None
+        self.lastFullTrackTime = None
+
         # x509 proxy handling
         proxy = Proxy({'logger': myThread.logger})
         self.x509userproxy = proxy.getProxyFilename()
@@ -199,7 +210,6 @@ class SimpleCondorPlugin(BasePlugin):
         Second, the jobs that need to be changed
         Third, the jobs that need to be completed
         """
-        jobInfo = {}
         changeList = []
         completeList = []
         runningList = []
@@ -211,13 +221,10 @@ class SimpleCondorPlugin(BasePlugin):
 
         logging.debug("Start: Retrieving classAds using Condor Python XQuery")
         try:
-            itobj = schedd.xquery("WMAgent_AgentName == %s" % classad.quote(self.agent),
-                                  ['ClusterId', 'ProcId', 'JobStatus', 'MachineAttrGLIDEIN_CMSSite0'])
-            for jobAd in itobj:
-                gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
-                jobStatus = SimpleCondorPlugin.exitCodeMap().get(jobAd.get('JobStatus'), 'Unknown')
-                location = jobAd.get('MachineAttrGLIDEIN_CMSSite0', None)
-                jobInfo[gridId] = (jobStatus, location)
+            if self.incrementalTracking:
+                jobInfo = self._getIncrementalJobInfo(schedd)
+            else:
+                jobInfo = self._getJobInfo(schedd, "WMAgent_AgentName == %s" % classad.quote(self.agent))
         except Exception as ex:
             logging.error("Query to condor schedd failed in SimpleCondorPlugin.")
             logging.error("Returning empty lists for all job types...")
@@ -226,6 +233,7 @@ class SimpleCondorPlugin(BasePlugin):
 
         logging.debug("Finished retrieving %d classAds from Condor", len(jobInfo))
 
+        stateMap = SimpleCondorPlugin.stateMap()
         # now go over the jobs and see what we have
         for job in jobs:
 
@@ -252,7 +260,7 @@ class SimpleCondorPlugin(BasePlugin):
                               job['status'])
                 changeList.append(job)
 
-            job['globalState'] = SimpleCondorPlugin.stateMap().get(newStatus)
+            job['globalState'] = stateMap.get(newStatus)
 
             # stop tracking finished jobs
             if job['globalState'] in ['Complete', 'Error']:
@@ -265,6 +273,56 @@ class SimpleCondorPlugin(BasePlugin):
 
         return runningList, changeList, completeList
 
+    def _getJobInfo(self, schedd, constraint):
+        """
+        _getJobInfo_
+
+        Query the schedd for the job ads matching the constraint and
+        return a dictionary of gridId to (jobStatus, location)
+        """
+        jobInfo = {}
+        exitCodeMap = SimpleCondorPlugin.exitCodeMap()
+        itobj = schedd.xquery(constraint, ['ClusterId', 'ProcId', 'JobStatus', 'MachineAttrGLIDEIN_CMSSite0'])
+        for jobAd in itobj:
+            gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
+            jobStatus = exitCodeMap.get(jobAd.get('JobStatus'), 'Unknown')
+            location = jobAd.get('MachineAttrGLIDEIN_CMSSite0', None)
+            jobInfo[gridId] = (jobStatus, location)
+        return jobInfo
+
+    def _getIncrementalJobInfo(self, schedd):
+        """
+        _getIncrementalJobInfo_
+
+        Update the resident map of condor job information with the job ads
+        that entered their current status since the last poll. Jobs that left
+        the queue in the meantime are found in the schedd history and removed
+        from the map, such that they are considered complete by track().
+        The whole map is rebuilt every fullTrackingInterval seconds.
+        """
+        pollTime = int(time.time())
+        agentConstraint = "WMAgent_AgentName == %s" % classad.quote(self.agent)
+
+        if self.lastTrackTime is None or pollTime - self.lastFullTrackTime >= self.fullTrackingInterval:
+            self.condorJobInfo = self._getJobInfo(schedd, agentConstraint)
+            self.lastFullTrackTime = pollTime
+            logging.info("Full condor tracking: retrieved %d classAds", len(self.condorJobInfo))
+        else:
+            constraint = "%s && EnteredCurrentStatus >= %d" % (agentConstraint,
+                                                                self.lastTrackTime - self.trackingOverlap)
+            changedInfo = self._getJobInfo(schedd, constraint)
+            self.condorJobInfo.update(changedInfo)
+            numLeft = 0
+            for jobAd in schedd.history(constraint, ['ClusterId', 'ProcId']):
+                gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
+                if self.condorJobInfo.pop(gridId, None) is not None:
+                    numLeft += 1
+            logging.info("Incremental condor tracking: retrieved %d changed classAds and %d jobs left the queue",
+                         len(changedInfo), numLeft)
+
+        self.lastTrackTime = pollTime
+        return self.condorJobInfo
+
     def complete(self, jobs):
         """
         Do any completion work required
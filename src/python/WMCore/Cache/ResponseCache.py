@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+_ResponseCache_
+
+Thread safe, in-memory LRU cache of service responses, bounded by the
+total size of the cached payloads.
+"""
+
+from builtins import object
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache(object):
+    """
+    _ResponseCache_
+
+    Map a key to a response payload (str or bytes), keeping track of when the
+    payload was stored. The least recently used payloads are evicted once the
+    cache holds more than maxBytes.
+    """
+
+    def __init__(self, maxBytes):
+        """
+        :param maxBytes: maximum total length of the cached payloads
+        """
+        self.maxBytes = maxBytes
+        self.currentBytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """
+        _get_
+
+        Return a tuple with the payload and its age in seconds,
+        or (None, None) if the key is not cached.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None, None
+            # put it back as the most recently used
+            self._entries[key] = entry
+        return entry[0], time.time() - entry[1]
+
+    def put(self, key, payload, timestamp=None):
+        """
+        _put_
+
+        Cache a payload, evicting the least recently used ones if needed.
+        Payloads larger than the cache are not stored. The age of the entry
+        counts from timestamp, when the payload was fetched (default: now).
+        """
+        size = len(payload)
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self._remove(key)
+            if size > self.maxBytes:
+                return False
+            self._entries[key] = (payload, timestamp, size)
+            self.currentBytes += size
+            while self.currentBytes > self.maxBytes:
+                oldKey = next(iter(self._entries))
+                self._remove(oldKey)
+                self.evictions += 1
+        return True
+
+    def pop(self, key):
+        """
+        _pop_
+
+        Remove a key from the cache
+        """
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """
+        _clear_
+
+        Remove all the cached payloads
+        """
+        with self._lock:
+            self._entries.clear()
+            self.currentBytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.currentBytes -= entry[2]
@@ -16,6 +16,12 @@ from future.utils import listvalues
 import os
 import traceback
 
+try:
+    from sys import intern
+except ImportError:
+    # python2 builtin
+    pass
+
 from Utils.PythonVersion import PY3
 
 import imp
@@ -40,6 +46,12 @@ _SupportedTypes = []
 _SupportedTypes.extend(_SimpleTypes)
 _SupportedTypes.extend(_ComplexTypes)
 
+# precomputed versions of the type lists above, used in the hot
+# path of ConfigSection.__setattr__
+_SimpleTypesTuple = tuple(_SimpleTypes)
+_ComplexTypesTuple = tuple(_ComplexTypes)
+_ExactSimpleTypes = frozenset(_SimpleTypes)
+
 
 def formatAsString(value):
     """
@@ -105,9 +117,9 @@ class ConfigSection(object):
 
     def _complexTypeCheck(self, name, value):
 
-        if isinstance(value, tuple(_SimpleTypes)):
+        if type(value) in _ExactSimpleTypes or isinstance(value, _SimpleTypesTuple):
             return
-        elif isinstance(value, tuple(_ComplexTypes)):
+        elif isinstance(value, _ComplexTypesTuple):
             vallist = value
             if isinstance(value, dict):
                 vallist = listvalues(value)
@@ -122,17 +134,22 @@ class ConfigSection(object):
             raise RuntimeError(msg)
 
     def __setattr__(self, name, value):
+        # Write straight into the instance dictionary, this is the hot
+        # path when building workload and report trees.
+        selfDict = self.__dict__
         if name.startswith("_internal_"):
             # skip test for internal setting
-            object.__setattr__(self, name, value)
+            selfDict[name] = value
             return
 
+        # attribute names are repeated all over large trees, share them
+        name = intern(name)
         if isinstance(value, ConfigSection):
             # child ConfigSection
             self._internal_children.add(name)
             self._internal_settings.add(name)
-            value._internal_parent_ref = self
-            object.__setattr__(self, name, value)
+            value.__dict__['_internal_parent_ref'] = self
+            selfDict[name] = value
             return
 
         # FIXME: This needs to be fixed when we run with py3 env
@@ -143,12 +160,12 @@ class ConfigSection(object):
             if isinstance(value, unicode):
                 value = str(value)
 
-        # for backward compatibility use getattr and sure to work if the
-        # _internal_skipChecks flag is not set
-        if not getattr(self, '_internal_skipChecks', False):
+        # for backward compatibility sure to work if the
+        # _internal_skipChecks flag is not set (e.g. old pickled objects)
+        if not selfDict.get('_internal_skipChecks', False) and type(value) not in _ExactSimpleTypes:
             self._complexTypeCheck(name, value)
 
-        object.__setattr__(self, name, value)
+        selfDict[name] = value
         self._internal_settings.add(name)
         return
 
@@ -200,11 +217,13 @@ class ConfigSection(object):
         returns a ConfigSection instance
 
         """
-        if sectionName in self.__dict__:
+        try:
             return self.__dict__[sectionName]
+        except KeyError:
+            pass
         newSection = ConfigSection(sectionName)
         self.__setattr__(sectionName, newSection)
-        return object.__getattribute__(self, sectionName)
+        return newSection
 
     def pythonise_(self, **options):
         """
@@ -226,6 +245,15 @@ class ConfigSection(object):
             myName = self._internal_name
 
         result = []
+        self._pythonise(result, myName, document, comment)
+        return result
+
+    def _pythonise(self, result, myName, document, comment):
+        """
+        Append the python format strings of this section, and of all
+        its children, to the result list. Children are handled in the
+        same list, rather than building and extending one list per section.
+        """
         if document:
             result.append("%s.document_(\"\"\"%s\"\"\")" % (
                 myName,
@@ -236,11 +264,13 @@ class ConfigSection(object):
                 myName, self._internal_documentation.replace(
                         "\n", "\n# "),
             ))
+        selfDict = self.__dict__
         for attr in self._internal_settings:
             if attr in self._internal_children:
                 result.append("%s.section_(\'%s\')" % (myName, attr))
-                result.extend(getattr(self, attr).pythonise_(
-                        document=document, comment=comment, prefix=myName))
+                child = selfDict[attr]
+                child._pythonise(result, "%s.%s" % (myName, child._internal_name),
+                                 document, comment)
                 continue
             if attr in self._internal_docstrings:
                 if comment:
@@ -250,7 +280,7 @@ class ConfigSection(object):
                     ))
             result.append("%s.%s = %s" % (
                 myName,
-                attr, formatAsString(getattr(self, attr))
+                attr, formatAsString(selfDict[attr])
             ))
 
             if attr in self._internal_docstrings:
@@ -259,7 +289,6 @@ class ConfigSection(object):
                             "%s.document_(\"\"\"%s\"\"\", \'%s\')" % (
                                 myName,
                                 self._internal_docstrings[attr], attr))
-        return result
 
     def dictionary_(self):
         """
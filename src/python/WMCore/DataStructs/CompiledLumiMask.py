@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+_CompiledLumiMask_
+
+Read-only run/lumi mask optimized for membership tests and filtering.
+
+The lumi ranges of each run are merged and kept as two sorted lists, the
+first and the last lumi of every range, such that a lumi is looked up with
+a binary search instead of a scan of all the ranges of its run. Sorted lists
+of lumis are filtered in a single pass over the ranges.
+"""
+
+from __future__ import division
+
+import logging
+from bisect import bisect_right
+
+from WMCore.DataStructs.Run import Run
+
+
+class CompiledLumiMask(object):
+    """
+    _CompiledLumiMask_
+
+    Build it from a compact lumi list, like {run: [[firstLumi, lastLumi], ...]}
+    where the run numbers can be integers or strings. Overlapping and adjacent
+    ranges are merged, invalid ranges are dropped.
+
+    Like the masks and good run lists it replaces, an empty mask accepts every
+    run and lumi. A run without any range rejects all its lumis.
+    """
+
+    def __init__(self, runsAndLumis=None):
+        self._runs = {}
+        for run, lumiRanges in (runsAndLumis or {}).items():
+            firstLumis, lastLumis = self._runs.setdefault(int(run), ([], []))
+            validRanges = []
+            for lumiRange in lumiRanges:
+                if len(lumiRange) != 2:
+                    logging.error("Invalid run range!  Failing this lumi!")
+                    continue
+                validRanges.append((min(lumiRange), max(lumiRange)))
+            validRanges.extend(zip(firstLumis, lastLumis))
+            del firstLumis[:], lastLumis[:]
+            for firstLumi, lastLumi in sorted(validRanges):
+                if lastLumis and firstLumi <= lastLumis[-1] + 1:
+                    lastLumis[-1] = max(lastLumis[-1], lastLumi)
+                else:
+                    firstLumis.append(firstLumi)
+                    lastLumis.append(lastLumi)
+        self.acceptAll = not self._runs
+
+    def __len__(self):
+        """
+        Number of runs in the mask
+        """
+        return len(self._runs)
+
+    def runs(self):
+        """
+        Return the sorted run numbers of the mask
+        """
+        return sorted(self._runs)
+
+    def getCompactList(self):
+        """
+        Return the merged ranges of the mask as {run: [[firstLumi, lastLumi], ...]}
+        """
+        return dict((run, [[firstLumi, lastLumi] for firstLumi, lastLumi in zip(*lumiRanges)])
+                    for run, lumiRanges in self._runs.items())
+
+    def hasRun(self, run):
+        """
+        Tell if a run is in the mask
+        """
+        return self.acceptAll or int(run) in self._runs
+
+    def contains(self, run, lumi):
+        """
+        Tell if a run/lumi is in the mask
+        """
+        if self.acceptAll:
+            return True
+        lumiRanges = self._runs.get(int(run))
+        if lumiRanges is None:
+            return False
+        idx = bisect_right(lumiRanges[0], lumi) - 1
+        return idx >= 0 and lumi <= lumiRanges[1][idx]
+
+    def containsMany(self, run, lumis):
+        """
+        Return a list of booleans telling which of the lumis of a run are in the mask
+        """
+        if self.acceptAll:
+            return [True] * len(lumis)
+        lumiRanges = self._runs.get(int(run))
+        if lumiRanges is None:
+            return [False] * len(lumis)
+        firstLumis, lastLumis = lumiRanges
+        result = []
+        for lumi in lumis:
+            idx = bisect_right(firstLumis, lumi) - 1
+            result.append(idx >= 0 and lumi <= lastLumis[idx])
+        return result
+
+    def filterLumis(self, run, lumis):
+        """
+        Return the lumis of a run which are in the mask, keeping their order.
+        Sorted lumis are filtered in a single pass over the ranges of the run.
+        """
+        if self.acceptAll:
+            return list(lumis)
+        lumiRanges = self._runs.get(int(run))
+        if lumiRanges is None:
+            return []
+        firstLumis, lastLumis = lumiRanges
+        if any(lumis[idx] > lumis[idx + 1] for idx in range(len(lumis) - 1)):
+            return [lumi for lumi, good in zip(lumis, self.containsMany(run, lumis)) if good]
+        result = []
+        idx = 0
+        numRanges = len(firstLumis)
+        for lumi in lumis:
+            while idx < numRanges and lastLumis[idx] < lumi:
+                idx += 1
+            if idx == numRanges:
+                break
+            if lumi >= firstLumis[idx]:
+                result.append(lumi)
+        return result
+
+    def filterRuns(self, runs):
+        """
+        Return a set of new Run objects with only the lumis (and their event
+        counts) of the given Run objects which are in the mask. Run objects
+        with the same run number are merged.
+        """
+        eventsPerRun = {}
+        for runObj in runs:
+            if not self.hasRun(runObj.run):
+                continue
+            eventsPerLumi = eventsPerRun.setdefault(runObj.run, {})
+            for lumi, events in runObj.eventsPerLumi.items():
+                if eventsPerLumi.get(lumi) and events:
+                    eventsPerLumi[lumi] += events
+                elif not eventsPerLumi.get(lumi):
+                    eventsPerLumi[lumi] = events
+
+        newRuns = set()
+        for runNumber, eventsPerLumi in eventsPerRun.items():
+            goodLumis = self.filterLumis(runNumber, sorted(eventsPerLumi))
+            if goodLumis:
+                newRuns.add(Run(runNumber, *[(lumi, eventsPerLumi[lumi]) for lumi in goodLumis]))
+        return newRuns
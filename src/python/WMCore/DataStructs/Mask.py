@@ -10,8 +10,7 @@ job in two ways:
 
 """
 
-from builtins import range
-from WMCore.DataStructs.Run import Run
+from WMCore.DataStructs.CompiledLumiMask import CompiledLumiMask
 
 
 class Mask(dict):
@@ -156,6 +155,16 @@ class Mask(dict):
 
         return self['runAndLumis']
 
+    def getCompiledMask(self):
+        """
+        _getCompiledMask_
+
+        Return a CompiledLumiMask of the current run and lumi ranges. It is a
+        snapshot: callers checking many lumis against an unchanged mask should
+        keep it, instead of compiling the mask again for each lookup.
+        """
+        return CompiledLumiMask(self['runAndLumis'])
+
     def runLumiInMask(self, run, lumi):
         """
         _runLumiInMask_
@@ -191,29 +200,4 @@ class Mask(dict):
             # ALWAYS TRUE
             return runs
 
-        runDict = {}
-        for r in runs:
-            if r.run in runDict:
-                runDict[r.run].extendLumis(r.lumis)
-            else:
-                runDict[r.run] = r
-
-        maskRuns = set(self["runAndLumis"].keys())
-        passedRuns = set([r.run for r in runs])
-        filteredRuns = maskRuns.intersection(passedRuns)
-
-        newRuns = set()
-        for runNumber in filteredRuns:
-            maskLumis = set()
-            for pair in self["runAndLumis"][runNumber]:
-                if pair[0] == pair[1]:
-                    maskLumis.add(pair[0])
-                else:
-                    maskLumis = maskLumis.union(list(range(pair[0], pair[1] + 1)))
-
-            filteredLumis = set(runDict[runNumber].lumis).intersection(maskLumis)
-            if len(filteredLumis) > 0:
-                filteredLumiEvents = [(lumi, runDict[runNumber].getEventsByLumi(lumi)) for lumi in filteredLumis]
-                newRuns.add(Run(runNumber, *filteredLumiEvents))
-
-        return newRuns
+        return self.getCompiledMask().filterRuns(runs)
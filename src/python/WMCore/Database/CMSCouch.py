@@ -20,16 +20,25 @@ import urllib.request, urllib.parse, urllib.error
 
 import base64
 import hashlib
+import json
 import logging
 import re
+import threading
 import time
 import traceback
+from collections import deque
 from datetime import datetime
 from http.client import HTTPException
+from multiprocessing.pool import ThreadPool
 
 from Utils.IteratorTools import grouper, nestedDictUpdate
 from WMCore.Services.Requests import JSONRequests
 
+try:
+    from WMCore.Services.pycurl_manager import RequestHandler
+except ImportError:
+    pass
+
 
 def check_name(dbname):
     match = re.match("^[a-z0-9_$()+-/]+$", urllib.parse.unquote_plus(dbname))
@@ -46,6 +55,10 @@ def check_server_url(srvurl):
 
 PY3_STR_DECODER = lambda x: decodeBytesToUnicodeConditional(x, condition=PY3)
 
+# view options selecting a range of rows
+VIEW_RANGE_OPTIONS = ('key', 'startkey', 'endkey', 'startkey_docid', 'endkey_docid',
+                      'descending', 'inclusive_end', 'stale')
+
 
 class Document(dict):
     """
@@ -102,6 +115,9 @@ class CouchDBRequests(JSONRequests):
                               {"cachepath": None, "pycurl": usePYCurl, "key": ckey, "cert": cert, "capath": capath})
         self.accept_type = "application/json"
         self["timeout"] = 600
+        if self.pycurl:
+            # keep the connections to CouchDB alive between requests
+            self.reqmgr = RequestHandler(config={'reusehandle': True})
 
     def move(self, uri=None, data=None):
         """
@@ -481,7 +497,8 @@ class Database(CouchDBRequests):
         Get the changes since sequence number. Store the last sequence value to
         self.last_seq. If the since is negative use self.last_seq.
         """
-        if since < 0:
+        # CouchDB 2 and later use opaque (string) sequences
+        if isinstance(since, int) and since < 0:
             since = self.last_seq
         data = self.get('/%s/_changes/?since=%s' % (self.name, since))
         self.last_seq = data['last_seq']
@@ -492,7 +509,7 @@ class Database(CouchDBRequests):
         Get the changes since sequence number. Store the last sequence value to
         self.last_seq. If the since is negative use self.last_seq.
         """
-        if since < 0:
+        if isinstance(since, int) and since < 0:
             since = self.last_seq
         data = self.get('/%s/_changes?limit=%s&since=%s&filter=%s' % (self.name, limit, since, filter))
         self.last_seq = data['last_seq']
@@ -555,6 +572,74 @@ class Database(CouchDBRequests):
         else:
             return retval
 
+    def iterView(self, design, view, options=None, pageSize=1000):
+        """
+        _iterView_
+
+        Iterate over the rows of a view, reading them in pages of pageSize rows
+        such that the whole view is never held in memory. Pages are chained with
+        the startkey/startkey_docid of the first row after each page. The options
+        are the same as in loadView (without keys), limit and skip applying to the
+        whole iteration. Rows emitted several times with the same key by the same
+        document may be repeated across page boundaries.
+        """
+        options = dict(options or {})
+        limit = options.pop('limit', None)
+        if 'key' in options:
+            options['startkey'] = options['endkey'] = options.pop('key')
+        while limit is None or limit > 0:
+            pageLimit = pageSize if limit is None else min(pageSize, limit)
+            options['limit'] = pageLimit + 1
+            rows = self.loadView(design, view, options)['rows']
+            for row in rows[:pageLimit]:
+                yield row
+            if len(rows) <= pageLimit:
+                break
+            if limit is not None:
+                limit -= pageLimit
+            options.pop('skip', None)
+            options['startkey'] = rows[pageLimit]['key']
+            if 'id' in rows[pageLimit]:
+                options['startkey_docid'] = rows[pageLimit]['id']
+
+    def iterList(self, design, list, view, options=None, pageSize=1000):
+        """
+        _iterList_
+
+        Iterate over the items returned by a list function which outputs a JSON
+        array, running it over pages of pageSize view rows. The page boundaries
+        are found reading the view keys only, then the list function is called
+        for each range of keys, such that only a page of its output is held in
+        memory. The list options are passed to each call, the view range options
+        are used to select the rows.
+        """
+        options = options or {}
+        rangeOptions = dict((k, v) for k, v in viewitems(options) if k in VIEW_RANGE_OPTIONS)
+        rangeOptions['reduce'] = False
+        listOptions = dict((k, v) for k, v in viewitems(options) if k not in VIEW_RANGE_OPTIONS)
+        page = []
+        for row in self.iterView(design, view, rangeOptions, pageSize):
+            page.append(row)
+            if len(page) == pageSize:
+                for item in self._loadListPage(design, list, view, listOptions, rangeOptions, page):
+                    yield item
+                page = []
+        if page:
+            for item in self._loadListPage(design, list, view, listOptions, rangeOptions, page):
+                yield item
+
+    def _loadListPage(self, design, list, view, listOptions, rangeOptions, page):
+        """
+        _loadListPage_
+
+        Run a list function over the view rows from the first to the last row of page
+        """
+        options = dict(listOptions)
+        options.update(descending=rangeOptions.get('descending', False), inclusive_end=True,
+                       startkey=page[0]['key'], startkey_docid=page[0]['id'],
+                       endkey=page[-1]['key'], endkey_docid=page[-1]['id'])
+        return json.loads(self.loadList(design, list, view, options))
+
     def loadList(self, design, list, view, options=None, keys=None):
         """
         Load data from a list function. This returns data that hasn't been
@@ -621,6 +706,74 @@ class Database(CouchDBRequests):
         else:
             return self.get('/%s/_all_docs' % self.name, encodedOptions)
 
+    def bulkLoadView(self, design, view, options=None, keys=None, sliceSize=1000, numThreads=4, stream=False):
+        """
+        _bulkLoadView_
+
+        Same as loadView, for large lists of keys: the keys are split in slices
+        of sliceSize keys, queried with up to numThreads concurrent requests.
+        Returns the rows of all the slices in a single view result (offset and
+        total_rows are the ones of the first slice), or with stream=True, a
+        generator of the rows which keeps only a few slices in memory.
+        """
+        func = lambda sliceKeys: self.loadView(design, view, options, sliceKeys)
+        return self._bulkResult(func, keys, sliceSize, numThreads, stream)
+
+    def bulkAllDocs(self, options=None, keys=None, sliceSize=1000, numThreads=4, stream=False):
+        """
+        _bulkAllDocs_
+
+        Same as allDocs, for large lists of document ids. See bulkLoadView.
+        """
+        func = lambda sliceKeys: self.allDocs(options, sliceKeys)
+        return self._bulkResult(func, keys, sliceSize, numThreads, stream)
+
+    def _bulkResult(self, func, keys, sliceSize, numThreads, stream):
+        """
+        _bulkResult_
+
+        Merge the results of the slices read by _bulkRead.
+        """
+        results = self._bulkRead(func, keys or [], sliceSize, numThreads)
+        if stream:
+            return (row for result in results for row in result.get('rows', []))
+        finalResult = {}
+        for result in results:
+            if not finalResult:
+                finalResult = result
+            else:
+                finalResult['rows'].extend(result.get('rows', []))
+        return finalResult
+
+    @staticmethod
+    def _bulkRead(func, keys, sliceSize, numThreads):
+        """
+        _bulkRead_
+
+        Call func with slices of at most sliceSize keys, running up to numThreads
+        calls concurrently, and yield their results in the order of the slices.
+        At most two results per thread are read ahead of the consumer. Without
+        keys, func is called once with an empty list.
+        """
+        slices = list(grouper(keys, sliceSize)) or [[]]
+        numThreads = min(numThreads, len(slices))
+        if numThreads <= 1:
+            for sliceKeys in slices:
+                yield func(sliceKeys)
+            return
+        pool = ThreadPool(numThreads)
+        pending = deque()
+        try:
+            for sliceKeys in slices:
+                if len(pending) >= 2 * numThreads:
+                    yield pending.popleft().get()
+                pending.append(pool.apply_async(func, (sliceKeys,)))
+            while pending:
+                yield pending.popleft().get()
+        finally:
+            pool.terminate()
+            pool.join()
+
     def info(self):
         """
         Return information about the databaes (size, number of documents etc).
@@ -699,6 +852,87 @@ class Database(CouchDBRequests):
         return self.commit()
 
 
+class _DocumentBatch(object):
+    """
+    Documents requested together through a DocumentCoalescer
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.rows = {}
+        self.error = None
+
+
+class DocumentCoalescer(object):
+    """
+    _DocumentCoalescer_
+
+    Merge the document() calls made concurrently by several threads into
+    single _all_docs requests. The first caller of a batch waits for up to
+    maxDelay seconds, or until maxBatch documents are requested, then fetches
+    all of them with one request on behalf of the other callers.
+    """
+
+    def __init__(self, database, maxDelay=0.005, maxBatch=500):
+        self.database = database
+        self.maxDelay = maxDelay
+        self.maxBatch = maxBatch
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._batch = None
+
+    def document(self, id, rev=None):
+        """
+        Same as Database.document. Requests for a given revision are not coalesced.
+        """
+        if rev:
+            return self.database.document(id, rev)
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _DocumentBatch()
+            if id not in batch.rows:
+                batch.ids.append(id)
+                batch.rows[id] = None
+            if len(batch.ids) >= self.maxBatch:
+                self._batch = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.maxDelay)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self._fetch(batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        row = batch.rows[id]
+        if not row or row.get('doc') is None:
+            raise CouchNotFoundError(row.get('error', 'not_found') if row else 'not_found', id, row)
+        return Document(id=id, inputDict=row['doc'])
+
+    def _fetch(self, batch):
+        """
+        Fetch the documents of a batch and wake up its callers
+        """
+        try:
+            self.requests += 1
+            result = self.database.allDocs({'include_docs': True}, batch.ids)
+            for row in result.get('rows', []):
+                if row.get('key') in batch.rows:
+                    batch.rows[row['key']] = row
+        except Exception as ex:
+            batch.error = ex
+        finally:
+            batch.done.set()
+
+
 class RotatingDatabase(Database):
     """
     A rotating database is actually multiple databases:
@@ -6,6 +6,9 @@ Core Database APIs
 
 
 """
+import sys
+import threading
+import time
 from copy import copy
 
 from Utils.IteratorTools import grouper
@@ -31,11 +34,83 @@ class DBInterface(WMObject):
     logger = None
     engine = None
 
-    def __init__(self, logger, engine):
+    def __init__(self, logger, engine, maxBindsPerQuery=500):
         self.logger = logger
         self.logger.info ("Instantiating base WM DBInterface")
         self.engine = engine
-        self.maxBindsPerQuery = 500
+        self.maxBindsPerQuery = maxBindsPerQuery
+        # timing counters per DAO class, disabled by default
+        self.daoStats = None
+        self._statsLock = threading.Lock()
+
+    def enableDAOStats(self):
+        """
+        _enableDAOStats_
+
+        Start collecting the number of calls, binds and time spent in
+        processData for each DAO class (or calling function)
+        """
+        with self._statsLock:
+            if self.daoStats is None:
+                self.daoStats = {}
+
+    def disableDAOStats(self):
+        """
+        _disableDAOStats_
+
+        Stop collecting statistics and drop the ones collected so far
+        """
+        with self._statsLock:
+            self.daoStats = None
+
+    def getDAOStats(self):
+        """
+        _getDAOStats_
+
+        Return a copy of the statistics collected so far, a dictionary keyed
+        by the DAO class name with the calls, binds and time (in seconds)
+        """
+        with self._statsLock:
+            if self.daoStats is None:
+                return {}
+            return dict((name, dict(stats)) for name, stats in self.daoStats.items())
+
+    def resetDAOStats(self):
+        """
+        _resetDAOStats_
+
+        Reset the statistics collected so far, keeping them enabled
+        """
+        with self._statsLock:
+            if self.daoStats is not None:
+                self.daoStats = {}
+
+    @staticmethod
+    def _callerName(frame):
+        """
+        _callerName_
+
+        Name the caller of processData: the class of the DAO object calling
+        it, or the module and function name for plain functions
+        """
+        caller = frame.f_locals.get('self')
+        if caller is not None:
+            return "%s.%s" % (caller.__class__.__module__, caller.__class__.__name__)
+        return "%s.%s" % (frame.f_globals.get('__name__'), frame.f_code.co_name)
+
+    def _recordDAOStats(self, name, numBinds, elapsed):
+        """
+        _recordDAOStats_
+
+        Add one processData call to the statistics of a DAO
+        """
+        with self._statsLock:
+            if self.daoStats is None:
+                return
+            stats = self.daoStats.setdefault(name, {'calls': 0, 'binds': 0, 'time': 0.0})
+            stats['calls'] += 1
+            stats['binds'] += numBinds
+            stats['time'] += elapsed
 
     def buildbinds(self, sequence, thename, therest=[{}]):
         """
@@ -126,6 +201,23 @@ class DBInterface(WMObject):
         set conn if you already have an active connection to reuse
         set transaction = True if you already have an active transaction
 
+        """
+        if self.daoStats is not None:
+            callerName = self._callerName(sys._getframe(1))
+            startTime = time.time()
+            try:
+                return self._processData(sqlstmt, binds, conn, transaction, returnCursor)
+            finally:
+                numBinds = len(binds) if isinstance(binds, list) else 1
+                self._recordDAOStats(callerName, numBinds, time.time() - startTime)
+
+        return self._processData(sqlstmt, binds, conn, transaction, returnCursor)
+
+    def _processData(self, sqlstmt, binds, conn, transaction, returnCursor):
+        """
+        _processData_
+
+        Actual implementation of processData
         """
         connection = None
         try:
@@ -14,6 +14,8 @@ class DBFactory(object):
     _defaultEngineParams = {"convert_unicode" : True,
                             "strategy": "threadlocal",
                             "pool_recycle": 7200}
+    # fetch rows from Oracle in large arrays, instead of the cx_Oracle default of 50
+    _oracleEngineParams = {"arraysize": 1000}
 
     def __init__(self, logger, dburl=None, options={}):
         self.logger = logger
@@ -80,11 +82,13 @@ class DBFactory(object):
             self.dia = None
 
         else:
-            self.engine = self._engineMap.setdefault(self.dburl,
-                                                     create_engine(self.dburl,
-                                                                   connect_args=options,
-                                                                   **self._defaultEngineParams)
-                                                     )
+            engineParams = dict(self._defaultEngineParams)
+            if self.dburl.split(':')[0].lower().startswith("oracle"):
+                for key, value in self._oracleEngineParams.items():
+                    engineParams.setdefault(key, value)
+            if self.dburl not in self._engineMap:
+                self._engineMap[self.dburl] = create_engine(self.dburl, connect_args=options, **engineParams)
+            self.engine = self._engineMap[self.dburl]
             self.dia = self.engine.dialect
 
         self.lock = threading.Condition()
@@ -11,12 +11,39 @@ from builtins import str, bytes, zip, range
 import datetime
 import time
 import types
+from collections import namedtuple
 
 from Utils.Utilities import decodeBytesToUnicodeConditional
 from WMCore.DataStructs.WMObject import WMObject
+from WMCore.Database.ResultSet import ResultSet
 from Utils.PythonVersion import PY3
 
 
+def _decodeColumn(column):
+    """
+    Decode the bytes values of a column of results. Types are checked all at
+    once, such that columns without bytes (the usual case) are not copied.
+    """
+    if PY3 and bytes in set(map(type, column)):
+        return [decodeBytesToUnicodeConditional(value, condition=PY3) for value in column]
+    return column
+
+
+_ROW_TYPES = {}
+
+
+def _rowType(keys):
+    """
+    Return a (cached) namedtuple class with the given column names
+    """
+    keys = tuple(keys)
+    try:
+        return _ROW_TYPES[keys]
+    except KeyError:
+        rowType = _ROW_TYPES[keys] = namedtuple("Row", keys, rename=True)
+        return rowType
+
+
 class DBFormatter(WMObject):
     def __init__(self, logger, dbinterface):
         """
@@ -152,6 +179,132 @@ class DBFormatter(WMObject):
             cursor.close()
         return result
 
+    @staticmethod
+    def columnNames(result):
+        """
+        Return the normalized (decoded and lower case) column names of
+        a ResultSet or a cursor
+        """
+        if isinstance(result.keys, types.MethodType):
+            descriptions = result.keys()  # warning: do not modernize this line.
+        else:
+            descriptions = result.keys
+        keys = []
+        for keyName in descriptions:
+            if isinstance(keyName, (str, bytes)):
+                keyName = decodeBytesToUnicodeConditional(keyName, condition=PY3)
+            keys.append(keyName.lower())
+        return keys
+
+    def iterChunks(self, results, size=1000):
+        """
+        Take the ResultSets returned by processData, or the cursors returned
+        with returnCursor=True, and yield (column names, rows) tuples, where
+        the column names are normalized once per result and the rows of the
+        cursors are fetched from the database in chunks of the given size.
+        Results are closed once consumed.
+        """
+        for result in results:
+            keys = self.columnNames(result)
+            try:
+                if isinstance(result, ResultSet):
+                    if result.data:
+                        yield keys, result.data
+                    continue
+                while True:
+                    rows = result.fetchmany(size)
+                    if not rows:
+                        break
+                    yield keys, rows
+            finally:
+                result.close()
+
+    def iterDict(self, cursors, size=1000):
+        """
+        Generator version of formatDict. It takes the cursors returned by
+        processData with returnCursor=True, normalizes the column names only
+        once per cursor and yields one dictionary per row, fetching rows from
+        the database in chunks of the given size.
+        """
+        for keys, rows in self.iterChunks(cursors, size):
+            columns = [_decodeColumn(column) for column in zip(*rows)]
+            for row in zip(*columns):
+                yield dict(zip(keys, row))
+
+    def iterNamedTuples(self, results, size=1000):
+        """
+        Same as iterDict, but yielding namedtuples, whose fields are the
+        normalized column names (invalid identifiers are renamed to _<index>)
+        """
+        for keys, rows in self.iterChunks(results, size):
+            rowType = _rowType(keys)
+            columns = [_decodeColumn(column) for column in zip(*rows)]
+            for row in zip(*columns):
+                yield rowType._make(row)
+
+    def formatNamedTuples(self, results):
+        """
+        Returns a list of namedtuples representing the results
+        """
+        return list(self.iterNamedTuples(results))
+
+    def formatColumns(self, results, size=1000):
+        """
+        Columnar version of formatDict: returns a dictionary with the normalized
+        column names as keys and the lists of column values as values.
+        All the results are expected to have the same columns.
+        """
+        return self._mergeColumns(self.iterChunks(results, size))
+
+    @staticmethod
+    def _mergeColumns(chunks):
+        """
+        Concatenate the columns of a sequence of (column names, rows) chunks
+        """
+        columns = {}
+        for keys, rows in chunks:
+            for keyName, column in zip(keys, zip(*rows)):
+                columns.setdefault(keyName, []).extend(_decodeColumn(column))
+        return columns
+
+    def _streamResults(self, sql, binds, conn, transaction, iterFunc, size):
+        """
+        Execute a select statement and run iterFunc over the returned cursors.
+        If no connection is provided, one is taken from the pool and held
+        until the generator is exhausted (or closed).
+        """
+        connection = conn or self.dbi.connection()
+        try:
+            cursors = self.dbi.processData(sql, binds or {}, conn=connection,
+                                           transaction=transaction, returnCursor=True)
+            for entry in iterFunc(cursors, size=size):
+                yield entry
+        finally:
+            if conn is None:
+                connection.close()
+
+    def streamDict(self, sql, binds=None, conn=None, transaction=False, size=1000):
+        """
+        Execute a select statement and yield its rows as dictionaries, without
+        materializing the whole result set in memory.
+        """
+        return self._streamResults(sql, binds, conn, transaction, self.iterDict, size)
+
+    def streamNamedTuples(self, sql, binds=None, conn=None, transaction=False, size=1000):
+        """
+        Execute a select statement and yield its rows as namedtuples, without
+        materializing the whole result set in memory.
+        """
+        return self._streamResults(sql, binds, conn, transaction, self.iterNamedTuples, size)
+
+    def fetchColumns(self, sql, binds=None, conn=None, transaction=False, size=1000):
+        """
+        Execute a select statement and return its results as column arrays
+        (see formatColumns). Rows are fetched in chunks straight from the
+        cursors, such that no intermediate row objects are kept in memory.
+        """
+        return self._mergeColumns(self._streamResults(sql, binds, conn, transaction, self.iterChunks, size))
+
     def getBinds(self, **kwargs):
         binds = {}
         for i in kwargs:
@@ -6,6 +6,8 @@ Handle bind variable parsing for MySQL.
 """
 
 import copy
+from collections import OrderedDict
+from operator import itemgetter
 
 from WMCore.Database.DBCore import DBInterface
 from WMCore.Database.ResultSet import ResultSet
@@ -31,6 +33,13 @@ def stringLengthCompare(a):
 
 
 class MySQLInterface(DBInterface):
+    def __init__(self, logger, engine, maxBindsPerQuery=500, statementCacheSize=1000):
+        DBInterface.__init__(self, logger, engine, maxBindsPerQuery)
+        # cache of the translated statements, keyed by the original SQL and
+        # its bind names, since the same few DAO statements are used all the time
+        self.statementCacheSize = statementCacheSize
+        self._statementCache = OrderedDict()
+
     def substitute(self, origSQL, origBindsList):
         """
         _substitute_
@@ -55,8 +64,34 @@ class MySQLInterface(DBInterface):
             return origSQL, None
 
         origBindsList = self.makelist(origBindsList)
-        origBind = origBindsList[0]
+        cacheKey = (origSQL, frozenset(origBindsList[0]))
+        try:
+            updatedSQL, bindGetter = self._statementCache[cacheKey]
+        except KeyError:
+            updatedSQL, bindVarNames = self._translate(origSQL, origBindsList[0])
+            if not bindVarNames:
+                bindGetter = lambda bind: ()
+            elif len(bindVarNames) == 1:
+                bindName = bindVarNames[0]
+                bindGetter = lambda bind: (bind[bindName],)
+            else:
+                bindGetter = itemgetter(*bindVarNames)
+            if self.statementCacheSize > 0:
+                self._statementCache[cacheKey] = (updatedSQL, bindGetter)
+                if len(self._statementCache) > self.statementCacheSize:
+                    self._statementCache.popitem(last=False)
+
+        mySQLBindVarsList = [tuple(bindGetter(origBind)) for origBind in origBindsList]
+
+        return (updatedSQL, mySQLBindVarsList)
+
+    def _translate(self, origSQL, origBind):
+        """
+        _translate_
 
+        Replace the named bind variables in the SQL by %s, returning the
+        new SQL and the bind variable names in the order they are used.
+        """
         bindVarPositionList = []
         updatedSQL = copy.copy(origSQL)
 
@@ -97,15 +132,7 @@ class MySQLInterface(DBInterface):
 
         bindVarPositionList.sort(key=bindVarCompare)
 
-        mySQLBindVarsList = []
-        for origBind in origBindsList:
-            mySQLBindVars = []
-            for bindVarPosition in bindVarPositionList:
-                mySQLBindVars.append(origBind[bindVarPosition[0]])
-
-            mySQLBindVarsList.append(tuple(mySQLBindVars))
-
-        return (updatedSQL, mySQLBindVarsList)
+        return updatedSQL, [bindVarPosition[0] for bindVarPosition in bindVarPositionList]
 
     def executebinds(self, s = None, b = None, connection = None,
                      returnCursor = False):
@@ -207,6 +207,10 @@ class Report(object):
                     if math.isinf(val) or math.isnan(val):
                         jsonPerformance[reportSection][key] = None
 
+        # only stage out steps using the parallel stage out have this section
+        if hasattr(perfSection, "stageOut"):
+            jsonPerformance["stageOut"] = perfSection.stageOut.dictionary_()
+
         return jsonPerformance
 
     def __to_json__(self, thunker):
@@ -1487,6 +1491,21 @@ class Report(object):
 
         return
 
+    def setStepStageOutTiming(self, stepName, timing):
+        """
+        _setStepStageOutTiming_
+
+        Set the Performance information of a parallel stage out: the
+        aggregated timing and counters returned by FileManager.stageFiles
+        """
+
+        reportStep = self.retrieveStep(stepName)
+        reportStep.performance.section_('stageOut')
+        for key, value in timing.items():
+            setattr(reportStep.performance.stageOut, key, value)
+
+        return
+
     def setStepCounter(self, stepName, counter):
         """
         _setStepCounter_
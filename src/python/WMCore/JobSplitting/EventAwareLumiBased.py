@@ -19,6 +19,7 @@ import logging
 import math
 import operator
 
+from WMCore.DataStructs.CompiledLumiMask import CompiledLumiMask
 from WMCore.DataStructs.Run import Run
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.JobSplitting.LumiBased import isGoodLumi, isGoodRun, LumiChecker
@@ -75,7 +76,7 @@ class EventAwareLumiBased(JobFactory):
             raise RuntimeError(msg)
 
         if self.package == 'WMCore.WMBS':
-            self.loadRunLumi = self.daoFactory(classname="Files.GetBulkRunLumi")
+            self.loadRunLumi = self.getRunLumiDAO()
             if deterministicPileup:
                 getJobNumber = self.daoFactory(classname="Jobs.GetNumberOfJobsPerWorkflow")
                 self.nJobs = getJobNumber.execute(workflow=self.subscription.getWorkflow().id)
@@ -102,6 +103,8 @@ class EventAwareLumiBased(JobFactory):
                 msg += "Refusing to create any jobs.\nDetails: %s" % str(ex)
                 logging.exception(msg)
                 return
+        # the mask is checked for every lumi of every file
+        goodRunList = CompiledLumiMask(goodRunList)
 
         lDict = self.getFilesSortedByLocation(avgEventsPerJob)
         if not lDict:
@@ -105,7 +105,7 @@ class EventAwareLumiByWork(JobFactory):
                       lumiMask)
 
         if self.package == 'WMCore.WMBS':
-            self.loadRunLumi = self.daoFactory(classname="Files.GetBulkRunLumi")
+            self.loadRunLumi = self.getRunLumiDAO()
             if self.deterministicPU:
                 getJobNumber = self.daoFactory(classname="Jobs.GetNumberOfJobsPerWorkflow")
                 self.nJobs = getJobNumber.execute(workflow=self.subscription.getWorkflow().id)
@@ -84,7 +84,7 @@ class EventBased(JobFactory):
                     break
             if getRunLumiInformation:
                 if self.package == 'WMCore.WMBS':
-                    loadRunLumi = self.daoFactory(classname="Files.GetBulkRunLumi")
+                    loadRunLumi = self.getRunLumiDAO()
                     fileLumis = loadRunLumi.execute(files=fileList)
                     if not fileLumis:
                         logging.warning("Empty fileLumis dict for workflow %s, subs %s.",
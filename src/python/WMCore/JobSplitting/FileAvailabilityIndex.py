@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+_FileAvailabilityIndex_
+
+Resident index of the files available to a WMBS subscription, grouped by
+their set of locations.
+
+The index is kept by the JobCreator across polling cycles, such that the
+file details, locations and run/lumis of the files that are left available
+(e.g. open PromptReco/Express subscriptions waiting for more lumis) are
+loaded from the database only once. Each refresh only lists the ids of the
+available files, loading the new ones and dropping the ones that are no
+longer available. Files acquired by the job splitting are dropped right away.
+"""
+
+from builtins import object
+
+import logging
+
+from WMCore.WMBS.File import File as WMBSFile
+
+
+class FileAvailabilityIndex(object):
+    """
+    _FileAvailabilityIndex_
+
+    Available files of a subscription, keyed by a frozenset of locations
+    """
+
+    def __init__(self, subscriptionID, daoFactory, rebuildCycles=20):
+        """
+        :param subscriptionID: WMBS subscription id
+        :param daoFactory: WMCore.WMBS DAOFactory
+        :param rebuildCycles: number of refreshes after which the index is
+            rebuilt from scratch, to pick up location changes. 0 to never rebuild.
+        """
+        self.subscriptionID = subscriptionID
+        self.rebuildCycles = rebuildCycles
+        self.getAvailableIDs = daoFactory(classname="Subscriptions.GetAvailableFilesNoLocations")
+        self.getFileInfo = daoFactory(classname="Files.GetForJobSplittingByID")
+        self.getLocations = daoFactory(classname="Files.GetLocationBulk")
+        self.getRunLumi = daoFactory(classname="Files.GetBulkRunLumi")
+        self.stats = dict.fromkeys(['refreshes', 'rebuilds', 'added', 'removed',
+                                    'runLumiHits', 'runLumiMisses'], 0)
+        self.clear()
+
+    def __len__(self):
+        return len(self._files)
+
+    def __contains__(self, fileID):
+        return fileID in self._files
+
+    def clear(self):
+        """
+        _clear_
+
+        Drop all the indexed files
+        """
+        self._files = {}
+        self._byLocation = {}
+        self._runLumis = {}
+        self._queue = []
+        self._position = 0
+        self._cycles = 0
+        self.maxFileID = 0
+
+    def locations(self):
+        """
+        _locations_
+
+        Return the number of files indexed per set of locations
+        """
+        return dict((locSet, len(fileIDs)) for locSet, fileIDs in self._byLocation.items())
+
+    def refresh(self, conn=None, transaction=False):
+        """
+        _refresh_
+
+        Synchronize the index with the files currently available to the
+        subscription and rewind the file queue. Returns the number of files
+        added and removed.
+        """
+        if self.rebuildCycles and self._cycles >= self.rebuildCycles:
+            logging.debug("Rebuilding the availability index of subscription %i", self.subscriptionID)
+            self.stats['rebuilds'] += 1
+            self.clear()
+        self._cycles += 1
+        self.stats['refreshes'] += 1
+
+        result = self.getAvailableIDs.execute(subscription=self.subscriptionID,
+                                              conn=conn, transaction=transaction)
+        available = set(entry['file'] for entry in result)
+
+        removed = [fileID for fileID in self._files if fileID not in available]
+        self.discard(removed)
+        newIDs = sorted(available.difference(self._files))
+        if newIDs:
+            self._load(newIDs, conn, transaction)
+
+        self.rewind()
+        logging.debug("Availability index of subscription %i: %i files, %i added, %i removed",
+                      self.subscriptionID, len(self._files), len(newIDs), len(removed))
+        return len(newIDs), len(removed)
+
+    def _load(self, fileIDs, conn, transaction):
+        """
+        _load_
+
+        Load the details and locations of new files
+        """
+        fileInfoDict = self.getFileInfo.execute(file=fileIDs, conn=conn, transaction=transaction)
+        locationDict = self.getLocations.execute(files=fileIDs, conn=conn, transaction=transaction) or {}
+
+        for fileID in fileIDs:
+            locSet = frozenset(locationDict.get(fileID, []))
+            self._byLocation.setdefault(locSet, set()).add(fileID)
+            self._files[fileID] = (fileInfoDict[fileID], locSet)
+            self.maxFileID = max(self.maxFileID, fileID)
+
+        self.stats['added'] += len(fileIDs)
+
+    def discard(self, fileIDs):
+        """
+        _discard_
+
+        Drop files which are no longer available, e.g. acquired by new jobs
+        """
+        for fileID in fileIDs:
+            entry = self._files.pop(fileID, None)
+            if entry is None:
+                continue
+            locSet = entry[1]
+            self._byLocation[locSet].discard(fileID)
+            if not self._byLocation[locSet]:
+                del self._byLocation[locSet]
+            self._runLumis.pop(fileID, None)
+            self.stats['removed'] += 1
+
+    def rewind(self):
+        """
+        _rewind_
+
+        Queue all the indexed files for the job splitting, the files at the
+        same locations being next to each other.
+        """
+        self._queue = []
+        for locSet in sorted(self._byLocation, key=sorted):
+            self._queue.extend(sorted(self._byLocation[locSet]))
+        self._position = 0
+
+    def fetchFiles(self, size):
+        """
+        _fetchFiles_
+
+        Return the next files of the queue as a set of new WMBS File objects,
+        since the splitting algorithms modify the files they're given.
+        """
+        files = set()
+        while len(files) < size and self._position < len(self._queue):
+            fileID = self._queue[self._position]
+            self._position += 1
+            entry = self._files.get(fileID)
+            if entry is None:
+                # acquired in the meantime
+                continue
+            fileInfo, locSet = entry
+            fl = WMBSFile(id=fileID)
+            fl.update(fileInfo)
+            fl.setLocation(locSet, immediateSave=False)
+            files.add(fl)
+        return files
+
+    def execute(self, files=None, conn=None, transaction=False):
+        """
+        _execute_
+
+        Files.GetBulkRunLumi interface, serving the run/lumis of the indexed
+        files from the cache. Returns {fileid: {run: [lumis]}}.
+        """
+        files = files or []
+        missing = [f for f in files if f['id'] not in self._runLumis]
+        self.stats['runLumiHits'] += len(files) - len(missing)
+        self.stats['runLumiMisses'] += len(missing)
+
+        result = {}
+        if missing:
+            result = self.getRunLumi.execute(files=missing, conn=conn, transaction=transaction)
+            for f in missing:
+                if f['id'] in self._files:
+                    self._runLumis[f['id']] = result.get(f['id'], {})
+
+        for f in files:
+            if self._runLumis.get(f['id']):
+                result[f['id']] = self._runLumis[f['id']]
+        return result
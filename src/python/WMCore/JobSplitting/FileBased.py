@@ -10,6 +10,7 @@ from __future__ import division
 from future.utils import viewvalues
 from builtins import int
 
+from WMCore.DataStructs.CompiledLumiMask import CompiledLumiMask
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.WMBS.File import File
 from WMCore.WMSpec.WMTask import buildLumiMask
@@ -40,7 +41,7 @@ class FileBased(JobFactory):
 
         goodRunList = {}
         if runs and lumis:
-            goodRunList = buildLumiMask(runs, lumis)
+            goodRunList = CompiledLumiMask(buildLumiMask(runs, lumis))
 
         #Get a dictionary of sites, files
         lDict = self.sortByLocation()
@@ -8,10 +8,11 @@ from future.utils import viewitems
 import threading
 import logging
 
+from WMCore.DataStructs.CompiledLumiMask import CompiledLumiMask
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.Services.UUIDLib import makeUUID
 from WMCore.DAOFactory import DAOFactory
-from WMCore.JobSplitting.LumiBased import isGoodRun, isGoodLumi
+from WMCore.JobSplitting.LumiBased import isGoodRun
 from WMCore.DataStructs.Run import Run
 from WMCore.WMSpec.WMTask import buildLumiMask
 
@@ -82,12 +83,7 @@ class Harvest(JobFactory):
                 for run in runSet:
                     if not isGoodRun(lumiMask, run.run):
                         continue
-                    # then loop over lumis
-                    maskedLumis = []
-                    for lumi in run.lumis:
-                        if not isGoodLumi(lumiMask, run.run, lumi):
-                            continue
-                        maskedLumis.append(lumi)
+                    maskedLumis = lumiMask.filterLumis(run.run, run.lumis)
 
                     if not maskedLumis:
                         continue
@@ -229,7 +225,7 @@ class Harvest(JobFactory):
 
         lumiMask = {}
         if runs and lumis:
-            lumiMask = buildLumiMask(runs, lumis)
+            lumiMask = CompiledLumiMask(buildLumiMask(runs, lumis))
 
         if periodicInterval and periodicInterval > 0:
 
@@ -40,6 +40,8 @@ class JobFactory(WMObject):
         self.transaction = None
         self.proxies = []
         self.grabByProxy = False
+        self.availabilityIndex = None
+        self.indexRefreshed = False
         self.daoFactory = None
         self.timing = {'jobInstance': 0, 'sortByLocation': 0, 'acquireFiles': 0, 'jobGroup': 0}
         self.siteWhitelist = []
@@ -180,6 +182,11 @@ class JobFactory(WMObject):
 
         if self.package == 'WMCore.WMBS':
 
+            if self.availabilityIndex is not None:
+                # the input files are acquired by the jobs
+                self.availabilityIndex.discard([fileInfo['id'] for jobGroup in self.jobGroups
+                                                for job in jobGroup.newjobs for fileInfo in job['input_files']])
+
             for jobGroup in self.jobGroups:
 
                 for job in jobGroup.newjobs:
@@ -282,6 +289,12 @@ class JobFactory(WMObject):
         resulting ResultProxies in self.proxies
         """
 
+        if self.availabilityIndex is not None:
+            # the index is refreshed when the first files are loaded
+            self.indexRefreshed = False
+            self.grabByProxy = True
+            return
+
         logging.debug("Opening DB resultProxies for JobFactory")
 
         myThread = threading.currentThread()
@@ -309,6 +322,7 @@ class JobFactory(WMObject):
         """
         self.proxies = []
         self.grabByProxy = False
+        self.indexRefreshed = False
         return
 
     def loadFiles(self, size=10):
@@ -319,6 +333,13 @@ class JobFactory(WMObject):
         Should handle multiple proxies.  Not really sure about that
         """
 
+        if self.availabilityIndex is not None:
+            if not self.indexRefreshed:
+                myThread = threading.currentThread()
+                self.availabilityIndex.refresh(conn=myThread.transaction.conn, transaction=True)
+                self.indexRefreshed = True
+            return self.availabilityIndex.fetchFiles(size)
+
         if len(self.proxies) < 1:
             # Well, you don't have any proxies.
             # This is what happens when you ran out of files last time
@@ -373,6 +394,17 @@ class JobFactory(WMObject):
 
         return files
 
+    def getRunLumiDAO(self):
+        """
+        _getRunLumiDAO_
+
+        Return the Files.GetBulkRunLumi DAO, or the availability index
+        caching the run/lumis of the subscription files if there is one.
+        """
+        if self.availabilityIndex is not None:
+            return self.availabilityIndex
+        return self.daoFactory(classname="Files.GetBulkRunLumi")
+
     def formatDict(self, results, keys):
         """
         _formatDict_
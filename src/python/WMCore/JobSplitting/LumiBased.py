@@ -14,6 +14,7 @@ import logging
 import operator
 
 from Utils.IteratorTools import flattenList
+from WMCore.DataStructs.CompiledLumiMask import CompiledLumiMask
 from WMCore.DataStructs.Run import Run
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.WMBS.File import File
@@ -25,8 +26,10 @@ def isGoodLumi(goodRunList, run, lumi):
     _isGoodLumi_
 
     Checks to see if runs match a run-lumi combination in the goodRunList
-    This is a pain in the ass.
+    This is a pain in the ass. Pass a CompiledLumiMask for repeated calls.
     """
+    if isinstance(goodRunList, CompiledLumiMask):
+        return goodRunList.contains(run, lumi)
     if goodRunList is None or goodRunList == {}:
         return True
 
@@ -50,6 +53,8 @@ def isGoodRun(goodRunList, run):
 
     Tell if this is a good run
     """
+    if isinstance(goodRunList, CompiledLumiMask):
+        return goodRunList.hasRun(run)
     if goodRunList is None or goodRunList == {}:
         return True
 
@@ -171,7 +176,7 @@ class LumiBased(JobFactory):
             raise RuntimeError(msg)
 
         if self.package == 'WMCore.WMBS':
-            self.loadRunLumi = self.daoFactory(classname="Files.GetBulkRunLumi")
+            self.loadRunLumi = self.getRunLumiDAO()
             if deterministicPileup:
                 getJobNumber = self.daoFactory(classname="Jobs.GetNumberOfJobsPerWorkflow")
                 self.nJobs = getJobNumber.execute(workflow=self.subscription.getWorkflow().id)
@@ -201,6 +206,8 @@ class LumiBased(JobFactory):
                 msg += "Refusing to create any jobs.\nDetails: %s" % str(ex)
                 logging.exception(msg)
                 return
+        # the mask is checked for every lumi of every file
+        goodRunList = CompiledLumiMask(goodRunList)
 
         lDict = self.getFilesSortedByLocation(lumisPerJob)
         if not lDict:
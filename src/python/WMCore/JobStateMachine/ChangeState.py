@@ -18,7 +18,7 @@ from WMCore.JobStateMachine.SummaryDB import updateSummaryDB
 from WMCore.JobStateMachine.Transitions import Transitions
 from WMCore.Lexicon import sanitizeURL
 from WMCore.WMConnectionBase import WMConnectionBase
-from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
+from WMCore.WMSpec.SpecCache import getSpecCache
 
 CMSSTEP = re.compile(r'^cmsRun[0-9]+$')
 
@@ -61,12 +61,16 @@ def discardConflictingDocument(couchDbInstance, data, result):
 
 
 def getDataFromSpecFile(specFile):
-    workload = WMWorkloadHelper()
-    workload.load(specFile)
-    campaign = workload.getCampaign()
-    result = {"Campaign": campaign}
-    for task in workload.taskIterator():
-        result[task.getPathName()] = task.getPrepID()
+    """
+    Return the campaign and the PrepID of each task of a spec, from the
+    agent spec summaries. None is returned if the spec is missing.
+    """
+    summary = getSpecCache().summary(specFile)
+    if summary is None:
+        logging.warning("Spec file %s not found, no campaign and PrepIDs for its jobs", specFile)
+        return None
+    result = {"Campaign": summary["campaign"]}
+    result.update(summary["prepIDs"])
     return result
 
 
@@ -314,10 +318,15 @@ class ChangeState(WMObject, WMConnectionBase):
 
             if job.get("fwjr", None):
 
-                cachedByWorkflow = self.workloadCache.setdefault(job['workflow'],
-                                                                 getDataFromSpecFile(
-                                                                     self.getWorkflowSpecDAO.execute(job['task'])[
-                                                                         job['task']]['spec']))
+                cachedByWorkflow = self.workloadCache.get(job['workflow'])
+                if cachedByWorkflow is None:
+                    specFile = self.getWorkflowSpecDAO.execute(job['task'])[job['task']]['spec']
+                    cachedByWorkflow = getDataFromSpecFile(specFile)
+                    if cachedByWorkflow is None:
+                        # the spec may show up later, do not cache the miss
+                        cachedByWorkflow = {}
+                    else:
+                        self.workloadCache[job['workflow']] = cachedByWorkflow
                 job['fwjr'].setCampaign(cachedByWorkflow.get('Campaign', ''))
                 job['fwjr'].setPrepID(cachedByWorkflow.get(job['task'], ''))
                 # If there are too many input files, strip them out
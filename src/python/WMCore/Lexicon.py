@@ -341,6 +341,53 @@ def hnName(candidate):
     return check(validName, candidate)
 
 
+LFN_REGEXPS = [
+    '/([a-z]+)/([a-z0-9]+)/(%(era)s)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}/([0-9]+)/([a-zA-Z0-9\-_]+).root' % lfnParts,
+    '/([a-z]+)/([a-z0-9]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}/([0-9]+)/([a-zA-Z0-9\-_]+).root',
+    '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/%(procDS)s/%(version)s/%(counter)s/%(root)s' % lfnParts,
+    '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/(%(subdir)s/)+%(root)s' % lfnParts,
+    # tier0 LFN
+    ('/store/(backfill/[0-9]/){0,1}(t0temp/|unmerged/){0,1}(data|express|hidata)/%(era)s/%(primDS)s/%(tier)s/'
+     '%(version)s/%(counter)s/%(counter)s/%(counter)s(/%(counter)s)?/%(root)s') % lfnParts,
+    # old style tier0 LFN
+    '/store/data/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s/%(root)s' % lfnParts,
+    # store/mc LFN
+    '/store/mc/(%(era)s)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)(/([a-zA-Z0-9\-_]+))*/([a-zA-Z0-9\-_]+).root' % lfnParts,
+    # LHE LFN
+    '/store/lhe/([0-9]+)/([a-zA-Z0-9\-_]+).lhe(.xz){0,1}',
+    # This is for future lhe LFN structure. Need to be tested.
+    '/store/lhe/%(era)s/%(primDS)s/([0-9]+)/([a-zA-Z0-9\-_]+).lhe(.xz){0,1}' % lfnParts,
+    # StoreResults LFNs
+    '/store/results/%(physics_group)s/%(primDS)s/%(procDS)s/%(primDS)s/%(tier)s/%(procDS)s/%(counter)s/%(root)s' % lfnParts,
+    "%s/%s" % (STORE_RESULTS_LFN, '%(counter)s/%(root)s' % lfnParts)
+]
+
+LFN_BASE_REGEXPS = [
+    '/([a-z]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)',
+    '/([a-z]+)/([a-z0-9]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}',
+    '/(store)/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/%(procDS)s/%(version)s' % lfnParts,
+    # tier0 LFN base
+    ('/store/(backfill/[0-9]/){0,1}(t0temp/|unmerged/){0,1}(data|express|hidata)/%(era)s/%(primDS)s/%(tier)s/'
+     '%(version)s/%(counter)s/%(counter)s/%(counter)s') % lfnParts,
+    STORE_RESULTS_LFN
+]
+
+
+def _checkAny(regexps, candidate):
+    """
+    Check the candidate against each of the regular expressions provided,
+    returning True on the first match. Raises an AssertionError listing
+    all the regular expressions otherwise.
+    """
+    errorMsg = "LFN candidate: %s doesn't match any of the following regular expressions:\n" % candidate
+    for regexp in regexps:
+        try:
+            return check(regexp, candidate)
+        except AssertionError:
+            errorMsg += "  %s\n" % regexp
+    raise AssertionError(errorMsg)
+
+
 def lfn(candidate):
     """
     Should be of the following form:
@@ -353,82 +400,7 @@ def lfn(candidate):
 
     Add for LHE files: /data/lhe/...
     """
-    regexp1 = '/([a-z]+)/([a-z0-9]+)/(%(era)s)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}/([0-9]+)/([a-zA-Z0-9\-_]+).root' % lfnParts
-    regexp2 = '/([a-z]+)/([a-z0-9]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}/([0-9]+)/([a-zA-Z0-9\-_]+).root'
-    regexp3 = '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/%(procDS)s/%(version)s/%(counter)s/%(root)s' % lfnParts
-    regexp4 = '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/(%(subdir)s/)+%(root)s' % lfnParts
-
-    oldStyleTier0LFN = '/store/data/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s/%(root)s' % lfnParts
-    tier0LFN = '/store/(backfill/[0-9]/){0,1}(t0temp/|unmerged/){0,1}(data|express|hidata)/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s(/%(counter)s)?/%(root)s' % lfnParts
-
-    storeMcLFN = '/store/mc/(%(era)s)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)(/([a-zA-Z0-9\-_]+))*/([a-zA-Z0-9\-_]+).root' % lfnParts
-
-    storeResults2LFN = '/store/results/%(physics_group)s/%(primDS)s/%(procDS)s/%(primDS)s/%(tier)s/%(procDS)s/%(counter)s/%(root)s' % lfnParts
-
-    storeResultRootPart = '%(counter)s/%(root)s' % lfnParts
-    storeResultsLFN = "%s/%s" % (STORE_RESULTS_LFN, storeResultRootPart)
-
-    lheLFN1 = '/store/lhe/([0-9]+)/([a-zA-Z0-9\-_]+).lhe(.xz){0,1}'
-    # This is for future lhe LFN structure. Need to be tested.
-    lheLFN2 = '/store/lhe/%(era)s/%(primDS)s/([0-9]+)/([a-zA-Z0-9\-_]+).lhe(.xz){0,1}' % lfnParts
-
-    errorMsg = "LFN candidate: %s doesn't match any of the following regular expressions:\n" % candidate
-
-    try:
-        return check(regexp1, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % regexp1
-
-    try:
-        return check(regexp2, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % regexp2
-
-    try:
-        return check(regexp3, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % regexp3
-
-    try:
-        return check(regexp4, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % regexp4
-
-    try:
-        return check(tier0LFN, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % tier0LFN
-
-    try:
-        return check(oldStyleTier0LFN, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % oldStyleTier0LFN
-
-    try:
-        return check(storeMcLFN, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % storeMcLFN
-
-    try:
-        return check(lheLFN1, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % lheLFN1
-
-    try:
-        return check(lheLFN2, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % lheLFN2
-
-    try:
-        return check(storeResults2LFN, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % storeResults2LFN
-
-    try:
-        return check(storeResultsLFN, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % storeResultsLFN
-        raise AssertionError(errorMsg)
+    return _checkAny(LFN_REGEXPS, candidate)
 
 
 def lfnBase(candidate):
@@ -436,47 +408,17 @@ def lfnBase(candidate):
     As lfn above, but for doing the lfnBase
     i.e., for use in spec generation and parsing
     """
-    regexp1 = '/([a-z]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)'
-    regexp2 = '/([a-z]+)/([a-z0-9]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}'
-    regexp3 = '/(store)/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/%(procDS)s/%(version)s' % lfnParts
-
-    tier0LFN = '/store/(backfill/[0-9]/){0,1}(t0temp/|unmerged/){0,1}(data|express|hidata)/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s' % lfnParts
-
-    errorMsg = "LFN candidate: %s doesn't match any of the following regular expressions:\n" % candidate
-
-    try:
-        return check(regexp1, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % regexp1
+    return _checkAny(LFN_BASE_REGEXPS, candidate)
 
-    try:
-        return check(regexp2, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % regexp2
-
-    try:
-        return check(regexp3, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % regexp3
 
-    try:
-        return check(tier0LFN, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % tier0LFN
-
-    try:
-        return check(STORE_RESULTS_LFN, candidate)
-    except AssertionError:
-        errorMsg += "  %s\n" % STORE_RESULTS_LFN
-        raise AssertionError(errorMsg)
+USER_LFN_RE = '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(subdir)s/%(workflow)s/%(subdir)s/%(file)s' % lfnParts
 
 
 def userLfn(candidate):
     """
     Check LFNs in /store/{temp}/user that are not EDM data
     """
-    regexp = '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(subdir)s/%(workflow)s/%(subdir)s/%(file)s' % lfnParts
-    return check(regexp, candidate)
+    return check(USER_LFN_RE, candidate)
 
 
 def userLfnBase(candidate):
@@ -516,11 +458,31 @@ def validateUrl(candidate):
     return check(regex_url, candidate)
 
 
+_COMPILED_REGEXPS = {}
+_MAX_COMPILED_REGEXPS = 512
+
+
+def compileRegexp(regexp):
+    """
+    Return the compiled version of a regular expression, compiling it
+    only the first time it is requested. Like the re module cache, the
+    cache is emptied once it holds _MAX_COMPILED_REGEXPS expressions.
+    """
+    try:
+        return _COMPILED_REGEXPS[regexp]
+    except KeyError:
+        if len(_COMPILED_REGEXPS) >= _MAX_COMPILED_REGEXPS:
+            _COMPILED_REGEXPS.clear()
+        compiled = re.compile(regexp)
+        _COMPILED_REGEXPS[regexp] = compiled
+        return compiled
+
+
 def check(regexp, candidate, maxLength=None):
     if maxLength is not None:
         assert len(candidate) <= maxLength, \
             "%s is longer than max length (%s) allowed" % (candidate, maxLength)
-    assert re.compile(regexp).match(candidate) is not None, \
+    assert compileRegexp(regexp).match(candidate) is not None, \
         "'%s' does not match regular expression %s" % (candidate, regexp)
     return True
 
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+_LexiconValidator_
+
+Precompiled and bulk version of some of the Lexicon checks.
+
+Every Lexicon type supported here is compiled only once, and the types
+defined by a list of alternative regular expressions (like lfn and lfnBase)
+are merged into a single regular expression, such that a candidate is
+matched only once. Results of recently validated strings are memoized.
+
+Validation rules are exactly the same as the ones in WMCore.Lexicon,
+which remains the reference implementation and is used to build the
+detailed error messages.
+"""
+from __future__ import division
+
+import re
+from collections import OrderedDict
+
+from WMCore import Lexicon
+
+
+def combineRegexps(regexps):
+    """
+    Merge a list of alternative regular expressions into a single compiled
+    regular expression. Like Lexicon.check, the result is meant to be used
+    with match (thus only anchored at the beginning of the candidate).
+    """
+    return re.compile("|".join("(?:%s)" % regexp for regexp in regexps))
+
+
+class LexiconValidator(object):
+    """
+    _LexiconValidator_
+
+    Validate single candidates or lists of candidates against Lexicon types.
+    Supported types are listed in the `types` property.
+    """
+
+    def __init__(self, memoSize=10000):
+        """
+        :param memoSize: maximum number of validated strings to remember
+            per Lexicon type. Use 0 to disable memoization.
+        """
+        self.memoSize = memoSize
+
+        self._lfnRe = combineRegexps(Lexicon.LFN_REGEXPS)
+        self._lfnBaseRe = combineRegexps(Lexicon.LFN_BASE_REGEXPS)
+        self._userLfnRe = re.compile(Lexicon.USER_LFN_RE)
+        self._datasetRe = re.compile(Lexicon.DATASET_RE)
+        self._primDSRe = re.compile(Lexicon.PRIMARY_DS['re'])
+        self._procDSRe = re.compile(Lexicon.PROCESSED_DS['re'])
+        self._procDatasetRe = re.compile(Lexicon.PROCDATASET_RE)
+        self._tierRe = re.compile(Lexicon.TIER['re'])
+        self._blockStrRe = re.compile(Lexicon.BLOCK_STR['re'])
+
+        self._validators = {'lfn': self._lfnRe.match,
+                            'lfnBase': self._lfnBaseRe.match,
+                            'userLfn': self._userLfnRe.match,
+                            'dataset': self._datasetRe.match,
+                            'primdataset': self._isPrimDataset,
+                            'procdataset': self._isProcDataset,
+                            'block': self._isBlock}
+        self._lexicon = {'lfn': Lexicon.lfn,
+                         'lfnBase': Lexicon.lfnBase,
+                         'userLfn': Lexicon.userLfn,
+                         'dataset': Lexicon.dataset,
+                         'primdataset': Lexicon.primdataset,
+                         'procdataset': Lexicon.procdataset,
+                         'block': Lexicon.block}
+        self._memo = dict((kind, OrderedDict()) for kind in self._validators)
+
+    @property
+    def types(self):
+        """
+        Return the list of Lexicon types supported by this validator
+        """
+        return sorted(self._validators)
+
+    def _isPrimDataset(self, candidate):
+        """
+        Same as Lexicon.primdataset, but returning a boolean
+        """
+        if not candidate:
+            return True
+        return len(candidate) <= Lexicon.PRIMARY_DS['maxLength'] and self._primDSRe.match(candidate)
+
+    def _isProcDataset(self, candidate):
+        """
+        Same as Lexicon.procdataset, but returning a boolean
+        """
+        if not candidate or candidate.startswith('None'):
+            return False
+        return (len(candidate) <= Lexicon.PROCESSED_DS['maxLength'] and
+                self._procDSRe.match(candidate) and self._procDatasetRe.match(candidate))
+
+    def _isBlock(self, candidate):
+        """
+        Same as Lexicon.block, but returning a boolean
+        """
+        if candidate.count('/') != 3:
+            return False
+        parts = candidate.split('/')
+        if parts[3].count('#') != 1:
+            return False
+        tier, blockStr = parts[3].split('#')
+        blockStr = "#" + blockStr
+        return (len(parts[1]) <= Lexicon.PRIMARY_DS['maxLength'] and self._primDSRe.match(parts[1]) and
+                len(parts[2]) <= Lexicon.PROCESSED_DS['maxLength'] and self._procDSRe.match(parts[2]) and
+                len(tier) <= Lexicon.TIER['maxLength'] and self._tierRe.match(tier) and
+                len(blockStr) <= Lexicon.BLOCK_STR['maxLength'] and self._blockStrRe.match(blockStr))
+
+    def _getValidator(self, kind):
+        """
+        Return the validation function for a given Lexicon type
+        """
+        try:
+            return self._validators[kind]
+        except KeyError:
+            raise ValueError("Unsupported Lexicon type: %s. Supported types are: %s" % (kind, self.types))
+
+    def isValid(self, kind, candidate):
+        """
+        Return True if the candidate is a valid Lexicon type, False otherwise
+        """
+        validator = self._getValidator(kind)
+        memo = self._memo[kind]
+        try:
+            return memo[candidate]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable candidate, which is never a valid string
+            return False
+
+        try:
+            result = bool(validator(candidate))
+        except (TypeError, AttributeError):
+            result = False
+
+        if self.memoSize > 0:
+            memo[candidate] = result
+            if len(memo) > self.memoSize:
+                memo.popitem(last=False)
+        return result
+
+    def check(self, kind, candidate):
+        """
+        Same behaviour as the Lexicon functions: return True for a valid candidate,
+        otherwise raise an AssertionError with the Lexicon error message.
+        """
+        if self.isValid(kind, candidate):
+            return True
+        # let Lexicon build its detailed error message
+        self._lexicon[kind](candidate)
+        raise AssertionError("'%s' is not a valid %s" % (candidate, kind))
+
+    def validate(self, kind, candidates):
+        """
+        Validate a list of candidates against a Lexicon type.
+
+        :param kind: Lexicon type name, see `types`
+        :param candidates: an iterable of candidate strings
+        :return: a list with the indexes of the candidates that failed validation
+        """
+        validator = self._getValidator(kind)
+        memo = self._memo[kind]
+        failed = []
+        for idx, candidate in enumerate(candidates):
+            try:
+                result = memo.get(candidate)
+            except TypeError:
+                # unhashable candidate, which is never a valid string
+                failed.append(idx)
+                continue
+            if result is None:
+                try:
+                    result = bool(validator(candidate))
+                except (TypeError, AttributeError):
+                    result = False
+                if self.memoSize > 0:
+                    memo[candidate] = result
+            if not result:
+                failed.append(idx)
+        while len(memo) > self.memoSize:
+            memo.popitem(last=False)
+        return failed
+
+    def lfns(self, candidates):
+        """
+        Bulk lfn validation, returns the indexes of the invalid LFNs
+        """
+        return self.validate('lfn', candidates)
+
+    def lfnBases(self, candidates):
+        """
+        Bulk lfnBase validation, returns the indexes of the invalid LFN bases
+        """
+        return self.validate('lfnBase', candidates)
+
+    def datasets(self, candidates):
+        """
+        Bulk dataset validation, returns the indexes of the invalid dataset names
+        """
+        return self.validate('dataset', candidates)
+
+    def blocks(self, candidates):
+        """
+        Bulk block validation, returns the indexes of the invalid block names
+        """
+        return self.validate('block', candidates)
+
+    def clearMemo(self):
+        """
+        Forget all the memoized validation results
+        """
+        for memo in self._memo.values():
+            memo.clear()
+
+
+_VALIDATOR = None
+
+
+def getLexiconValidator():
+    """
+    Return a process-wide LexiconValidator instance, creating it on first usage
+    """
+    global _VALIDATOR
+    if _VALIDATOR is None:
+        _VALIDATOR = LexiconValidator()
+    return _VALIDATOR
@@ -17,7 +17,10 @@ MONITOR_REPORT = dict(start_time=0,
                       filtered_transfer_docs=0,
                       success_transfer_doc_update=0,
                       failed_transfer_doc_update=0,
-                      request_status_updated=0)
+                      request_status_updated=0,
+                      num_rules_fetched=0,
+                      num_rules_skipped=0,
+                      num_rules_failed=0)
 
 # summary metrics for the MSTransferor thread
 # (also available through the `info` REST API)
@@ -10,10 +10,13 @@ from __future__ import division, print_function
 
 # system modules
 import time
+from multiprocessing.pool import ThreadPool
+from queue import Empty, Queue
 
 # WMCore modules
 from WMCore.MicroService.DataStructs.DefaultStructs import MONITOR_REPORT
 from WMCore.MicroService.MSCore import MSCore
+from WMCore.MicroService.MSMonitor.RuleStatusCache import RuleStatusCache
 from WMCore.Services.Rucio.Rucio import Rucio
 
 
@@ -28,10 +31,24 @@ class MSMonitor(MSCore):
         # update interval is used to check records in CouchDB and update them
         # after this interval, default 6h
         self.updateInterval = self.msConfig.get('updateInterval', 6 * 60 * 60)
-        self.rucio = Rucio(acct=self.msConfig['rucioAccount'],
-                           hostUrl=self.msConfig['rucioUrl'],
-                           authUrl=self.msConfig['rucioAuthUrl'],
-                           configDict={"logger": self.logger, "user_agent": "WMCore-MSMonitor"})
+        self.rucioArgs = dict(acct=self.msConfig['rucioAccount'],
+                              hostUrl=self.msConfig['rucioUrl'],
+                              authUrl=self.msConfig['rucioAuthUrl'],
+                              configDict={"logger": self.logger, "user_agent": "WMCore-MSMonitor"})
+        self.rucio = Rucio(**self.rucioArgs)
+        # Rucio clients are not thread safe: each rule polling thread borrows a
+        # client from this pool, they are created on demand and reused across cycles
+        self.rucioClients = Queue()
+        self.rucioClients.put(self.rucio)
+        # Rucio rules are fetched concurrently; satisfied rules are never fetched again
+        # and the other ones are polled with an interval growing while they make no progress
+        self.rucioRuleThreads = self.msConfig.get('rucioRuleThreads', 8)
+        self.ruleCacheMaxAge = self.msConfig.get('ruleCacheMaxAge', 7 * 24 * 60 * 60)
+        self.ruleCache = RuleStatusCache(minInterval=self.msConfig.get('rulePollMinInterval', 15 * 60),
+                                         maxInterval=self.msConfig.get('rulePollMaxInterval', 12 * 60 * 60),
+                                         cacheFile=self.msConfig.get('ruleCacheFile'),
+                                         logger=self.logger)
+        self.ruleStats = dict(fetched=0, skipped=0, failed=0)
 
     def updateCaches(self):
         """
@@ -109,6 +126,9 @@ class MSMonitor(MSCore):
         try:
             # keep track of request and their new statuses
             skippedWorkflows = self.getTransferInfo(transferRecords)
+            self.updateReportDict(summary, "num_rules_fetched", self.ruleStats['fetched'])
+            self.updateReportDict(summary, "num_rules_skipped", self.ruleStats['skipped'])
+            self.updateReportDict(summary, "num_rules_failed", self.ruleStats['failed'])
             requestsToStage = self.getCompletedWorkflows(transferRecords, campaigns)
             failedDocs = self.updateTransferDocs(transferRecords, skippedWorkflows)
             self.updateReportDict(summary, "success_transfer_doc_update",
@@ -143,9 +163,14 @@ class MSMonitor(MSCore):
         :return skippedWorkflows: a list of workflow names which a call to the data
         management system did not succeed
         """
-        # FIXME: create concurrent rucio calls using multi_getdata
         skippedWorkflows = []
         tstamp = int(time.time())
+        ruleIDs = set()
+        for doc in transferRecords:
+            for rec in doc['transfers']:
+                ruleIDs.update(rec['transferIDs'])
+        failedRules = self._pollRules(ruleIDs)
+
         for doc in transferRecords:
             self.logger.debug("Checking transfers for: %s", doc['workflowName'])
             if not doc['transfers']:
@@ -156,7 +181,7 @@ class MSMonitor(MSCore):
             try:
                 for rec in doc['transfers']:
                     # obtain new transfer ids and completion for given dataset
-                    completion = self._getRucioTransferstatus(rec['transferIDs'])
+                    completion = self._getRucioTransferstatus(rec['transferIDs'], failedRules)
                     rec['completion'].append(round(completion, 3))
                 doc['lastUpdate'] = tstamp
             except Exception as exc:
@@ -165,12 +190,65 @@ class MSMonitor(MSCore):
                 skippedWorkflows.append(doc['workflowName'])
         return skippedWorkflows
 
-    def _getRucioTransferstatus(self, rulesList):
+    def _pollRules(self, ruleIDs):
         """
-        Given a list of Rucio rules ID - for a given input data - check the
-        overall transfer status from Rucio
-        :param rulesList: list of rules ID
-        :return: the overall transfers percent completion
+        Fetch from Rucio, with up to rucioRuleThreads concurrent calls, the rules
+        which are not known to be satisfied and whose poll interval expired; and
+        record their completion in the rule cache. The number of fetched, skipped
+        and failed rules is kept in ruleStats.
+        :param ruleIDs: set of rule IDs
+        :return: a set with the rule IDs which could not be fetched
+        """
+        now = time.time()
+        self.ruleCache.markSeen(ruleIDs, now)
+        rulesToFetch = [ruleID for ruleID in ruleIDs if self.ruleCache.isDue(ruleID, now)]
+        failedRules = set()
+        if rulesToFetch:
+            pool = ThreadPool(min(self.rucioRuleThreads, len(rulesToFetch)))
+            try:
+                rulesData = pool.map(self._fetchRule, rulesToFetch)
+            finally:
+                pool.close()
+                pool.join()
+            for ruleID, data in zip(rulesToFetch, rulesData):
+                if not data:
+                    failedRules.add(ruleID)
+                    continue
+                completion = self._ruleCompletion(data)
+                self.ruleCache.update(ruleID, data['state'], completion, now)
+                self.logger.info("Rule ID: %s has a completion rate of: %s%%", ruleID, completion)
+                self.logger.debug("Rule ID: %s, DID: %s, state: %s, grouping: %s, rse_expression: %s",
+                                  ruleID, data['name'], data['state'], data['grouping'], data['rse_expression'])
+        self.ruleCache.prune(self.ruleCacheMaxAge, now)
+        self.ruleCache.save()
+
+        self.ruleStats = dict(fetched=len(rulesToFetch) - len(failedRules),
+                              skipped=len(ruleIDs) - len(rulesToFetch),
+                              failed=len(failedRules))
+        self.logger.info("Rucio rules: %d fetched, %d skipped (satisfied or not due) and %d failed",
+                         self.ruleStats['fetched'], self.ruleStats['skipped'], self.ruleStats['failed'])
+        return failedRules
+
+    def _fetchRule(self, ruleID):
+        """
+        Fetch a rule from Rucio, with a client not used by any other thread,
+        returning an empty dictionary in case of errors
+        """
+        try:
+            rucio = self.rucioClients.get_nowait()
+        except Empty:
+            rucio = Rucio(**self.rucioArgs)
+        try:
+            return rucio.getRule(ruleID)
+        except Exception as exc:
+            self.logger.error("Failed to retrieve rule ID: %s from Rucio. Error: %s", ruleID, str(exc))
+            return {}
+        finally:
+            self.rucioClients.put(rucio)
+
+    def _ruleCompletion(self, data):
+        """
+        Given the data of a Rucio rule, return its completion percent.
 
         The Rucio getRule API returns data in the form of:
             {u'account': u'transfer_ops',
@@ -185,33 +263,35 @@ class MSMonitor(MSCore):
         NOTE: completion in Rucio is different than in PhEDEx. PhEDEx gives the
         percentage value; while Rucio gives the ratio (0 - 1).
         """
+        if data['state'] == "OK":
+            return 100.0
+        totalLocks = data['locks_ok_cnt'] + data['locks_replicating_cnt'] + data['locks_stuck_cnt']
+        try:
+            return (data['locks_ok_cnt'] / totalLocks) * 100
+        except ZeroDivisionError:
+            self.logger.warning("Rule does not have any lock counts yet. Rule data: %s", data)
+            return 0
+
+    def _getRucioTransferstatus(self, rulesList, failedRules=None):
+        """
+        Given a list of Rucio rules ID - for a given input data - check the
+        overall transfer status, from the rule cache filled by _pollRules
+        :param rulesList: list of rules ID
+        :param failedRules: set of rule IDs which could not be fetched in this cycle
+        :return: the overall transfers percent completion
+        """
+        failedRules = failedRules or set()
         completion = []
         for ruleID in rulesList:
-            # if we query by dataset and the subscription was at block level,
-            # we get an empty response. So always wildcard the block parameter
-            data = self.rucio.getRule(ruleID)
-            if not data:
+            lockCompletion = self.ruleCache.completion(ruleID)
+            if ruleID in failedRules or lockCompletion is None:
                 msg = "Failed to retrieve rule information from Rucio for rule ID: {}".format(ruleID)
                 raise RuntimeError(msg)
-
-            if data['state'] == "OK":
-                lockCompletion = 100.0
-            else:
-                totalLocks = data['locks_ok_cnt'] + data['locks_replicating_cnt'] + data['locks_stuck_cnt']
-                try:
-                    lockCompletion = (data['locks_ok_cnt'] / totalLocks) * 100
-                except ZeroDivisionError:
-                    self.logger.warning("Rule does not have any lock counts yet. Rule data: %s", data)
-                    lockCompletion = 0
             completion.append(lockCompletion)
-            self.logger.info("Rule ID: %s has a completion rate of: %s%%", ruleID, lockCompletion)
-            self.logger.debug("Rule ID: %s, DID: %s, state: %s, grouping: %s, rse_expression: %s",
-                              ruleID, data['name'], data['state'], data['grouping'], data['rse_expression'])
         if not completion:
             return 0
         return sum(completion) / len(completion)
 
-
     def getCompletedWorkflows(self, transfers, campaigns):
         """
         Parse the transfer documents, compare against the campaign settings
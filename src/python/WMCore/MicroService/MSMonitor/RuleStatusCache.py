@@ -0,0 +1,139 @@
+"""
+File       : RuleStatusCache.py
+Description: RuleStatusCache keeps the last known completion of Rucio rules
+across MSMonitor cycles, such that rules which are already satisfied are
+never polled again, and rules still replicating are polled with a backoff.
+"""
+# futures
+from __future__ import division, print_function
+
+# system modules
+import json
+import os
+import time
+from builtins import object
+
+
+class RuleStatusCache(object):
+    """
+    Cache of Rucio rule status, keyed by rule ID. Each entry holds:
+      * completion: the last completion percent of the rule
+      * state: the last rule state
+      * interval: the current poll interval, in seconds
+      * nextPoll: timestamp of the next time the rule has to be polled
+      * lastSeen: timestamp of the last time the rule was requested
+    """
+
+    terminalStates = ("OK",)
+
+    def __init__(self, minInterval=15 * 60, maxInterval=12 * 60 * 60, cacheFile=None, logger=None):
+        """
+        :param minInterval: poll interval of rules which made progress since the last poll
+        :param maxInterval: maximum poll interval of rules which did not make progress
+        :param cacheFile: optional JSON file where the cache is persisted
+        :param logger: logger object
+        """
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.cacheFile = cacheFile
+        self.logger = logger
+        self.rules = {}
+        if self.cacheFile and os.path.exists(self.cacheFile):
+            self.load()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __contains__(self, ruleID):
+        return ruleID in self.rules
+
+    def isTerminal(self, ruleID):
+        """
+        Return True if the rule is known to be in a terminal state
+        """
+        return ruleID in self.rules and self.rules[ruleID]['state'] in self.terminalStates
+
+    def isDue(self, ruleID, now=None):
+        """
+        Return True if the rule has to be polled from Rucio: it is either
+        unknown, or not in a terminal state and its poll interval expired
+        """
+        if ruleID not in self.rules:
+            return True
+        if self.isTerminal(ruleID):
+            return False
+        now = time.time() if now is None else now
+        return now >= self.rules[ruleID]['nextPoll']
+
+    def completion(self, ruleID, now=None):
+        """
+        Return the last known completion of a rule, or None if it is unknown
+        """
+        entry = self.rules.get(ruleID)
+        if entry is None:
+            return None
+        entry['lastSeen'] = time.time() if now is None else now
+        return entry['completion']
+
+    def markSeen(self, ruleIDs, now=None):
+        """
+        Record that the known rules among ruleIDs were requested, such that
+        they are not pruned, whether they are polled or not
+        """
+        now = time.time() if now is None else now
+        for ruleID in ruleIDs:
+            if ruleID in self.rules:
+                self.rules[ruleID]['lastSeen'] = now
+
+    def update(self, ruleID, state, completion, now=None):
+        """
+        Record the status of a rule which has just been polled. Rules which did
+        not make any progress get their poll interval doubled, up to maxInterval,
+        the other ones are polled again after minInterval.
+        """
+        now = time.time() if now is None else now
+        entry = self.rules.get(ruleID)
+        if entry is None or completion > entry['completion']:
+            interval = self.minInterval
+        else:
+            interval = min(max(2 * entry['interval'], self.minInterval), self.maxInterval)
+        self.rules[ruleID] = dict(completion=completion, state=state, interval=interval,
+                                  nextPoll=now + interval, lastSeen=now)
+
+    def prune(self, maxAge, now=None):
+        """
+        Remove the rules which were not requested over the last maxAge seconds
+        :return: the number of rules removed
+        """
+        now = time.time() if now is None else now
+        oldRules = [ruleID for ruleID, entry in self.rules.items() if now - entry['lastSeen'] > maxAge]
+        for ruleID in oldRules:
+            del self.rules[ruleID]
+        return len(oldRules)
+
+    def load(self):
+        """
+        Load the cache from the cache file, ignoring unreadable files
+        """
+        try:
+            with open(self.cacheFile) as fobj:
+                self.rules = json.load(fobj)
+        except (IOError, ValueError) as exc:
+            if self.logger:
+                self.logger.warning("Failed to load the rule cache from %s. Error: %s", self.cacheFile, str(exc))
+            self.rules = {}
+
+    def save(self):
+        """
+        Write the cache to the cache file, if any
+        """
+        if not self.cacheFile:
+            return
+        tmpFile = "%s.tmp" % self.cacheFile
+        try:
+            with open(tmpFile, 'w') as fobj:
+                json.dump(self.rules, fobj)
+            os.rename(tmpFile, self.cacheFile)
+        except (IOError, OSError) as exc:
+            if self.logger:
+                self.logger.warning("Failed to save the rule cache to %s. Error: %s", self.cacheFile, str(exc))
@@ -11,6 +11,11 @@ import xml.sax.saxutils
 import zlib
 from traceback import format_exc
 
+try:
+    from collections.abc import Iterator
+except ImportError:
+    from collections import Iterator
+
 import cherrypy
 
 from WMCore.REST.Error import RESTError, ExecutionError, report_rest_error
@@ -37,6 +42,33 @@ def is_iterable(obj):
     else:
         return True
 
+def _json_default(obj):
+    """Expand iterators and generators nested in the objects into lists."""
+    if isinstance(obj, Iterator):
+        return list(obj)
+    raise TypeError("Object of type %s is not JSON serializable" % type(obj).__name__)
+
+# same separators and escaping as json.dumps()
+_json_encoder = json.JSONEncoder(default=_json_default, separators=(", ", ": "), ensure_ascii=True)
+
+def _json_dumps_std(obj):
+    """Encode `obj` to JSON bytes with the standard library encoder."""
+    return _json_encoder.encode(obj).encode("utf-8")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json_dumps_orjson(obj):
+    """Encode `obj` to JSON bytes with orjson, falling back to the
+    standard encoder for objects orjson refuses, e.g. integers larger
+    than 64 bits."""
+    try:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        return _json_dumps_std(obj)
+
 class RESTFormat(object):
     def __call__(self, stream, etag):
         """Main entry point for generating output for `stream` using `etag`
@@ -208,6 +240,19 @@ class JSONFormat(RESTFormat):
     must inspect the X-REST-Status trailer header to find out if it got the
     complete output. No ETag header is generated in case of an exception.
 
+    Objects are encoded straight into a reusable byte buffer, which is output
+    whenever it grows beyond `chunk_size` bytes, so several lines usually
+    make up one chunk and a large object may span several chunks. Iterators
+    and generators are encoded as arrays one item at a time, as are the
+    members of top-level dictionaries which have at least `split_size`
+    members or iterator values, so such results are never materialized
+    whole. Nested deeper, iterators are expanded into lists. The output is
+    the same as the one of `json.dumps()`, unless `use_orjson` is set and
+    orjson is installed: orjson is much faster, but its output is compact,
+    not ASCII escaped and has null for NaN and infinite floats, so it must
+    be enabled only for clients which do not depend on these details.
+    A `chunk_size` of zero outputs one chunk per line using `json.dumps()`.
+
     The ETag generation is deterministic only if `cjson.encode()` output is
     deterministic for the input. Beware in particular the key order for a
     dict is arbitrary and may differ for two semantically identical dicts.
@@ -231,13 +276,118 @@ class JSONFormat(RESTFormat):
     dictionary and an array ("``{key: [``"), one line of JSON rendering of
     each object in `stream`, with the first line starting with exactly one
     space and second and subsequent lines starting with a comma, and one
-    final trailer line consisting of "``]}``". Each line is generated as a
-    HTTP transfer chunk. This format is fixed so readers can be constructed
-    to read and parse the stream incrementally one line at a time,
-    facilitating maximum throughput processing of the response."""
+    final trailer line consisting of "``]}``". This format is fixed so
+    readers can be constructed to read and parse the stream incrementally
+    one line at a time, facilitating maximum throughput processing of the
+    response."""
+
+    def __init__(self, chunk_size=64 * 1024, split_size=100, use_orjson=False):
+        self.chunk_size = chunk_size
+        self.split_size = split_size
+        if use_orjson and orjson is not None:
+            self._json_dumps = _json_dumps_orjson
+        else:
+            self._json_dumps = _json_dumps_std
 
     def stream_chunked(self, stream, etag, preamble, trailer):
-        """Generator for actually producing the output."""
+        """Return the generator for actually producing the output."""
+        if self.chunk_size:
+            return self.stream_buffered(stream, etag, preamble, trailer)
+        return self.stream_lines(stream, etag, preamble, trailer)
+
+    def stream_buffered(self, stream, etag, preamble, trailer):
+        """Generator producing the output in chunks of `chunk_size` bytes."""
+        buf = bytearray()
+
+        try:
+            if preamble:
+                buf += encodeUnicodeToBytes(preamble)
+
+            try:
+                comma = b" "
+                for obj in stream:
+                    mark = len(buf)
+                    buf += comma
+                    try:
+                        for chunk in self._write(obj, buf, 0):
+                            mark = 0
+                            etag.update(chunk)
+                            yield chunk
+                    except Exception as exp:
+                        # discard the partially encoded object from the pending
+                        # output before aborting the response
+                        del buf[mark:]
+                        cherrypy.log("json.dumps failed to serialize %s, type %s: %s"
+                                     % (obj, type(obj), str(exp)))
+                        raise
+                    buf += b"\n"
+                    comma = b","
+                    if len(buf) >= self.chunk_size:
+                        chunk = bytes(buf)
+                        del buf[:]
+                        etag.update(chunk)
+                        yield chunk
+            except GeneratorExit:
+                etag.invalidate()
+                trailer = None
+                raise
+            finally:
+                if trailer:
+                    buf += encodeUnicodeToBytes(trailer)
+                    chunk = bytes(buf)
+                    del buf[:]
+                    etag.update(chunk)
+                    yield chunk
+
+            cherrypy.response.headers["X-REST-Status"] = 100
+        except RESTError as e:
+            etag.invalidate()
+            report_rest_error(e, format_exc(), False)
+        except Exception as e:
+            etag.invalidate()
+            report_rest_error(ExecutionError(), format_exc(), False)
+
+    def _write(self, obj, buf, depth):
+        """Encode `obj` as JSON into `buf`, yielding the buffer contents
+        whenever it grows beyond `chunk_size` bytes."""
+        if isinstance(obj, Iterator):
+            buf += b"["
+            sep = b""
+            for item in obj:
+                buf += sep
+                for chunk in self._write(item, buf, depth + 1):
+                    yield chunk
+                sep = b", "
+            buf += b"]"
+        elif depth == 0 and isinstance(obj, dict) and self._split_dict(obj):
+            buf += b"{"
+            sep = b""
+            for key, value in viewitems(obj):
+                buf += sep
+                buf += self._json_dumps(key)
+                buf += b": "
+                for chunk in self._write(value, buf, depth + 1):
+                    yield chunk
+                sep = b", "
+            buf += b"}"
+        else:
+            buf += self._json_dumps(obj)
+
+        if len(buf) >= self.chunk_size:
+            chunk = bytes(buf)
+            del buf[:]
+            yield chunk
+
+    def _split_dict(self, obj):
+        """Check whether dictionary `obj` should be encoded one member at a time."""
+        if not all(isinstance(key, str) for key in obj):
+            return False
+        if len(obj) >= self.split_size:
+            return True
+        return any(isinstance(value, Iterator) for value in obj.values())
+
+    def stream_lines(self, stream, etag, preamble, trailer):
+        """Generator producing the output as one chunk per line."""
         comma = " "
 
         try:
@@ -467,24 +617,25 @@ def _stream_compress_deflate(reply, compress_level, max_chunk):
     z = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS,
                          zlib.DEF_MEM_LEVEL, 0)
 
-    # Data pending compression. We only take entire chunks from original
-    # reply. Then process reply one chunk at a time. Whenever we have enough
-    # data to compress, spit it out flushing the zlib engine entirely, so we
-    # respect original chunk boundaries.
+    # Feed the reply to the compressor one chunk at a time, without joining
+    # the chunks first. Whenever we have compressed enough data, spit it out
+    # flushing the zlib engine entirely, so we respect original chunk
+    # boundaries.
     npending = 0
-    pending = []
+    parts = []
     for chunk in reply:
-        pending.append(chunk)
+        parts.append(z.compress(encodeUnicodeToBytes(chunk)))
         npending += len(chunk)
         if npending >= max_chunk:
-            part = z.compress(encodeUnicodeToBytes("".join(pending))) + z.flush(zlib.Z_FULL_FLUSH)
-            pending = []
+            parts.append(z.flush(zlib.Z_FULL_FLUSH))
+            yield b"".join(parts)
+            parts = []
             npending = 0
-            yield part
 
     # Crank the compressor one more time for remaining output.
     if npending:
-        yield z.compress(encodeUnicodeToBytes("".join(pending))) + z.flush(zlib.Z_FINISH)
+        parts.append(z.flush(zlib.Z_FINISH))
+        yield b"".join(parts)
 
 # : Stream compression methods.
 _stream_compressor = {
@@ -615,8 +766,7 @@ def stream_maybe_etag(size_limit, etag, reply):
     res.headers['Content-Length'] = size
     # TODO investigate why `result` is a list of bytes strings in py3
     # The current solution seems to work in both py2 and py3
-    resp = b"" if PY3 else ""
-    for item in result:
-        resp += encodeUnicodeToBytesConditional(item, condition=PY3)
+    resp = (b"" if PY3 else "").join(encodeUnicodeToBytesConditional(item, condition=PY3)
+                                      for item in result)
     assert len(resp) == size
     return resp
@@ -8,6 +8,8 @@ standard_library.install_aliases()
 import json
 import logging
 import re
+import threading
+import time
 from urllib.parse import urlencode
 
 from WMCore.Services.Service import Service
@@ -27,11 +29,107 @@ def row2dict(columns, row):
     return robj
 
 
+class SiteTopology(object):
+    """
+    _SiteTopology_
+
+    Bidirectional and indexed view of the CRIC data-processing mapping,
+    between PSNs (processing site names) and PNNs (PhEDEx node names).
+    It is immutable once built, such that it can be shared by many threads.
+    """
+
+    def __init__(self, mapping):
+        """
+        :param mapping: list of dictionaries with the psn_name and phedex_name keys
+        """
+        psnToPnns = {}
+        pnnToPsns = {}
+        for item in mapping:
+            psnToPnns.setdefault(item['psn_name'], set()).add(item['phedex_name'])
+            pnnToPsns.setdefault(item['phedex_name'], set()).add(item['psn_name'])
+        self._psnToPnns = dict((psn, frozenset(pnns)) for psn, pnns in psnToPnns.items())
+        self._pnnToPsns = dict((pnn, frozenset(psns)) for pnn, psns in pnnToPsns.items())
+        # results of the pattern queries, which can only change with a new topology
+        self._patternCache = {}
+        self._patternLock = threading.Lock()
+
+    def psns(self):
+        """
+        Return the set of PSNs with at least one PNN
+        """
+        return set(self._psnToPnns)
+
+    def pnns(self):
+        """
+        Return the set of PNNs with at least one PSN
+        """
+        return set(self._pnnToPsns)
+
+    def pnnToPsns(self, pnn):
+        """
+        Return the set of PSNs associated to a PNN (empty if it's unknown)
+        """
+        return set(self._pnnToPsns.get(pnn, ()))
+
+    def psnToPnns(self, psn):
+        """
+        Return the set of PNNs associated to a PSN (empty if it's unknown)
+        """
+        return set(self._psnToPnns.get(psn, ()))
+
+    def pnnsToPsnsMap(self, pnns):
+        """
+        Bulk translation of PNNs, returning a dictionary of PNN to its set of PSNs.
+        Unknown PNNs are mapped to an empty set.
+        """
+        return dict((pnn, set(self._pnnToPsns.get(pnn, ()))) for pnn in pnns)
+
+    def psnsToPnnsMap(self, psns):
+        """
+        Bulk translation of PSNs, returning a dictionary of PSN to its set of PNNs.
+        Unknown PSNs are mapped to an empty set.
+        """
+        return dict((psn, set(self._psnToPnns.get(psn, ()))) for psn in psns)
+
+    def _matchPattern(self, kind, index, pattern):
+        """
+        Return the sorted keys of an index matching a regex pattern, caching the result
+        """
+        key = (kind, pattern)
+        try:
+            return self._patternCache[key]
+        except KeyError:
+            pass
+        regex = re.compile(pattern)
+        names = tuple(sorted(name for name in index if regex.match(name)))
+        with self._patternLock:
+            self._patternCache[key] = names
+        return names
+
+    def psnToPnnMap(self, psnPattern=''):
+        """
+        Return a dictionary of the PSNs matching a regex pattern to their set of PNNs
+        """
+        return dict((psn, set(self._psnToPnns[psn])) for psn in self._matchPattern('psn', self._psnToPnns, psnPattern))
+
+    def pnnToPsnMap(self, pnnPattern=''):
+        """
+        Return a dictionary of the PNNs matching a regex pattern to their set of PSNs
+        """
+        return dict((pnn, set(self._pnnToPsns[pnn])) for pnn in self._matchPattern('pnn', self._pnnToPsns, pnnPattern))
+
+
 class CRIC(Service):
     """
     Class which provides client APIs to the CRIC service.
     """
 
+    # site topologies shared by all the instances, keyed by endpoint, with
+    # one lock per endpoint such that only a single thread refreshes it
+    _topologies = {}
+    _topologyLocks = {}
+    _topologyLocksGuard = threading.Lock()
+
     def __init__(self, url=None, logger=None, configDict=None):
         """
         configDict is a dictionary with parameters that are passed
@@ -41,6 +139,8 @@ class CRIC(Service):
         configDict = configDict or {}
         configDict.setdefault('endpoint', url)
         configDict.setdefault('cacheduration', 1)  # in hours
+        # identical queries are frequent, keep the responses in memory too
+        configDict.setdefault('memcachesize', 16 * 1024 * 1024)
         configDict.setdefault('accept_type', 'application/json')
         configDict.setdefault('content_type', 'application/json')
         configDict['logger'] = logger if logger else logging.getLogger()
@@ -149,6 +249,42 @@ class CRIC(Service):
             nodeNames = [x for x in nodeNames if pattern.match(x)]
         return nodeNames
 
+    def getSiteTopology(self):
+        """
+        _getSiteTopology_
+
+        Return the PSN/PNN site topology, rebuilt from the data-processing
+        mapping once the cache duration is over. Concurrent callers wait for
+        a single refresh and share its result.
+        :return: a SiteTopology object
+        """
+        endpoint = self['endpoint']
+        topology, expiration = self._topologies.get(endpoint, (None, 0))
+        if time.time() < expiration:
+            return topology
+
+        with self._topologyLocksGuard:
+            lock = self._topologyLocks.setdefault(endpoint, threading.Lock())
+        with lock:
+            # someone else might have refreshed it in the meantime
+            topology, expiration = self._topologies.get(endpoint, (None, 0))
+            if time.time() < expiration:
+                return topology
+            topology = SiteTopology(self._CRICSiteQuery(callname='data-processing'))
+            expiration = time.time() + self['cacheduration'] * 3600
+            self._topologies[endpoint] = (topology, expiration)
+        return topology
+
+    @classmethod
+    def clearSiteTopology(cls):
+        """
+        _clearSiteTopology_
+
+        Drop all the site topologies in memory, forcing a refresh on the next usage
+        """
+        with cls._topologyLocksGuard:
+            cls._topologies.clear()
+
     def PNNstoPSNs(self, pnns):
         """
         Given a list of PNNs, return all their PSNs
@@ -156,17 +292,13 @@ class CRIC(Service):
         :param pnns: a string or a list of PNNs
         :return: a list with unique PSNs matching those PNNs
         """
-        mapping = self._CRICSiteQuery(callname='data-processing')
+        topology = self.getSiteTopology()
 
         if isinstance(pnns, (str, bytes)):
             pnns = [pnns]
 
         psns = set()
-        for pnn in pnns:
-            psnSet = set()
-            for item in mapping:
-                if pnn == item['phedex_name']:
-                    psnSet.add(item['psn_name'])
+        for pnn, psnSet in topology.pnnsToPsnsMap(pnns).items():
             if psnSet:
                 psns.update(psnSet)
             else:
@@ -181,17 +313,13 @@ class CRIC(Service):
         :param allowPNNLess: flag to return the PSN as a PNN if no match
         :return: a list with unique PNNs matching those PSNs
         """
-        mapping = self._CRICSiteQuery(callname='data-processing')
+        topology = self.getSiteTopology()
 
         if isinstance(psns, (str, bytes)):
             psns = [psns]
 
         pnns = set()
-        for psn in psns:
-            pnnSet = set()
-            for item in mapping:
-                if item['psn_name'] == psn:
-                    pnnSet.add(item['phedex_name'])
+        for psn, pnnSet in topology.psnsToPnnsMap(psns).items():
             if pnnSet:
                 pnns.update(pnnSet)
             elif allowPNNLess:
@@ -210,14 +338,7 @@ class CRIC(Service):
         if not isinstance(psnPattern, (str, bytes)):
             raise TypeError('psnPattern argument must be of type str or bytes')
 
-        results = self._CRICSiteQuery(callname='data-processing')
-        mapping = {}
-
-        psnPattern = re.compile(psnPattern)
-        for entry in results:
-            if psnPattern.match(entry['psn_name']):
-                mapping.setdefault(entry['psn_name'], set()).add(entry['phedex_name'])
-        return mapping
+        return self.getSiteTopology().psnToPnnMap(psnPattern)
 
     def PNNtoPSNMap(self, pnnPattern=''):
         """
@@ -228,11 +349,4 @@ class CRIC(Service):
         if not isinstance(pnnPattern, (str, bytes)):
             raise TypeError('pnnPattern argument must be of type str or bytes')
 
-        results = self._CRICSiteQuery(callname='data-processing')
-        mapping = {}
-
-        pnnPattern = re.compile(pnnPattern)
-        for entry in results:
-            if pnnPattern.match(entry['phedex_name']):
-                mapping.setdefault(entry['phedex_name'], set()).add(entry['psn_name'])
-        return mapping
+        return self.getSiteTopology().pnnToPsnMap(pnnPattern)
@@ -90,10 +90,55 @@ class FWJRDBAPI(object):
         keys = status
         return self._getCouchView("reportsByArchiveStatus", options, keys)
 
+    def getFWJRByArchiveStatusPage(self, status, limit, startDocID=None):
+        """
+        Page through the FWJR docs with a given archive status, ordered by doc id.
+        'startDocID': id of the first doc of the page, None for the first page
+        One more row is read to find where the next page starts: its id is
+        returned as 'nextDocID' (None for the last page), but not in the rows.
+        Thus the docs of a page leaving the view, once marked as uploaded, do
+        not shift the next page.
+        """
+        options = {"include_docs": True, "startkey": status, "endkey": status, "limit": limit + 1}
+        if startDocID is not None:
+            options["startkey_docid"] = startDocID
+        result = self._getCouchView("reportsByArchiveStatus", options)
+        rows = result["rows"]
+        result["nextDocID"] = rows[limit]["id"] if len(rows) > limit else None
+        result["rows"] = rows[:limit]
+        return result
+
     def updateArchiveUploadedStatus(self, docID):
 
         return self.couchDB.updateDocument(docID, self.couchapp, "archiveStatus")
 
+    def bulkUpdateArchiveUploadedStatus(self, docs):
+        """
+        Mark as uploaded a list of FWJR docs, as retrieved with include_docs,
+        with a single _bulk_docs call. Docs failing with a conflict are then
+        updated one by one through the update function.
+        Returns the list of doc ids which could not be updated.
+        """
+        if not docs:
+            return []
+        updatedDocs = []
+        for doc in docs:
+            doc = dict(doc)
+            doc["archivestatus"] = "uploaded"
+            updatedDocs.append(doc)
+        result = self.couchDB.post('/%s/_bulk_docs/' % self.dbName, {"docs": updatedDocs})
+
+        failedIDs = []
+        for row in result:
+            if row.get("error") == "conflict":
+                try:
+                    self.updateArchiveUploadedStatus(row["id"])
+                except Exception:
+                    failedIDs.append(row["id"])
+            elif "error" in row:
+                failedIDs.append(row["id"])
+        return failedIDs
+
     def isAllFWJRArchived(self, workflow):
         keys = [[workflow, "ready"]]
         options = {"reduce": True, "group": True}
@@ -11,15 +11,19 @@ from future import standard_library
 standard_library.install_aliases()
 
 # standard modules
+import atexit
 import logging
 import re
 import threading
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from http.client import HTTPException
 
 # project modules
 from WMCore.Lexicon import splitCouchServiceURL
-from WMCore.Services.LogDB.LogDBBackend import LogDBBackend
+from WMCore.Services.LogDB.LogDBBackend import LogDBBackend, tstamp
+
+# supported policies when the write-behind buffer is full
+LOGDB_OVERFLOW_POLICIES = ['flush', 'drop', 'drop-oldest']
 
 
 def getLogDBInstanceFromThread():
@@ -41,6 +45,15 @@ class LogDB(object):
     """
 
     def __init__(self, url, identifier, logger=None, **kwds):
+        """
+        Besides the backend parameters, the following optional keywords
+        enable and tune the write-behind buffer:
+          write_behind: buffer posted messages and write them in bulk (default False)
+          flush_interval: seconds between two flushes of the buffer (default 60)
+          max_queue_size: maximum number of documents waiting in the buffer (default 1000)
+          overflow_policy: what to do with a message for a new document when the
+              buffer is full, one of LOGDB_OVERFLOW_POLICIES (default 'flush')
+        """
         self.logger = logger if logger else logging.getLogger()
         self.url = url if url else 'https://cmsweb.cern.ch/couchdb/wmstats_logdb'
         self.identifier = identifier if identifier else 'unknown'
@@ -51,12 +64,33 @@ class LogDB(object):
         except KeyError:
             self.thread_name = threading.currentThread().getName()
 
+        self.write_behind = kwds.pop('write_behind', False)
+        self.flush_interval = kwds.pop('flush_interval', 60)
+        self.max_queue_size = kwds.pop('max_queue_size', 1000)
+        self.overflow_policy = kwds.pop('overflow_policy', 'flush')
+        if self.overflow_policy not in LOGDB_OVERFLOW_POLICIES:
+            raise ValueError("Unsupported overflow policy: '%s', supported policies %s"
+                             % (self.overflow_policy, LOGDB_OVERFLOW_POLICIES))
+        # pending messages per (request, mtype), the thread is the one of this instance
+        self._pending = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flusher = None
+        self.stats = {'posted': 0, 'coalesced': 0, 'dropped': 0, 'flushes': 0, 'written': 0, 'failed': 0,
+                      'requeued': 0}
+
         self.user_pat = re.compile(r'^/[a-zA-Z][a-zA-Z0-9/\=\s()\']*\=[a-zA-Z0-9/\=\.\-_/#:\s\']*$')
         self.agent = 0 if self.user_pat.match(self.identifier) else 1
         couch_url, db_name = splitCouchServiceURL(self.url)
         self.backend = LogDBBackend(couch_url, db_name, identifier,
                                     self.thread_name, agent=self.agent, **kwds)
         self.logger.info(self)
+        if self.write_behind:
+            self._flusher = threading.Thread(target=self._flushLoop, name="LogDBFlusher-%s" % self.thread_name)
+            self._flusher.daemon = True
+            self._flusher.start()
+            atexit.register(self.close)
 
     def __repr__(self):
         "Return representation for class"
@@ -69,7 +103,9 @@ class LogDB(object):
         try:
             if request is None:
                 request = self.default_user
-            if self.user_pat.match(self.identifier):
+            if self.write_behind:
+                res = self._buffer(request, msg, mtype)
+            elif self.user_pat.match(self.identifier):
                 res = self.backend.user_update(request, msg, mtype)
             else:
                 res = self.backend.agent_update(request, msg, mtype)
@@ -81,9 +117,127 @@ class LogDB(object):
         self.logger.debug("LogDB post request, res=%s", res)
         return res
 
+    def _buffer(self, request, msg, mtype):
+        """
+        Add a message to the write-behind buffer. Messages for the same
+        document are coalesced: agent documents only keep the latest one,
+        while user messages are all kept.
+        """
+        if self.agent:
+            self.backend.check(request, mtype)
+            mtype = self.backend.prefix(mtype)
+        key = (request, mtype)
+        rec = {"ts": tstamp(), "msg": msg}
+        with self._pending_lock:
+            self.stats['posted'] += 1
+            full = key not in self._pending and len(self._pending) >= self.max_queue_size
+        if full and self.overflow_policy == 'flush':
+            self.flush()
+        with self._pending_lock:
+            if key in self._pending:
+                self.stats['coalesced'] += 1
+                if self.agent:
+                    self._pending[key] = [rec]
+                else:
+                    self._pending[key].append(rec)
+                return 'buffered'
+            if len(self._pending) >= self.max_queue_size:
+                if self.overflow_policy == 'drop-oldest':
+                    _, recs = self._pending.popitem(last=False)
+                    self.stats['dropped'] += len(recs)
+                else:
+                    self.stats['dropped'] += 1
+                    return 'dropped'
+            self._pending[key] = [rec]
+        return 'buffered'
+
+    def pending(self):
+        """Return the number of documents waiting in the write-behind buffer"""
+        with self._pending_lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Write all the buffered messages with a single bulk revision look-up and
+        a single _bulk_docs call. Return the number of documents written.
+        Documents which could not be written are put back in the buffer, to be
+        written by the next flush.
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return 0
+                entries = [(request, mtype, recs) for (request, mtype), recs in viewitems(self._pending)]
+                self._pending = OrderedDict()
+            try:
+                results = self.backend.bulk_update(entries) or []
+            except HTTPException as ex:
+                self.logger.error("Failed to flush %d docs to LogDB. Reason: %s, status: %s",
+                                  len(entries), ex.reason, ex.status)
+                self.stats['failed'] += len(entries)
+                self._requeue(entries)
+                return 0
+            except Exception as exc:
+                self.logger.error("LogDBBackend bulk_update API failed, error=%s", str(exc))
+                self.stats['failed'] += len(entries)
+                self._requeue(entries)
+                return 0
+            failed = [res for res in results if 'error' in res]
+            if failed:
+                self.logger.warning("Failed to write %d LogDB docs, errors: %s",
+                                    len(failed), set(res['error'] for res in failed))
+                failedIds = set(res.get('id') for res in failed)
+                self._requeue([entry for entry in entries
+                               if self.backend.docid(entry[0], entry[1]) in failedIds])
+            self.stats['flushes'] += 1
+            self.stats['written'] += len(results) - len(failed)
+            self.stats['failed'] += len(failed)
+            self.logger.debug("LogDB flushed %d docs, stats=%s", len(results), self.stats)
+            return len(results) - len(failed)
+
+    def _requeue(self, entries):
+        """
+        Put the entries of a failed flush back in front of the buffer, merged
+        with the messages posted in the meantime. Like for new messages, the
+        oldest documents are dropped beyond max_queue_size.
+        """
+        with self._pending_lock:
+            pending = OrderedDict()
+            for request, mtype, recs in entries:
+                key = (request, mtype)
+                newer = self._pending.get(key)
+                if newer is not None and self.agent:
+                    # agent documents only keep the latest message
+                    continue
+                pending[key] = recs + (newer or [])
+            self.stats['requeued'] += len(pending)
+            for key, recs in viewitems(self._pending):
+                pending.setdefault(key, recs)
+            while len(pending) > self.max_queue_size:
+                _, recs = pending.popitem(last=False)
+                self.stats['dropped'] += len(recs)
+            self._pending = pending
+
+    def _flushLoop(self):
+        """Flush the write-behind buffer every flush_interval seconds"""
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the flusher thread and write all the buffered messages"""
+        if self._flusher is None:
+            return
+        self._stop_event.set()
+        if self._flusher is not threading.currentThread():
+            self._flusher.join()
+        self._flusher = None
+        self.flush()
+
     def get(self, request=None, mtype=None):
         """Retrieve all entries from LogDB for given request"""
         res = []
+        if self.write_behind:
+            self.flush()
         try:
             if request is None:
                 request = self.default_user
@@ -129,6 +283,9 @@ class LogDB(object):
         mtype != None - only delete specified mtype
         """
         res = 'delete-error'
+        if self.write_behind:
+            # pending messages would otherwise recreate the deleted documents
+            self.flush()
         try:
             if request is None:
                 request = self.default_user
@@ -123,6 +123,40 @@ class LogDBBackend(object):
             res = self.db.commitOne(doc)
         return res
 
+    def bulk_update(self, entries):
+        """
+        Update many LogDB documents at once. Current revisions (and messages,
+        for user documents) are fetched with a single _all_docs call and all
+        the documents are then written with a single _bulk_docs call.
+        :param entries: list of (request, mtype, records) tuples, where mtype
+            is already prefixed and records are the new messages, oldest first.
+        :return: list of _bulk_docs results
+        """
+        docs = {}
+        for request, mtype, recs in entries:
+            # agent documents only keep the latest message, user ones keep them all
+            messages = list(reversed(recs)) if not self.agent else recs[-1:]
+            doc = {"_id": self.docid(request, mtype), "messages": messages,
+                   "request":request, "identifier":self.dbid,
+                   "thr":self.thread_name, "type":mtype}
+            docs[doc["_id"]] = doc
+        if not docs:
+            return []
+
+        options = {'include_docs': not self.agent}
+        for row in self.db.allDocs(options, list(docs)).get('rows', []):
+            if 'error' in row or row['value'].get('deleted'):
+                # this means document is not exist so we will just insert
+                continue
+            doc = docs[row['id']]
+            doc["_rev"] = row['value']['rev']
+            if not self.agent and row.get('doc'):
+                doc["messages"] += row['doc']["messages"]
+
+        # post the documents directly, the database queue may commit on its own
+        uri = '/%s/_bulk_docs/' % self.db.name
+        return self.db.post(uri, {'docs': list(docs.values())})
+
     def get(self, request, mtype=None, detail=True, agent=True):
         """Retrieve all entries from LogDB for given request"""
         self.check(request, mtype)
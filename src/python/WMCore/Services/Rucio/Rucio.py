@@ -832,6 +832,21 @@ class Rucio(object):
             self.logger.error("Data identifier not found in Rucio: %s. Error: %s", didName, str(exc))
         return response
 
+    def getBlockLengths(self, container, scope='cms'):
+        """
+        Bulk version of getDID(dynamic=False) for all the blocks in a container,
+        retrieved with a single listing.
+        :param container: string with the container name
+        :param scope: string containing the Rucio scope (defaults to 'cms')
+        :return: a dictionary with the number of files, key'ed by the block name.
+          Blocks unknown to Rucio are not in the dictionary.
+        """
+        result = {}
+        filters = {'name': '%s#*' % container}
+        for did in self.cli.list_dids(scope, filters, 'dataset', True):
+            result[did['name']] = did.get('length')
+        return result
+
     def didExist(self, didName, scope='cms'):
         """
         Provided a given DID, check whether it's already in the Rucio server.
@@ -1153,6 +1168,40 @@ class Rucio(object):
             finalRSEs = list(finalRSEs)
         return finalRSEs
 
+    def getBlocksLockedAndAvailable(self, blockNames, account, scope='cms', returnTape=False):
+        """
+        Bulk version of getDataLockedAndAvailable for a list of blocks. It returns
+        the same locations, but the rules of the parent containers are listed only
+        once, instead of once per block.
+        :param blockNames: list of block names
+        :param account: string with the rucio account name
+        :param scope: string with the scope name (default is "cms")
+        :param returnTape: boolean to return Tape RSEs in the output, if any
+        :return: a dictionary with the list of RSEs locking and holding each block,
+          key'ed by the block name
+        """
+        parentRules = {}
+        result = {}
+        for blockName in blockNames:
+            allRuleIds = set()
+            for parentDID in self.listParentDIDs(blockName):
+                parentName = parentDID['name']
+                if parentName not in parentRules:
+                    kwargs = dict(name=parentName, account=account, scope=scope)
+                    parentRules[parentName] = [rule['id'] for rule in self.cli.list_replication_rules(kwargs)]
+                allRuleIds.update(parentRules[parentName])
+
+            kwargs = dict(name=blockName, account=account, scope=scope)
+            for rule in self.cli.list_replication_rules(kwargs):
+                allRuleIds.add(rule['id'])
+
+            finalRSEs = set()
+            for blockLock in self.cli.get_dataset_locks(scope, blockName):
+                if blockLock['state'] == 'OK' and blockLock['rule_id'] in allRuleIds:
+                    finalRSEs.add(blockLock['rse'])
+            result[blockName] = list(finalRSEs) if returnTape else dropTapeRSEs(finalRSEs)
+        return result
+
     def getContainerLockedAndAvailable(self, **kwargs):
         """
         This method retrieves all the locations where a given container DID is
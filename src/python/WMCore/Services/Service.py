@@ -46,6 +46,14 @@ httplib2 cache  |   yes    |   yes    |    no    |     no     |
 service cache   |    no    |   yes    |   yes    |     no     |
 ----------------+----------+----------+----------+------------+
 result          |  cached  |  cached  |  cached  | not cached |
+
+On top of the cache files, the responses can be kept in an in-memory LRU cache
+by setting memcachesize (maximum size of the cached responses, in bytes). Its
+entries follow the same cache duration, counted from when the response was
+fetched, which can be set per url prefix via the cachettl dictionary (in hours). With stalewhilerevalidate (in hours), expired
+responses kept in memory are still returned for that long, while they are
+refreshed in a background thread. The cache files are gzip compressed when
+compresscache is set. Cache statistics are available via cacheStatistics().
 """
 
 from builtins import str
@@ -53,14 +61,19 @@ from future import standard_library
 standard_library.install_aliases()
 
 import datetime
+import gzip
 import json
 import logging
 import os
+import threading
 import time
 from io import BytesIO, StringIO
 from http.client import HTTPException
 
+from future.utils import viewitems
+
 from Utils.PythonVersion import PY3
+from WMCore.Cache.ResponseCache import ResponseCache
 from WMCore.Services.Requests import Requests, JSONRequests
 from WMCore.WMException import WMException
 
@@ -132,6 +145,12 @@ class Service(dict):
         # Set a timeout for the socket
         self.setdefault("timeout", 300)
 
+        # in-memory cache of the responses, size in bytes (0 to disable it)
+        self.setdefault("memcachesize", 0)
+        self.setdefault("cachettl", {})
+        self.setdefault("stalewhilerevalidate", 0)
+        self.setdefault("compresscache", False)
+
         # then update with the incoming dict
         self.update(cfg_dict)
 
@@ -156,6 +175,16 @@ class Service(dict):
         # cachepath will be modified - i.e. hostname added
         self['cachepath'] = self["requests"]["cachepath"]
 
+        self.memoryCache = ResponseCache(self['memcachesize']) if self['memcachesize'] > 0 else None
+        self.cacheStats = dict.fromkeys(['memoryHits', 'staleHits', 'fileHits', 'misses',
+                                         'backgroundRefreshes', 'refreshErrors'], 0)
+        self._statsLock = threading.Lock()
+        # the requests object is shared with the background refresh threads, if any
+        self._requestLock = None
+        if self.memoryCache is not None and self['stalewhilerevalidate']:
+            self._requestLock = threading.RLock()
+        self._refreshing = set()
+
         if 'logger' not in self:
             if self['cachepath']:
                 logfile = os.path.join(self['cachepath'], '%s.log' % self.__class__.__name__.lower())
@@ -186,9 +215,127 @@ class Service(dict):
         else:
             hash_ = _makeHash(self['inputdata'])
         cachefile = "%s/%s_%s_%s" % (self["cachepath"], hash_, verb, cachefile)
+        if self['compresscache']:
+            cachefile += '.gz'
 
         return cachefile
 
+    def cacheDuration(self, url=''):
+        """
+        Return the cache duration, in hours, of a given url: the one of the
+        longest matching prefix in cachettl, or cacheduration.
+        """
+        duration = self["cacheduration"]
+        matched = None
+        for prefix, hours in viewitems(self['cachettl']):
+            if (url or '').startswith(prefix) and (matched is None or len(prefix) > len(matched)):
+                duration, matched = hours, prefix
+        return duration
+
+    def cacheStatistics(self):
+        """
+        Return the number of memory cache hits (fresh and stale), cache file
+        hits, misses and background refreshes, plus the memory cache usage.
+        """
+        with self._statsLock:
+            stats = dict(self.cacheStats)
+        if self.memoryCache is not None:
+            stats['memoryEntries'] = len(self.memoryCache)
+            stats['memoryBytes'] = self.memoryCache.currentBytes
+            stats['memoryEvictions'] = self.memoryCache.evictions
+        return stats
+
+    def _countCache(self, stat):
+        with self._statsLock:
+            self.cacheStats[stat] += 1
+
+    def _memoryKey(self, cachefile, verb, inputdata):
+        """
+        Key of a query in the memory cache, built like the cache file name
+        """
+        return "%s_%s_%s" % (_makeHash(inputdata or self['inputdata']), verb, cachefile)
+
+    @staticmethod
+    def _openCacheFile(cachefile):
+        """
+        Return the cache file as an open file object
+        """
+        if isfile(cachefile):
+            return cachefile
+        if cachefile.endswith('.gz'):
+            return gzip.open(cachefile, 'rt')
+        return open(cachefile, 'r')
+
+    @staticmethod
+    def _payloadFile(payload):
+        return StringIO(payload) if isinstance(payload, str) else BytesIO(payload)
+
+    def _remember(self, memoryKey, cachefile):
+        """
+        Store the content of the cache file in the memory cache, returning
+        it as a file object. The memory entry ages from the time the cache
+        file was written, such that both expire together.
+        """
+        fobj = self._openCacheFile(cachefile)
+        payload = fobj.read()
+        if isfile(cachefile):
+            cachefile.seek(0, 0)
+            # the data was just fetched
+            fetchTime = None
+        else:
+            fobj.close()
+            fetchTime = os.path.getmtime(cachefile)
+        self.memoryCache.put(memoryKey, payload, fetchTime)
+        return self._payloadFile(payload)
+
+    def _backgroundRefresh(self, memoryKey, cachename, url, inputdata, incoming_headers,
+                           encoder, decoder, verb, contentType):
+        """
+        Refresh a stale memory cache entry in a background thread,
+        unless it's already being refreshed
+        """
+        with self._statsLock:
+            if memoryKey in self._refreshing:
+                return
+            self._refreshing.add(memoryKey)
+        thread = threading.Thread(target=self._refreshMemory, name="%sRefresh" % self['service_name'],
+                                  args=(memoryKey, cachename, url, inputdata, incoming_headers,
+                                        encoder, decoder, verb, contentType))
+        thread.daemon = True
+        thread.start()
+
+    def _refreshMemory(self, memoryKey, cachename, url, inputdata, incoming_headers,
+                       encoder, decoder, verb, contentType):
+        try:
+            cachefile = self.cacheFileName(cachename, verb, inputdata)
+            headers = dict(incoming_headers)
+            headers.update({'cache-control': 'no-cache'})
+            self.getData(cachefile, url, inputdata, headers, encoder, decoder, verb, contentType,
+                         force_refresh=True)
+            self._remember(memoryKey, cachefile)
+            self._countCache('backgroundRefreshes')
+        except Exception as ex:
+            self._countCache('refreshErrors')
+            self['logger'].warning("Background refresh of %s failed, serving stale data: %s", url, str(ex))
+        finally:
+            with self._statsLock:
+                self._refreshing.discard(memoryKey)
+
+    def _makeRequest(self, url, verb, inputdata, incoming_headers, encoder, decoder, contentType):
+        """
+        Make a request to the service. Requests are serialized only when the
+        memory cache refreshes responses in the background, since the requests
+        object is then shared between threads.
+        """
+        if self._requestLock is None:
+            return self["requests"].makeRequest(uri=url, verb=verb, data=inputdata,
+                                                incoming_headers=incoming_headers, encoder=encoder,
+                                                decoder=decoder, contentType=contentType)
+        with self._requestLock:
+            return self["requests"].makeRequest(uri=url, verb=verb, data=inputdata,
+                                                incoming_headers=incoming_headers, encoder=encoder,
+                                                decoder=decoder, contentType=contentType)
+
     def refreshCache(self, cachefile, url='', inputdata=None, openfile=True,
                      encoder=True, decoder=True, verb='GET', contentType=None, incoming_headers=None):
         """
@@ -200,16 +347,38 @@ class Service(dict):
         incoming_headers = incoming_headers or {}
         verb = self._verbCheck(verb)
 
-        cachefile = self.cacheFileName(cachefile, verb, inputdata)
-
-        if cache_expired(cachefile, self["cacheduration"]):
+        cachename = cachefile
+        memoryKey = None
+        if self.memoryCache is not None and openfile:
+            memoryKey = self._memoryKey(cachename, verb, inputdata)
+        cachefile = self.cacheFileName(cachename, verb, inputdata)
+        cacheduration = self.cacheDuration(url)
+
+        if memoryKey is not None:
+            payload, age = self.memoryCache.get(memoryKey)
+            if payload is not None and age < cacheduration * 3600:
+                self._countCache('memoryHits')
+                self['logger'].debug('Data is from the Service memory cache')
+                return self._payloadFile(payload)
+            if payload is not None and age < (cacheduration + self['stalewhilerevalidate']) * 3600:
+                self._countCache('staleHits')
+                self['logger'].debug('Stale data is from the Service memory cache, refreshing it')
+                self._backgroundRefresh(memoryKey, cachename, url, inputdata, incoming_headers,
+                                        encoder, decoder, verb, contentType)
+                return self._payloadFile(payload)
+
+        if cache_expired(cachefile, cacheduration):
+            self._countCache('misses')
             self.getData(cachefile, url, inputdata, incoming_headers, encoder, decoder, verb, contentType)
         else:
+            self._countCache('fileHits')
             self['logger'].debug('Data is from the Service cache')
 
+        if memoryKey is not None:
+            return self._remember(memoryKey, cachefile)
         # cachefile may be filename or file object
-        if openfile and not isfile(cachefile):
-            return open(cachefile, 'r')
+        if openfile:
+            return self._openCacheFile(cachefile)
         else:
             return cachefile
 
@@ -225,27 +394,36 @@ class Service(dict):
         incoming_headers = incoming_headers or {}
         verb = self._verbCheck(verb)
 
+        memoryKey = None
+        if self.memoryCache is not None and openfile:
+            memoryKey = self._memoryKey(cachefile, verb, inputdata)
         cachefile = self.cacheFileName(cachefile, verb, inputdata)
 
         self['logger'].debug("Forcing cache refresh of %s" % cachefile)
         incoming_headers.update({'cache-control': 'no-cache'})
         self.getData(cachefile, url, inputdata, incoming_headers,
                      encoder, decoder, verb, contentType, force_refresh=True, )
-        if openfile and not isfile(cachefile):
-            return open(cachefile, 'r')
+        self._countCache('misses')
+        if memoryKey is not None:
+            return self._remember(memoryKey, cachefile)
+        if openfile:
+            return self._openCacheFile(cachefile)
         else:
             return cachefile
 
     def clearCache(self, cachefile, inputdata=None, verb='GET'):
         """
-        Delete the cache file and the httplib2 cache.
+        Delete the cache file, the httplib2 cache and the memory cache entry.
         """
+        inputdata = inputdata or {}
+        verb = self._verbCheck(verb)
+        if self.memoryCache is not None and cachefile:
+            self.memoryCache.pop(self._memoryKey(cachefile, verb, inputdata))
+
         if not self['cachepath'] or not cachefile:
             # nothing to clear
             return
 
-        inputdata = inputdata or {}
-        verb = self._verbCheck(verb)
         os.system("/bin/rm -f %s/*" % self['requests']['req_cache_path'])
         cachefile = self.cacheFileName(cachefile, verb, inputdata)
         try:
@@ -276,13 +454,8 @@ class Service(dict):
                                  url, verb, incoming_headers, inputdata)
             # self['logger'].debug('getData: \n\turl: %s\n\tdata: %s' % \
             #                     (url, inputdata))
-            data, dummyStatus, dummyReason, from_cache = self["requests"].makeRequest(uri=url,
-                                                                                      verb=verb,
-                                                                                      data=inputdata,
-                                                                                      incoming_headers=incoming_headers,
-                                                                                      encoder=encoder,
-                                                                                      decoder=decoder,
-                                                                                      contentType=contentType)
+            data, dummyStatus, dummyReason, from_cache = self._makeRequest(url, verb, inputdata, incoming_headers,
+                                                                           encoder, decoder, contentType)
             if from_cache:
                 # If it's coming from the cache we don't need to write it to the
                 # second cache, or do we?
@@ -294,7 +467,8 @@ class Service(dict):
                     cachefile.write(data)
                     cachefile.seek(0, 0)  # return to beginning of file
                 else:
-                    with open(cachefile, 'w') as f:
+                    opener = gzip.open if cachefile.endswith('.gz') else open
+                    with opener(cachefile, 'wt') as f:
                         if isinstance(data, dict) or isinstance(data, list):
                             f.write(json.dumps(data))
                         else:
@@ -35,6 +35,8 @@ class TagCollector(Service):
         configDict.setdefault('endpoint', url)
         configDict.setdefault("timeout", 300)
         configDict.setdefault('cacheduration', 1)
+        # identical queries are frequent, keep the responses in memory too
+        configDict.setdefault('memcachesize', 16 * 1024 * 1024)
         configDict['logger'] = logger if logger else logging.getLogger()
         super(TagCollector, self).__init__(configDict)
         self['logger'].debug("Initializing TagCollector with url: %s", self['endpoint'])
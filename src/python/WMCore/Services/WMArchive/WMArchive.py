@@ -1,6 +1,8 @@
 from __future__ import (division, print_function)
 
+import gzip
 import json
+from io import BytesIO
 
 from WMCore.Services.Service import Service
 
@@ -29,5 +31,20 @@ class WMArchive(Service):
 
 
 
-    def archiveData(self, data):
+    def _gzipEncoder(self, data):
+        """
+        Encode the data as gzip compressed json
+        """
+        buf = BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as zfile:
+            zfile.write(self.encoder(data).encode('utf-8'))
+        return buf.getvalue()
+
+    def archiveData(self, data, compress=False):
+        """
+        Upload a list of documents to WMArchive, optionally gzip compressed
+        """
+        if compress:
+            return self["requests"].post('', {'data': data}, incoming_headers={'Content-Encoding': 'gzip'},
+                                         encode=self._gzipEncoder)[0]['result']
         return self["requests"].post('', {'data': data})[0]['result']
@@ -4,7 +4,7 @@ from builtins import object
 from future.utils import viewitems
 
 import logging
-from Utils.IteratorTools import nestedDictUpdate, grouper
+from Utils.IteratorTools import nestedDictUpdate
 from WMCore.Database.CMSCouch import CouchServer
 from WMCore.Lexicon import splitCouchServiceURL, sanitizeURL
 from WMCore.Services.RequestDB.RequestDBReader import RequestDBReader
@@ -193,6 +193,7 @@ class WMStatsReader(object):
         if filterRequest is None:
             keys = [row['key'] for row in result["rows"]]
         else:
+            filterRequest = set(filterRequest)
             keys = [row['key'] for row in result["rows"] if row['key'][0] in filterRequest]
         return keys
 
@@ -215,16 +216,10 @@ class WMStatsReader(object):
         options = {}
         options["include_docs"] = True
         options["reduce"] = False
-        finalResults = {}
+        options = self.setDefaultStaleOptions(options)
+        self.logger.info("Querying latestRequest with %d keys", len(keys))
         # magic number: 5000 keys (need to check which number is optimal)
-        for sliceKeys in grouper(keys, 5000):
-            self.logger.info("Querying latestRequest with %d keys", len(sliceKeys))
-            result = self._getCouchView("latestRequest", options, sliceKeys)
-            if not finalResults and result:
-                finalResults = result
-            elif result.get('rows'):
-                finalResults['rows'].extend(result['rows'])
-        return finalResults
+        return self.couchDB.bulkLoadView(self.couchapp, "latestRequest", options, keys, sliceSize=5000)
 
     def _getAllDocsByIDs(self, ids, include_docs=True):
         """
@@ -300,6 +295,122 @@ class WMStatsReader(object):
     def getActiveData(self, listStatuses, jobInfoFlag=False):
         return self.getRequestByStatus(listStatuses, jobInfoFlag)
 
+    def getUpdateSequences(self):
+        """
+        Return the current update sequences of the wmstats and request databases.
+        They need to be taken before loading the active data, and can then be used
+        as the starting point for the incremental updates (see updateActiveData)
+        """
+        return {"wmstats": self.couchDB.info()["update_seq"],
+                "reqmgr": self.reqDB.getDBInstance().info()["update_seq"]}
+
+    def _getChangedIDs(self, couchDB, since, changesFilter=None, limit=1000):
+        """
+        Return the set of document ids changed since a given sequence
+        (ignoring design documents), and the last sequence of the changes feed
+        """
+        changedIDs = set()
+        while True:
+            if changesFilter:
+                data = couchDB.changesWithFilter(changesFilter, limit=limit, since=since)
+            else:
+                data = couchDB.changes(since=since)
+            for row in data["results"]:
+                if not row["id"].startswith("_design/"):
+                    changedIDs.add(row["id"])
+            since = data["last_seq"]
+            if not changesFilter or len(data["results"]) < limit:
+                break
+        return changedIDs, since
+
+    def updateActiveData(self, activeData, sequences, statusList, jobInfoStatusList=None):
+        """
+        Update the active data (in the getActiveData format) with the changes made to
+        the request and wmstats databases since the given sequences, instead of loading
+        all the active requests again.
+
+        :param activeData: dictionary of request name to request documents. It is not
+            modified, documents are copied on write, so it can be in use by other threads.
+        :param sequences: dictionary with the "reqmgr" and "wmstats" update sequences
+            the activeData is up-to-date with
+        :param statusList: list of active statuses
+        :param jobInfoStatusList: list of active statuses also requiring the job information
+        :return: a tuple with the updated active data and the new update sequences
+        """
+        jobInfoStatusList = set(jobInfoStatusList or [])
+        statusList = set(statusList) | jobInfoStatusList
+        activeData = dict(activeData)
+        newSequences = dict(sequences)
+
+        # first update the request documents
+        reqCouchDB = self.reqDB.getDBInstance()
+        changedRequests, newSequences["reqmgr"] = self._getChangedIDs(reqCouchDB, sequences["reqmgr"])
+        newJobInfoRequests = set()
+        if changedRequests:
+            self.logger.info("Updating %d changed requests", len(changedRequests))
+            result = reqCouchDB.allDocs({"include_docs": True}, list(changedRequests))
+            for row in result["rows"]:
+                requestName = row.get("id", row["key"])
+                doc = row.get("doc")
+                if not doc or doc.get("RequestStatus") not in statusList:
+                    # deleted or not active anymore
+                    activeData.pop(requestName, None)
+                    continue
+                for key in ['_rev', '_attachments']:
+                    doc.pop(key, None)
+                if doc["RequestStatus"] in jobInfoStatusList:
+                    oldDoc = activeData.get(requestName) or {}
+                    if "AgentJobInfo" in oldDoc:
+                        doc["AgentJobInfo"] = oldDoc["AgentJobInfo"]
+                    else:
+                        newJobInfoRequests.add(requestName)
+                activeData[requestName] = doc
+
+        if not jobInfoStatusList:
+            return activeData, newSequences
+
+        # then the agent job information of the requests already known
+        changedDocs, newSequences["wmstats"] = self._getChangedIDs(self.couchDB, sequences["wmstats"],
+                                                                   changesFilter="WMStats/agentRequestFilter")
+        deletedDocs = set()
+        if changedDocs:
+            self.logger.info("Updating %d changed agent request documents", len(changedDocs))
+            result = self.couchDB.allDocs({"include_docs": True}, list(changedDocs))
+            for row in result["rows"]:
+                doc = row.get("doc")
+                if not doc:
+                    if "error" not in row:
+                        deletedDocs.add(row["id"])
+                    continue
+                requestName = doc.get("workflow")
+                if doc.get("type") != "agent_request" or requestName in newJobInfoRequests:
+                    continue
+                reqDoc = activeData.get(requestName)
+                if not reqDoc or reqDoc.get("RequestStatus") not in jobInfoStatusList:
+                    continue
+                reqDoc = dict(reqDoc)
+                reqDoc["AgentJobInfo"] = dict(reqDoc.get("AgentJobInfo", {}))
+                reqDoc["AgentJobInfo"][doc["agent_url"]] = doc
+                activeData[requestName] = reqDoc
+
+        if deletedDocs:
+            for requestName, reqDoc in list(viewitems(activeData)):
+                agentJobInfo = reqDoc.get("AgentJobInfo", {})
+                agentUrls = [agentUrl for agentUrl, doc in viewitems(agentJobInfo) if doc["_id"] in deletedDocs]
+                if agentUrls:
+                    reqDoc = dict(reqDoc)
+                    reqDoc["AgentJobInfo"] = dict((agentUrl, doc) for agentUrl, doc in viewitems(agentJobInfo)
+                                                  if agentUrl not in agentUrls)
+                    if not reqDoc["AgentJobInfo"]:
+                        del reqDoc["AgentJobInfo"]
+                    activeData[requestName] = reqDoc
+
+        # requests which just moved to a job information status need it all
+        if newJobInfoRequests:
+            self._updateRequestInfoWithJobInfo(dict((name, activeData[name]) for name in newJobInfoRequests))
+
+        return activeData, newSequences
+
     def getT0ActiveData(self, jobInfoFlag=False):
 
         return self.getRequestByStatus(T0_ACTIVE_STATUS, jobInfoFlag)
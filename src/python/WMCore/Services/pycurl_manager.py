@@ -52,6 +52,7 @@ import os
 import re
 import subprocess
 import sys
+import threading
 import pycurl
 from io import BytesIO
 import http.client
@@ -60,6 +61,13 @@ from urllib.parse import urlencode
 from Utils.Utilities import encodeUnicodeToBytes, decodeBytesToUnicode
 from Utils.PortForward import portForward, PortForward
 
+# idle curl handles shared by the RequestHandler instances of the process
+# which use the reusehandle option, such that their connection cache is
+# reused by the following requests to the same hosts
+_CURL_POOL = {'pid': None, 'handles': []}
+_CURL_POOL_LOCK = threading.Lock()
+_CURL_POOL_SIZE = 32
+
 
 class ResponseHeader(object):
     """ResponseHeader parses HTTP response header"""
@@ -138,8 +146,37 @@ class RequestHandler(object):
         self.connecttimeout = config.get('connecttimeout', defaultOpts['CONNECTTIMEOUT'])
         self.followlocation = config.get('followlocation', defaultOpts['FOLLOWLOCATION'])
         self.maxredirs = config.get('maxredirs', defaultOpts['MAXREDIRS'])
+        self.reusehandle = config.get('reusehandle', False)
         self.logger = logger if logger else logging.getLogger()
 
+    def get_curl(self):
+        """
+        Return the curl handle to be used for a request. With the reusehandle
+        option, an idle handle of the process pool is reset and returned, if any.
+        Forked children never use the handles (and connections) of their parent.
+        """
+        if self.reusehandle:
+            with _CURL_POOL_LOCK:
+                if _CURL_POOL['pid'] != os.getpid():
+                    _CURL_POOL['pid'] = os.getpid()
+                    _CURL_POOL['handles'] = []
+                if _CURL_POOL['handles']:
+                    curl = _CURL_POOL['handles'].pop()
+                    curl.reset()
+                    return curl
+        return pycurl.Curl()
+
+    def release_curl(self, curl):
+        """
+        Give back a curl handle to the process pool, keeping its connections alive
+        """
+        if self.reusehandle:
+            with _CURL_POOL_LOCK:
+                if _CURL_POOL['pid'] == os.getpid() and len(_CURL_POOL['handles']) < _CURL_POOL_SIZE:
+                    _CURL_POOL['handles'].append(curl)
+                    return
+        curl.close()
+
     def encode_params(self, params, verb, doseq, encode):
         """ Encode request parameters for usage with the 4 verbs.
             Assume params is already encoded if it is a string and
@@ -277,10 +314,15 @@ class RequestHandler(object):
                 verbose=0, ckey=None, cert=None, capath=None,
                 doseq=True, encode=False, decode=False, cainfo=None, cookie=None):
         """Fetch data for given set of parameters"""
-        curl = pycurl.Curl()
+        curl = self.get_curl()
         bbuf, hbuf = self.set_opts(curl, url, params, headers, ckey, cert, capath,
                                    verbose, verb, doseq, encode, cainfo, cookie)
-        curl.perform()
+        try:
+            curl.perform()
+        except pycurl.error:
+            curl.close()
+            raise
+        self.release_curl(curl)
         if verbose:
             print(verb, url, params, headers)
         header = self.parse_header(hbuf.getvalue())
@@ -9,14 +9,18 @@ Refactoring of StageOutMgr -- for now, not accessed by default
 
 from builtins import range, object
 
+import heapq
 import logging
 import time
 import traceback
+from multiprocessing.pool import ThreadPool
+from queue import Empty, Queue
 
 # PyCharm likes to remove these two imports, but we cannot let it do it.
 import WMCore.Storage.Backends
 import WMCore.Storage.Plugins
 
+from Utils.FileTools import calculateChecksums
 from WMCore.Storage.Registry import RegistryError, retrieveStageOutImpl
 from WMCore.Storage.SiteLocalConfig import loadSiteLocalConfig
 from WMCore.Storage.StageOutError import StageOutError, StageOutFailure
@@ -303,35 +307,14 @@ class FileManager(object):
         performs a transfer using a selected method and retries.
         necessary because python doesn't have a good nested loop break syntax
         """
-
-        (pnn, command, options, _, protocol) = \
-            self.getTransferDetails(localFileName, currentMethod)
-
-        # Swap directions if we're staging in
-        if not stageOut:
-            tempPfn = pfn
-            pfn = localFileName
-            localFileName = tempPfn
-
         for retryNumber in range(self.numberOfRetries + 1):
             log.info("Attempting transfer method %s, Retry number: %s" % (methodCounter, retryNumber))
             log.info("Current method information: %s" % currentMethod)
 
-            try:
-                stageOutSlave = retrieveStageOutImpl(command, useNewVersion=True, stagein=not stageOut)
-            except RegistryError:
-                stageOutSlave = retrieveStageOutImpl(command, useNewVersion=False, stagein=not stageOut)
-                logging.error("Tried to load stageout backend %s, a new version isn't there yet" % command)
-                logging.error("Will try to fall back to the oldone, but it's really best to redo it")
-                logging.error("Here goes...")
-                stageOutSlave(protocol, localFileName, pfn, options)
-                return pfn
-
             # do the copy. The implementation is responsible for its own verification
             newPfn = None
             try:
-                # FIXME add checksum stuff
-                newPfn = stageOutSlave.doTransfer(localFileName, pfn, stageOut, pnn, command, options, protocol, None)
+                newPfn = self._transferAttempt(currentMethod, localFileName, pfn, stageOut)
             except StageOutError as ex:
                 log.info("Transfer failed in an expected manner. Exception is:")
                 log.info("%s" % str(ex))
@@ -360,6 +343,248 @@ class FileManager(object):
         # unseuccessful transfers make it here
         return False
 
+    def _transferAttempt(self, currentMethod, localFileName, pfn, stageOut):
+        """
+        makes a single transfer attempt with a selected method, raising on failure.
+        returns the PFN of the transferred file
+        """
+        (pnn, command, options, _, protocol) = \
+            self.getTransferDetails(localFileName, currentMethod)
+
+        # Swap directions if we're staging in
+        if not stageOut:
+            tempPfn = pfn
+            pfn = localFileName
+            localFileName = tempPfn
+
+        try:
+            stageOutSlave = retrieveStageOutImpl(command, useNewVersion=True, stagein=not stageOut)
+        except RegistryError:
+            stageOutSlave = retrieveStageOutImpl(command, useNewVersion=False, stagein=not stageOut)
+            logging.error("Tried to load stageout backend %s, a new version isn't there yet" % command)
+            logging.error("Will try to fall back to the oldone, but it's really best to redo it")
+            logging.error("Here goes...")
+            stageOutSlave(protocol, localFileName, pfn, options)
+            return pfn
+
+        # FIXME add checksum stuff
+        return stageOutSlave.doTransfer(localFileName, pfn, stageOut, pnn, command, options, protocol, None)
+
+    def stageFiles(self, filesToStage, stageOut=True, maxTransfersPerBackend=4, computeChecksums=False,
+                   interruptGraceTime=60):
+        """
+        _stageFiles_
+
+        Stage several files concurrently, with at most maxTransfersPerBackend
+        transfers running at the same time for each stage out method (backend).
+        Each file goes through the default and fallback methods with its own
+        retry schedule: a failed attempt is retried retryPauseTime seconds later
+        without holding back the transfers of the other files.
+        input:
+            filesToStage: list of dicts, as in stageFile
+            stageOut: boolean for if the files are staged in or out
+            maxTransfersPerBackend: maximum number of concurrent transfers per method
+            computeChecksums: compute the adler32 and cksum checksums of the files
+                without 'Checksums' while they are transferred (stage out only)
+            interruptGraceTime: when interrupted, e.g. by a stage out timeout, time
+                given to the running transfers to end before giving up on them
+        output:
+            dict with the keys
+                staged: list of the files staged, updated like in stageFile
+                failed: dict of the first exception of each failed file, keyed by LFN
+                timing: aggregated timing of the transfers, see _newTiming
+        """
+        startTime = time.time()
+        self.firstException = None
+        maxTransfersPerBackend = max(1, maxTransfersPerBackend)
+        stageOutMethods = [self.defaultMethod]
+        stageOutMethods.extend(self.fallbacks)
+        backends = ["%s:%s" % (method.get('command'), method.get('phedex-node')) for method in stageOutMethods]
+        activeTransfers = dict((backend, 0) for backend in backends)
+        timing = self._newTiming(len(filesToStage))
+
+        checksumPool = None
+        checksumResults = {}
+        if stageOut and computeChecksums:
+            needChecksums = [idx for idx, fileToStage in enumerate(filesToStage) if not fileToStage.get('Checksums')]
+            if needChecksums:
+                checksumPool = ThreadPool(1)
+                for idx in needChecksums:
+                    checksumResults[idx] = checksumPool.apply_async(self._timedChecksums,
+                                                                    (filesToStage[idx]['PFN'],))
+
+        # per file state: [method index, retry number, first exception]
+        fileStates = [[0, 0, None] for _ in filesToStage]
+        retrySchedule = [(startTime, idx) for idx in range(len(filesToStage))]
+        heapq.heapify(retrySchedule)
+        completions = Queue()
+        transferPool = ThreadPool(maxTransfersPerBackend * len(stageOutMethods))
+        numRunning = 0
+        staged = {}
+        failed = {}
+        try:
+            while retrySchedule or numRunning:
+                now = time.time()
+                blocked = []
+                while retrySchedule and retrySchedule[0][0] <= now:
+                    item = heapq.heappop(retrySchedule)
+                    idx = item[1]
+                    methodIndex = fileStates[idx][0]
+                    backend = backends[methodIndex]
+                    if activeTransfers[backend] >= maxTransfersPerBackend:
+                        blocked.append(item)
+                        continue
+                    activeTransfers[backend] += 1
+                    numRunning += 1
+                    timing['attempts'] += 1
+                    timing['maxConcurrentTransfers'] = max(timing['maxConcurrentTransfers'], numRunning)
+                    transferPool.apply_async(self._timedTransfer,
+                                             (idx, methodIndex, filesToStage[idx], stageOut),
+                                             callback=completions.put)
+                for item in blocked:
+                    heapq.heappush(retrySchedule, item)
+
+                # wait for a transfer to end, or for the next scheduled retry
+                timeout = None
+                futureTimes = [readyTime for readyTime, _ in retrySchedule if readyTime > now]
+                if futureTimes:
+                    timeout = min(futureTimes) - now
+                elif not numRunning:
+                    continue
+                try:
+                    idx, methodIndex, newPfn, exception, elapsed = completions.get(timeout=timeout)
+                except Empty:
+                    continue
+                numRunning -= 1
+                activeTransfers[backends[methodIndex]] -= 1
+                timing['transferTime'] += elapsed
+                fileToStage = filesToStage[idx]
+                state = fileStates[idx]
+                if exception is None and newPfn:
+                    staged[idx] = self._recordStagedFile(fileToStage, stageOutMethods[methodIndex], newPfn)
+                    continue
+
+                # as in stageFile, a transfer returning no PFN is not retried
+                state[2] = state[2] or exception
+                reason = str(exception) if exception else "no PFN returned"
+                if isinstance(exception, StageOutError) and state[1] < self.numberOfRetries:
+                    state[1] += 1
+                    timing['retries'] += 1
+                    log.info("Transfer of %s failed, retrying in %s seconds: %s" %
+                             (fileToStage['LFN'], self.retryPauseTime, reason))
+                    heapq.heappush(retrySchedule, (time.time() + self.retryPauseTime, idx))
+                elif state[0] + 1 < len(stageOutMethods):
+                    state[0] += 1
+                    state[1] = 0
+                    timing['fallbacks'] += 1
+                    log.info("Transfer of %s failed, moving to stage out method %s: %s" %
+                             (fileToStage['LFN'], state[0] + 1, reason))
+                    heapq.heappush(retrySchedule, (time.time(), idx))
+                else:
+                    state[2] = state[2] or StageOutError("Error in stageout, this has been logged in the logs")
+                    log.error("Error in stageout of %s: %s" % (fileToStage['LFN'], str(state[2])))
+                    failed[fileToStage['LFN']] = state[2]
+                    self.firstException = self.firstException or state[2]
+        except BaseException:
+            # e.g. on a stage out timeout: give the transfers in flight some time to end,
+            # such that the files they staged are known to cleanSuccessfulStageOuts.
+            # Hanging transfers are abandoned, their threads cannot be interrupted
+            log.error("Stage out interrupted, waiting up to %s secs for %d running transfers" %
+                      (interruptGraceTime, numRunning))
+            deadline = time.time() + interruptGraceTime
+            while numRunning:
+                try:
+                    idx, methodIndex, newPfn, exception, _ = completions.get(timeout=max(0, deadline - time.time()))
+                except Empty:
+                    log.error("Giving up on %d hanging transfers" % numRunning)
+                    break
+                numRunning -= 1
+                if exception is None and newPfn:
+                    self._recordStagedFile(filesToStage[idx], stageOutMethods[methodIndex], newPfn)
+            transferPool.terminate()
+            if checksumPool is not None:
+                checksumPool.terminate()
+            raise
+        transferPool.close()
+        transferPool.join()
+
+        if checksumPool is not None:
+            for idx, result in checksumResults.items():
+                checksums, elapsed = result.get()
+                timing['checksumTime'] += elapsed
+                if checksums:
+                    filesToStage[idx]['Checksums'] = checksums
+            checksumPool.close()
+            checksumPool.join()
+
+        timing['stagedFiles'] = len(staged)
+        timing['failedFiles'] = len(failed)
+        timing['wallTime'] = time.time() - startTime
+        log.info("Staged %d files (%d failed) in %.1f secs, %.1f secs spent in transfers" %
+                 (len(staged), len(failed), timing['wallTime'], timing['transferTime']))
+        return {'staged': [staged[idx] for idx in sorted(staged)],
+                'failed': failed,
+                'timing': timing}
+
+    @staticmethod
+    def _newTiming(numFiles):
+        """
+        aggregated timing of a stageFiles call:
+            wallTime: total time of the call
+            transferTime: sum of the durations of all the transfer attempts
+            checksumTime: sum of the durations of the checksum computations
+            attempts, retries, fallbacks: number of transfer attempts, retries
+                of the same method and moves to the next method
+            maxConcurrentTransfers: highest number of simultaneous transfers
+        """
+        return {'files': numFiles, 'stagedFiles': 0, 'failedFiles': 0,
+                'wallTime': 0.0, 'transferTime': 0.0, 'checksumTime': 0.0,
+                'attempts': 0, 'retries': 0, 'fallbacks': 0, 'maxConcurrentTransfers': 0}
+
+    def _recordStagedFile(self, fileToStage, currentMethod, newPfn):
+        """
+        updates a file staged by stageFiles like stageFile does, and adds it
+        to the completed files
+        """
+        (pnn, command, _, _, _) = self.getTransferDetails(fileToStage['LFN'], currentMethod)
+        fileToStage['PFN'] = newPfn
+        fileToStage['PNN'] = pnn
+        fileToStage['StageOutCommand'] = command
+        self.completedFiles[fileToStage['LFN']] = fileToStage
+        log.info("Transfer succeeded: %s" % fileToStage)
+        return fileToStage
+
+    def _timedTransfer(self, idx, methodIndex, fileToStage, stageOut):
+        """
+        makes one transfer attempt for stageFiles, in a pool thread
+        returns (idx, methodIndex, newPfn, exception, elapsed time)
+        """
+        stageOutMethods = [self.defaultMethod]
+        stageOutMethods.extend(self.fallbacks)
+        currentMethod = stageOutMethods[methodIndex]
+        startTime = time.time()
+        try:
+            (_, _, _, pfn, _) = self.getTransferDetails(fileToStage['LFN'], currentMethod)
+            newPfn = self._transferAttempt(currentMethod, fileToStage['PFN'], pfn, stageOut)
+        except Exception as ex:
+            log.info("Transfer attempt of %s failed:\n%s" % (fileToStage['LFN'], traceback.format_exc()))
+            return idx, methodIndex, None, ex, time.time() - startTime
+        return idx, methodIndex, newPfn, None, time.time() - startTime
+
+    @staticmethod
+    def _timedChecksums(fileName):
+        """
+        computes the checksums of a local file for stageFiles, in a pool thread
+        returns the checksums dict (None on errors) and the elapsed time
+        """
+        startTime = time.time()
+        try:
+            adler32, cksum = calculateChecksums(fileName)
+        except Exception as ex:
+            log.warning("Could not compute the checksums of %s: %s" % (fileName, str(ex)))
+            return None, time.time() - startTime
+        return {'adler32': adler32, 'cksum': cksum}, time.time() - startTime
+
     def cleanSuccessfulStageOuts(self):
         """
         _cleanSucessfulStageOuts_
@@ -22,6 +22,11 @@ Usage: Given a TFC constact string: trivialcatalog_file:/path?protocol=proto
 
     pfn = tfcInstance.matchLFN(protocol, lfn)
 
+The mappings are compiled on first use into per-protocol rule tables, with
+chained rules resolved, and recent translations are memoized. Many LFNs can
+be translated at once with matchLFNs:
+
+    pfns = tfcInstance.matchLFNs(protocol, lfns)
 
 """
 
@@ -33,6 +38,8 @@ standard_library.install_aliases()
 
 import os
 import re
+import threading
+from collections import OrderedDict
 
 from urllib.parse import urlsplit
 from xml.dom.minidom import Document
@@ -40,6 +47,119 @@ from xml.dom.minidom import Document
 from WMCore.Algorithms.ParseXMLFile import xmlFileToNode
 
 _TFCArgSplit = re.compile("\?protocol=")
+_ResultGroup = re.compile(r"\$([1-9])")
+_LeadingAnchor = re.compile(r"(\(*)(\.\*|\^)")
+_NoMatch = object()
+
+
+def _compileResult(result):
+    """
+    _compileResult_
+
+    Split a mapping result into literal strings (even positions) and
+    group numbers (odd positions), such that $N is only parsed once
+    """
+    parts = _ResultGroup.split(result)
+    for idx in range(1, len(parts), 2):
+        parts[idx] = int(parts[idx])
+    return parts
+
+
+def _isAnchored(pattern):
+    """
+    _isAnchored_
+
+    Check whether a path-match starts with .* or ^ in all its alternatives,
+    such that matching it anywhere in a path without newlines implies a match
+    at the start of the path. Alternations enclosing the leading .* or ^, like
+    in .*a|b, let other branches match further in the path.
+    """
+    anchor = _LeadingAnchor.match(pattern)
+    if not anchor:
+        return False
+    numLeading = len(anchor.group(1))
+    # for each open group, whether it encloses the leading .* or ^
+    groups = []
+    numOpened = 0
+    inClass = False
+    idx = 0
+    while idx < len(pattern):
+        char = pattern[idx]
+        if char == "\\":
+            idx += 1
+        elif inClass:
+            inClass = char != "]"
+        elif char == "[":
+            inClass = True
+            # a ] first in a character class is a literal
+            if pattern[idx + 1:idx + 2] == "^":
+                idx += 1
+            if pattern[idx + 1:idx + 2] == "]":
+                idx += 1
+        elif char == "(":
+            groups.append(numOpened < numLeading)
+            numOpened += 1
+        elif char == ")":
+            if groups:
+                groups.pop()
+        elif char == "|" and (not groups or groups[-1]):
+            return False
+        idx += 1
+    return True
+
+
+def _expandResult(parts, groups):
+    """
+    _expandResult_
+
+    Substitute the $N in a compiled result with the Nth group.
+    Groups which were not matched are left as $N.
+    """
+    result = []
+    for idx, part in enumerate(parts):
+        if idx % 2 == 0:
+            result.append(part)
+        elif part <= len(groups):
+            result.append(groups[part - 1])
+        else:
+            result.append("$%d" % part)
+    return "".join(result)
+
+
+def _applyRules(rules, path):
+    """
+    _applyRules_
+
+    Apply the first matching rule of a compiled rule table to the path.
+    Chained rules are applied to the result of their chain rule table,
+    which is computed once per chain protocol.
+
+    Return None if no match
+    """
+    chainedPaths = {}
+    for regex, resultParts, chainRules, anchored in rules:
+        if chainRules is None:
+            match = regex.match(path)
+        else:
+            if id(chainRules) not in chainedPaths:
+                chainedPaths[id(chainRules)] = _applyRules(chainRules, path)
+            chainedPath = chainedPaths[id(chainRules)]
+            if not chainedPath:
+                continue
+            # the chained path can match anywhere. For anchored path-matches
+            # a match anywhere implies a match at the start, so don't search
+            match = regex.match(chainedPath)
+            if not match and not (anchored and "\n" not in chainedPath):
+                match = regex.search(chainedPath)
+        if not match:
+            continue
+        matchedPath = match.string
+        # groups are what the path-match splits the path into, ignoring empty ones
+        groups = [matchedPath[:match.start()]]
+        groups.extend(match.groups())
+        groups.append(matchedPath[match.end():])
+        return _expandResult(resultParts, [group for group in groups if group])
+    return None
 
 
 class TrivialFileCatalog(dict):
@@ -50,11 +170,19 @@ class TrivialFileCatalog(dict):
     File Catalog
     """
 
+    # maximum number of memoized translations
+    memoSize = 10000
+
     def __init__(self):
         dict.__init__(self)
         self['lfn-to-pfn'] = []
         self['pfn-to-lfn'] = []
         self.preferredProtocol = None  # attribute for preferred protocol
+        self._rules = {}
+        self._memo = OrderedDict()
+        # bumped whenever a mapping is added, to rebuild the rule tables
+        self._version = 0
+        self._lock = threading.Lock()
 
     def addMapping(self, protocol, match, result,
                    chain=None, mapping_type='lfn-to-pfn'):
@@ -70,7 +198,64 @@ class TrivialFileCatalog(dict):
         entry.setdefault("path-match", match)
         entry.setdefault("result", result)
         entry.setdefault("chain", chain)
-        self[mapping_type].append(entry)
+        with self._lock:
+            self[mapping_type].append(entry)
+            self._version += 1
+
+    def _compile(self, style):
+        """
+        _compile_
+
+        Return the rule tables of a mapping style, keyed by protocol. Each rule
+        is a tuple of the path-match regexp, the compiled result and, for chained
+        rules, the rule table of the chain protocol, plus whether the path-match
+        is anchored at the start of the path. Tables are rebuilt, and the
+        memoized translations dropped, whenever a mapping is added.
+        Must be called with the lock held.
+        """
+        version, tables = self._rules.get(style, (None, None))
+        if version == self._version:
+            return tables
+
+        tables = {}
+        for mapping in self[style]:
+            tables.setdefault(mapping['protocol'], [])
+            if mapping['chain'] is not None:
+                tables.setdefault(mapping['chain'], [])
+        for mapping in self[style]:
+            chainRules = None if mapping['chain'] is None else tables[mapping['chain']]
+            tables[mapping['protocol']].append((mapping['path-match-expr'],
+                                                _compileResult(mapping['result']),
+                                                chainRules,
+                                                _isAnchored(mapping['path-match'])))
+        self._rules[style] = (self._version, tables)
+        self._memo.clear()
+        return tables
+
+    def _match(self, protocol, path, style):
+        """
+        _match_
+
+        Translate a path with the compiled rules, going through the memo of
+        recent translations first.
+
+        Return None if no match
+        """
+        key = (style, protocol, path)
+        with self._lock:
+            tables = self._compile(style)
+            result = self._memo.pop(key, _NoMatch)
+            if result is not _NoMatch:
+                self._memo[key] = result
+                return result
+        result = _applyRules(tables.get(protocol, []), path)
+        with self._lock:
+            # do not memoize translations made with outdated rule tables
+            if self._rules[style][0] == self._version:
+                if len(self._memo) >= self.memoSize:
+                    self._memo.popitem(last=False)
+                self._memo[key] = result
+        return result
 
     def _doMatch(self, protocol, path, style, caller):
         """
@@ -78,6 +263,8 @@ class TrivialFileCatalog(dict):
         caller is the method from there this method was called, it's used
         for resolving chained rules
 
+        Uncompiled version of _match, scanning all the mappings for each path.
+
         Return None if no match
 
         """
@@ -89,6 +276,7 @@ class TrivialFileCatalog(dict):
                     oldpath = path
                     path = caller(mapping["chain"], path)
                     if not path:
+                        path = oldpath
                         continue
                 splitList = []
                 if len(mapping['path-match-expr'].split(path, 1)) > 1:
@@ -116,7 +304,7 @@ class TrivialFileCatalog(dict):
         Return None if no match
 
         """
-        result = self._doMatch(protocol, lfn, "lfn-to-pfn", self.matchLFN)
+        result = self._match(protocol, lfn, "lfn-to-pfn")
         return result
 
     def matchPFN(self, protocol, pfn):
@@ -129,9 +317,29 @@ class TrivialFileCatalog(dict):
         Return None if no match
 
         """
-        result = self._doMatch(protocol, pfn, "pfn-to-lfn", self.matchPFN)
+        result = self._match(protocol, pfn, "pfn-to-lfn")
         return result
 
+    def matchLFNs(self, protocol, lfns):
+        """
+        _matchLFNs_
+
+        Bulk version of matchLFN, return a dictionary of the
+        results (None if no match) keyed by LFN
+
+        """
+        return dict((lfn, self._match(protocol, lfn, "lfn-to-pfn")) for lfn in lfns)
+
+    def matchPFNs(self, protocol, pfns):
+        """
+        _matchPFNs_
+
+        Bulk version of matchPFN, return a dictionary of the
+        results (None if no match) keyed by PFN
+
+        """
+        return dict((pfn, self._match(protocol, pfn, "pfn-to-lfn")) for pfn in pfns)
+
     def getXML(self):
         """
         Converts TFC implementation (dict) into a XML string representation.
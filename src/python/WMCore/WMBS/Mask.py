@@ -55,19 +55,19 @@ class Mask(WMBSBase, WMMask):
         """
 
 
+        # plain dictionaries with the mask keys used by Masks.Save, much cheaper
+        # to build than a full Mask object per lumi range
         maskList = []
         for run in self['runAndLumis']:
             for lumiPair in self['runAndLumis'][run]:
-                tmpMask = WMMask()
-                tmpMask['jobID']      = jobID
-                tmpMask['inclusivemask']  = self['inclusivemask']
-                tmpMask['FirstEvent'] = self['FirstEvent']
-                tmpMask['LastEvent']  = self['LastEvent']
-                tmpMask['FirstRun']   = int(run)
-                tmpMask['LastRun']    = int(run)
-                tmpMask['FirstLumi']  = lumiPair[0]
-                tmpMask['LastLumi']   = lumiPair[1]
-                maskList.append(tmpMask)
+                maskList.append({'jobID': jobID,
+                                 'inclusivemask': self['inclusivemask'],
+                                 'FirstEvent': self['FirstEvent'],
+                                 'LastEvent': self['LastEvent'],
+                                 'FirstRun': int(run),
+                                 'LastRun': int(run),
+                                 'FirstLumi': lumiPair[0],
+                                 'LastLumi': lumiPair[1]})
 
 
         return maskList
@@ -28,22 +28,28 @@ class GetBulkRunLumi(DBFormatter):
 
     def format(self, result):
         "Return a list of Run/Lumi Set"
+        return self.formatRunLumis(self.formatColumns(result))
 
+    def formatRunLumis(self, columns):
+        """
+        Build the {fileid: {run: [lumis]}} map out of the result columns
+        """
         finalResult = {}
-        res = self.formatDict(result)
-
-        for entry in res:
-            fileid = entry['id']
-            run = entry['run']
-            finalResult.setdefault(fileid, {})
-            finalResult[fileid].setdefault(run, [])
-            finalResult[fileid][run].append(entry['lumi'])
+        for fileid, run, lumi in zip(columns.get('id', []), columns.get('run', []), columns.get('lumi', [])):
+            fileRuns = finalResult.get(fileid)
+            if fileRuns is None:
+                fileRuns = finalResult[fileid] = {}
+            lumis = fileRuns.get(run)
+            if lumis is None:
+                lumis = fileRuns[run] = []
+            lumis.append(lumi)
 
         return finalResult
 
     def execute(self, files=None, conn=None, transaction=False):
         binds = self.getBinds(files)
 
+        # one select per file, all in a single ResultSet (not one cursor per file)
         result = self.dbi.processData(self.sql, binds,
                                       conn=conn, transaction=transaction)
         return self.format(result)
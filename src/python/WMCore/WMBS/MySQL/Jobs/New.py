@@ -47,12 +47,8 @@ class New(DBFormatter):
         return binds
 
     def format(self, input):
-        result = {}
-        jobList = self.formatDict(input)
-        for job in jobList:
-            result[job['name']] = job['id']
-
-        return result
+        columns = self.formatColumns(input)
+        return dict(zip(columns.get('name', []), columns.get('id', [])))
 
     def execute(self, jobgroup = None, name = None, couch_record = None, location = None, cache_dir = None,
                 outcome = None, fwjr = None, conn = None, transaction = False, jobList = None):
@@ -8,6 +8,10 @@ Return a list of files that are available for processing.
 Available means not acquired, complete or failed.
 """
 
+from collections import OrderedDict
+
+from future.utils import viewitems
+
 from WMCore.Database.DBFormatter import DBFormatter
 
 
@@ -25,32 +29,27 @@ class GetAvailableFiles(DBFormatter):
         method turns everything into strings.  Also, fixup the results of the
         Oracle query by renaming 'fileid' to file.
         """
-        formattedResults = DBFormatter.formatDict(self, results)
-
-        for formattedResult in formattedResults:
-            if "file" in formattedResult:
-                formattedResult["file"] = int(formattedResult["file"])
-            else:
-                formattedResult["file"] = int(formattedResult["fileid"])
-
-        # Now the tricky part
-        tempResults = {}
-        for formattedResult in formattedResults:
-            fileID = formattedResult['file']
-            if fileID not in tempResults:
-                tempResults[fileID] = []
-            if "pnn" in formattedResult:
-                if not formattedResult['pnn'] in tempResults[fileID]:
-                    tempResults[fileID].append(formattedResult["pnn"])
-
-        finalResults = []
-        for key in tempResults:
-            tmpDict = {"file": key}
-            if not tempResults[key] == []:
-                tmpDict['locations'] = tempResults[key]
-            finalResults.append(tmpDict)
-
-        return finalResults
+        return self.formatFiles(self.formatColumns(results))
+
+    def formatFiles(self, columns):
+        """
+        _formatFiles_
+
+        Build the list of files, with their locations, out of the file and pnn
+        result columns
+        """
+        fileIDs = columns.get("file", columns.get("fileid", []))
+        pnns = columns.get("pnn")
+        if pnns is None:
+            return [{"file": fileID} for fileID in OrderedDict.fromkeys(int(fileID) for fileID in fileIDs)]
+
+        locations = {}
+        for fileID, pnn in zip(fileIDs, pnns):
+            fileLocations = locations.setdefault(int(fileID), [])
+            if pnn not in fileLocations:
+                fileLocations.append(pnn)
+
+        return [{"file": fileID, "locations": fileLocations} for fileID, fileLocations in viewitems(locations)]
 
     def execute(self, subscription, conn=None, transaction=False, returnCursor=False):
         if returnCursor:
@@ -58,6 +57,6 @@ class GetAvailableFiles(DBFormatter):
                                         conn=conn, transaction=transaction,
                                         returnCursor=returnCursor)
 
-        results = self.dbi.processData(self.sql, {"subscription": subscription},
-                                       conn=conn, transaction=transaction)
-        return self.formatDict(results)
+        columns = self.fetchColumns(self.sql, {"subscription": subscription},
+                                    conn=conn, transaction=transaction)
+        return self.formatFiles(columns)
@@ -13,7 +13,8 @@ from __future__ import print_function
 from future.utils import listvalues
 
 import logging
-from collections import Counter
+import time
+from collections import Counter, OrderedDict
 
 from WMCore.DataStructs.Fileset import Fileset as WMFileset
 from WMCore.DataStructs.Subscription import Subscription as WMSubscription
@@ -49,6 +50,7 @@ class Subscription(WMBSBase, WMSubscription):
         self.setdefault("id", id)
 
         self.bulkDeleteLimit = 500
+        self.bulkCommitTimings = OrderedDict()
         return
 
     def create(self):
@@ -530,18 +532,28 @@ class Subscription(WMBSBase, WMSubscription):
 
         return
 
+    @staticmethod
+    def _recordStage(timings, stage, startTime):
+        """
+        _recordStage_
+
+        Record the time spent in a bulkCommit stage and return the start time of the next one
+        """
+        now = time.time()
+        timings[stage] = now - startTime
+        return now
+
     def bulkCommit(self, jobGroups):
         """
         _bulkCommit_
 
         Commits all objects created during job splitting.  This is dangerous because it assumes
         that you can pass in all jobGroups.
-        """
-
-        jobList = []
-        jobGroupList = []
-        nameList = []
 
+        Every stage is done with a single bulk DAO call (executemany, chunked by the
+        database interface) and the time spent in each of them is available in
+        self.bulkCommitTimings afterwards.
+        """
         # You have to do things in this order:
         # 1) First create Filesets, then jobGroups
         # 2) Second, create jobs pointing to jobGroups
@@ -552,21 +564,20 @@ class Subscription(WMBSBase, WMSubscription):
         if self['id'] == -1:
             self.create()
 
+        timings = OrderedDict()
+        stageTime = time.time()
         existingTransaction = self.beginTransaction()
 
         # You need to create a number of Filesets equal to the
-        # number of jobGroups.
-
-        for _ in jobGroups:
-            # Make a random name for each fileset
-            nameList.append(makeUUID())
-
-        # Create filesets
+        # number of jobGroups, each one with a random name
+        nameList = [makeUUID() for _ in jobGroups]
         action = self.daofactory(classname="Fileset.BulkNewReturn")
         fsIDs = action.execute(nameList=nameList, open=True,
                                conn=self.getDBConn(),
                                transaction=self.existingTransaction())
+        stageTime = self._recordStage(timings, "filesets", stageTime)
 
+        jobGroupList = []
         for jobGroup in jobGroups:
             jobGroup.uid = makeUUID()
             jobGroupList.append({'subscription': self['id'],
@@ -578,13 +589,13 @@ class Subscription(WMBSBase, WMSubscription):
                                conn=self.getDBConn(),
                                transaction=self.existingTransaction())
 
+        # This should assign an ID to the right jobGroup
+        jgIDMap = dict((idUID['guid'], idUID['id']) for idUID in jgIDs)
         for jobGroup in jobGroups:
-            for idUID in jgIDs:
-                # This should assign an ID to the right job
-                if jobGroup.uid == idUID['guid']:
-                    jobGroup.id = idUID['id']
-                    break
+            jobGroup.id = jgIDMap.get(jobGroup.uid, jobGroup.id)
+        stageTime = self._recordStage(timings, "jobGroups", stageTime)
 
+        jobList = []
         for jobGroup in jobGroups:
             for job in jobGroup.newjobs:
                 if job["id"] is not None:
@@ -596,52 +607,56 @@ class Subscription(WMBSBase, WMSubscription):
                     job["name"] = makeUUID()
                 jobList.append(job)
 
-        bulkAction = self.daofactory(classname="Jobs.New")
-        result = bulkAction.execute(jobList=jobList, conn=self.getDBConn(),
-                                    transaction=self.existingTransaction())
+        if jobList:
+            bulkAction = self.daofactory(classname="Jobs.New")
+            result = bulkAction.execute(jobList=jobList, conn=self.getDBConn(),
+                                        transaction=self.existingTransaction())
 
         # Move jobs to jobs from newjobs
         for jobGroup in jobGroups:
             jobGroup.jobs.extend(jobGroup.newjobs)
             jobGroup.newjobs = []
+        stageTime = self._recordStage(timings, "jobs", stageTime)
 
-        # Use the results of the bulk commit to get the jobIDs
+        # Use the results of the bulk commit to get the jobIDs, and build in a
+        # single pass the job/file associations, the mask binds and the files to acquire
         fileDict = {}
-        jobFileRunLumis = []
+        maskList = []
+        fileList = []
+        acquiredIDs = set()
         for job in jobList:
             job['id'] = result[job['name']]
-            fileDict[job['id']] = []
+            fileIDs = fileDict[job['id']] = []
             for f in job['input_files']:
-                fileDict[job['id']].append(f['id'])
-                fileMask = job['mask'].filterRunLumisByMask(runs=f['runs'])
-                for runObj in fileMask:
-                    run = runObj.run
-                    lumis = runObj.lumis
-                    for lumi in lumis:
-                        jobFileRunLumis.append((job['id'], f['id'], run, lumi))
-
-        # Create a list of mask binds
-        maskList = []
-        for job in jobList:
+                fileIDs.append(f['id'])
+                if f['id'] not in acquiredIDs:
+                    acquiredIDs.add(f['id'])
+                    fileList.append(f)
+
             mask = job['mask']
-            if len(list(mask['runAndLumis'].keys())) > 0:
+            if mask['runAndLumis']:
                 # Then we have multiple binds
-                binds = mask.produceCommitBinds(jobID=job['id'])
-                maskList.extend(binds)
+                maskList.extend(mask.produceCommitBinds(jobID=job['id']))
             else:
                 mask['jobID'] = job['id']
                 maskList.append(mask)
 
-        maskAction = self.daofactory(classname="Masks.Save")
-        maskAction.execute(jobid=None, mask=maskList, conn=self.getDBConn(),
-                           transaction=self.existingTransaction())
+        if maskList:
+            maskAction = self.daofactory(classname="Masks.Save")
+            maskAction.execute(jobid=None, mask=maskList, conn=self.getDBConn(),
+                               transaction=self.existingTransaction())
+        stageTime = self._recordStage(timings, "masks", stageTime)
 
-        fileAction = self.daofactory(classname="Jobs.AddFiles")
-        fileAction.execute(jobDict=fileDict, conn=self.getDBConn(),
-                           transaction=self.existingTransaction())
+        if fileDict:
+            fileAction = self.daofactory(classname="Jobs.AddFiles")
+            fileAction.execute(jobDict=fileDict, conn=self.getDBConn(),
+                               transaction=self.existingTransaction())
+        stageTime = self._recordStage(timings, "jobFiles", stageTime)
 
         # wfid = self['workflow'].id
-        # Add work units and associate them
+        # Add work units and associate them. When enabled, jobFileRunLumis has to be built
+        # above with one (job id, file id, run, lumi) tuple for each lumi of the job masks:
+        #   fileMask = job['mask'].filterRunLumisByMask(runs=f['runs'])
         # wuAction = self.daofactory(classname='WorkUnit.Add')
         # wufAction = self.daofactory(classname='Jobs.AddWorkUnits')
 
@@ -654,10 +669,14 @@ class Subscription(WMBSBase, WMSubscription):
         # wufAction.execute(jobFileRunLumis=jobFileRunLumis,
         #                   conn=self.getDBConn(), transaction=self.existingTransaction())
 
-        fileList = []
-        for job in jobList:
-            fileList.extend(job['input_files'])
+        if fileList:
+            self.acquireFiles(files=fileList)
+        stageTime = self._recordStage(timings, "acquireFiles", stageTime)
 
-        self.acquireFiles(files=fileList)
         self.commitTransaction(existingTransaction)
+        self._recordStage(timings, "commit", stageTime)
+        self.bulkCommitTimings = timings
+        logging.debug("Subscription %s bulkCommit of %d jobs in %d jobGroups, timings: %s",
+                      self['id'], len(jobList), len(jobGroups),
+                      ", ".join("%s %.3fs" % (stage, spent) for stage, spent in timings.items()))
         return
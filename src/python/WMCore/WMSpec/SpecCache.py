@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+_SpecCache_
+
+Cache of the workload specs used by the agent components.
+
+Two levels of caching are provided:
+  * full WMWorkloadHelper objects, kept in memory by each process and reloaded
+    when the spec file changes. They are shared by all the callers of a process
+    and must not be modified.
+  * spec summaries: small, pre-parsed JSON representations with the task list,
+    task types, PrepIDs, campaign and splitting parameters. They are written
+    next to the spec file (<spec>.summary.json), such that the spec is unpickled
+    only once for all the component processes of the agent, and read through
+    the page cache afterwards.
+"""
+from __future__ import division
+
+import copy
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
+
+SUMMARY_SUFFIX = ".summary.json"
+SUMMARY_VERSION = 1
+
+
+def _fileSignature(fileName):
+    """
+    Return the (mtime, size) signature of a file, or None if it does not exist
+    """
+    try:
+        fileStat = os.stat(fileName)
+    except OSError:
+        return None
+    return [fileStat.st_mtime, fileStat.st_size]
+
+
+def buildSpecSummary(workload):
+    """
+    _buildSpecSummary_
+
+    Create the summary of a workload: a JSON serializable dictionary
+    """
+    summary = {"name": workload.name(),
+               "campaign": workload.getCampaign(),
+               "requestType": workload.getRequestType(),
+               "tasks": [],
+               "taskTypes": {},
+               "prepIDs": {},
+               "splitting": {}}
+    for taskPath in workload.listAllTaskPathNames():
+        task = workload.getTaskByPath(taskPath)
+        summary["tasks"].append(taskPath)
+        summary["taskTypes"][taskPath] = task.taskType()
+        summary["prepIDs"][taskPath] = task.getPrepID()
+        summary["splitting"][taskPath] = task.jobSplittingParameters()
+    return summary
+
+
+class SpecCache(object):
+    """
+    Per process cache of workloads and spec summaries, validated with the
+    modification time and size of the spec files
+    """
+
+    def __init__(self, maxWorkloads=100, maxSummaries=1000, writeSummaries=True, logger=None):
+        """
+        :param maxWorkloads: maximum number of full workloads kept in memory
+        :param maxSummaries: maximum number of spec summaries kept in memory
+        :param writeSummaries: write the summary files of the specs, for the other processes
+        :param logger: logger object
+        """
+        self.maxWorkloads = maxWorkloads
+        self.maxSummaries = maxSummaries
+        self.writeSummaries = writeSummaries
+        self.logger = logger or logging.getLogger()
+        self._workloads = OrderedDict()
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"workloadLoads": 0, "workloadHits": 0, "summaryLoads": 0,
+                      "summaryBuilds": 0, "summaryHits": 0}
+
+    def workload(self, specFile):
+        """
+        _workload_
+
+        Return the WMWorkloadHelper of a spec file, or None if the file does not
+        exist. The object is shared and must not be modified.
+        """
+        signature = _fileSignature(specFile)
+        if signature is None:
+            return None
+        with self._lock:
+            entry = self._workloads.pop(specFile, None)
+            if entry and entry[0] == signature:
+                self._workloads[specFile] = entry
+                self.stats["workloadHits"] += 1
+                return entry[1]
+        workload = self._loadWorkload(specFile)
+        with self._lock:
+            self._workloads.pop(specFile, None)
+            self._workloads[specFile] = (signature, workload)
+            while len(self._workloads) > self.maxWorkloads:
+                self._workloads.popitem(last=False)
+        return workload
+
+    def summary(self, specFile):
+        """
+        _summary_
+
+        Return the summary of a spec file, or None if the file does not exist.
+        The summary is read from memory, from the summary file, or built from
+        the workload, in this order of preference.
+        """
+        signature = _fileSignature(specFile)
+        if signature is None:
+            return None
+        with self._lock:
+            entry = self._summaries.pop(specFile, None)
+            if entry and entry["specSignature"] == signature:
+                self._summaries[specFile] = entry
+                self.stats["summaryHits"] += 1
+                return entry
+            workloadEntry = self._workloads.get(specFile)
+        summary = self._readSummary(specFile, signature)
+        if summary is None:
+            # only the summary is needed, the workload is not kept in memory
+            if workloadEntry and workloadEntry[0] == signature:
+                workload = workloadEntry[1]
+            else:
+                workload = self._loadWorkload(specFile)
+            summary = buildSpecSummary(workload)
+            summary["version"] = SUMMARY_VERSION
+            summary["specSignature"] = signature
+            self.stats["summaryBuilds"] += 1
+            if self.writeSummaries:
+                self._writeSummary(specFile, summary)
+        with self._lock:
+            self._summaries.pop(specFile, None)
+            self._summaries[specFile] = summary
+            while len(self._summaries) > self.maxSummaries:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def _loadWorkload(self, specFile):
+        """
+        Load the workload of a spec file, without caching it
+        """
+        workload = WMWorkloadHelper()
+        workload.load(specFile)
+        with self._lock:
+            self.stats["workloadLoads"] += 1
+        return workload
+
+    def _readSummary(self, specFile, signature):
+        """
+        Read the summary file of a spec, if it is up to date
+        """
+        try:
+            with open(specFile + SUMMARY_SUFFIX) as fObj:
+                summary = json.load(fObj)
+        except (IOError, OSError, ValueError):
+            return None
+        if summary.get("version") != SUMMARY_VERSION or summary.get("specSignature") != signature:
+            return None
+        self.stats["summaryLoads"] += 1
+        return summary
+
+    def _writeSummary(self, specFile, summary):
+        """
+        Atomically write the summary file of a spec. Specs which cannot be
+        summarized in JSON, or written in read-only areas, are only kept in memory.
+        """
+        summaryFile = specFile + SUMMARY_SUFFIX
+        tmpFile = "%s.%d.tmp" % (summaryFile, os.getpid())
+        try:
+            with open(tmpFile, "w") as fObj:
+                json.dump(summary, fObj)
+            os.rename(tmpFile, summaryFile)
+        except (IOError, OSError, TypeError, ValueError) as ex:
+            self.logger.debug("Could not write the spec summary %s: %s", summaryFile, str(ex))
+            if os.path.exists(tmpFile):
+                os.remove(tmpFile)
+
+    def taskList(self, specFile):
+        """
+        Return the path names of all the tasks of a spec
+        """
+        summary = self.summary(specFile)
+        return summary["tasks"] if summary else []
+
+    def taskType(self, specFile, taskPath):
+        """
+        Return the type of a task, or None if the task does not exist
+        """
+        summary = self.summary(specFile)
+        return summary["taskTypes"].get(taskPath) if summary else None
+
+    def prepID(self, specFile, taskPath):
+        """
+        Return the PrepID of a task, or None if the task does not exist
+        """
+        summary = self.summary(specFile)
+        return summary["prepIDs"].get(taskPath) if summary else None
+
+    def campaign(self, specFile):
+        """
+        Return the campaign of a spec
+        """
+        summary = self.summary(specFile)
+        return summary["campaign"] if summary else None
+
+    def splittingParams(self, specFile, taskPath):
+        """
+        Return a copy of the job splitting parameters of a task, or None if the
+        task does not exist
+        """
+        summary = self.summary(specFile)
+        if not summary or taskPath not in summary["splitting"]:
+            return None
+        return copy.deepcopy(summary["splitting"][taskPath])
+
+    def resize(self, maxWorkloads):
+        """
+        Change the maximum number of full workloads kept in memory, dropping
+        the least recently used ones above it
+        """
+        with self._lock:
+            self.maxWorkloads = maxWorkloads
+            while len(self._workloads) > self.maxWorkloads:
+                self._workloads.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop all the cached workloads and summaries
+        """
+        with self._lock:
+            self._workloads.clear()
+            self._summaries.clear()
+
+
+_SPEC_CACHE = None
+_SPEC_CACHE_LOCK = threading.Lock()
+
+
+def getSpecCache(maxWorkloads=None):
+    """
+    _getSpecCache_
+
+    Return the spec cache shared by all the components of the process
+
+    :param maxWorkloads: if given, maximum number of full workloads kept in memory
+    """
+    global _SPEC_CACHE
+    with _SPEC_CACHE_LOCK:
+        if _SPEC_CACHE is None:
+            _SPEC_CACHE = SpecCache()
+        if maxWorkloads is not None:
+            _SPEC_CACHE.resize(maxWorkloads)
+    return _SPEC_CACHE
@@ -8,6 +8,7 @@ Implementation of an Executor for a StageOut step
 from __future__ import print_function
 
 import logging
+import math
 import os
 import os.path
 import signal
@@ -15,8 +16,7 @@ import sys
 
 from WMCore.Algorithms.Alarm import Alarm, alarmHandler
 from WMCore.FwkJobReport.Report import Report
-from WMCore.Lexicon import lfn     as lfnRegEx
-from WMCore.Lexicon import userLfn as userLfnRegEx
+from WMCore.LexiconValidator import getLexiconValidator
 from WMCore.Storage.FileManager import StageOutMgr as FMStageOutMgr
 from WMCore.Storage.StageOutMgr import StageOutMgr
 from WMCore.WMSpec.Steps.Executor import Executor
@@ -102,6 +102,12 @@ class StageOut(Executor):
                                     numberOfRetries=self.step.retryCount,
                                     **stageOutCall)
 
+        # parallel stage out of the files of each step, only with the new code
+        parallelStageOut = 0
+        if useNewStageOutCode:
+            parallelStageOut = overrides.get('parallelStageOut', getattr(self.step, 'parallelStageOut', 0))
+        stageOutTiming = {}
+
         # We need to find a list of steps in our task
         # And eventually a list of jobReports for out steps
 
@@ -138,6 +144,7 @@ class StageOut(Executor):
             # So getting all the files should get ONLY the files
             # for that step; or so I hope
             files = stepReport.getAllFileRefsFromStep(step=step)
+            pendingTransfers = []
             for fileName in files:
 
                 # make sure the file information is consistent
@@ -182,9 +189,9 @@ class StageOut(Executor):
                 lfn = fileName.lfn
                 fileSource = getattr(fileName, 'Source', None)
                 if fileSource in ['TFileService', 'UserDefined']:
-                    userLfnRegEx(lfn)
+                    getLexiconValidator().check('userLfn', lfn)
                 else:
-                    lfnRegEx(lfn)
+                    getLexiconValidator().check('lfn', lfn)
 
                 fileForTransfer = {'LFN': lfn,
                                    'PFN': getattr(fileName, 'pfn'),
@@ -192,6 +199,10 @@ class StageOut(Executor):
                                    'StageOutCommand': None,
                                    'Checksums': getattr(fileName, 'checksums', None)}
 
+                if parallelStageOut:
+                    pendingTransfers.append((fileName, fileForTransfer))
+                    continue
+
                 signal.signal(signal.SIGALRM, alarmHandler)
                 signal.alarm(waitTime)
                 try:
@@ -216,14 +227,70 @@ class StageOut(Executor):
 
                 signal.alarm(0)
 
+            if pendingTransfers:
+                try:
+                    filesTransferred.extend(self.parallelStageOut(manager, pendingTransfers, parallelStageOut,
+                                                                  waitTime, stageOutTiming))
+                except Alarm:
+                    msg = "Indefinite hang during parallel stageOut"
+                    logging.error(msg)
+                    manager.cleanSuccessfulStageOuts()
+                    stepReport.addError(self.stepName, 60403, "StageOutTimeout", msg)
+                except Exception as ex:
+                    manager.cleanSuccessfulStageOuts()
+                    stepReport.addError(self.stepName, 60307, "StageOutFailure", str(ex))
+                    stepReport.persist(reportLocation)
+                    raise
+
             # Am DONE with report. Persist it
             stepReport.persist(reportLocation)
 
         # Done with all steps, and should have a list of
         # stagedOut files in fileForTransfer
         logging.info("Transferred %i files", len(filesTransferred))
+        if stageOutTiming:
+            self.report.setStepStageOutTiming(self.stepName, stageOutTiming)
         return
 
+    def parallelStageOut(self, manager, pendingTransfers, maxTransfers, waitTime, stageOutTiming):
+        """
+        _parallelStageOut_
+
+        Stage out the files of a step concurrently, computing the missing
+        checksums at the same time, and update their file references.
+        The timing of the transfers is added to stageOutTiming.
+        Raise the first stage out error if any file could not be staged out.
+        waitTime is the time allowed per file, the timeout of the whole
+        stage out accounts for the files waiting for a free transfer slot.
+        """
+        numRounds = int(math.ceil(len(pendingTransfers) / float(max(1, maxTransfers))))
+        signal.signal(signal.SIGALRM, alarmHandler)
+        signal.alarm(waitTime * numRounds)
+        try:
+            result = manager.stageFiles([fileForTransfer for _, fileForTransfer in pendingTransfers],
+                                        maxTransfersPerBackend=maxTransfers, computeChecksums=True)
+        finally:
+            signal.alarm(0)
+
+        for key, value in result['timing'].items():
+            stageOutTiming[key] = max(stageOutTiming.get(key, 0), value) if key == 'maxConcurrentTransfers' \
+                else stageOutTiming.get(key, 0) + value
+
+        filesTransferred = []
+        for fileName, fileForTransfer in pendingTransfers:
+            if fileForTransfer['LFN'] in result['failed']:
+                continue
+            filesTransferred.append(fileForTransfer)
+            fileName.StageOutCommand = fileForTransfer['StageOutCommand']
+            fileName.location = fileForTransfer['PNN']
+            fileName.OutputPFN = fileForTransfer['PFN']
+            if not getattr(fileName, 'checksums', None) and fileForTransfer.get('Checksums'):
+                fileName.checksums = fileForTransfer['Checksums']
+
+        if result['failed']:
+            raise manager.firstException
+        return filesTransferred
+
     def post(self, emulator=None):
         """
         _post_
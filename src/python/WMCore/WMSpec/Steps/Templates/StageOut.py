@@ -37,6 +37,15 @@ class StageOutStepHelper(CoreHelper):
         self.data.retryCount = 1
         self.data.retryDelay = 0
 
+    def setParallelStageOut(self, maxTransfers=4):
+        """
+        _setParallelStageOut_
+
+        Stage out the files of each step concurrently, with at most maxTransfers
+        transfers per stage out method. Only used with the new stage out code.
+        """
+        self.data.parallelStageOut = maxTransfers
+
     def disableStraightToMerge(self):
         """
         _disableStraightToMerge_
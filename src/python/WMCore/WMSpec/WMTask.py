@@ -22,7 +22,7 @@ import WMCore.WMSpec.Utilities as SpecUtils
 from WMCore.Configuration import ConfigSection
 from WMCore.DataStructs.LumiList import LumiList
 from WMCore.DataStructs.Workflow import Workflow as DataStructsWorkflow
-from WMCore.Lexicon import lfnBase
+from WMCore.LexiconValidator import getLexiconValidator
 from WMCore.WMSpec.ConfigSectionTree import ConfigSectionTree, TreeHelper
 from WMCore.WMSpec.Steps.BuildMaster import BuildMaster
 from WMCore.WMSpec.Steps.ExecuteMaster import ExecuteMaster
@@ -1758,8 +1758,8 @@ class WMTaskHelper(TreeHelper):
                         unmergedLFN += lfnSuffix
                         mergedLFN += lfnSuffix
 
-                    lfnBase(unmergedLFN)
-                    lfnBase(mergedLFN)
+                    getLexiconValidator().check('lfnBase', unmergedLFN)
+                    getLexiconValidator().check('lfnBase', mergedLFN)
                     setattr(outputModule, "processedDataset", processedDataset)
 
                     # For merge tasks, we want all output to go to the merged LFN base.
@@ -10,6 +10,13 @@ class DataCacheUpdate(CherryPyPeriodicTask):
 
     def __init__(self, rest, config):
         self.getJobInfo = getattr(config, "getJobInfo", False)
+        # in incremental mode the data is loaded once, then only the changes from the
+        # request and wmstats databases are applied, with a periodic full refresh
+        self.incrementalUpdate = getattr(config, "incrementalUpdate", False)
+        self.incrementalUpdateInterval = getattr(config, "incrementalUpdateInterval", 30)
+        self.fullUpdateInterval = getattr(config, "fullUpdateInterval", 3600)
+        self.sequences = None
+        self.lastFullUpdate = 0
 
         super(DataCacheUpdate, self).__init__(config)
 
@@ -17,7 +24,21 @@ class DataCacheUpdate(CherryPyPeriodicTask):
         """
         sets the list of functions which
         """
-        self.concurrentTasks = [{'func': self.gatherActiveDataStats, 'duration': 300}]
+        if self.incrementalUpdate:
+            self.concurrentTasks = [{'func': self.updateActiveDataStats, 'duration': self.incrementalUpdateInterval}]
+        else:
+            self.concurrentTasks = [{'func': self.gatherActiveDataStats, 'duration': 300}]
+
+    def _getActiveData(self, wmstatsDB):
+        """
+        load all the active requests, with job info for the running ones
+        """
+        self.logger.info("Getting active data with job info for statuses: %s", WMSTATS_JOB_INFO)
+        jobData = wmstatsDB.getActiveData(WMSTATS_JOB_INFO, jobInfoFlag=self.getJobInfo)
+        self.logger.info("Getting active data with NO job info for statuses: %s", WMSTATS_NO_JOB_INFO)
+        tempData = wmstatsDB.getActiveData(WMSTATS_NO_JOB_INFO, jobInfoFlag=False)
+        jobData.update(tempData)
+        return jobData
 
     def gatherActiveDataStats(self, config):
         """
@@ -29,11 +50,7 @@ class DataCacheUpdate(CherryPyPeriodicTask):
             if DataCache.islatestJobDataExpired():
                 wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
                                           reqdbCouchApp="ReqMgr", logger=self.logger)
-                self.logger.info("Getting active data with job info for statuses: %s", WMSTATS_JOB_INFO)
-                jobData = wmstatsDB.getActiveData(WMSTATS_JOB_INFO, jobInfoFlag=self.getJobInfo)
-                self.logger.info("Getting active data with NO job info for statuses: %s", WMSTATS_NO_JOB_INFO)
-                tempData = wmstatsDB.getActiveData(WMSTATS_NO_JOB_INFO, jobInfoFlag=False)
-                jobData.update(tempData)
+                jobData = self._getActiveData(wmstatsDB)
                 self.logger.info("Running setlatestJobData...")
                 DataCache.setlatestJobData(jobData)
                 self.logger.info("DataCache is up-to-date with %d requests data", len(jobData))
@@ -41,3 +58,34 @@ class DataCacheUpdate(CherryPyPeriodicTask):
             self.logger.exception("Exception updating DataCache. Error: %s", str(ex))
         self.logger.info("Total time loading data from ReqMgr2 and WMStats: %s", time.time() - tStart)
         return
+
+    def updateActiveDataStats(self, config):
+        """
+        update the active data statistics with the database changes,
+        doing a full load only at bootstrap, after errors or once in a while
+        """
+        tStart = time.time()
+        try:
+            wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
+                                      reqdbCouchApp="ReqMgr", logger=self.logger)
+            if self.sequences is None or DataCache.isEmpty() or \
+                    tStart - self.lastFullUpdate > self.fullUpdateInterval:
+                self.logger.info("Loading all the active data with jobInfo set to: %s", self.getJobInfo)
+                # take the sequences first, changes made during the load are applied next time
+                sequences = wmstatsDB.getUpdateSequences()
+                jobData = self._getActiveData(wmstatsDB)
+                self.lastFullUpdate = tStart
+            else:
+                jobInfoStatus = WMSTATS_JOB_INFO if self.getJobInfo else []
+                jobData, sequences = wmstatsDB.updateActiveData(DataCache.getlatestJobData(), self.sequences,
+                                                                WMSTATS_JOB_INFO + WMSTATS_NO_JOB_INFO,
+                                                                jobInfoStatus)
+            DataCache.setlatestJobData(jobData)
+            self.sequences = sequences
+            self.logger.info("DataCache is up-to-date with %d requests data", len(jobData))
+        except Exception as ex:
+            # force a full load in the next cycle
+            self.sequences = None
+            self.logger.exception("Exception updating DataCache. Error: %s", str(ex))
+        self.logger.info("Total time updating data from ReqMgr2 and WMStats: %s", time.time() - tStart)
+        return
@@ -6,8 +6,12 @@ WorkQueue splitting by block
 from __future__ import print_function, division
 
 import logging
+import threading
 from math import ceil
+from multiprocessing.pool import ThreadPool
 
+from Utils.IteratorTools import grouper
+from WMCore.Services.DBS.DBS3Reader import DBS3Reader
 from WMCore.WorkQueue.Policy.Start.StartPolicyInterface import StartPolicyInterface
 from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueWMSpecError
 from WMCore.WorkQueue.WorkQueueUtils import makeLocationsList
@@ -29,6 +33,11 @@ class Block(StartPolicyInterface):
         # Initialize modifiers of the policy
         self.blockBlackListModifier = []
 
+        # Concurrency of the DBS and Rucio lookups
+        self.args.setdefault('LookupThreads', 8)
+        self.args.setdefault('LocationBatchSize', 50)
+        self._threadData = threading.local()
+
     def split(self):
         """Apply policy to spec"""
         dbs = self.dbs()
@@ -105,22 +114,37 @@ class Block(StartPolicyInterface):
                 for block in dbs.listFileBlocks(data, onlyClosedBlocks=True):
                     blocks.append(str(block))
 
+        # fetch the information of all the blocks passing the restrictions up front
+        runsFilter = None
+        lookups = [blockName for blockName in blocks
+                   if self._passesBlockLists(blockName, blockWhiteList, blockBlackList)]
+        if task.getLumiMask():
+            lookups = [blockName for blockName in lookups if blockName in maskedBlocks]
+        elif runWhiteList or runBlackList:
+            runsFilter = (runWhiteList, runBlackList)
+        blockInfo = self._lookupBlocks(dbs, datasetPath, lookups, runsFilter=runsFilter)
+
         for blockName in blocks:
             # check block restrictions
-            if blockWhiteList and blockName not in blockWhiteList:
-                continue
-            if blockName in blockBlackList:
-                continue
-            if blockName in self.blockBlackListModifier:
-                # Don't duplicate blocks rejected before or blocks that were included and therefore are now in the blacklist
+            if not self._passesBlockLists(blockName, blockWhiteList, blockBlackList):
                 continue
             if task.getLumiMask() and blockName not in maskedBlocks:
                 logging.warning("Block %s doesn't pass the lumi mask constraints", blockName)
                 self.rejectedWork.append(blockName)
                 continue
 
-            block = self._getBlockSummary(dbs, datasetPath, blockName)
-            if not block:
+            block, reason = blockInfo[blockName]
+            if reason == "dbs":
+                logging.warning("Block %s being rejected for lack of valid files in DBS to process", blockName)
+                self.badWork.append(blockName)
+                continue
+            if reason == "rucio":
+                logging.warning("Block %s being rejected for lack of files in Rucio to process", blockName)
+                self.badWork.append(blockName)
+                continue
+            if reason == "runs":
+                logging.warning("Block %s doesn't pass the runs constraints", blockName)
+                self.rejectedWork.append(blockName)
                 continue
 
             # check lumi restrictions
@@ -132,65 +156,15 @@ class Block(StartPolicyInterface):
                 ratioAccepted = accepted_lumis / block['NumberOfLumis']
                 block['NumberOfEvents'] = block['NumberOfEvents'] * ratioAccepted
                 block[self.lumiType] = accepted_lumis
-            # check run restrictions
-            elif runWhiteList or runBlackList:
-                # listRunLumis returns a dictionary with the lumi sections per run
-                runLumis = dbs.listRunLumis(block=block['block'])
-                runs = set(runLumis.keys())
-                recalculateLumiCounts = False
-                if len(runs) > 1:
-                    # If more than one run in the block
-                    # Then we must calculate the lumi counts after filtering the run list
-                    # This has to be done rarely and requires calling DBS file information
-                    recalculateLumiCounts = True
-
-                # apply blacklist
-                runs = runs.difference(runBlackList)
-                # if whitelist only accept listed runs
-                if runWhiteList:
-                    runs = runs.intersection(runWhiteList)
-                # any runs left are ones we will run on, if none ignore block
-                if not runs:
-                    logging.warning("Block %s doesn't pass the runs constraints", blockName)
-                    self.rejectedWork.append(blockName)
-                    continue
-
-                if len(runs) == len(runLumis):
-                    # If there is no change in the runs, then we can skip recalculating lumi counts
-                    recalculateLumiCounts = False
-
-                if recalculateLumiCounts:
-                    # Recalculate effective size of block
-                    # We pull out file info, since we don't do this often
-                    acceptedLumiCount = 0
-                    acceptedEventCount = 0
-                    acceptedFileCount = 0
-                    fileInfo = dbs.listFilesInBlock(fileBlockName=block['block'])
-                    for fileEntry in fileInfo:
-                        acceptedFile = False
-                        acceptedFileLumiCount = 0
-                        for lumiInfo in fileEntry['LumiList']:
-                            runNumber = lumiInfo['RunNumber']
-                            if runNumber in runs:
-                                acceptedFile = True
-                                acceptedFileLumiCount += 1
-                                acceptedLumiCount += len(lumiInfo['LumiSectionNumber'])
-                        if acceptedFile:
-                            acceptedFileCount += 1
-                            if len(fileEntry['LumiList']) != acceptedFileLumiCount:
-                                acceptedEventCount += acceptedFileLumiCount * fileEntry['NumberOfEvents'] / len(fileEntry['LumiList'])
-                            else:
-                                acceptedEventCount += fileEntry['NumberOfEvents']
-                    block[self.lumiType] = acceptedLumiCount
-                    block['NumberOfFiles'] = acceptedFileCount
-                    block['NumberOfEvents'] = acceptedEventCount
-            # save locations
-            if task.getTrustSitelists().get('trustlists'):
-                self.data[block['block']] = self.sites
-            else:
-                blockLocations = self.blockLocationRucioPhedex(block['block'])
-                self.data[block['block']] = self.cric.PNNstoPSNs(blockLocations)
+            validBlocks.append(block)
 
+        # save locations
+        if task.getTrustSitelists().get('trustlists'):
+            blockLocations = dict((block['block'], self.sites) for block in validBlocks)
+        else:
+            blockLocations = self._lookupLocations([block['block'] for block in validBlocks])
+        for block in validBlocks:
+            self.data[block['block']] = blockLocations[block['block']]
             # TODO: need to decide what to do when location is no find.
             # There could be case for network problem (no connection to dbs, phedex)
             # or DBS se is not recorded (This will be retried anyway by location mapper)
@@ -200,34 +174,153 @@ class Block(StartPolicyInterface):
             #    self.rejectedWork.append(blockName)
             #    continue
 
-            validBlocks.append(block)
         return validBlocks
 
-    def _getBlockSummary(self, dbsObj, datasetPath, blockName):
+    def _passesBlockLists(self, blockName, blockWhiteList, blockBlackList):
+        """Check the block white and black lists, including the blocks already processed"""
+        if blockWhiteList and blockName not in blockWhiteList:
+            return False
+        if blockName in blockBlackList:
+            return False
+        if blockName in self.blockBlackListModifier:
+            # Don't duplicate blocks rejected before or blocks that were included and therefore are now in the blacklist
+            return False
+        return True
+
+    def _lookupBlocks(self, dbs, datasetPath, blockNames, runsFilter=None):
         """
-        Retrieve a summary for this block from both DBS and Rucio. If the block
-        has 0 valid files in DBS, or 0 files in Rucio, it is then marked as
-        rejected and skipped from the work creation. Otherwise, the DBS summary
-        is returned.
-        :param dbsObj: instance to the DBS3Reader object
+        Fetch the DBS summary of the blocks, check they have files in Rucio and,
+        if a run filter is given, recalculate their size after applying it.
+        The number of files in Rucio is fetched with a single call per dataset,
+        the DBS lookups are run concurrently (see the LookupThreads argument).
+
+        :param dbs: DBSReader instance
         :param datasetPath: string with the input dataset name
-        :param blockName: string with the block name
-        :return: either an empty dictionary, or the DBS summary dictionary
+        :param blockNames: list of block names
+        :param runsFilter: None or a tuple with the run white and black lists
+        :return: dictionary key'ed by block name, with a tuple of the block summary
+          and the rejection reason ("dbs", "rucio", "runs" or None)
+        """
+        if not blockNames:
+            return {}
+        # validate the dataset once, instead of once per block summary
+        dbs.checkDatasetPath(datasetPath)
+        rucioLengths = {}
+        for container in set(blockName.split('#')[0] for blockName in blockNames):
+            rucioLengths.update(self.rucio.getBlockLengths(container))
+
+        concurrent = min(self.args['LookupThreads'], len(blockNames)) > 1
+
+        def lookupBlock(blockName):
+            reader = self._threadDBS(dbs) if concurrent else dbs
+            block = reader.getDBSSummaryInfo(block=blockName)
+            # blocks with 0 valid files should be ignored
+            # - ideally they would be deleted but dbs can't delete blocks
+            if int(block.get('NumberOfFiles', 0)) == 0:
+                return block, "dbs"
+            block['path'] = datasetPath
+            # blocks with 0 files in Rucio should be ignored as well
+            if not rucioLengths.get(blockName):
+                return block, "rucio"
+            if runsFilter and not self._applyRunsFilter(reader, block, *runsFilter):
+                return block, "runs"
+            return block, None
+
+        return dict(zip(blockNames, self._lookupMap(lookupBlock, blockNames)))
+
+    def _applyRunsFilter(self, dbs, block, runWhiteList, runBlackList):
+        """
+        Apply the run white and black lists to the block, recalculating its
+        number of lumis, files and events if only some of its runs are accepted.
+        Return False if none of the block runs is accepted.
+        """
+        # listRunLumis returns a dictionary with the lumi sections per run
+        runLumis = dbs.listRunLumis(block=block['block'])
+        runs = set(runLumis.keys())
+        recalculateLumiCounts = False
+        if len(runs) > 1:
+            # If more than one run in the block
+            # Then we must calculate the lumi counts after filtering the run list
+            # This has to be done rarely and requires calling DBS file information
+            recalculateLumiCounts = True
+
+        # apply blacklist
+        runs = runs.difference(runBlackList)
+        # if whitelist only accept listed runs
+        if runWhiteList:
+            runs = runs.intersection(runWhiteList)
+        # any runs left are ones we will run on, if none ignore block
+        if not runs:
+            return False
+
+        if len(runs) == len(runLumis):
+            # If there is no change in the runs, then we can skip recalculating lumi counts
+            recalculateLumiCounts = False
+
+        if recalculateLumiCounts:
+            # Recalculate effective size of block
+            # We pull out file info, since we don't do this often
+            acceptedLumiCount = 0
+            acceptedEventCount = 0
+            acceptedFileCount = 0
+            fileInfo = dbs.listFilesInBlock(fileBlockName=block['block'])
+            for fileEntry in fileInfo:
+                acceptedFile = False
+                acceptedFileLumiCount = 0
+                for lumiInfo in fileEntry['LumiList']:
+                    runNumber = lumiInfo['RunNumber']
+                    if runNumber in runs:
+                        acceptedFile = True
+                        acceptedFileLumiCount += 1
+                        acceptedLumiCount += len(lumiInfo['LumiSectionNumber'])
+                if acceptedFile:
+                    acceptedFileCount += 1
+                    if len(fileEntry['LumiList']) != acceptedFileLumiCount:
+                        acceptedEventCount += acceptedFileLumiCount * fileEntry['NumberOfEvents'] / len(fileEntry['LumiList'])
+                    else:
+                        acceptedEventCount += fileEntry['NumberOfEvents']
+            block[self.lumiType] = acceptedLumiCount
+            block['NumberOfFiles'] = acceptedFileCount
+            block['NumberOfEvents'] = acceptedEventCount
+        return True
+
+    def _lookupLocations(self, blockNames):
+        """
+        Return the locations (PSNs) of the blocks, querying Rucio in batches
+        of blocks, concurrently.
+        """
+        batches = list(grouper(blockNames, self.args['LocationBatchSize']))
+        lookup = lambda batch: self.rucio.getBlocksLockedAndAvailable(batch, account=self.rucioAcct)
+        result = {}
+        for rses in self._lookupMap(lookup, batches):
+            for blockName in rses:
+                result[blockName] = self.cric.PNNstoPSNs(rses[blockName])
+        return result
+
+    def _lookupMap(self, func, items):
+        """
+        Map func over items with up to LookupThreads threads, keeping the order.
+        Exceptions are raised back to the caller.
+        """
+        numThreads = min(self.args['LookupThreads'], len(items))
+        if numThreads <= 1:
+            return [func(item) for item in items]
+        pool = ThreadPool(numThreads)
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _threadDBS(self, dbs):
+        """
+        Return a DBSReader for the current thread: the underlying DBS client
+        cannot be shared between threads, so the lookup threads use their own.
         """
-        # blocks with 0 valid files should be ignored
-        # - ideally they would be deleted but dbs can't delete blocks
-        block = dbsObj.getDBSSummaryInfo(dataset=datasetPath, block=blockName)
-        if int(block.get('NumberOfFiles', 0)) == 0:
-            logging.warning("Block %s being rejected for lack of valid files in DBS to process", blockName)
-            self.badWork.append(blockName)
-            return dict()
-        # blocks with 0 files in Rucio should be ignored as well
-        blockRucio = self.rucio.getDID(didName=blockName, dynamic=False)
-        if not blockRucio.get('length'):
-            logging.warning("Block %s being rejected for lack of files in Rucio to process", blockName)
-            self.badWork.append(blockName)
-            return dict()
-        return block
+        readers = self._threadData.__dict__.setdefault('readers', {})
+        if dbs.dbsURL not in readers:
+            readers[dbs.dbsURL] = DBS3Reader(dbs.dbsURL, logger=dbs.logger)
+        return readers[dbs.dbsURL]
 
     def modifyPolicyForWorkAddition(self, inboxElement):
         """
@@ -124,9 +124,9 @@ class ResubmitBlock(StartPolicyInterface):
         """Return a set of blocks with a fixed number of ACDC records"""
         fixedSizeBlocks = []
         chunkSize = 250
-        acdcBlocks = acdc.chunkFileset(acdcInfo['collection'],
-                                       acdcInfo['fileset'],
-                                       chunkSize)
+        acdcBlocks = acdc.iterChunks(acdcInfo['collection'],
+                                     acdcInfo['fileset'],
+                                     chunkSize)
         for block in acdcBlocks:
             dbsBlock = {}
             dbsBlock['Name'] = ACDCBlock.name(self.wmspec.name(),
@@ -78,6 +78,8 @@ class WorkQueueBackend(object):
         self.inbox = self.server.connectDatabase(inbox_name, create=False, size=10000)
         self.queueUrl = sanitizeURL(queueUrl or (db_url + '/' + db_name))['url']
         self.eleKey = 'WMCore.WorkQueue.DataStructs.WorkQueueElement.WorkQueueElement'
+        # number of view rows read at once when paging through the queue
+        self.pageSize = 2000
 
     def forceQueueSync(self):
         """Force a blocking replication - used only in tests"""
@@ -362,18 +364,18 @@ class WorkQueueBackend(object):
         options['descending'] = True
         options['resources'] = thresholds
         options['num_elem'] = 9999999  # magic number!
-        result = self.db.loadList('WorkQueue', 'workRestrictions', 'availableByPriority', options)
-        result = json.loads(result)
+        # run the list over pages of the view, such that only a page of documents
+        # is decoded at once, then convert them into Couch WQE objects
+        sortedElements = []
+        for item in self.db.iterList('WorkQueue', 'workRestrictions', 'availableByPriority', options,
+                                     pageSize=self.pageSize):
+            element = CouchWorkQueueElement.fromDocument(self.db, item)
+            sortedElements.append(element)
         self.logger.info("Retrieved %d elements from workRestrictions list for: %s",
-                         len(result), self.queueUrl)
+                         len(sortedElements), self.queueUrl)
 
-        # Convert python dictionary into Couch WQE objects
         # And sort them by creation time and priority, such that highest priority and
         # oldest elements come first in the list
-        sortedElements = []
-        for item in result:
-            element = CouchWorkQueueElement.fromDocument(self.db, item)
-            sortedElements.append(element)
         sortAvailableElements(sortedElements)
 
         for element in sortedElements:
@@ -11,7 +11,7 @@ import logging
 import threading
 import time
 
-from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
+from WMCore.Agent.HeartbeatAPI import HeartbeatAPI, getHeartbeatWriter
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 
 # keep track of a unique WTM number
@@ -75,8 +75,11 @@ class WorkerThreadManager(object):
         worker.notifyResume = self.resumeSlaves
         if hasattr(self.component.config, "Agent"):
             if getattr(self.component.config.Agent, "useHeartbeat", True):
+                # heartbeats are written asynchronously, unless the interval is 0
+                flushInterval = getattr(self.component.config.Agent, "heartbeatFlushInterval", 0)
                 worker.heartbeatAPI = HeartbeatAPI(self.component.config.Agent.componentName,
-                                                   idleTime, heartbeatTimeout)
+                                                   idleTime, heartbeatTimeout,
+                                                   flushInterval=flushInterval)
 
     def addWorker(self, worker, idleTime=60, hbTimeout=None, parameters=None):
         """
@@ -158,6 +161,8 @@ class WorkerThreadManager(object):
                             self.activeThreadCount -= 1
             self.lock.release()
             time.sleep(5)
+        # write the last heartbeats of the workers
+        getHeartbeatWriter().stop()
         logging.info("All worker threads terminated")
 
     def pauseWorkers(self):
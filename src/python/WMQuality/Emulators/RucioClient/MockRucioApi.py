@@ -135,6 +135,32 @@ class MockRucioApi(object):
         rses.update(sites)
         return list(rses)
 
+    def getBlocksLockedAndAvailable(self, blockNames, account, scope='cms', returnTape=False):
+        """
+        Mock the bulk method to discover where blocks are locked and available.
+        :return: a dictionary with a unique list of RSEs per block
+        """
+        logging.info("%s: Calling mock getBlocksLockedAndAvailable", self.__class__.__name__)
+        result = {}
+        for blockName in blockNames:
+            result[blockName] = self.getDataLockedAndAvailable(name=blockName, account=account,
+                                                               scope=scope, returnTape=returnTape)
+        return result
+
+    def getBlockLengths(self, container, scope='cms'):
+        """
+        Mock the bulk method returning the number of files for all the blocks
+        in a container, using the mocked getDID data.
+        :return: a dictionary with the number of files per block
+        """
+        logging.info("%s: Calling mock getBlockLengths", self.__class__.__name__)
+        result = {}
+        prefix = "getDID:[('didName', '%s#" % container
+        for signature, did in MOCK_DATA.items():
+            if signature.startswith(prefix) and signature.endswith("('dynamic', False)]"):
+                result[did['name']] = did.get('length')
+        return result
+
     def getPileupLockedAndAvailable(self, container, account, scope="cms"):
         """
         Mock method to resolve where the pileup container (and all its blocks)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+_ArchiveUploadPipeline_t_
+
+Unit tests for the WMArchive upload pipeline, using a mock
+FWJR database and a local HTTP server standing in for WMArchive.
+"""
+from __future__ import division
+
+import copy
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from future import standard_library
+standard_library.install_aliases()
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from WMCore.Services.FWJRDB.FWJRDBAPI import FWJRDBAPI
+from WMCore.WMBase import getTestBase
+from WMComponent.ArchiveDataReporter.ArchiveUploadPipeline import ArchiveUploadPipeline
+
+
+class MockFWJRDBAPI(FWJRDBAPI):
+    """
+    Emulate the FWJRDBAPI calls done by the pipeline, counting them. The
+    reportsByArchiveStatus view is emulated, docs leave it once uploaded.
+    """
+
+    def __init__(self, fwjr, numDocs):
+        self.couchapp = "FWJRDump"
+        self.defaultStale = {}
+        self.docs = {}
+        for idx in range(numDocs):
+            doc = copy.deepcopy(fwjr)
+            doc['_id'] = "%08d-0" % idx
+            doc['archivestatus'] = 'ready'
+            self.docs[doc['_id']] = doc
+        self.calls = {'page': 0, 'bulkUpdate': 0}
+        self.failUpdates = set()
+
+    def _getCouchView(self, view, options, keys=None):
+        self.calls['page'] += 1
+        rows = []
+        for docID in sorted(self.docs):
+            if self.docs[docID]['archivestatus'] != options['startkey']:
+                continue
+            if docID < options.get('startkey_docid', ''):
+                continue
+            rows.append({'id': docID, 'key': options['startkey'], 'value': None,
+                         'doc': copy.deepcopy(self.docs[docID])})
+        rows = rows[options.get('skip', 0):]
+        return {'rows': rows[:options['limit']]}
+
+    def bulkUpdateArchiveUploadedStatus(self, docs):
+        self.calls['bulkUpdate'] += 1
+        failed = []
+        for doc in docs:
+            if doc['_id'] in self.failUpdates:
+                failed.append(doc['_id'])
+            else:
+                self.docs[doc['_id']]['archivestatus'] = 'uploaded'
+        return failed
+
+
+class WMArchiveHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the WMArchive data API, with a fixed latency per call
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        data = json.loads(body)['data']
+        server = self.server
+        with server.lock:
+            server.calls += 1
+            server.received += len(data)
+            fail = server.failNext > 0
+            server.failNext -= 1
+        time.sleep(server.latency)
+        if fail:
+            result = [{'status': 'error', 'reason': 'test failure', 'ids': []}]
+        else:
+            result = [{'status': 'ok', 'ids': [doc['meta_data']['fwjr_id'] for doc in data]}]
+        response = json.dumps({'result': result}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+class WMArchiveServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), WMArchiveHandler)
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.calls = 0
+        self.received = 0
+        self.failNext = 0
+
+
+class ArchiveUploadPipelineTest(unittest.TestCase):
+    """
+    Test the WMArchive upload pipeline
+    """
+
+    def setUp(self):
+        self.server = WMArchiveServer(latency=0.02)
+        self.serverThread = threading.Thread(target=self.server.serve_forever)
+        self.serverThread.daemon = True
+        self.serverThread.start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        sPath = os.path.join(getTestBase(), "WMCore_t/Services_t/WMArchive_t/FWJRSamples/ProcessingSuccessFwjr.json")
+        with open(sPath, 'r') as infile:
+            self.fwjr = json.load(infile)
+        self.logger = logging.getLogger('ArchiveUploadPipelineTest')
+        # the HTTP client requires some credentials, even if they are not used with http
+        self.certFile = tempfile.NamedTemporaryFile(suffix='.pem')
+        self.environ = {key: os.environ.get(key) for key in ('X509_USER_CERT', 'X509_USER_KEY')}
+        os.environ['X509_USER_CERT'] = os.environ['X509_USER_KEY'] = self.certFile.name
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.certFile.close()
+        for key, value in self.environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    def testPipeline(self):
+        """
+        Test paging, upload and bulk status update
+        """
+        fwjrAPI = MockFWJRDBAPI(self.fwjr, 95)
+        pipeline = ArchiveUploadPipeline(fwjrAPI, self.url, pageSize=40, sliceSize=10,
+                                         numUploadThreads=3, logger=self.logger)
+        stats = pipeline.run()
+        self.assertEqual(stats['fetched'], 95)
+        self.assertEqual(stats['uploaded'], 95)
+        self.assertEqual(stats['uploadFailed'], 0)
+        self.assertEqual(self.server.received, 95)
+        self.assertEqual(fwjrAPI.calls, {'page': 3, 'bulkUpdate': 10})
+        self.assertTrue(all(doc['archivestatus'] == 'uploaded' for doc in fwjrAPI.docs.values()))
+        self.assertTrue(stats['docsPerSec'] > 0)
+
+        # nothing left to do
+        stats = pipeline.run()
+        self.assertEqual(stats['fetched'], 0)
+
+    def testFailures(self):
+        """
+        Failed uploads and status updates are retried in the next run
+        """
+        fwjrAPI = MockFWJRDBAPI(self.fwjr, 30)
+        fwjrAPI.failUpdates.add("00000015-0")
+        self.server.failNext = 1
+        pipeline = ArchiveUploadPipeline(fwjrAPI, self.url, pageSize=100, sliceSize=10,
+                                         numUploadThreads=1, compress=True, logger=self.logger)
+        stats = pipeline.run()
+        self.assertEqual(stats['uploadFailed'], 10)
+        self.assertEqual(stats['uploaded'], 20)
+        self.assertEqual(stats['updateFailed'], 1)
+
+        fwjrAPI.failUpdates.clear()
+        stats = pipeline.run()
+        self.assertEqual(stats['uploaded'], 11)
+        self.assertTrue(all(doc['archivestatus'] == 'uploaded' for doc in fwjrAPI.docs.values()))
+
+    def testMaxPages(self):
+        """
+        Test that a run processes at most maxPages pages
+        """
+        fwjrAPI = MockFWJRDBAPI(self.fwjr, 50)
+        pipeline = ArchiveUploadPipeline(fwjrAPI, self.url, pageSize=10, sliceSize=5, maxPages=2,
+                                         numConvertProcesses=2, logger=self.logger)
+        stats = pipeline.run()
+        self.assertEqual(stats['uploaded'], 20)
+        self.assertEqual(fwjrAPI.calls['page'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
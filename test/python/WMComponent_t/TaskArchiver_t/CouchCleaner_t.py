@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+_CouchCleaner_t_
+
+Unit tests for the bulk deletion of workflow documents, using
+in-memory stand-ins of the CMSCouch Database class.
+"""
+from __future__ import division
+
+import threading
+import unittest
+
+from WMComponent.TaskArchiver.CouchCleaner import CouchCleaner
+
+
+class FakeDatabase(object):
+    """
+    In-memory database with the views used by the cleaner: documents
+    have a 'workflow' field and the views emit [workflow, docId] or workflow
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+        self.requests = 0
+        self.compactions = 0
+        self.failing = set()
+        self.conflicts = set()
+        self.lock = threading.Lock()
+
+    def _request(self):
+        with self.lock:
+            self.requests += 1
+
+    def loadView(self, design, view, options=None, keys=None):
+        self._request()
+        if keys:
+            return {'rows': [{'key': doc['workflow'], 'value': {'id': docId, 'rev': doc['_rev']}}
+                             for docId, doc in sorted(self.docs.items()) if doc['workflow'] in keys]}
+        workflowName = options['startkey'][0]
+        if workflowName in self.failing:
+            raise RuntimeError("view failure")
+        return {'rows': [{'key': [workflowName, docId], 'value': {'id': docId, 'rev': doc['_rev']}}
+                         for docId, doc in sorted(self.docs.items()) if doc['workflow'] == workflowName]}
+
+    def allDocs(self, options=None, keys=None):
+        self._request()
+        rows = []
+        for key in keys:
+            if key in self.docs:
+                rows.append({'id': key, 'key': key, 'value': {'rev': self.docs[key]['_rev']}})
+            else:
+                rows.append({'key': key, 'error': 'not_found'})
+        return {'rows': rows}
+
+    def post(self, uri, data):
+        self._request()
+        assert uri == '/%s/_bulk_docs/' % self.name
+        results = []
+        with self.lock:
+            for doc in data['docs']:
+                if doc['_id'] in self.conflicts or self.docs[doc['_id']]['_rev'] != doc['_rev']:
+                    results.append({'id': doc['_id'], 'error': 'conflict'})
+                else:
+                    del self.docs[doc['_id']]
+                    results.append({'id': doc['_id'], 'ok': True})
+        return results
+
+    def purge(self, data):
+        self._request()
+        with self.lock:
+            for docId in data:
+                del self.docs[docId]
+        return {'purge_seq': 1, 'purged': data}
+
+    def compact(self, views=None):
+        self.compactions += 1
+
+
+class CouchCleanerTest(unittest.TestCase):
+    """
+    Test the bulk deletion of workflow documents
+    """
+
+    def _databases(self, numWorkflows, docsPerWorkflow):
+        jobs = FakeDatabase("jobs")
+        summary = FakeDatabase("summary")
+        wmstats = FakeDatabase("wmstats")
+        for wfIdx in range(numWorkflows):
+            workflowName = "workflow%d" % wfIdx
+            summary.docs[workflowName] = {'workflow': workflowName, '_rev': '1-a'}
+            wmstats.docs["agent-%s" % workflowName] = {'workflow': workflowName, '_rev': '1-a'}
+            for docIdx in range(docsPerWorkflow):
+                jobs.docs["%s-%d" % (workflowName, docIdx)] = {'workflow': workflowName, '_rev': '1-a'}
+        return {"JobDump": {"database": jobs, "design": "JobDump", "view": "jobsByWorkflowName", "mode": "range"},
+                "SummaryStats": {"database": summary, "mode": "ids"},
+                "WMStatsAgent": {"database": wmstats, "design": "WMStatsAgent", "view": "allWorkflows",
+                                 "mode": "keys"}}
+
+    def testDeleteWorkflows(self):
+        """
+        All the documents of the workflows are deleted, with per workflow reports
+        """
+        databases = self._databases(5, 30)
+        jobs = databases["JobDump"]["database"]
+        cleaner = CouchCleaner(databases, numThreads=3, bulkSize=20, compactThreshold=50)
+
+        # a conflict on one document, a view failure on another workflow
+        jobs.conflicts.add("workflow1-3")
+        jobs.failing.add("workflow2")
+        reports = cleaner.deleteWorkflows(["workflow0", "workflow1", "workflow2", "workflow3"])
+        self.assertEqual(reports["workflow0"]["JobDump"], {'status': 'ok', 'delete': 30, 'message': {}})
+        self.assertEqual(reports["workflow0"]["SummaryStats"]["delete"], 1)
+        self.assertEqual(reports["workflow0"]["WMStatsAgent"]["delete"], 1)
+        self.assertEqual(reports["workflow1"]["JobDump"], {'status': 'error', 'delete': 29,
+                                                           'message': {'conflict': 1}})
+        self.assertEqual(reports["workflow2"]["JobDump"]["status"], 'error')
+        self.assertEqual(reports["workflow2"]["WMStatsAgent"]["status"], 'ok')
+        self.assertEqual(sorted(set(doc['workflow'] for doc in jobs.docs.values())),
+                         ["workflow1", "workflow2", "workflow4"])
+        self.assertEqual(len(jobs.docs), 1 + 30 + 30)
+        # the job database got the compaction once
+        self.assertEqual(jobs.compactions, 1)
+        self.assertEqual(databases["SummaryStats"]["database"].compactions, 0)
+
+        # workflows without documents
+        reports = cleaner.deleteWorkflows(["workflow3", "workflow9"])
+        self.assertEqual(reports["workflow9"]["JobDump"]["status"], 'warning')
+        self.assertEqual(reports["workflow9"]["SummaryStats"]["status"], 'warning')
+        self.assertEqual(cleaner.deleteWorkflows([]), {})
+
+    def testPurge(self):
+        """
+        Documents can be purged instead of deleted
+        """
+        databases = self._databases(3, 10)
+        cleaner = CouchCleaner(databases, purge=True)
+        reports = cleaner.deleteWorkflows(["workflow0", "workflow1"])
+        self.assertEqual(reports["workflow1"]["JobDump"], {'status': 'ok', 'delete': 10, 'message': {}})
+        self.assertEqual(len(databases["JobDump"]["database"].docs), 10)
+        self.assertEqual(len(databases["WMStatsAgent"]["database"].docs), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
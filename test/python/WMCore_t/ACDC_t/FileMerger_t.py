@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+_FileMerger_t_
+
+Unit tests for the ACDC file merger and its lumi interval sets
+"""
+from __future__ import division
+
+import copy
+import random
+import unittest
+
+from WMCore.ACDC.FileMerger import FileMerger, LumiIntervals
+
+
+def legacyMerge(chunkFiles):
+    """
+    Reference merge of real input files, comparing every new record against
+    each of the run/lumi entries already merged for that file
+    """
+    mergedFiles = {}
+    for acdcFile in chunkFiles:
+        fName = acdcFile['lfn']
+        if fName not in mergedFiles:
+            mergedFiles[fName] = acdcFile
+            continue
+        runNum = acdcFile['runs'][0]['run_number']
+        lumiSet = set(acdcFile['runs'][0]['lumis'])
+        if any(runNum == runLumi['run_number'] and lumiSet.issubset(runLumi['lumis'])
+               for runLumi in mergedFiles[fName]['runs']):
+            continue
+        mergedFiles[fName]['parents'] = list(set(mergedFiles[fName]['parents']).union(acdcFile['parents']))
+        mergedFiles[fName]['runs'].extend(acdcFile['runs'])
+    for fileInfo in mergedFiles.values():
+        runLumis = {}
+        for item in fileInfo['runs']:
+            runLumis.setdefault(item['run_number'], set()).update(item['lumis'])
+        fileInfo['runs'] = [{'run_number': run, 'lumis': sorted(lumis)} for run, lumis in runLumis.items()]
+    return list(mergedFiles.values())
+
+
+def normalize(files):
+    """
+    Order independent representation of merged files
+    """
+    result = {}
+    for fileInfo in files:
+        result[fileInfo['lfn']] = (sorted(fileInfo['parents']),
+                                   sorted((run['run_number'], sorted(run['lumis'])) for run in fileInfo['runs']))
+    return result
+
+
+class FileMergerTest(unittest.TestCase):
+    """
+    Test the FileMerger against the reference merge
+    """
+
+    def testLumiIntervals(self):
+        """
+        Test the lumi interval sets
+        """
+        lumis = LumiIntervals([5, 3, 4, 10, 12])
+        self.assertEqual(lumis.ranges(), [[3, 5], [10, 10], [12, 12]])
+        lumis.add(11)
+        self.assertEqual(lumis.ranges(), [[3, 5], [10, 12]])
+        lumis.update([1, 7, 6, 2])
+        self.assertEqual(lumis.ranges(), [[1, 7], [10, 12]])
+        self.assertEqual(list(lumis), [1, 2, 3, 4, 5, 6, 7, 10, 11, 12])
+        self.assertEqual(len(lumis), 10)
+        self.assertIn(4, lumis)
+        self.assertNotIn(8, lumis)
+        self.assertNotIn(0, lumis)
+        self.assertTrue(lumis.issuperset([1, 12, 5]))
+        self.assertFalse(lumis.issuperset([1, 9]))
+        self.assertTrue(lumis.issuperset([]))
+
+        random.seed(1234)
+        allLumis = [random.randint(1, 500) for _ in range(1000)]
+        lumis = LumiIntervals(allLumis)
+        self.assertEqual(list(lumis), sorted(set(allLumis)))
+
+    def testMergeFakeFiles(self):
+        """
+        Test merging MCFakeFiles, including a duplicate record
+        """
+        files = [{'lfn': 'MCFakeFile-1', 'events': 10, 'runs': [{'run_number': 1, 'lumis': [1, 2]}]},
+                 {'lfn': 'MCFakeFile-1', 'events': 10, 'runs': [{'run_number': 1, 'lumis': [5, 6]}]},
+                 {'lfn': 'MCFakeFile-1', 'events': 10, 'runs': [{'run_number': 1, 'lumis': [6, 5]}]},
+                 {'lfn': 'MCFakeFile-2', 'events': 10, 'runs': [{'run_number': 1, 'lumis': [3]}]}]
+        merger = FileMerger()
+        merger.addFiles(files)
+        merged = dict((f['lfn'], f) for f in merger.files())
+        self.assertEqual(len(merger), 2)
+        self.assertEqual(merged['MCFakeFile-1']['events'], 20)
+        self.assertEqual(merged['MCFakeFile-1']['runs'][0]['lumis'], [1, 2, 5, 6])
+        self.assertEqual(merged['MCFakeFile-2']['events'], 10)
+
+    def testMergeRealFiles(self):
+        """
+        Test merging real input files against the reference implementation
+        """
+        random.seed(4321)
+        files = []
+        for _ in range(2000):
+            lfn = "/store/data/file%d.root" % random.randint(1, 50)
+            run = random.randint(1, 3)
+            firstLumi = random.randint(1, 200)
+            files.append({'lfn': lfn, 'events': 100, 'parents': ["/store/parent%d.root" % random.randint(1, 5)],
+                          'runs': [{'run_number': run, 'lumis': list(range(firstLumi, firstLumi + 3))}]})
+        merger = FileMerger()
+        merger.addFiles(copy.deepcopy(files))
+        result = normalize(merger.files())
+        expected = normalize(legacyMerge(copy.deepcopy(files)))
+        self.assertEqual(result, expected)
+
+    def testMergeMultiRunFiles(self):
+        """
+        Test merging real input files with several runs per record
+        """
+        files = [{'lfn': '/store/data/file1.root', 'events': 100, 'parents': ['/store/parent1.root'],
+                  'runs': [{'run_number': 1, 'lumis': [1, 2]}]},
+                 {'lfn': '/store/data/file1.root', 'events': 100, 'parents': ['/store/parent2.root'],
+                  'runs': [{'run_number': 1, 'lumis': [3, 4]}]},
+                 # the lumis of its first run are only covered by two records together
+                 {'lfn': '/store/data/file1.root', 'events': 100, 'parents': ['/store/parent3.root'],
+                  'runs': [{'run_number': 1, 'lumis': [2, 3]}, {'run_number': 2, 'lumis': [7]}]},
+                 # duplicate of the first record
+                 {'lfn': '/store/data/file1.root', 'events': 100, 'parents': ['/store/parent4.root'],
+                  'runs': [{'run_number': 1, 'lumis': [1]}, {'run_number': 3, 'lumis': [9]}]}]
+        merger = FileMerger()
+        merger.addFiles(copy.deepcopy(files))
+        result = normalize(merger.files())
+        self.assertEqual(result, normalize(legacyMerge(copy.deepcopy(files))))
+        self.assertEqual(result['/store/data/file1.root'],
+                         (['/store/parent1.root', '/store/parent2.root', '/store/parent3.root'],
+                          [(1, [1, 2, 3, 4]), (2, [7])]))
+
+        random.seed(2468)
+        files = []
+        for _ in range(2000):
+            runs = []
+            for run in random.sample([1, 2, 3, 4], random.randint(1, 3)):
+                firstLumi = random.randint(1, 100)
+                runs.append({'run_number': run, 'lumis': list(range(firstLumi, firstLumi + 3))})
+            files.append({'lfn': "/store/data/file%d.root" % random.randint(1, 20), 'events': 100,
+                          'parents': ["/store/parent%d.root" % random.randint(1, 5)], 'runs': runs})
+        merger = FileMerger()
+        merger.addFiles(copy.deepcopy(files))
+        self.assertEqual(normalize(merger.files()), normalize(legacyMerge(copy.deepcopy(files))))
+
+
+if __name__ == '__main__':
+    unittest.main()
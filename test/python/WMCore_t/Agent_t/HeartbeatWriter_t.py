@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+_HeartbeatWriter_t_
+
+Unit tests for the asynchronous heartbeat writer, with an in-memory
+stand-in of the UpdateWorkers DAO.
+"""
+from __future__ import division
+
+import threading
+import time
+import unittest
+
+from WMCore.Agent.HeartbeatAPI import HeartbeatWriter, getHeartbeatWriter
+
+
+class FakeUpdateWorkers(object):
+    """
+    Keep the rows written, and the number of statements executed
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = 0
+        self.failing = False
+        self.lock = threading.Lock()
+
+    def execute(self, binds, conn=None, transaction=False):
+        with self.lock:
+            self.calls += 1
+            if self.failing:
+                raise RuntimeError("database is down")
+            for bind in binds:
+                self.rows.setdefault(bind["worker_name"], {}).update(bind)
+
+
+class HeartbeatWriterTest(unittest.TestCase):
+    """
+    Test the HeartbeatWriter class
+    """
+
+    def testUpdates(self):
+        """
+        Only the latest update of each worker is written, in one statement
+        """
+        dao = FakeUpdateWorkers()
+        writer = HeartbeatWriter()
+        writer.start(dao, 3600)
+        writer.update("worker1", "Running")
+        writer.update("worker1", "Running", 1.5, "10")
+        writer.update("worker1", "Running")
+        writer.update("worker2", "Paused")
+        self.assertEqual(dao.calls, 0)
+
+        status = writer.workerStatus()
+        self.assertEqual(status["worker1"]["cycle_time"], 1.5)
+        self.assertTrue(status["worker1"]["pending"])
+
+        writer.flush()
+        self.assertEqual(dao.calls, 1)
+        self.assertEqual(dao.rows["worker1"]["cycle_time"], 1.5)
+        self.assertEqual(dao.rows["worker1"]["outcome"], "10")
+        self.assertEqual(dao.rows["worker2"]["state"], "Paused")
+        self.assertNotIn("cycle_time", dao.rows["worker2"])
+        self.assertFalse(writer.workerStatus()["worker1"]["pending"])
+        self.assertEqual(writer.stats["rowsWritten"], 2)
+
+        # nothing to write
+        writer.flush()
+        self.assertEqual(dao.calls, 1)
+
+        # discarded updates are not written
+        writer.update("worker2", "Running")
+        writer.discard("worker2")
+        writer.stop()
+        self.assertEqual(dao.rows["worker2"]["state"], "Paused")
+
+    def testFailures(self):
+        """
+        Failed updates are kept for the next flush, newer updates taking precedence
+        """
+        dao = FakeUpdateWorkers()
+        writer = HeartbeatWriter()
+        writer.start(dao, 3600)
+        writer.update("worker1", "Running", 2, None)
+        dao.failing = True
+        writer.flush()
+        self.assertEqual(writer.stats["failures"], 1)
+        self.assertEqual(dao.rows, {})
+
+        writer.update("worker1", "Paused")
+        dao.failing = False
+        writer.stop()
+        self.assertEqual(dao.rows["worker1"]["state"], "Paused")
+        self.assertEqual(dao.rows["worker1"]["cycle_time"], 2)
+
+    def testPeriodicFlush(self):
+        """
+        The background thread writes the updates periodically
+        """
+        dao = FakeUpdateWorkers()
+        writer = HeartbeatWriter()
+        writer.start(dao, 0.05)
+        writer.update("worker1", "Running")
+        deadline = time.time() + 10
+        while "worker1" not in dao.rows and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(dao.rows["worker1"]["state"], "Running")
+        writer.stop()
+        self.assertTrue(getHeartbeatWriter() is getHeartbeatWriter())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,7 +11,7 @@ import unittest
 
 from Utils.PythonVersion import PY3
 
-from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
+from WMCore.Agent.HeartbeatAPI import HeartbeatAPI, getHeartbeatWriter
 from WMQuality.TestInit import TestInit
 
 
@@ -132,6 +132,37 @@ class HeartbeatTest(unittest.TestCase):
                 self.assertEqual(worker["state"], "Error")
                 self.assertEqual(worker["error_message"], "BAD JOB!!!")
 
+    def testAsyncUpdates(self):
+        """
+        _testAsyncUpdates_
+
+        Heartbeats and cycles are written by the heartbeat writer, in batches
+        """
+        comp1 = HeartbeatAPI("testComponent1", pollInterval=60, heartbeatTimeout=600, flushInterval=3600)
+        comp1.registerComponent()
+        comp1.registerWorker("testWorker1")
+        comp1.registerWorker("testWorker2")
+        comp1.registerWorker("testWorker3")
+
+        comp1.updateWorkerHeartbeat("testWorker1", "Paused")
+        comp1.updateWorkerCycle("testWorker2", 12.5, 100)
+        comp1.updateWorkerHeartbeat("testWorker3", "Running")
+        self.assertItemsEqual([item["state"] for item in comp1.getHeartbeatInfo()], ["Start", "Start", "Start"])
+        self.assertTrue(getHeartbeatWriter().workerStatus()["testWorker2"]["pending"])
+
+        # errors are written right away, and are not overwritten by the pending updates
+        comp1.updateWorkerError("testWorker3", "BAD JOB!!!")
+        comp1.flushHeartbeats()
+        hb1 = dict((item["worker_name"], item) for item in comp1.getHeartbeatInfo())
+        self.assertEqual(hb1["testWorker1"]["state"], "Paused")
+        self.assertEqual(hb1["testWorker1"]["cycle_time"], 0)
+        self.assertEqual(hb1["testWorker2"]["state"], "Running")
+        self.assertEqual(hb1["testWorker2"]["cycle_time"], 12.5)
+        self.assertEqual(hb1["testWorker2"]["outcome"], '100')
+        self.assertEqual(hb1["testWorker3"]["state"], "Error")
+        self.assertFalse(getHeartbeatWriter().workerStatus()["testWorker2"]["pending"])
+        getHeartbeatWriter().stop()
+
 
 if __name__ == "__main__":
     unittest.main()
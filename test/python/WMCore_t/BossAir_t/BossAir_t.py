@@ -16,6 +16,7 @@ try:
 except ImportError:
     import pickle
 
+from mock import patch
 from nose.plugins.attrib import attr
 
 import WMCore.WMInit
@@ -507,6 +508,64 @@ class BossAirTest(unittest.TestCase):
 
         return
 
+    def testC_TrackChangedJobs(self):
+        """
+        _TrackChangedJobs_
+
+        Check that tracking only passes the selected running jobs to the
+        plugins, and only writes the status of the jobs they report as changed
+        """
+        myThread = threading.currentThread()
+
+        config = self.getConfig()
+
+        baAPI = BossAirAPI(config=config, insertStates=True)
+
+        nJobs = 10
+
+        jobDummies = self.createDummyJobs(nJobs=nJobs, location='T3_US_Xanadu')
+        for job in jobDummies:
+            job['plugin'] = 'TestPlugin'
+            job['owner'] = 'tapas'
+
+        baAPI.submit(jobs=jobDummies)
+        statusTimes = dict(myThread.dbi.processData("SELECT id, status_time FROM bl_runjob")[0].fetchall())
+
+        def trackChanges(jobs, info=None):
+            """
+            Report the status of the first 4 jobs as changed
+            """
+            changed = sorted(jobs, key=lambda x: x['jobid'])[:4]
+            for job in changed:
+                job['status'] = 'Dead'
+                job['status_time'] = 12345
+            return [], changed, []
+
+        trackedIDs = [job['id'] for job in jobDummies[:6]]
+        with patch.object(baAPI.plugins['TestPlugin'], 'track', side_effect=trackChanges) as track:
+            baAPI.track(wmbsIDs=trackedIDs)
+        self.assertEqual(track.call_count, 1)
+        trackedJobs = track.call_args[1]['jobs']
+        self.assertEqual(sorted(job['jobid'] for job in trackedJobs), sorted(trackedIDs))
+        for job in trackedJobs:
+            self.assertEqual(job['plugin'], 'TestPlugin')
+
+        changedIDs = sorted(trackedIDs)[:4]
+        result = myThread.dbi.processData("""SELECT rj.wmbs_id, rj.id, st.name, rj.status_time, rj.status
+                                               FROM bl_runjob rj
+                                               INNER JOIN bl_status st ON rj.sched_status = st.id""")[0].fetchall()
+        self.assertEqual(len(result), nJobs)
+        for wmbsID, runJobID, status, statusTime, active in result:
+            if wmbsID in changedIDs:
+                self.assertEqual(status, 'Dead')
+                self.assertEqual(statusTime, 12345)
+            else:
+                self.assertEqual(status, 'New')
+                self.assertEqual(statusTime, statusTimes[runJobID])
+            self.assertEqual(active, 1)
+
+        return
+
     def testG_monitoringDAO(self):
         """
         _monitoringDAO_
@@ -256,7 +256,77 @@ class RunJobTest(unittest.TestCase):
             self.assertEqual(job['userrole'], job2['userrole'])
         return
 
+    def testD_TrackDAOs(self):
+        """
+        _TrackDAOs_
+
+        Test the DAOs used to track jobs: the streamed load of the running
+        jobs and the update of only their status and status time.
+        """
+        myThread = threading.currentThread()
+
+        jobGroup = self.createJobs(nJobs = 10)
+
+        runJobs = []
+        for job in jobGroup.jobs:
+            runJob = RunJob(jobid = job.exists())
+            runJob['status']    = 'New'
+            runJob['bulkid']    = 1001
+            runJob['userdn']    = job['owner']
+            runJob['usergroup'] = 'phgroup'
+            runJob['userrole']  = 'cmsrole'
+            runJobs.append(runJob)
+
+        statusDAO = self.daoFactory(classname = "NewState")
+        statusDAO.execute(states = ['New', 'Gone', 'Dead'])
+        newJobDAO = self.daoFactory(classname = "NewJobs")
+        newJobDAO.execute(jobs = runJobs)
+
+        # the streamed rows are the same as the loaded ones, with the plugin
+        runningJobDAO = self.daoFactory(classname = "LoadRunning")
+        runningJobs = runningJobDAO.execute()
+        streamedJobs = list(runningJobDAO.execute(stream = True))
+        self.assertEqual(len(runningJobs), 10)
+        self.assertItemsEqual(streamedJobs, runningJobs)
+        for job in streamedJobs:
+            self.assertEqual(job['plugin'], 'TestPlugin')
+            self.assertEqual(job['status'], 'New')
+
+        # only the status and the status time of the given jobs change
+        changedJobs = sorted(runningJobs, key = lambda x: x['id'])[:4]
+        for job in changedJobs:
+            job['status'] = 'Dead'
+            job['status_time'] = 12345
+            job['bulkid'] = 2002
+            job['retry_count'] = 5
+        updateStatusDAO = self.daoFactory(classname = "UpdateStatus")
+        updateStatusDAO.execute(jobs = changedJobs)
+        updateStatusDAO.execute(jobs = [])
+
+        result = myThread.dbi.processData("""SELECT rj.id, st.name, rj.status_time, rj.bulk_id,
+                                                      rj.retry_count, rj.status
+                                               FROM bl_runjob rj
+                                               INNER JOIN bl_status st ON rj.sched_status = st.id
+                                               ORDER BY rj.id""")[0].fetchall()
+        changedIDs = set(job['id'] for job in changedJobs)
+        oldTimes = dict((job['id'], job['status_time']) for job in runningJobs if job['id'] not in changedIDs)
+        self.assertEqual(len(result), 10)
+        for jobID, status, statusTime, bulkID, retryCount, active in result:
+            if jobID in changedIDs:
+                self.assertEqual(status, 'Dead')
+                self.assertEqual(statusTime, 12345)
+            else:
+                self.assertEqual(status, 'New')
+                self.assertEqual(statusTime, oldTimes[jobID])
+            self.assertEqual(str(bulkID), '1001')
+            self.assertEqual(retryCount, 0)
+            self.assertEqual(active, 1)
 
+        loadJobsDAO = self.daoFactory(classname = "LoadByStatus")
+        self.assertEqual(len(loadJobsDAO.execute(status = 'Dead')), 4)
+        self.assertEqual(len(loadJobsDAO.execute(status = 'New')), 6)
+
+        return
 
 
 if __name__ == '__main__':
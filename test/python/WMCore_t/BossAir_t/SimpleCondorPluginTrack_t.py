@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+_SimpleCondorPluginTrack_t_
+
+Unit tests for SimpleCondorPlugin.track, in both the full
+and the incremental tracking modes, using a mock condor schedd.
+"""
+from __future__ import division
+
+import logging
+import re
+import threading
+import time
+import unittest
+
+import mock
+
+from WMCore.BossAir.Plugins.SimpleCondorPlugin import SimpleCondorPlugin
+from WMCore.Configuration import Configuration
+
+ECS_RE = re.compile(r"EnteredCurrentStatus >= (-?\d+)")
+
+
+class MockSchedd(object):
+    """
+    Minimal schedd emulation supporting the queries done by track()
+    """
+
+    def __init__(self):
+        self.queue = {}
+        self.historyAds = []
+
+    def submit(self, gridId, status=1):
+        clusterId, procId = gridId.split(".")
+        self.queue[gridId] = {'ClusterId': int(clusterId), 'ProcId': int(procId), 'JobStatus': status,
+                              'EnteredCurrentStatus': int(time.time())}
+
+    def setStatus(self, gridId, status, site=None):
+        self.queue[gridId]['JobStatus'] = status
+        self.queue[gridId]['EnteredCurrentStatus'] = int(time.time())
+        if site:
+            self.queue[gridId]['MachineAttrGLIDEIN_CMSSite0'] = site
+
+    def leaveQueue(self, gridId):
+        jobAd = self.queue.pop(gridId)
+        jobAd['JobStatus'] = 4
+        jobAd['EnteredCurrentStatus'] = int(time.time())
+        self.historyAds.append(jobAd)
+
+    @staticmethod
+    def _filter(constraint, jobAds):
+        match = ECS_RE.search(constraint)
+        since = int(match.group(1)) if match else None
+        for jobAd in jobAds:
+            if since is None or jobAd['EnteredCurrentStatus'] >= since:
+                yield jobAd
+
+    def xquery(self, constraint, projection):
+        for jobAd in self._filter(constraint, list(self.queue.values())):
+            yield dict((key, jobAd[key]) for key in projection if key in jobAd)
+
+    def history(self, constraint, projection):
+        for jobAd in self._filter(constraint, self.historyAds):
+            yield dict((key, jobAd[key]) for key in projection if key in jobAd)
+
+
+class SimpleCondorPluginTrackTest(unittest.TestCase):
+    """
+    Test the condor tracking with a mock schedd
+    """
+
+    def setUp(self):
+        myThread = threading.currentThread()
+        myThread.logger = logging.getLogger()
+        myThread.dbi = None
+        self.schedd = MockSchedd()
+        self.patchers = [mock.patch('WMCore.BossAir.Plugins.SimpleCondorPlugin.DAOFactory'),
+                         mock.patch('WMCore.BossAir.Plugins.SimpleCondorPlugin.Proxy'),
+                         mock.patch('WMCore.BossAir.Plugins.SimpleCondorPlugin.htcondor.Schedd',
+                                    return_value=self.schedd)]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    @staticmethod
+    def getConfig(incremental):
+        config = Configuration()
+        config.section_("Agent")
+        config.Agent.agentName = "testAgent"
+        config.section_("JobSubmitter")
+        config.JobSubmitter.submitScript = "submit.sh"
+        config.section_("BossAir")
+        config.BossAir.incrementalTracking = incremental
+        return config
+
+    @staticmethod
+    def createJobs(gridIds):
+        return [{'jobid': idx, 'gridid': gridId, 'status': 'Idle', 'location': None}
+                for idx, gridId in enumerate(gridIds)]
+
+    def _track(self, plugin, jobs):
+        """
+        Run track and return the gridIds of the running, changed and complete jobs
+        """
+        results = plugin.track(jobs)
+        return [sorted(job['gridid'] for job in jobList) for jobList in results]
+
+    def testTrackingModes(self):
+        """
+        Full and incremental tracking must report the same transitions
+        """
+        gridIds = ["1.%d" % i for i in range(10)]
+        for gridId in gridIds:
+            self.schedd.submit(gridId)
+
+        fullPlugin = SimpleCondorPlugin(self.getConfig(False))
+        incrPlugin = SimpleCondorPlugin(self.getConfig(True))
+        fullJobs = self.createJobs(gridIds)
+        incrJobs = self.createJobs(gridIds)
+
+        # first cycle: nothing changed, the incremental plugin bootstraps
+        self.assertEqual(self._track(fullPlugin, fullJobs), [gridIds, [], []])
+        self.assertEqual(self._track(incrPlugin, incrJobs), [gridIds, [], []])
+
+        # second cycle: some jobs start running, one is held and one leaves the queue
+        self.schedd.setStatus("1.1", 2, site="T2_CH_CERN")
+        self.schedd.setStatus("1.2", 2, site="T1_US_FNAL")
+        self.schedd.setStatus("1.3", 5)
+        self.schedd.leaveQueue("1.4")
+        expected = [sorted(set(gridIds) - {"1.3", "1.4"}), ["1.1", "1.2", "1.3", "1.4"], ["1.3", "1.4"]]
+        self.assertEqual(self._track(fullPlugin, fullJobs), expected)
+        self.assertEqual(self._track(incrPlugin, incrJobs), expected)
+        self.assertEqual(incrJobs[1]['location'], "T2_CH_CERN")
+        self.assertEqual(incrJobs[1]['globalState'], 'Running')
+        self.assertNotIn("1.4", incrPlugin.condorJobInfo)
+
+        # third cycle with the remaining jobs
+        remaining = [job for job in incrJobs if job['gridid'] not in ("1.3", "1.4")]
+        self.schedd.leaveQueue("1.1")
+        self.schedd.submit("2.0")
+        newJob = self.createJobs(["2.0"])
+        result = self._track(incrPlugin, remaining + newJob)
+        self.assertEqual(result[2], ["1.1"])
+        self.assertIn("2.0", result[0])
+
+    def testFullRefresh(self):
+        """
+        Test that the incremental mode refreshes the whole map periodically
+        """
+        self.schedd.submit("1.0")
+        plugin = SimpleCondorPlugin(self.getConfig(True))
+        plugin.track(self.createJobs(["1.0"]))
+        # a job forgotten by the history is only removed by a full refresh
+        self.schedd.queue.pop("1.0")
+        plugin.track(self.createJobs(["1.0"]))
+        self.assertIn("1.0", plugin.condorJobInfo)
+        plugin.lastFullTrackTime -= plugin.fullTrackingInterval
+        result = self._track(plugin, self.createJobs(["1.0"]))
+        self.assertEqual(result[2], ["1.0"])
+        self.assertEqual(plugin.condorJobInfo, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
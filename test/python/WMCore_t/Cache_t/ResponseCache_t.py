@@ -0,0 +1,73 @@
+"""
+_ResponseCache_t_
+
+Test class for the ResponseCache
+"""
+from __future__ import print_function, division
+
+import threading
+import unittest
+
+from WMCore.Cache.ResponseCache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def testLRU(self):
+        """
+        _testLRU_
+
+        The least recently used payloads are evicted first
+        """
+        cache = ResponseCache(maxBytes=10)
+        self.assertTrue(cache.put('a', 'aaaa'))
+        self.assertTrue(cache.put('b', b'bbbb'))
+        self.assertEqual(cache.get('a')[0], 'aaaa')
+        self.assertTrue(cache.get('a')[1] >= 0)
+        cache.put('c', 'cccc')
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b'), (None, None))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.currentBytes, 8)
+        self.assertEqual(cache.evictions, 1)
+
+        # replacing a payload updates the size
+        cache.put('a', 'a')
+        self.assertEqual(cache.currentBytes, 5)
+
+        # too large payloads are not cached
+        self.assertFalse(cache.put('d', 'd' * 11))
+        self.assertNotIn('d', cache)
+        self.assertEqual(len(cache), 2)
+
+        cache.pop('a')
+        cache.pop('notThere')
+        self.assertEqual(cache.currentBytes, 4)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.currentBytes, 0)
+
+    def testThreads(self):
+        """
+        _testThreads_
+
+        Concurrent puts keep the size accounting consistent
+        """
+        cache = ResponseCache(maxBytes=1000)
+
+        def worker(prefix):
+            for idx in range(2000):
+                cache.put('%s%d' % (prefix, idx % 50), 'x' * (idx % 20))
+                cache.get('%s%d' % (prefix, (idx + 1) % 50))
+
+        threads = [threading.Thread(target=worker, args=(prefix,)) for prefix in 'abcd']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(cache.currentBytes <= 1000)
+        self.assertEqual(cache.currentBytes, sum(len(cache.get(key)[0]) for key in list(cache._entries)))
+
+
+if __name__ == '__main__':
+    unittest.main()
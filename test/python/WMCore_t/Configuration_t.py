@@ -2,6 +2,7 @@
 #pylint: disable=E1101,C0103,R0902
 
 
+import pickle
 import unittest
 
 from Utils.PythonVersion import PY3
@@ -326,6 +327,37 @@ class ConfigurationTest(unittest.TestCase):
             self.assertFalse(isinstance(values, ConfigSection))
         self.assertEqual(d["Task1"]["subSection"]["value3"], "MyValue3")
 
+    def testI_ConfigSectionPickle(self):
+        """
+        Test that the ConfigSection internal layout is kept, such that
+        pickled objects can be exchanged with older and newer releases.
+        """
+        config = ConfigSection("config")
+        config.value1 = "MyValue1"
+        setattr(config, "".join(["value", "2"]), [1, {"a": 2.0}])
+        config.section_("Task1")
+        config.Task1.section_("subSection")
+        config.Task1.subSection.value3 = None
+        self.assertIs(config.section_("Task1"), config.Task1)
+        self.assertIs(config.Task1._internal_parent_ref, config)
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            newConfig = pickle.loads(pickle.dumps(config, protocol=protocol))
+            self.assertEqual(sorted(newConfig.__dict__), sorted(config.__dict__))
+            self.assertIsInstance(newConfig._internal_settings, set)
+            self.assertIsInstance(newConfig._internal_children, set)
+            self.assertEqual(newConfig._internal_settings, {"value1", "value2", "Task1"})
+            self.assertEqual(newConfig._internal_children, {"Task1"})
+            self.assertEqual(newConfig.value2, [1, {"a": 2.0}])
+            self.assertIs(newConfig.Task1._internal_parent_ref, newConfig)
+            self.assertEqual(sorted(newConfig.pythonise_()), sorted(config.pythonise_()))
+            self.assertEqual(newConfig.dictionary_whole_tree_(), config.dictionary_whole_tree_())
+
+        # objects pickled before the _internal_skipChecks flag existed
+        del config._internal_skipChecks
+        newConfig = pickle.loads(pickle.dumps(config))
+        self.assertRaises(RuntimeError, setattr, newConfig, "value4", [object()])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+_CompiledLumiMask_t_
+
+Unit tests for the WMCore.DataStructs.CompiledLumiMask class
+"""
+from __future__ import division
+
+import pickle
+import random
+import unittest
+
+from WMCore.DataStructs.CompiledLumiMask import CompiledLumiMask
+from WMCore.DataStructs.Mask import Mask
+from WMCore.DataStructs.Run import Run
+from WMCore.JobSplitting.LumiBased import isGoodLumi, isGoodRun
+
+
+def makeGoldenJSON(numRuns=800, firstRun=315000, seed=1234):
+    """
+    Build a Golden JSON like compact list, with string run numbers and a few
+    certified lumi ranges per run, similar to a full year of data taking
+    """
+    rand = random.Random(seed)
+    goldenJSON = {}
+    for run in range(firstRun, firstRun + numRuns * 3, 3):
+        lumiRanges = []
+        lumi = rand.randint(1, 20)
+        for _ in range(rand.randint(1, 25)):
+            lastLumi = lumi + rand.randint(0, 150)
+            lumiRanges.append([lumi, lastLumi])
+            lumi = lastLumi + rand.randint(2, 40)
+        goldenJSON[str(run)] = lumiRanges
+    return goldenJSON
+
+
+class CompiledLumiMaskTest(unittest.TestCase):
+    """
+    _CompiledLumiMaskTest_
+    """
+
+    def testMembership(self):
+        """
+        Ranges are merged, and lumis are looked up in them
+        """
+        mask = CompiledLumiMask({"1": [[20, 30], [1, 5], [6, 8], [25, 40], [50, 50]],
+                                 2: [[7, 3]],
+                                 "3": [],
+                                 "4": [[1, 2, 3]]})
+        self.assertEqual(mask.getCompactList(), {1: [[1, 8], [20, 40], [50, 50]],
+                                                 2: [[3, 7]], 3: [], 4: []})
+        self.assertEqual(mask.runs(), [1, 2, 3, 4])
+        self.assertEqual(len(mask), 4)
+        self.assertTrue(mask.hasRun("1"))
+        self.assertTrue(mask.hasRun(3))
+        self.assertFalse(mask.hasRun(5))
+        for lumi in (1, 8, 20, 33, 40, 50):
+            self.assertTrue(mask.contains(1, lumi))
+        for lumi in (0, 9, 19, 41, 49, 51):
+            self.assertFalse(mask.contains(1, lumi))
+        self.assertTrue(mask.contains("2", 5))
+        self.assertFalse(mask.contains(3, 1))
+        self.assertFalse(mask.contains(5, 1))
+        self.assertEqual(mask.containsMany(1, [9, 8, 50, 100]), [False, True, True, False])
+        self.assertEqual(mask.containsMany(5, [1, 2]), [False, False])
+
+        self.assertEqual(mask.filterLumis(1, [0, 1, 2, 9, 20, 45, 50, 51]), [1, 2, 20, 50])
+        self.assertEqual(mask.filterLumis(1, [50, 2, 9, 1]), [50, 2, 1])
+        self.assertEqual(mask.filterLumis(5, [1, 2]), [])
+
+        # an empty mask accepts everything
+        emptyMask = CompiledLumiMask()
+        self.assertTrue(emptyMask.acceptAll)
+        self.assertFalse(emptyMask)
+        self.assertTrue(emptyMask.contains(1, 1))
+        self.assertEqual(emptyMask.filterLumis(1, [3, 1]), [3, 1])
+
+    def testFilterRuns(self):
+        """
+        Run objects are filtered, keeping their event counts
+        """
+        mask = CompiledLumiMask({1: [[3, 4], [7, 9]], 2: [[1, 1]]})
+        runs = [Run(1, *[(9, 500), (10, 500)]), Run(1, *[(3, 500), (4, 500)]),
+                Run(1, *[(7, 500), (8, 500)]), Run(2, 2, 3), Run(3, 1)]
+        newRuns = mask.filterRuns(runs)
+        self.assertEqual(len(newRuns), 1)
+        run = newRuns.pop()
+        self.assertEqual(run.run, 1)
+        self.assertEqual(run.lumis, [3, 4, 7, 8, 9])
+        self.assertEqual(run.getEventsByLumi(9), 500)
+        # the input runs are left untouched
+        self.assertEqual(runs[0].lumis, [9, 10])
+
+    def testSplittingHelpers(self):
+        """
+        isGoodRun and isGoodLumi give the same answers with a compiled mask
+        """
+        goldenJSON = makeGoldenJSON(numRuns=50)
+        compiledMask = CompiledLumiMask(goldenJSON)
+        for run in range(315000, 315200):
+            self.assertEqual(isGoodRun(goldenJSON, run), isGoodRun(compiledMask, run))
+            for lumi in range(0, 300, 7):
+                self.assertEqual(isGoodLumi(goldenJSON, run, lumi), isGoodLumi(compiledMask, run, lumi))
+        self.assertTrue(isGoodLumi(CompiledLumiMask({}), 1, 1))
+
+    def testMask(self):
+        """
+        The mask lookups follow the changes of its ranges, including the ones
+        made in place
+        """
+        mask = Mask()
+        mask.addRunAndLumis(run=1, lumis=[1, 10])
+        self.assertTrue(mask.runLumiInMask(1, 5))
+        self.assertFalse(mask.runLumiInMask(1, 15))
+        mask.addRunAndLumis(run=1, lumis=[11, 20])
+        self.assertTrue(mask.runLumiInMask(1, 15))
+        mask.addRunWithLumiRanges(run=1, lumiList=[[30, 40]])
+        self.assertFalse(mask.runLumiInMask(1, 15))
+        mask['runAndLumis'][2] = [[1, 1]]
+        self.assertTrue(mask.runLumiInMask(2, 1))
+
+        newMask = pickle.loads(pickle.dumps(mask))
+        self.assertEqual(newMask, mask)
+        self.assertTrue(newMask.runLumiInMask(1, 35))
+
+        # ranges modified in place, or replaced by the same number of ranges
+        mask = Mask()
+        mask.addRunWithLumiRanges(run=1, lumiList=[[1, 5]])
+        self.assertFalse(mask.runLumiInMask(1, 7))
+        mask['runAndLumis'][1][0][1] = 10
+        self.assertTrue(mask.runLumiInMask(1, 7))
+        mask['runAndLumis'][1] = [[20, 30]]
+        self.assertTrue(mask.runLumiInMask(1, 25))
+        self.assertFalse(mask.runLumiInMask(1, 7))
+        runs = [Run(1, 7, 25), Run(2, 1)]
+        self.assertEqual([(run.run, run.lumis) for run in mask.filterRunLumisByMask(runs)], [(1, [25])])
+        mask['runAndLumis'][1][0][0] = 5
+        filtered = mask.filterRunLumisByMask(runs)
+        self.assertEqual([(run.run, sorted(run.lumis)) for run in filtered], [(1, [7, 25])])
+        compiledMask = mask.getCompiledMask()
+        self.assertTrue(compiledMask.contains(1, 7))
+        mask.addRunWithLumiRanges(run=2, lumiList=[[1, 1]])
+        self.assertFalse(compiledMask.contains(2, 1))
+        self.assertTrue(mask.getCompiledMask().contains(2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+_CMSCouchBulk_t_
+
+Unit tests for the CMSCouch bulk and paged reads, and for the document
+coalescer, run against a minimal in-process HTTP server emulating the CouchDB
+view, list and _all_docs APIs. The emulated view emits the value of each
+document as key, and the emulated list function returns the documents whose
+value is not a multiple of 3.
+"""
+from __future__ import division
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlparse
+
+from WMCore.Database.CMSCouch import Database, DocumentCoalescer, CouchNotFoundError
+
+NUM_DOCS = 2000
+
+
+class FakeCouchHandler(BaseHTTPRequestHandler):
+    """
+    Serve the rows of the fake database for view and _all_docs requests
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _viewRows(self, query):
+        """
+        Select the view rows, sorted by key and document id, like CouchDB
+        """
+        descending = query.get("descending", False)
+        rows = sorted(((doc["value"], docId) for docId, doc in self.server.docs.items()), reverse=descending)
+
+        def compare(row, key, docId):
+            bound = (key, docId) if docId is not None else (key,)
+            value = (row[:len(bound)] > bound) - (row[:len(bound)] < bound)
+            return -value if descending else value
+
+        if "startkey" in query:
+            rows = [row for row in rows if compare(row, query["startkey"], query.get("startkey_docid")) >= 0]
+        if "endkey" in query:
+            rows = [row for row in rows if compare(row, query["endkey"], query.get("endkey_docid")) <= 0]
+        rows = rows[query.get("skip", 0):]
+        if "limit" in query:
+            rows = rows[:query["limit"]]
+        return rows
+
+    def do_GET(self):
+        self.server.countRequest()
+        url = urlparse(self.path)
+        query = dict((key, json.loads(value)) for key, value in parse_qsl(url.query))
+        rows = self._viewRows(query)
+        self.server.rowsRead.append(len(rows))
+        if "/_list/" in url.path:
+            self._reply([self.server.docs[docId] for key, docId in rows if key % 3])
+        else:
+            self._reply({"total_rows": NUM_DOCS, "offset": 0,
+                         "rows": [{"id": docId, "key": key, "value": None} for key, docId in rows]})
+
+    def do_POST(self):
+        self.server.countRequest()
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        includeDocs = "include_docs=true" in self.path
+        rows = []
+        for key in data["keys"]:
+            if key not in self.server.docs:
+                rows.append({"key": key, "error": "not_found"})
+                continue
+            row = {"id": key, "key": key, "value": {"rev": "1-abc"}}
+            if includeDocs:
+                row["doc"] = self.server.docs[key]
+            rows.append(row)
+        self._reply({"total_rows": NUM_DOCS, "offset": 0, "rows": rows})
+
+
+class FakeCouchServer(ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server counting requests and connections
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), FakeCouchHandler)
+        self.docs = dict(("doc%d" % idx, {"_id": "doc%d" % idx, "_rev": "1-abc", "value": idx})
+                         for idx in range(NUM_DOCS))
+        self.requests = 0
+        self.connections = 0
+        self.rowsRead = []
+        self.lock = threading.Lock()
+
+    def countRequest(self):
+        with self.lock:
+            self.requests += 1
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        ThreadingMixIn.process_request(self, request, client_address)
+
+
+class CMSCouchBulkTest(unittest.TestCase):
+    """
+    Test the CMSCouch bulk reads and document coalescer
+    """
+
+    def setUp(self):
+        self.server = FakeCouchServer()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        # no credentials are used over http, but they must exist
+        fd, self.credentials = tempfile.mkstemp()
+        os.close(fd)
+        self.db = Database("cmscouch_bulk_t", url=url, ckey=self.credentials, cert=self.credentials)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.remove(self.credentials)
+
+    def testBulkLoadView(self):
+        """
+        The rows of all the slices are returned in the order of the keys
+        """
+        keys = ["doc%d" % idx for idx in range(0, NUM_DOCS, 2)] + ["missing"]
+        result = self.db.bulkLoadView("design", "view", {"reduce": False}, keys, sliceSize=100)
+        self.assertEqual(self.server.requests, 11)
+        self.assertEqual(result["total_rows"], NUM_DOCS)
+        self.assertEqual([row["key"] for row in result["rows"]], keys)
+
+        # streamed rows
+        rows = self.db.bulkLoadView("design", "view", keys=keys, sliceSize=100, stream=True)
+        self.assertFalse(isinstance(rows, (dict, list)))
+        self.assertEqual([row["key"] for row in rows], keys)
+
+        # without keys, the whole view is read with a single request
+        self.assertEqual(len(self.db.bulkLoadView("design", "view")["rows"]), NUM_DOCS)
+
+        # the connections are kept alive, one per thread at most
+        self.assertTrue(self.server.connections <= 5)
+
+    def testBulkAllDocs(self):
+        """
+        Documents are read in slices
+        """
+        keys = ["doc%d" % idx for idx in range(NUM_DOCS)]
+        result = self.db.bulkAllDocs({"include_docs": True}, keys, sliceSize=300, numThreads=3)
+        self.assertEqual(self.server.requests, 7)
+        self.assertEqual([row["doc"]["value"] for row in result["rows"]], list(range(NUM_DOCS)))
+
+    def testDocumentCoalescer(self):
+        """
+        Concurrent document calls are merged in a few requests
+        """
+        coalescer = DocumentCoalescer(self.db, maxDelay=0.05, maxBatch=50)
+        results = {}
+        errors = []
+
+        def getDocument(docId):
+            try:
+                results[docId] = coalescer.document(docId)
+            except CouchNotFoundError as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=getDocument, args=("doc%d" % (idx % 100),)) for idx in range(200)]
+        threads.append(threading.Thread(target=getDocument, args=("missing",)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 100)
+        self.assertEqual(results["doc42"]["value"], 42)
+        self.assertEqual(results["doc42"]["_id"], "doc42")
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].data, "missing")
+        self.assertTrue(coalescer.requests < 20)
+        self.assertEqual(coalescer.requests, self.server.requests)
+
+    def testIterView(self):
+        """
+        Views are read in pages
+        """
+        keys = [row["key"] for row in self.db.iterView("design", "view", pageSize=300)]
+        self.assertEqual(keys, list(range(NUM_DOCS)))
+        self.assertEqual(self.server.requests, 7)
+        self.assertTrue(max(self.server.rowsRead) <= 301)
+
+        options = {"startkey": 1500, "endkey": 100, "descending": True, "skip": 10, "limit": 950}
+        keys = [row["key"] for row in self.db.iterView("design", "view", options, pageSize=100)]
+        self.assertEqual(keys, list(range(1490, 540, -1)))
+
+        keys = [row["key"] for row in self.db.iterView("design", "view", {"key": 42})]
+        self.assertEqual(keys, [42])
+
+    def testIterList(self):
+        """
+        List functions are run over pages of the view
+        """
+        options = {"descending": True, "include_docs": True, "num_elem": 9999999}
+        docs = list(self.db.iterList("design", "list", "view", options, pageSize=250))
+        self.assertEqual([doc["value"] for doc in docs], [idx for idx in range(NUM_DOCS - 1, -1, -1) if idx % 3])
+        # 8 pages of view keys and 8 pages of documents
+        self.assertEqual(self.server.requests, 16)
+        self.assertTrue(max(self.server.rowsRead) <= 251)
+
+        docs = list(self.db.iterList("design", "list", "view", {"startkey": 10, "endkey": 20}, pageSize=4))
+        self.assertEqual([doc["value"] for doc in docs], [10, 11, 13, 14, 16, 17, 19, 20])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+_DBCoreProfile_t_
+
+Unit tests for the DAO timers of DBInterface and the result formatting of
+DBFormatter, using an in-memory SQLite database as a stand-in for
+MySQL/Oracle.
+"""
+from __future__ import division
+
+import logging
+import unittest
+
+from WMCore.Database.DBFactory import DBFactory
+from WMCore.Database.DBFormatter import DBFormatter
+from WMCore.WMBS.MySQL.Files.GetBulkRunLumi import GetBulkRunLumi
+from WMCore.WMBS.MySQL.Subscriptions.GetAvailableFiles import GetAvailableFiles
+
+
+class InsertFiles(DBFormatter):
+    """
+    Minimal DAO inserting files
+    """
+    sql = "INSERT INTO test_files (id, lfn, size) VALUES (:id, :lfn, :size)"
+
+    def execute(self, files, conn=None, transaction=False):
+        self.dbi.processData(self.sql, files, conn=conn, transaction=transaction)
+
+
+class LoadFiles(DBFormatter):
+    """
+    Minimal DAO loading files by lfn
+    """
+    sql = "SELECT id, lfn, size FROM test_files WHERE lfn = :lfn"
+
+    def execute(self, lfns, conn=None, transaction=False):
+        binds = [{'lfn': lfn} for lfn in lfns]
+        return self.formatDict(self.dbi.processData(self.sql, binds, conn=conn, transaction=transaction))
+
+
+class DBCoreProfileTest(unittest.TestCase):
+    """
+    Time large bind sets going through processData
+    """
+
+    def setUp(self):
+        self.logger = logging.getLogger()
+        self.dbi = DBFactory(self.logger, dburl="sqlite://").connect()
+        self.conn = self.dbi.connection()
+        self.dbi.processData("CREATE TABLE test_files (id INTEGER PRIMARY KEY, lfn VARCHAR(500), size INTEGER)",
+                             conn=self.conn)
+
+    def tearDown(self):
+        self.dbi.processData("DROP TABLE test_files", conn=self.conn)
+        self.conn.close()
+
+    def testDAOStats(self):
+        """
+        Test the timing counters per DAO class and the chunking of large bind sets
+        """
+        numFiles = 2345
+        files = [{'id': i, 'lfn': "/store/data/%08d.root" % i, 'size': i} for i in range(numFiles)]
+        self.assertEqual(self.dbi.getDAOStats(), {})
+
+        self.dbi.enableDAOStats()
+        InsertFiles(self.logger, self.dbi).execute(files, conn=self.conn)
+        result = LoadFiles(self.logger, self.dbi).execute([f['lfn'] for f in files[:10]], conn=self.conn)
+        self.assertEqual(sorted(row['id'] for row in result), list(range(10)))
+
+        stats = self.dbi.getDAOStats()
+        insertStats = stats["%s.InsertFiles" % __name__]
+        self.assertEqual(insertStats['calls'], 1)
+        self.assertEqual(insertStats['binds'], numFiles)
+        self.assertEqual(stats["%s.LoadFiles" % __name__]['binds'], 10)
+        self.assertEqual(self.dbi.processData("SELECT COUNT(*) FROM test_files", conn=self.conn)[0].fetchone()[0],
+                         numFiles)
+
+        self.dbi.resetDAOStats()
+        self.assertEqual(self.dbi.getDAOStats(), {})
+        self.dbi.disableDAOStats()
+        InsertFiles(self.logger, self.dbi).execute([{'id': numFiles, 'lfn': "/store/a", 'size': 0}], conn=self.conn)
+        self.assertEqual(self.dbi.getDAOStats(), {})
+
+    def testResultFormats(self):
+        """
+        Test that the columnar and namedtuple result paths match formatDict
+        """
+        files = [{'id': i, 'lfn': "/store/data/%08d.root" % i, 'size': i * 10} for i in range(25)]
+        InsertFiles(self.logger, self.dbi).execute(files, conn=self.conn)
+        formatter = DBFormatter(self.logger, self.dbi)
+        sql = "SELECT id AS ID, lfn, size FROM test_files ORDER BY id"
+
+        expected = formatter.formatDict(self.dbi.processData(sql, conn=self.conn))
+        self.assertEqual(expected, files)
+
+        columns = formatter.formatColumns(self.dbi.processData(sql, conn=self.conn))
+        self.assertEqual(columns, {'id': list(range(25)), 'lfn': [f['lfn'] for f in files],
+                                   'size': [f['size'] for f in files]})
+        self.assertEqual(formatter.fetchColumns(sql, conn=self.conn, size=7), columns)
+        self.assertEqual(formatter.fetchColumns("SELECT id FROM test_files WHERE id < 0", conn=self.conn), {})
+
+        rows = formatter.formatNamedTuples(self.dbi.processData(sql, conn=self.conn))
+        self.assertEqual([row._asdict() for row in rows], expected)
+        self.assertEqual(rows[3].lfn, files[3]['lfn'])
+        rows = list(formatter.streamNamedTuples(sql, conn=self.conn, size=4))
+        self.assertEqual([dict(row._asdict()) for row in rows], expected)
+        self.assertEqual(list(formatter.streamDict(sql, conn=self.conn, size=4)), expected)
+
+        # many selects at once, through executemany
+        binds = [{'id': 3}, {'id': 5}]
+        columns = formatter.formatColumns(self.dbi.processData("SELECT id, lfn FROM test_files WHERE id = :id",
+                                                               binds, conn=self.conn))
+        self.assertEqual(columns['id'], [3, 5])
+
+    def testMigratedDAOs(self):
+        """
+        Test the DAOs using the columnar results against a minimal WMBS schema
+        """
+        for sql in ["CREATE TABLE wmbs_file_runlumi_map (fileid INTEGER, run INTEGER, lumi INTEGER)",
+                    "CREATE TABLE wmbs_sub_files_available (subscription INTEGER, fileid INTEGER)",
+                    "CREATE TABLE wmbs_file_location (fileid INTEGER, pnn INTEGER)",
+                    "CREATE TABLE wmbs_pnns (id INTEGER, pnn VARCHAR(255))"]:
+            self.dbi.processData(sql, conn=self.conn)
+        try:
+            runLumis = [{'fileid': fileid, 'run': run, 'lumi': lumi}
+                        for fileid in range(3) for run in (1, 2) for lumi in range(fileid + 1)]
+            self.dbi.processData("INSERT INTO wmbs_file_runlumi_map (fileid, run, lumi) VALUES (:fileid, :run, :lumi)",
+                                 runLumis, conn=self.conn)
+            result = GetBulkRunLumi(self.logger, self.dbi).execute(files=[{'id': 1}, {'id': 2}], conn=self.conn)
+            self.assertEqual(result, {1: {1: [0, 1], 2: [0, 1]}, 2: {1: [0, 1, 2], 2: [0, 1, 2]}})
+
+            self.dbi.processData("INSERT INTO wmbs_pnns (id, pnn) VALUES (:id, :pnn)",
+                                 [{'id': 1, 'pnn': 'T2_CH_CERN'}, {'id': 2, 'pnn': 'T1_US_FNAL_Disk'}], conn=self.conn)
+            self.dbi.processData("INSERT INTO wmbs_sub_files_available (subscription, fileid) VALUES (:sub, :fileid)",
+                                 [{'sub': 1, 'fileid': 10}, {'sub': 1, 'fileid': 11}, {'sub': 2, 'fileid': 12}],
+                                 conn=self.conn)
+            self.dbi.processData("INSERT INTO wmbs_file_location (fileid, pnn) VALUES (:fileid, :pnn)",
+                                 [{'fileid': 10, 'pnn': 1}, {'fileid': 10, 'pnn': 2}, {'fileid': 11, 'pnn': 2},
+                                  {'fileid': 12, 'pnn': 1}], conn=self.conn)
+            dao = GetAvailableFiles(self.logger, self.dbi)
+            result = sorted(dao.execute(1, conn=self.conn), key=lambda x: x['file'])
+            self.assertEqual(result, [{'file': 10, 'locations': ['T2_CH_CERN', 'T1_US_FNAL_Disk']},
+                                      {'file': 11, 'locations': ['T1_US_FNAL_Disk']}])
+            resultSets = self.dbi.processData(dao.sql, {'subscription': 1}, conn=self.conn)
+            self.assertEqual(sorted(dao.formatDict(resultSets), key=lambda x: x['file']), result)
+
+            # without locations, the files keep the order of the rows
+            self.assertEqual(dao.formatFiles({'fileid': [12, 10, 12, 11, 10]}),
+                             [{'file': 12}, {'file': 10}, {'file': 11}])
+        finally:
+            for table in ("wmbs_file_runlumi_map", "wmbs_sub_files_available", "wmbs_file_location", "wmbs_pnns"):
+                self.dbi.processData("DROP TABLE %s" % table, conn=self.conn)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -82,6 +82,42 @@ class DBFormatterTest(unittest.TestCase):
         output = dbformatter.formatOneDict(result)
         self.assertEqual(output, {'column3': 'value2a', 'column2': 1, 'column1': 'value1a'})
 
+    def testStreamDict(self):
+        """
+        Test that streaming rows gives the same result as formatDict
+        """
+        self.stuffDB()
+
+        myThread = threading.currentThread()
+        dbformatter = DBFormatter(myThread.logger, myThread.dbi)
+
+        expected = dbformatter.formatDict(myThread.dbi.processData(self.selectSQL))
+        output = list(dbformatter.streamDict(self.selectSQL, size=2))
+        self.assertEqual(output, expected)
+
+        cursors = myThread.dbi.processData(self.selectSQL, returnCursor=True)
+        self.assertEqual(list(dbformatter.iterDict(cursors, size=1)), expected)
+
+    def testColumnsAndNamedTuples(self):
+        """
+        Test that the columnar and namedtuple results match formatDict
+        """
+        self.stuffDB()
+
+        myThread = threading.currentThread()
+        dbformatter = DBFormatter(myThread.logger, myThread.dbi)
+
+        expected = dbformatter.formatDict(myThread.dbi.processData(self.selectSQL))
+        columns = dbformatter.formatColumns(myThread.dbi.processData(self.selectSQL))
+        self.assertEqual(sorted(columns), ['column1', 'column2', 'column3'])
+        self.assertEqual(columns['column1'], [row['column1'] for row in expected])
+        self.assertEqual(dbformatter.fetchColumns(self.selectSQL, size=2), columns)
+
+        rows = dbformatter.formatNamedTuples(myThread.dbi.processData(self.selectSQL))
+        self.assertEqual([dict(row._asdict()) for row in rows], expected)
+        rows = list(dbformatter.streamNamedTuples(self.selectSQL, size=2))
+        self.assertEqual([row.column3 for row in rows], [row['column3'] for row in expected])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -122,5 +122,32 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testStatementCache(self):
+        """
+        _testStatementCache_
+
+        Verify that translated statements are cached and reused, giving the same
+        result as a fresh translation, and that the cache is bounded.
+        """
+        sql = "SELECT id FROM wmbs_file_details WHERE lfn = :lfn AND size = :size"
+        myInterface = MySQLInterface(logger = logging, engine = None, statementCacheSize = 2)
+
+        for _ in range(2):
+            (updatedSQL, bindList) = myInterface.substitute(sql, [{"size": 1, "lfn": "/store/a"},
+                                                                  {"size": 2, "lfn": "/store/b"}])
+            self.assertEqual(updatedSQL, "SELECT id FROM wmbs_file_details WHERE lfn = %s AND size = %s")
+            self.assertEqual(bindList, [("/store/a", 1), ("/store/b", 2)])
+        self.assertEqual(len(myInterface._statementCache), 1)
+
+        (updatedSQL, bindList) = myInterface.substitute("SELECT id FROM wmbs_fileset WHERE name = :name",
+                                                        {"name": "fileset"})
+        self.assertEqual(bindList, [("fileset",)])
+        (updatedSQL, bindList) = myInterface.substitute("SELECT id FROM wmbs_fileset", {"name": "fileset"})
+        self.assertEqual(updatedSQL, "SELECT id FROM wmbs_fileset")
+        self.assertEqual(bindList, [()])
+        self.assertEqual(len(myInterface._statementCache), 2)
+
+        return
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+_FileAvailabilityIndex_t_
+
+Unit tests for the subscription file availability index,
+using mock DAOs which emulate the WMBS tables and count the loaded rows.
+"""
+from __future__ import division
+
+import logging
+import threading
+import unittest
+from collections import defaultdict
+
+import mock
+
+from WMCore.DataStructs.Run import Run
+from WMCore.JobSplitting.FileAvailabilityIndex import FileAvailabilityIndex
+from WMCore.JobSplitting.FileBased import FileBased
+
+
+class MockWMBS(object):
+    """
+    Available files of a single subscription, with their locations and run/lumis
+    """
+
+    def __init__(self):
+        self.available = set()
+        self.locations = {}
+        self.rows = defaultdict(int)
+
+    def addFiles(self, fileIDs, pnns):
+        for fileID in fileIDs:
+            self.available.add(fileID)
+            self.locations[fileID] = list(pnns)
+
+
+class MockDAO(object):
+    """
+    Emulate the WMBS DAOs used to load the available files
+    """
+
+    def __init__(self, wmbs, classname):
+        self.wmbs = wmbs
+        self.classname = classname
+
+    def execute(self, *args, **kwargs):
+        wmbs = self.wmbs
+        if self.classname == "Subscriptions.GetAvailableFilesNoLocations":
+            wmbs.rows[self.classname] += len(wmbs.available)
+            return [{'file': fileID} for fileID in wmbs.available]
+        if self.classname == "Subscriptions.GetAvailableFiles":
+            wmbs.rows[self.classname] += len(wmbs.available)
+            return [{'file': fileID, 'locations': wmbs.locations[fileID]} for fileID in wmbs.available]
+        if self.classname == "Files.GetForJobSplittingByID":
+            wmbs.rows[self.classname] += len(kwargs['file'])
+            return dict((fileID, {'id': fileID, 'lfn': '/store/data/%08d.root' % fileID, 'events': 100,
+                                  'first_event': 0, 'minrun': 1, 'size': 1000})
+                        for fileID in kwargs['file'])
+        if self.classname == "Files.GetLocationBulk":
+            wmbs.rows[self.classname] += len(kwargs['files'])
+            return dict((fileID, wmbs.locations[fileID]) for fileID in kwargs['files'])
+        if self.classname == "Files.GetBulkRunLumi":
+            wmbs.rows[self.classname] += len(kwargs['files'])
+            return dict((f['id'], {1: [2 * f['id'], 2 * f['id'] + 1]}) for f in kwargs['files'])
+        if self.classname == "Locations.GetPNNtoPSNMapping":
+            return {}
+        return None
+
+
+class MockDAOFactory(object):
+    """
+    DAOFactory returning MockDAOs
+    """
+
+    def __init__(self, wmbs):
+        self.wmbs = wmbs
+
+    def __call__(self, classname):
+        return MockDAO(self.wmbs, classname)
+
+
+class FileAvailabilityIndexTest(unittest.TestCase):
+    """
+    Test the subscription file availability index
+    """
+
+    def setUp(self):
+        self.wmbs = MockWMBS()
+        self.daoFactory = MockDAOFactory(self.wmbs)
+        myThread = threading.currentThread()
+        self.savedThreadAttrs = dict((attr, getattr(myThread, attr, None)) for attr in ("logger", "dbi", "transaction"))
+        myThread.logger = logging.getLogger()
+        myThread.dbi = mock.MagicMock()
+        myThread.transaction = mock.MagicMock()
+
+    def tearDown(self):
+        myThread = threading.currentThread()
+        for attr, value in self.savedThreadAttrs.items():
+            setattr(myThread, attr, value)
+
+    def testRefresh(self):
+        """
+        Only new files are loaded, files no longer available are dropped
+        """
+        self.wmbs.addFiles(range(1, 7), ["T1_US_FNAL_Disk"])
+        self.wmbs.addFiles(range(7, 11), ["T2_CH_CERN", "T1_US_FNAL_Disk"])
+        index = FileAvailabilityIndex(1, self.daoFactory, rebuildCycles=3)
+        self.assertEqual(index.refresh(), (10, 0))
+        self.assertEqual(len(index), 10)
+        self.assertEqual(index.maxFileID, 10)
+        self.assertEqual(index.locations(), {frozenset(["T1_US_FNAL_Disk"]): 6,
+                                             frozenset(["T2_CH_CERN", "T1_US_FNAL_Disk"]): 4})
+
+        # files at the same locations are fetched together
+        files = index.fetchFiles(6)
+        self.assertEqual(sorted(f['id'] for f in files), list(range(1, 7)))
+        for f in files:
+            self.assertEqual(f['locations'], set(["T1_US_FNAL_Disk"]))
+            self.assertEqual(f['lfn'], '/store/data/%08d.root' % f['id'])
+        # acquired files are skipped
+        index.discard([7, 8])
+        self.assertEqual(sorted(f['id'] for f in index.fetchFiles(6)), [9, 10])
+        self.assertEqual(index.fetchFiles(6), set())
+
+        # acquired out of the job splitting, plus new files, including an older file
+        self.wmbs.available.discard(1)
+        self.wmbs.available.difference_update([7, 8])
+        self.wmbs.addFiles([11, 12], ["T2_CH_CERN"])
+        self.wmbs.locations[0] = ["T2_CH_CERN"]
+        self.wmbs.available.add(0)
+        self.assertEqual(index.refresh(), (3, 1))
+        self.assertEqual(self.wmbs.rows["Files.GetForJobSplittingByID"], 13)
+        self.assertEqual(sorted(f['id'] for f in index.fetchFiles(20)), [0, 2, 3, 4, 5, 6, 9, 10, 11, 12])
+
+        # periodic rebuild
+        index.refresh()
+        self.assertEqual(self.wmbs.rows["Files.GetForJobSplittingByID"], 13)
+        self.wmbs.locations[2] = ["T2_CH_CERN"]
+        index.refresh()
+        self.assertEqual(index.stats['rebuilds'], 1)
+        self.assertEqual(self.wmbs.rows["Files.GetForJobSplittingByID"], 23)
+        self.assertEqual(index.locations()[frozenset(["T2_CH_CERN"])], 4)
+
+    def testRunLumiCache(self):
+        """
+        Run/lumis of the indexed files are loaded only once
+        """
+        self.wmbs.addFiles(range(1, 5), ["T1_US_FNAL_Disk"])
+        index = FileAvailabilityIndex(1, self.daoFactory)
+        index.refresh()
+        files = list(index.fetchFiles(10))
+        self.assertEqual(index.execute(files=files)[3], {1: [6, 7]})
+        self.assertEqual(index.execute(files=files)[3], {1: [6, 7]})
+        self.assertEqual(self.wmbs.rows["Files.GetBulkRunLumi"], 4)
+        self.assertEqual(index.stats['runLumiHits'], 4)
+
+        # the run/lumis of unknown files are not cached
+        index.discard([3])
+        index.execute(files=files)
+        index.execute(files=files)
+        self.assertEqual(self.wmbs.rows["Files.GetBulkRunLumi"], 6)
+
+        # new File objects are returned, such that the cache is not polluted
+        index.rewind()
+        for f in index.fetchFiles(10):
+            self.assertEqual(len(f['runs']), 0)
+            f.addRun(Run(1, 100))
+
+    def _runFactory(self, index, subscription, limit, **splitParams):
+        """
+        Run the splitting as the JobCreator does, returning the job groups
+        """
+        with mock.patch('WMCore.JobSplitting.JobFactory.DAOFactory', return_value=self.daoFactory):
+            jobFactory = FileBased(package="WMCore.WMBS", subscription=subscription, limit=limit)
+        jobFactory.availabilityIndex = index
+        jobFactory.open()
+        jobGroups = []
+        while jobFactory.grabByProxy:
+            groups = jobFactory(**splitParams)
+            if not groups:
+                break
+            jobGroups.extend(groups)
+        jobFactory.close()
+        return jobGroups
+
+    def testJobFactory(self):
+        """
+        Test the job splitting with the index, in batches of files
+        """
+        subscription = mock.MagicMock()
+        subscription.__getitem__.return_value = "Processing"
+        jobFiles = []
+
+        def bulkCommit(jobGroups):
+            for jobGroup in jobGroups:
+                for job in jobGroup.newjobs:
+                    jobFiles.append(sorted(f['id'] for f in job['input_files']))
+                    self.wmbs.available.difference_update(jobFiles[-1])
+        subscription.bulkCommit.side_effect = bulkCommit
+
+        self.wmbs.addFiles(range(1, 11), ["T1_US_FNAL_Disk"])
+        self.wmbs.addFiles(range(11, 16), ["T2_CH_CERN"])
+        index = FileAvailabilityIndex(1, self.daoFactory)
+        self._runFactory(index, subscription, limit=4, files_per_job=2)
+        self.assertEqual(sorted(fileID for files in jobFiles for fileID in files), list(range(1, 16)))
+        self.assertEqual(len(index), 0)
+        self.assertEqual(self.wmbs.available, set())
+        self.assertEqual(index.stats['refreshes'], 1)
+
+        # next cycle only loads the new files
+        self.wmbs.addFiles(range(16, 19), ["T2_CH_CERN"])
+        del jobFiles[:]
+        self._runFactory(index, subscription, limit=100, files_per_job=2)
+        self.assertEqual(jobFiles, [[16, 17], [18]])
+        self.assertEqual(self.wmbs.rows["Files.GetForJobSplittingByID"], 18)
+
+
+if __name__ == '__main__':
+    unittest.main()
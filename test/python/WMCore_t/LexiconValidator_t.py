@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+_LexiconValidator_t_
+
+Unit tests for the precompiled and bulk Lexicon validator
+"""
+from __future__ import print_function, division
+
+import unittest
+
+from WMCore import Lexicon
+from WMCore.LexiconValidator import LexiconValidator, getLexiconValidator
+
+GOOD_LFNS = ['/store/mc/Fall10/DYToMuMu_M-20_TuneZ2_7TeV-pythia6/AODSIM/START38_V12-v1/0003/C0F3344F-6EC8-DF11-8ED6-E41F13181020.root',
+             '/store/temp/user/cinquilli.nocern/Higgs-123/PrivateSample/v1/1000/a_X-2.root',
+             '/store/group/Exotica/Higgs-123/PrivateSample/v1/1000/a_X-2.root',
+             '/store/temp/lustre1/acquisition_10-A/MuElectron-10_100/RAW-RECO/vX-1/1000/a_X-2.root',
+             '/store/data/Run2010A/Cosmics/RECO/v4/000/143/316/0000/F65F4AFE-14AC-DF11-B3BE-00215E21F32E.root',
+             '/store/backfill/1/unmerged/data/Run2010A/Cosmics/RECO/v4/000/143/316/0000/F65F4AFE-14AC-DF11-B3BE-00215E21F32E.root',
+             '/store/lhe/10860/LQToUE_BetaHalf_vector_YM-MLQ300LG0KG0.lhe.xz',
+             '/store/results/qcd/StoreResults/QCD_Pt_40_2017_14TeV_612_SLHC6_patch1/USER/QCD_Pt_40_2017_14TeV_612_SLHC6_patch1_6be6d116203e430d91d7e1d6d9a88cd7-v1/00000/028DDC2A-63A8-E311-BB40-842B2B5546DE.root']
+
+BAD_LFNS = ['/store/data/../../etc/passwd',
+            '/Store/data/Run2010A/Cosmics/RECO/v4/000/143/316/0000/F65F4AFE.root',
+            'store/data/Run2010A/Cosmics/RECO/v4/000/143/316/0000/F65F4AFE.root',
+            '/store/lhe/abc/file.lhe',
+            '']
+
+
+class LexiconValidatorTest(unittest.TestCase):
+    """
+    Compare the LexiconValidator results against the Lexicon functions
+    """
+
+    def setUp(self):
+        self.validator = LexiconValidator()
+
+    @staticmethod
+    def _lexiconFailures(func, candidates):
+        """
+        Return the indexes of the candidates rejected by a Lexicon function
+        """
+        failed = []
+        for idx, candidate in enumerate(candidates):
+            try:
+                func(candidate)
+            except AssertionError:
+                failed.append(idx)
+        return failed
+
+    def testLFNs(self):
+        """
+        Test bulk LFN validation
+        """
+        candidates = GOOD_LFNS + BAD_LFNS
+        expected = self._lexiconFailures(Lexicon.lfn, candidates)
+        self.assertEqual(self.validator.lfns(candidates), expected)
+        self.assertEqual(expected, list(range(len(GOOD_LFNS), len(candidates))))
+        # now from the memo
+        self.assertEqual(self.validator.lfns(candidates), expected)
+
+        self.assertTrue(self.validator.check('lfn', GOOD_LFNS[0]))
+        with self.assertRaises(AssertionError) as context:
+            self.validator.check('lfn', BAD_LFNS[0])
+        self.assertIn("doesn't match any of the following regular expressions", str(context.exception))
+
+    def testLFNBases(self):
+        """
+        Test bulk LFN base validation
+        """
+        candidates = ['/store/temp/user/ewv/Higgs-123/PrivateSample/v1',
+                      '/store/data/acquisition_10-A/MuElectron-10_100/RAW-RECO/vX-1',
+                      '/store/unmerged/data/Run2010A/Cosmics/RECO/v4/000/143/316',
+                      '/store/results/qcd/StoreResults/QCD_Pt_40/USER/QCD_Pt_40_6be6d116203e430d91d7e1d6d9a88cd7-v1',
+                      '/store/temp/user/ewv/Higgs-123/PrivateSample',
+                      '/store/Temp/user/ewv/Higgs-123/PrivateSample/v1']
+        expected = self._lexiconFailures(Lexicon.lfnBase, candidates)
+        self.assertEqual(self.validator.lfnBases(candidates), expected)
+        self.assertEqual(expected, [4, 5])
+
+    def testDatasetsAndBlocks(self):
+        """
+        Test bulk dataset and block validation
+        """
+        datasets = ['/MinimumBias/Run2018A-v1/RAW', '/a/b/c', '/a/b/c/', 'a/b/C', '/a/b#c/RECO']
+        expected = self._lexiconFailures(Lexicon.dataset, datasets)
+        self.assertEqual(self.validator.datasets(datasets), expected)
+
+        blocks = ['/MinimumBias/Run2018A-v1/RAW#a1b2c3d4-e5f6-7890-abcd-ef1234567890',
+                  '/a/b/C#d', '/a/b/C', '/a/b/C#d#e', '/1a/b/C#d', '/a/b/c#d', '/a/b/C#' + 'd' * 100]
+        expected = self._lexiconFailures(Lexicon.block, blocks)
+        self.assertEqual(self.validator.blocks(blocks), expected)
+        self.assertEqual(expected, [2, 3, 4, 5, 6])
+
+    def testOtherTypes(self):
+        """
+        Test primary/processed dataset and user LFN validation
+        """
+        procDS = ['Run2018A-PromptReco-v1', 'None-v1', 'CMSSW_3_0_0_pre3_IDEAL_30X-v1', 'Summer09-MC_31X_V3-v1',
+                  'Run2018A-v', '-v1', 'a' * 200 + '-v1']
+        self.assertEqual(self.validator.validate('procdataset', procDS),
+                         self._lexiconFailures(Lexicon.procdataset, procDS))
+
+        primDS = ['MinimumBias', 'a-b_c', '1MinBias', 'Min.Bias', '', 'a' * 100]
+        self.assertEqual(self.validator.validate('primdataset', primDS),
+                         self._lexiconFailures(Lexicon.primdataset, primDS))
+
+        userLfns = ['/store/user/ewv/Higgs-123/PrivateSample/v1/a_X-2.tgz', '/store/user/ewv/a']
+        self.assertEqual(self.validator.validate('userLfn', userLfns),
+                         self._lexiconFailures(Lexicon.userLfn, userLfns))
+
+    def testInvalidInput(self):
+        """
+        Test unsupported types and non-string candidates
+        """
+        self.assertRaises(ValueError, self.validator.validate, 'notAType', ['/a/b/c'])
+        self.assertEqual(self.validator.datasets([None, ['/a/b/c'], 1, '/a/b/C']), [0, 1, 2])
+        self.assertIs(getLexiconValidator(), getLexiconValidator())
+
+    def testMemoSize(self):
+        """
+        Test that the memo of validated strings is bounded
+        """
+        validator = LexiconValidator(memoSize=3)
+        validator.lfns(GOOD_LFNS)
+        self.assertEqual(len(validator._memo['lfn']), 3)
+        validator.clearMemo()
+        self.assertEqual(len(validator._memo['lfn']), 0)
+
+        validator = LexiconValidator(memoSize=0)
+        self.assertEqual(validator.lfns(GOOD_LFNS + BAD_LFNS), list(range(len(GOOD_LFNS), len(GOOD_LFNS + BAD_LFNS))))
+        self.assertEqual(len(validator._memo['lfn']), 0)
+
+    def testCompiledRegexpCache(self):
+        """
+        Test that the cache of compiled regular expressions is bounded
+        """
+        for idx in range(Lexicon._MAX_COMPILED_REGEXPS + 10):
+            Lexicon.check("a{%d}" % idx, "a" * idx)
+        self.assertTrue(len(Lexicon._COMPILED_REGEXPS) <= Lexicon._MAX_COMPILED_REGEXPS)
+        self.assertTrue(Lexicon.lfn(GOOD_LFNS[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,16 +7,64 @@ from __future__ import division, print_function
 
 from future.utils import viewitems
 
+import threading
 import time
 # system modules
 import unittest
 from copy import deepcopy
+from queue import Queue
+
+from mock import patch
 
 # WMCore modules
 from WMCore.MicroService.MSMonitor.MSMonitor import MSMonitor
+from WMCore.MicroService.MSMonitor.RuleStatusCache import RuleStatusCache
 from WMQuality.Emulators.EmulatedUnitTestCase import EmulatedUnitTestCase
 from WMQuality.Emulators.ReqMgrAux.MockReqMgrAux import MockReqMgrAux
 
+RULE_DATA = {'name': '/a/b/c', 'state': 'REPLICATING', 'grouping': 'ALL', 'rse_expression': 'T1_US_FNAL_Disk',
+             'locks_ok_cnt': 0, 'locks_replicating_cnt': 0, 'locks_stuck_cnt': 0}
+
+
+class MockRuleRucio(object):
+    """
+    Rucio stand-in returning rules from a dictionary, and recording the calls.
+    The clients created through newClient share the rules and the calls, and
+    record whether any of them is used by two threads at the same time.
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self.calls = []
+        self.clients = []
+        self.overlaps = 0
+        self.lock = threading.Lock()
+
+    def newClient(self, **kwargs):
+        "Return a new client sharing the state of this one"
+        client = MockRuleRucioClient(self)
+        with self.lock:
+            self.clients.append(client)
+        return client
+
+
+class MockRuleRucioClient(object):
+    "Rucio client stand-in, see MockRuleRucio"
+
+    def __init__(self, shared):
+        self.shared = shared
+        self.busy = False
+
+    def getRule(self, ruleId):
+        with self.shared.lock:
+            self.shared.calls.append(ruleId)
+            if self.busy:
+                self.shared.overlaps += 1
+            self.busy = True
+        time.sleep(0.01)
+        self.busy = False
+        return self.shared.rules.get(ruleId, {})
+
 
 class MSMonitorTest(EmulatedUnitTestCase):
     "Unit test for Monitor module"
@@ -97,6 +145,72 @@ class MSMonitorTest(EmulatedUnitTestCase):
         failed = self.ms.updateTransferDocs(transferRecords, workflowsToSkip=[])
         self.assertEqual(len(failed), len(transferRecords))
 
+    def testRulePolling(self):
+        """
+        Test the concurrent rule polling and the rule cache
+        """
+        rucio = MockRuleRucio()
+        self.ms.rucioClients = Queue()
+        rucioPatch = patch('WMCore.MicroService.MSMonitor.MSMonitor.Rucio', side_effect=rucio.newClient)
+        rucioPatch.start()
+        self.addCleanup(rucioPatch.stop)
+        rucio.rules = {'rule1': dict(RULE_DATA, state='OK', locks_ok_cnt=4),
+                       'rule2': dict(RULE_DATA, locks_ok_cnt=1, locks_replicating_cnt=3),
+                       'rule3': dict(RULE_DATA, locks_ok_cnt=2, locks_replicating_cnt=2)}
+        docs = [{'workflowName': 'wf1', 'lastUpdate': 0,
+                 'transfers': [{'transferIDs': ['rule1', 'rule2'], 'completion': []}]},
+                {'workflowName': 'wf2', 'lastUpdate': 0,
+                 'transfers': [{'transferIDs': ['rule3'], 'completion': []},
+                               {'transferIDs': ['rule4'], 'completion': []}]}]
+        self.assertEqual(self.ms.getTransferInfo(docs), ['wf2'])
+        self.assertEqual(docs[0]['transfers'][0]['completion'], [62.5])
+        self.assertEqual(self.ms.ruleStats, dict(fetched=3, skipped=0, failed=1))
+
+        # satisfied and not due rules are not fetched again
+        rucio.calls = []
+        rucio.rules['rule4'] = dict(RULE_DATA, locks_ok_cnt=0, locks_replicating_cnt=0)
+        self.assertEqual(self.ms.getTransferInfo(docs), [])
+        self.assertEqual(rucio.calls, ['rule4'])
+        self.assertEqual(self.ms.ruleStats, dict(fetched=1, skipped=3, failed=0))
+        self.assertEqual(docs[1]['transfers'][0]['completion'], [50.0, 50.0])
+        self.assertEqual(docs[1]['transfers'][1]['completion'], [0])
+
+        # rules whose poll interval expired are fetched again
+        self.ms.ruleCache.rules['rule2']['nextPoll'] = 0
+        rucio.calls = []
+        self.ms.getTransferInfo(docs)
+        self.assertEqual(rucio.calls, ['rule2'])
+
+        # the clients are never shared by threads, and are reused across cycles
+        self.ms.rucioRuleThreads = 4
+        rucio.rules.update(('rule%d' % idx, dict(RULE_DATA)) for idx in range(10, 50))
+        ruleIDs = set(rucio.rules)
+        self.ms._pollRules(ruleIDs)
+        self.assertEqual(rucio.overlaps, 0)
+        self.assertTrue(len(rucio.clients) <= 4)
+        numClients = len(rucio.clients)
+        for ruleID in ruleIDs:
+            if not self.ms.ruleCache.isTerminal(ruleID):
+                self.ms.ruleCache.rules[ruleID]['nextPoll'] = 0
+        self.ms._pollRules(ruleIDs)
+        self.assertEqual(rucio.overlaps, 0)
+        self.assertEqual(len(rucio.clients), numClients)
+
+    def testRulePruning(self):
+        """
+        Rules requested in a cycle are not pruned, even when they are not polled
+        """
+        rucio = MockRuleRucio()
+        self.ms.rucioClients = Queue()
+        self.ms.rucioClients.put(rucio.newClient())
+        rucio.rules = {'rule1': dict(RULE_DATA, state='OK', locks_ok_cnt=4)}
+        self.ms.ruleCache.update('rule1', 'OK', 100.0, now=time.time() - 2 * self.ms.ruleCacheMaxAge)
+        self.ms.ruleCache.update('rule2', 'OK', 100.0, now=time.time() - 2 * self.ms.ruleCacheMaxAge)
+        self.assertEqual(self.ms._pollRules({'rule1'}), set())
+        self.assertEqual(rucio.calls, [])
+        self.assertIn('rule1', self.ms.ruleCache)
+        self.assertNotIn('rule2', self.ms.ruleCache)
+
 
 if __name__ == '__main__':
     unittest.main()
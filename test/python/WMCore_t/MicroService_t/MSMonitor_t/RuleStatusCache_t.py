@@ -0,0 +1,87 @@
+"""
+Unit tests for MSMonitor/RuleStatusCache.py module
+"""
+from __future__ import division, print_function
+
+# system modules
+import os
+import shutil
+import tempfile
+import unittest
+
+# WMCore modules
+from WMCore.MicroService.MSMonitor.RuleStatusCache import RuleStatusCache
+
+
+class RuleStatusCacheTest(unittest.TestCase):
+    "Unit test for the RuleStatusCache module"
+
+    def setUp(self):
+        "init test class"
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def testBackoff(self):
+        """
+        Test the poll intervals of rules which are still replicating
+        """
+        cache = RuleStatusCache(minInterval=10, maxInterval=35)
+        self.assertTrue(cache.isDue('rule1', now=1000))
+        self.assertIsNone(cache.completion('rule1'))
+
+        cache.update('rule1', 'REPLICATING', 50.0, now=1000)
+        self.assertFalse(cache.isDue('rule1', now=1009))
+        self.assertTrue(cache.isDue('rule1', now=1010))
+        self.assertEqual(cache.completion('rule1'), 50.0)
+
+        # no progress, the interval doubles up to maxInterval
+        cache.update('rule1', 'REPLICATING', 50.0, now=1010)
+        self.assertEqual(cache.rules['rule1']['interval'], 20)
+        cache.update('rule1', 'STUCK', 50.0, now=1030)
+        self.assertEqual(cache.rules['rule1']['interval'], 35)
+        self.assertFalse(cache.isDue('rule1', now=1064))
+        self.assertTrue(cache.isDue('rule1', now=1065))
+
+        # progress resets the interval
+        cache.update('rule1', 'REPLICATING', 75.0, now=1065)
+        self.assertEqual(cache.rules['rule1']['interval'], 10)
+
+        # satisfied rules are never polled again
+        cache.update('rule1', 'OK', 100.0, now=1075)
+        self.assertTrue(cache.isTerminal('rule1'))
+        self.assertFalse(cache.isDue('rule1', now=10 ** 10))
+        self.assertEqual(cache.completion('rule1', now=2000), 100.0)
+
+    def testPruneAndPersistence(self):
+        """
+        Test removing old rules and saving the cache across instances
+        """
+        cacheFile = os.path.join(self.tmpDir, 'rules.json')
+        cache = RuleStatusCache(cacheFile=cacheFile)
+        cache.update('rule1', 'OK', 100.0, now=1000)
+        cache.update('rule2', 'REPLICATING', 10.0, now=1000)
+        cache.completion('rule2', now=1500)
+        self.assertEqual(cache.prune(maxAge=200, now=1600), 1)
+        self.assertNotIn('rule1', cache)
+        # requested rules are kept, even if they are not polled
+        cache.markSeen(['rule2', 'unknown'], now=1900)
+        self.assertEqual(cache.prune(maxAge=200, now=2000), 0)
+        self.assertNotIn('unknown', cache)
+        cache.update('rule3', 'OK', 100.0, now=1600)
+        cache.save()
+
+        newCache = RuleStatusCache(cacheFile=cacheFile)
+        self.assertEqual(len(newCache), 2)
+        self.assertTrue(newCache.isTerminal('rule3'))
+        self.assertEqual(newCache.completion('rule2'), 10.0)
+
+        # unreadable cache files are ignored
+        with open(cacheFile, 'w') as fobj:
+            fobj.write("not json")
+        self.assertEqual(len(RuleStatusCache(cacheFile=cacheFile)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
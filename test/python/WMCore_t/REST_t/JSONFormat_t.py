@@ -0,0 +1,138 @@
+"""
+_JSONFormat_t_
+
+Unit tests for the JSONFormat streaming encoder, using WMStats request
+documents as payload.
+"""
+from __future__ import division
+
+import copy
+import json
+import os
+import unittest
+import zlib
+
+import cherrypy
+import mock
+
+from WMCore.REST import Format
+from WMCore.REST.Format import JSONFormat, SHA1ETag, _stream_compress_deflate
+from WMCore.WMBase import getTestBase
+
+
+def wmstatsRequests(numRequests):
+    """
+    Return a dictionary of numRequests WMStats request documents, keyed by
+    request name, like the ReqMgr and WMStats replies
+    """
+    fName = os.path.join(getTestBase(), "WMCore_t/WMStats_t/DataStructs_t/DataCache.json")
+    with open(fName) as fd:
+        docs = json.load(fd)
+    result = {}
+    names = sorted(docs)
+    for idx in range(numRequests):
+        name = names[idx % len(names)]
+        result["%s_%d" % (name, idx)] = copy.deepcopy(docs[name])
+    return result
+
+
+class JSONFormatTest(unittest.TestCase):
+    """
+    Test the JSONFormat encoders
+    """
+
+    def setUp(self):
+        cherrypy.request.rest_generate_data = "result"
+        cherrypy.request.rest_generate_preamble = None
+
+    @staticmethod
+    def _format(fmt, stream, etag=None):
+        etag = etag or SHA1ETag()
+        chunks = list(fmt(stream, etag))
+        return chunks, etag
+
+    @staticmethod
+    def _join(chunks):
+        return b"".join(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8") for chunk in chunks)
+
+    def testLineFormat(self):
+        """
+        The buffered encoder keeps one object per line
+        """
+        stream = [{"a": 1}, [1, 2], "x", None, {"b": {"c": [1.5, True]}}]
+        chunks, _ = self._format(JSONFormat(chunk_size=20), iter(stream))
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+        lines = self._join(chunks).decode("utf-8").splitlines()
+        self.assertEqual(lines[0], '{"result": [')
+        self.assertEqual(lines[-1], ']}')
+        self.assertTrue(lines[1].startswith(" "))
+        self.assertTrue(all(line.startswith(",") for line in lines[2:-1]))
+        self.assertEqual([json.loads(line[1:]) for line in lines[1:-1]], stream)
+        self.assertEqual(json.loads(self._join(chunks)), {"result": stream})
+
+        # with a large chunk size everything fits in a single chunk
+        chunks, _ = self._format(JSONFormat(), stream)
+        self.assertEqual(len(chunks), 1)
+
+    def testStandardBackend(self):
+        """
+        By default, the output and the ETag are the same as the ones of the
+        line by line encoder, whether orjson is installed or not
+        """
+        stream = [wmstatsRequests(150), {"a": [1, 2], "b": float("nan")}, u"caf\u00e9"]
+        legacy, legacyETag = self._format(JSONFormat(chunk_size=0), stream)
+        buffered, bufferedETag = self._format(JSONFormat(chunk_size=4096), stream)
+        self.assertEqual(self._join(legacy), self._join(buffered))
+        self.assertEqual(legacyETag.value(), bufferedETag.value())
+        self.assertTrue(len(buffered) > 1)
+        self.assertIn(b'"caf\\u00e9"', self._join(buffered))
+
+        # orjson is used only when it is enabled and installed
+        with mock.patch.object(Format, "orjson", None):
+            self.assertTrue(JSONFormat(use_orjson=True)._json_dumps is Format._json_dumps_std)
+        self.assertTrue(JSONFormat(use_orjson=False)._json_dumps is Format._json_dumps_std)
+
+    def testGenerators(self):
+        """
+        Iterators and generators are encoded as arrays, at any level
+        """
+        def rowsGen(num):
+            for idx in range(num):
+                yield {"row": idx, "values": iter([idx, idx * 2])}
+
+        stream = ({"rows": rowsGen(3), "name": "test"} for _ in range(2))
+        chunks, _ = self._format(JSONFormat(chunk_size=16), stream)
+        result = json.loads(self._join(chunks))
+        expected = {"rows": [{"row": idx, "values": [idx, idx * 2]} for idx in range(3)], "name": "test"}
+        self.assertEqual(result, {"result": [expected, expected]})
+
+    def testErrors(self):
+        """
+        Errors in the stream are reported and the trailer is still output
+        """
+        def failingStream():
+            yield {"a": 1}
+            yield {"b": object()}
+
+        etag = SHA1ETag()
+        with mock.patch.object(Format, "report_rest_error") as reportError:
+            chunks, etag = self._format(JSONFormat(), failingStream(), etag)
+        self.assertEqual(reportError.call_count, 1)
+        self.assertIsNone(etag.value())
+        # the output ends before the object which failed to encode
+        self.assertEqual(json.loads(self._join(chunks)), {"result": [{"a": 1}]})
+
+    def testCompression(self):
+        """
+        The compressed stream expands to the original output
+        """
+        stream = [wmstatsRequests(100)]
+        chunks, _ = self._format(JSONFormat(chunk_size=8192), stream)
+        compressed = list(_stream_compress_deflate(iter(chunks), 9, 64 * 1024))
+        self.assertTrue(len(compressed) > 1)
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        self.assertEqual(decompressor.decompress(b"".join(compressed)), self._join(chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+_SiteTopology_t_
+
+Unit tests for the indexed CRIC site topology, using the mocked CRIC data
+"""
+from __future__ import division
+
+import json
+import os
+import re
+import threading
+import time
+import unittest
+
+import mock
+
+from WMCore.Services.CRIC.CRIC import CRIC, SiteTopology
+from WMCore.WMBase import getTestBase
+
+
+def loadMapping():
+    """
+    Load the data-processing mapping from the CRIC mock data
+    """
+    mockFile = os.path.join(getTestBase(), '..', 'data', 'Mock', 'CRICMockData.json')
+    with open(mockFile) as fd:
+        return json.load(fd)['data-processing']
+
+
+def scanPNNstoPSNs(mapping, pnns):
+    """
+    Reference implementation, scanning the whole mapping for every PNN
+    """
+    return set(item['psn_name'] for pnn in pnns for item in mapping if item['phedex_name'] == pnn)
+
+
+class SiteTopologyTest(unittest.TestCase):
+    """
+    Compare the SiteTopology lookups against a scan of the mapping
+    """
+
+    def setUp(self):
+        self.mapping = loadMapping()
+        self.topology = SiteTopology(self.mapping)
+        CRIC.clearSiteTopology()
+
+    def tearDown(self):
+        CRIC.clearSiteTopology()
+
+    def testLookups(self):
+        """
+        Test the single and bulk lookups in both directions
+        """
+        allPNNs = set(item['phedex_name'] for item in self.mapping)
+        allPSNs = set(item['psn_name'] for item in self.mapping)
+        self.assertEqual(self.topology.pnns(), allPNNs)
+        self.assertEqual(self.topology.psns(), allPSNs)
+
+        for pnn in allPNNs:
+            self.assertEqual(self.topology.pnnToPsns(pnn), scanPNNstoPSNs(self.mapping, [pnn]))
+        self.assertEqual(self.topology.pnnToPsns("T2_XX_Unknown"), set())
+        self.assertEqual(self.topology.psnToPnns("T2_CH_CERN_HLT"), {"T2_CH_CERN"})
+
+        bulk = self.topology.pnnsToPsnsMap(["T2_CH_CERN", "T2_XX_Unknown"])
+        self.assertEqual(bulk["T2_XX_Unknown"], set())
+        self.assertIn("T2_CH_CERN_HLT", bulk["T2_CH_CERN"])
+        # results can be modified by the caller without affecting the topology
+        bulk["T2_CH_CERN"].add("T2_XX_Unknown")
+        self.assertNotIn("T2_XX_Unknown", self.topology.pnnToPsns("T2_CH_CERN"))
+
+        bulk = self.topology.psnsToPnnsMap(["T2_CH_CERN_HLT", "T2_XX_Unknown"])
+        self.assertEqual(bulk, {"T2_CH_CERN_HLT": {"T2_CH_CERN"}, "T2_XX_Unknown": set()})
+
+    def testPatterns(self):
+        """
+        Test the pattern queries against a full scan
+        """
+        for pattern in ['', 'T1_.*', 'T2_CH_.*', 'T3_XX_.*', '.*_Disk']:
+            expected = {}
+            for item in self.mapping:
+                if re.match(pattern, item['phedex_name']):
+                    expected.setdefault(item['phedex_name'], set()).add(item['psn_name'])
+            self.assertEqual(self.topology.pnnToPsnMap(pattern), expected)
+            # and now from the pattern cache
+            self.assertEqual(self.topology.pnnToPsnMap(pattern), expected)
+
+            expected = {}
+            for item in self.mapping:
+                if re.match(pattern, item['psn_name']):
+                    expected.setdefault(item['psn_name'], set()).add(item['phedex_name'])
+            self.assertEqual(self.topology.psnToPnnMap(pattern), expected)
+
+    def testCRICAPIs(self):
+        """
+        Test the CRIC APIs on top of the topology
+        """
+        with mock.patch.object(CRIC, '_CRICSiteQuery', return_value=self.mapping) as query:
+            cric = CRIC()
+            pnns = ["T1_US_FNAL_Disk", "T2_CH_CERN", "T2_XX_Unknown"]
+            self.assertCountEqual(cric.PNNstoPSNs(pnns), scanPNNstoPSNs(self.mapping, pnns))
+            self.assertCountEqual(cric.PNNstoPSNs("T2_CH_CERN"), scanPNNstoPSNs(self.mapping, ["T2_CH_CERN"]))
+            self.assertCountEqual(cric.PSNstoPNNs(["T2_CH_CERN_HLT", "T2_XX_Unknown"]), ["T2_CH_CERN"])
+            self.assertCountEqual(cric.PSNstoPNNs(["T2_CH_CERN_HLT", "T2_XX_Unknown"], allowPNNLess=True),
+                                  ["T2_CH_CERN", "T2_XX_Unknown"])
+            self.assertEqual(cric.PSNtoPNNMap('T2_CH_CERN_HLT'), {"T2_CH_CERN_HLT": {"T2_CH_CERN"}})
+            self.assertRaises(TypeError, cric.PNNtoPSNMap, 1)
+            # the mapping was only fetched once, and is shared with other instances
+            CRIC().PNNtoPSNMap()
+            self.assertEqual(query.call_count, 1)
+
+    def testSingleFlightRefresh(self):
+        """
+        Test that concurrent callers share a single refresh
+        """
+        def slowQuery(*args, **kwargs):
+            time.sleep(0.2)
+            return self.mapping
+
+        with mock.patch.object(CRIC, '_CRICSiteQuery', side_effect=slowQuery) as query:
+            cric = CRIC()
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(cric.getSiteTopology())) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(query.call_count, 1)
+            self.assertEqual(len(set(id(topology) for topology in results)), 1)
+
+            # expire it
+            CRIC._topologies[cric['endpoint']] = (results[0], 0)
+            self.assertIsNot(cric.getSiteTopology(), results[0])
+            self.assertEqual(query.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
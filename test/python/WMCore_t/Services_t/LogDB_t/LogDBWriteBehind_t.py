@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+_LogDBWriteBehind_t_
+
+Unit tests for the LogDB write-behind buffer, using a mock CouchDB
+database which counts the round-trips.
+"""
+from __future__ import division
+
+import logging
+import time
+import unittest
+
+import mock
+
+from WMCore.Database.CMSCouch import CouchNotFoundError
+from WMCore.Services.LogDB.LogDB import LogDB
+
+
+class MockCouchDB(object):
+    """
+    Minimal emulation of the CMSCouch Database calls done by LogDBBackend
+    """
+
+    def __init__(self):
+        self.name = "logdb_t"
+        self.docs = {}
+        self.calls = 0
+        self.failing = set()
+
+    def _write(self, doc):
+        if doc['_id'] in self.failing:
+            return {'id': doc['_id'], 'error': 'forbidden'}
+        current = self.docs.get(doc['_id'])
+        if current is not None and current['_rev'] != doc.get('_rev'):
+            return {'id': doc['_id'], 'error': 'conflict'}
+        doc = dict(doc)
+        doc['_rev'] = str(int(current['_rev']) + 1 if current else 1)
+        self.docs[doc['_id']] = doc
+        return {'id': doc['_id'], 'rev': doc['_rev']}
+
+    def document(self, docId):
+        self.calls += 1
+        if docId not in self.docs:
+            raise CouchNotFoundError("not_found", {}, 404, "Object Not Found", {})
+        return dict(self.docs[docId])
+
+    def commitOne(self, doc):
+        self.calls += 1
+        return [self._write(doc)]
+
+    def allDocs(self, options=None, keys=None):
+        self.calls += 1
+        rows = []
+        for key in keys:
+            if key in self.docs:
+                row = {'id': key, 'key': key, 'value': {'rev': self.docs[key]['_rev']}}
+                if options.get('include_docs'):
+                    row['doc'] = dict(self.docs[key])
+                rows.append(row)
+            else:
+                rows.append({'key': key, 'error': 'not_found'})
+        return {'rows': rows}
+
+    def post(self, uri, data):
+        self.calls += 1
+        assert uri == '/%s/_bulk_docs/' % self.name
+        if self.failing == {'all'}:
+            raise RuntimeError("CouchDB is down")
+        return [self._write(doc) for doc in data['docs']]
+
+
+class LogDBWriteBehindTest(unittest.TestCase):
+    """
+    Test the LogDB write-behind buffer
+    """
+
+    def setUp(self):
+        self.logger = logging.getLogger('LogDBWriteBehindTest')
+        self.couchDB = MockCouchDB()
+        self.patcher = mock.patch('WMCore.Services.LogDB.LogDBBackend.CouchServer')
+        couchServer = self.patcher.start()
+        couchServer.return_value.connectDatabase.return_value = self.couchDB
+        self.url = "http://localhost:5984/logdb_t"
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def _logdb(self, identifier='agentname', **kwds):
+        # long flush interval, such that the tests control the flushes
+        kwds.setdefault('flush_interval', 3600)
+        logdb = LogDB(self.url, identifier, logger=self.logger, thread_name="MainThread", **kwds)
+        self.addCleanup(logdb.close)
+        return logdb
+
+    def testAgentCoalescing(self):
+        """
+        Agent documents only keep the latest message of each type
+        """
+        logdb = self._logdb(write_behind=True)
+        for idx in range(10):
+            self.assertEqual(logdb.post('request1', 'msg%d' % idx, 'info'), 'buffered')
+        logdb.post('request1', 'an error', 'error')
+        logdb.post('request2', 'other', 'info')
+        self.assertEqual(logdb.post('request1', 'bad type', 'notAType'), 'post-error')
+        self.assertEqual(logdb.pending(), 3)
+        self.assertEqual(self.couchDB.calls, 0)
+
+        self.assertEqual(logdb.flush(), 3)
+        self.assertEqual(self.couchDB.calls, 2)
+        self.assertEqual(logdb.pending(), 0)
+        self.assertEqual(logdb.stats['coalesced'], 9)
+
+        docId = logdb.backend.docid('request1', 'agent-info')
+        self.assertEqual([rec['msg'] for rec in self.couchDB.docs[docId]['messages']], ['msg9'])
+
+        # a second flush updates the existing documents
+        logdb.post('request1', 'msg10', 'info')
+        self.assertEqual(logdb.flush(), 1)
+        self.assertEqual(self.couchDB.docs[docId]['_rev'], '2')
+        self.assertEqual([rec['msg'] for rec in self.couchDB.docs[docId]['messages']], ['msg10'])
+        self.assertEqual(logdb.flush(), 0)
+
+    def testUserMessages(self):
+        """
+        User messages are all kept, newest first, like user_update does
+        """
+        identifier = '/DC=org/DC=doegrids/OU=People/CN=First Last 123'
+        direct = self._logdb(identifier)
+        buffered = self._logdb(identifier, write_behind=True)
+        direct.post('request1', 'msg0')
+        for idx in range(1, 4):
+            buffered.post('request1', 'msg%d' % idx)
+        buffered.flush()
+        docId = buffered.backend.docid('request1', 'comment')
+        self.assertEqual([rec['msg'] for rec in self.couchDB.docs[docId]['messages']],
+                         ['msg3', 'msg2', 'msg1', 'msg0'])
+
+    def testOverflowPolicies(self):
+        """
+        Test the policies applied when the buffer is full
+        """
+        logdb = self._logdb(write_behind=True, max_queue_size=2, overflow_policy='drop')
+        logdb.post('request1', 'msg')
+        logdb.post('request2', 'msg')
+        self.assertEqual(logdb.post('request3', 'msg'), 'dropped')
+        # messages for buffered documents are still coalesced
+        self.assertEqual(logdb.post('request1', 'new msg'), 'buffered')
+        self.assertEqual(logdb.stats['dropped'], 1)
+        self.assertEqual(logdb.flush(), 2)
+
+        logdb = self._logdb(write_behind=True, max_queue_size=2, overflow_policy='drop-oldest')
+        for request in ('request1', 'request2', 'request3'):
+            logdb.post(request, 'msg')
+        self.assertEqual(logdb.pending(), 2)
+        self.assertEqual([key[0] for key in logdb._pending], ['request2', 'request3'])
+
+        logdb = self._logdb(write_behind=True, max_queue_size=2)
+        for request in ('request1', 'request2', 'request3'):
+            logdb.post(request, 'msg')
+        self.assertEqual(logdb.pending(), 1)
+        self.assertEqual(logdb.stats['written'], 2)
+
+        self.assertRaises(ValueError, self._logdb, write_behind=True, overflow_policy='notAPolicy')
+
+    def testFailedFlush(self):
+        """
+        Documents which could not be written are kept for the next flush
+        """
+        logdb = self._logdb(write_behind=True, max_queue_size=3)
+        for request in ('request1', 'request2', 'request3'):
+            logdb.post(request, 'msg', 'info')
+        self.couchDB.failing = {'all'}
+        self.assertEqual(logdb.flush(), 0)
+        self.assertEqual(logdb.pending(), 3)
+        self.assertEqual(logdb.stats['failed'], 3)
+
+        # a newer message replaces the one of the failed flush
+        logdb.post('request1', 'new msg', 'info')
+        self.couchDB.failing = {logdb.backend.docid('request2', 'agent-info')}
+        self.assertEqual(logdb.flush(), 2)
+        self.assertEqual(logdb.stats['written'], 2)
+        self.assertEqual([key[0] for key in logdb._pending], ['request2'])
+        docId = logdb.backend.docid('request1', 'agent-info')
+        self.assertEqual([rec['msg'] for rec in self.couchDB.docs[docId]['messages']], ['new msg'])
+
+        # the buffer stays bounded: a failed flush cannot make room for new documents
+        self.couchDB.failing = {'all'}
+        for request in ('request4', 'request5'):
+            logdb.post(request, 'msg', 'info')
+        self.assertEqual(logdb.post('request6', 'msg', 'info'), 'dropped')
+        self.assertEqual([key[0] for key in logdb._pending], ['request2', 'request4', 'request5'])
+
+        self.couchDB.failing = set()
+        self.assertEqual(logdb.flush(), 3)
+        self.assertEqual(logdb.pending(), 0)
+
+    def testFlushOnClose(self):
+        """
+        Test the periodic flush and the flush on shutdown
+        """
+        logdb = self._logdb(write_behind=True, flush_interval=0.05)
+        logdb.post('request1', 'msg')
+        time.sleep(0.5)
+        self.assertEqual(logdb.pending(), 0)
+        self.assertEqual(logdb.stats['written'], 1)
+
+        logdb = self._logdb(write_behind=True)
+        logdb.post('request2', 'msg')
+        logdb.close()
+        self.assertEqual(logdb.pending(), 0)
+        self.assertEqual(len(self.couchDB.docs), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
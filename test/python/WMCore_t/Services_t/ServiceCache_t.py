@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+_ServiceCache_t_
+
+Unit tests for the Service memory and file caches, using a mock Requests
+class which counts the requests made to the remote service.
+"""
+from __future__ import division
+
+from future import standard_library
+standard_library.install_aliases()
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.client import HTTPException
+
+import mock
+
+from WMCore.Services.Service import Service
+
+
+class MockRequests(dict):
+    """
+    Stand-in for the Requests class, returning the number of calls made
+    """
+
+    def __init__(self, url, cfg):
+        super(MockRequests, self).__init__()
+        self['host'] = url
+        self['cachepath'] = cfg.get('cachepath')
+        self['req_cache_path'] = os.path.join(cfg.get('cachepath') or tempfile.gettempdir(), 'requests')
+        self.calls = 0
+        self.fail = False
+        # cleared to hold the requests back
+        self.release = threading.Event()
+        self.release.set()
+
+    def makeRequest(self, uri=None, data=None, verb='GET', incoming_headers=None,
+                    encoder=True, decoder=True, contentType=None):
+        self.release.wait(30)
+        if self.fail:
+            raise HTTPException("service unavailable")
+        self.calls += 1
+        return json.dumps({'uri': uri, 'call': self.calls, 'data': list(range(100))}), 200, 'OK', False
+
+
+class ServiceCacheTest(unittest.TestCase):
+    """
+    Test the Service memory and file caches
+    """
+
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+        self.logger = logging.getLogger('ServiceCacheTest')
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir, ignore_errors=True)
+
+    def _service(self, **kwargs):
+        cfg = {'endpoint': 'http://localhost:8080/api', 'cachepath': self.cacheDir,
+               'requests': MockRequests, 'logger': self.logger}
+        cfg.update(kwargs)
+        return Service(cfg)
+
+    @staticmethod
+    def _read(service, cachefile, url, **kwargs):
+        fobj = service.refreshCache(cachefile, url, **kwargs)
+        result = json.loads(fobj.read())
+        fobj.close()
+        return result
+
+    def testMemoryCache(self):
+        """
+        Responses are served from memory, then from the cache files
+        """
+        service = self._service(memcachesize=1024 * 1024)
+        self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+        self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+        self.assertEqual(self._read(service, 'sites', '/sites', inputdata={'a': 1})['call'], 2)
+        self.assertEqual(service['requests'].calls, 2)
+        stats = service.cacheStatistics()
+        self.assertEqual(stats['memoryHits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['memoryEntries'], 2)
+        self.assertTrue(stats['memoryBytes'] > 0)
+
+        # a new instance finds the cache files
+        other = self._service(memcachesize=1024 * 1024)
+        self.assertEqual(self._read(other, 'sites', '/sites')['call'], 1)
+        self.assertEqual(other.cacheStatistics()['fileHits'], 1)
+        self.assertEqual(other['requests'].calls, 0)
+
+        # clearing the cache drops the memory entry too
+        service.clearCache('sites')
+        self.assertEqual(self._read(service, 'sites', '/sites')['call'], 3)
+
+        # forceRefresh updates the memory cache
+        service.forceRefresh('sites', '/sites').close()
+        self.assertEqual(self._read(service, 'sites', '/sites')['call'], 4)
+
+        # the memory cache is not used when the file name is requested
+        self.assertTrue(os.path.isfile(service.refreshCache('sites', '/sites', openfile=False)))
+
+        # without cache files, the responses are still kept in memory
+        service = self._service(memcachesize=1024 * 1024, cachepath='')
+        self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+        self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+
+    def testOldCacheFile(self):
+        """
+        Responses read from a cache file expire from memory with the file
+        """
+        service = self._service(memcachesize=1024 * 1024, cacheduration=1)
+        self._read(service, 'sites', '/sites')
+        cachefile = service.cacheFileName('sites')
+
+        # a new instance finds a cache file about to expire
+        fetchTime = time.time() - 3600 + 60
+        os.utime(cachefile, (fetchTime, fetchTime))
+        other = self._service(memcachesize=1024 * 1024, cacheduration=1)
+        self.assertEqual(self._read(other, 'sites', '/sites')['call'], 1)
+        self.assertEqual(other.cacheStatistics()['fileHits'], 1)
+        _, age = other.memoryCache.get(other._memoryKey('sites', 'GET', {}))
+        self.assertTrue(age >= 3600 - 60)
+
+        # two minutes later, the cache file and the memory entry expired
+        now = time.time() + 120
+        os.utime(cachefile, (fetchTime - 120, fetchTime - 120))
+        with mock.patch('WMCore.Cache.ResponseCache.time') as mockTime:
+            mockTime.time.return_value = now
+            self.assertEqual(self._read(other, 'sites', '/sites')['call'], 1)
+        self.assertEqual(other.cacheStatistics()['memoryHits'], 0)
+        self.assertEqual(other['requests'].calls, 1)
+
+    def testMemoryLimit(self):
+        """
+        The memory cache is bounded in size
+        """
+        service = self._service(memcachesize=1000)
+        for idx in range(10):
+            self._read(service, 'call%d' % idx, '/call%d' % idx)
+        stats = service.cacheStatistics()
+        self.assertTrue(stats['memoryBytes'] <= 1000)
+        self.assertTrue(stats['memoryEvictions'] > 0)
+
+    def testCacheTTL(self):
+        """
+        Cache durations per url prefix
+        """
+        # no cache files, since their expiration has a one second resolution
+        service = self._service(memcachesize=1024 * 1024, cacheduration=1, cachepath='',
+                                cachettl={'/volatile': 0, '/volatile/static': 2})
+        self.assertEqual(service.cacheDuration('/sites'), 1)
+        self.assertEqual(service.cacheDuration('/volatile/list'), 0)
+        self.assertEqual(service.cacheDuration('/volatile/static/list'), 2)
+
+        for _ in range(3):
+            self._read(service, 'volatile', '/volatile/list')
+            self._read(service, 'sites', '/sites')
+        self.assertEqual(service['requests'].calls, 4)
+
+    @staticmethod
+    def _waitForRefresh(service):
+        """
+        Wait for the background refreshes of a service to finish
+        """
+        for thread in threading.enumerate():
+            if thread.name == "%sRefresh" % service['service_name']:
+                thread.join()
+
+    def testStaleWhileRevalidate(self):
+        """
+        Expired responses are served while they are refreshed in the background
+        """
+        now = [1000.0]
+        with mock.patch('WMCore.Cache.ResponseCache.time') as mockTime:
+            mockTime.time.side_effect = lambda: now[0]
+            service = self._service(memcachesize=1024 * 1024, cacheduration=1, stalewhilerevalidate=1,
+                                    cachepath='')
+            requests = service['requests']
+            self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+
+            # expired, but still in the stale window: the refresh does not block the readers
+            now[0] += 3601
+            requests.release.clear()
+            self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+            self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+            requests.release.set()
+            self._waitForRefresh(service)
+            self.assertEqual(self._read(service, 'sites', '/sites')['call'], 2)
+            stats = service.cacheStatistics()
+            # a single refresh is triggered
+            self.assertEqual(stats['staleHits'], 2)
+            self.assertEqual(stats['backgroundRefreshes'], 1)
+
+            # failed refreshes keep serving the stale response
+            requests.fail = True
+            now[0] += 3601
+            self.assertEqual(self._read(service, 'sites', '/sites')['call'], 2)
+            self._waitForRefresh(service)
+            self.assertEqual(service.cacheStatistics()['refreshErrors'], 1)
+            self.assertEqual(self._read(service, 'sites', '/sites')['call'], 2)
+            self._waitForRefresh(service)
+
+            # beyond the stale window, the request is made right away
+            requests.fail = False
+            now[0] += 2 * 3600
+            self.assertEqual(self._read(service, 'sites', '/sites')['call'], 3)
+            self.assertEqual(service.cacheStatistics()['backgroundRefreshes'], 1)
+
+        # requests are only serialized when there are background refreshes
+        self.assertIsNotNone(service._requestLock)
+        self.assertIsNone(self._service(memcachesize=1024 * 1024)._requestLock)
+
+    def testCompression(self):
+        """
+        Cache files can be gzip compressed
+        """
+        service = self._service(compresscache=True)
+        self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+        cachefile = service.cacheFileName('sites')
+        self.assertTrue(cachefile.endswith('.gz'))
+        with gzip.open(cachefile, 'rt') as fobj:
+            self.assertEqual(json.loads(fobj.read())['uri'], '/sites')
+        self.assertEqual(self._read(service, 'sites', '/sites')['call'], 1)
+        self.assertEqual(service.cacheStatistics()['fileHits'], 1)
+        self.assertEqual(service['requests'].calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
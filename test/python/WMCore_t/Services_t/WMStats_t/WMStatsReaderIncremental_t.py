@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+"""
+_WMStatsReaderIncremental_t_
+
+Unit tests for the incremental update of the WMStats active data,
+using in-memory stand-ins of the request and wmstats couch databases.
+"""
+from __future__ import division
+
+import logging
+import unittest
+
+from WMCore.Services.WMStats.WMStatsReader import WMStatsReader
+
+
+class MockCouchDB(object):
+    """
+    In-memory database with the few couch calls needed by updateActiveData
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.seq = 0
+        self.feed = []  # list of (seq, docId, deleted)
+
+    def save(self, doc):
+        self.seq += 1
+        self.docs[doc["_id"]] = dict(doc, _rev="%d-abc" % self.seq)
+        self.feed.append((self.seq, doc["_id"], False))
+
+    def delete(self, docId):
+        self.seq += 1
+        self.docs.pop(docId)
+        self.feed.append((self.seq, docId, True))
+
+    def info(self):
+        return {"update_seq": self.seq}
+
+    def _changes(self, since, docFilter=None, limit=None):
+        latest = {}
+        for seq, docId, deleted in self.feed:
+            if seq > since:
+                latest[docId] = (seq, deleted)
+        results = []
+        for docId, (seq, deleted) in sorted(latest.items(), key=lambda item: item[1][0]):
+            if docFilter is None or deleted or docFilter(self.docs[docId]):
+                results.append({"id": docId, "seq": seq, "deleted": deleted})
+        if limit is not None:
+            results = results[:limit]
+        lastSeq = results[-1]["seq"] if results and limit is not None else self.seq
+        return {"results": results, "last_seq": lastSeq}
+
+    def changes(self, since=-1):
+        return self._changes(since)
+
+    def changesWithFilter(self, filter, limit=1000, since=-1):
+        assert filter == "WMStats/agentRequestFilter"
+        return self._changes(since, lambda doc: doc.get("type") == "agent_request", limit)
+
+    def allDocs(self, options=None, keys=None):
+        rows = []
+        for docId in keys:
+            if docId in self.docs:
+                rows.append({"id": docId, "key": docId, "value": {}, "doc": dict(self.docs[docId])})
+            elif any(feedId == docId for _, feedId, _ in self.feed):
+                rows.append({"id": docId, "key": docId, "value": {"deleted": True}, "doc": None})
+            else:
+                rows.append({"key": docId, "error": "not_found"})
+        return {"rows": rows}
+
+
+class MockRequestDB(object):
+    """
+    Stand-in for RequestDBReader
+    """
+
+    def __init__(self, couchDB):
+        self.couchDB = couchDB
+
+    def getDBInstance(self):
+        return self.couchDB
+
+    def getRequestByStatus(self, statusList, detail=False, limit=None, skip=None):
+        return dict((docId, dict(doc)) for docId, doc in self.couchDB.docs.items()
+                    if doc["RequestStatus"] in statusList)
+
+
+class MockWMStatsReader(WMStatsReader):
+    """
+    WMStatsReader over the in-memory databases
+    """
+
+    def __init__(self, wmstatsDB, reqDB):
+        self.couchDB = wmstatsDB
+        self.reqDB = MockRequestDB(reqDB)
+        self.couchapp = "WMStatsErl"
+        self.logger = logging.getLogger()
+
+    def _getRequestAndAgent(self, filterRequest=None):
+        filterRequest = set(filterRequest)
+        return [[doc["workflow"], doc["agent_url"]] for doc in self.couchDB.docs.values()
+                if doc.get("type") == "agent_request" and doc["workflow"] in filterRequest]
+
+    def _getLatestJobInfo(self, keys):
+        docIds = ["%s-%s" % (agentUrl, workflow) for workflow, agentUrl in keys]
+        return self.couchDB.allDocs({"include_docs": True}, docIds)
+
+
+def agentDoc(workflow, agentUrl, success):
+    return {"_id": "%s-%s" % (agentUrl, workflow), "type": "agent_request", "workflow": workflow,
+            "agent_url": agentUrl, "status": {"success": success}}
+
+
+class WMStatsReaderIncrementalTest(unittest.TestCase):
+    """
+    Compare the incremental updates against full loads of the active data
+    """
+
+    maxDiff = None
+    jobInfoStatus = ["running-open", "completed"]
+    noJobInfoStatus = ["assigned"]
+
+    def setUp(self):
+        self.wmstatsDB = MockCouchDB()
+        self.reqDB = MockCouchDB()
+        self.reader = MockWMStatsReader(self.wmstatsDB, self.reqDB)
+
+    def _fullLoad(self):
+        activeData = self.reader.getActiveData(self.jobInfoStatus, jobInfoFlag=True)
+        activeData.update(self.reader.getActiveData(self.noJobInfoStatus, jobInfoFlag=False))
+        for doc in activeData.values():
+            doc.pop("_rev", None)
+            for agentDoc in doc.get("AgentJobInfo", {}).values():
+                agentDoc.pop("_rev", None)
+        return activeData
+
+    def _update(self, activeData, sequences):
+        newData, sequences = self.reader.updateActiveData(activeData, sequences,
+                                                          self.jobInfoStatus + self.noJobInfoStatus,
+                                                          self.jobInfoStatus)
+        for doc in newData.values():
+            for agentDoc in doc.get("AgentJobInfo", {}).values():
+                agentDoc.pop("_rev", None)
+        return newData, sequences
+
+    def _setRequest(self, name, status):
+        self.reqDB.save({"_id": name, "RequestName": name, "RequestStatus": status})
+
+    def testUpdateActiveData(self):
+        """
+        Test the incremental update with request and agent document changes
+        """
+        for i in range(5):
+            self._setRequest("req%d" % i, "running-open")
+            self.wmstatsDB.save(agentDoc("req%d" % i, "agent1", i))
+        self._setRequest("req5", "assigned")
+
+        sequences = self.reader.getUpdateSequences()
+        activeData = self._fullLoad()
+        self.assertEqual(len(activeData), 6)
+        oldData = dict(activeData)
+
+        # no changes
+        newData, sequences = self._update(activeData, sequences)
+        self.assertEqual(newData, activeData)
+
+        self._setRequest("req0", "completed")
+        self._setRequest("req1", "announced")
+        self.reqDB.delete("req2")
+        self._setRequest("req5", "running-open")
+        self._setRequest("req6", "assigned")
+        self.wmstatsDB.save(agentDoc("req3", "agent1", 100))
+        self.wmstatsDB.save(agentDoc("req3", "agent2", 5))
+        self.wmstatsDB.save(agentDoc("req5", "agent2", 7))
+        self.wmstatsDB.save({"_id": "job1", "type": "jobsummary", "workflow": "req4"})
+        self.wmstatsDB.delete("agent1-req4")
+
+        newData, sequences = self._update(activeData, sequences)
+        self.assertEqual(newData, self._fullLoad())
+        self.assertEqual(set(newData), {"req0", "req3", "req4", "req5", "req6"})
+        self.assertEqual(newData["req3"]["AgentJobInfo"]["agent1"]["status"]["success"], 100)
+        self.assertEqual(newData["req5"]["AgentJobInfo"]["agent2"]["status"]["success"], 7)
+        self.assertEqual(newData["req4"].get("AgentJobInfo", {}), {})
+        # the original data was not touched
+        self.assertEqual(activeData, oldData)
+        self.assertEqual(activeData["req3"]["AgentJobInfo"]["agent1"]["status"]["success"], 3)
+        self.assertEqual(sequences, self.reader.getUpdateSequences())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,10 +9,65 @@ import logging
 import os.path
 import shutil
 import tempfile
+import threading
+import time
 import unittest
+from queue import Queue
+
+from mock import patch
 
 import WMCore.Storage.StageOutError
+from WMCore.Algorithms.Alarm import Alarm
 from WMCore.Storage.FileManager import StageInMgr, StageOutMgr, DeleteMgr
+from WMCore.Storage.StageOutError import StageOutFailure
+
+
+class SlowImpl(object):
+    """
+    Stage out backend with a fixed latency, failing the first attempts of
+    the PFNs in failures and keeping track of the concurrent transfers.
+    Successful transfers return no PFN if returnPfn is False, the transfers
+    of the PFNs in hanging do not end until release is set.
+    """
+
+    def __init__(self, latency=0, failures=None, returnPfn=True, hanging=None):
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.returnPfn = returnPfn
+        self.hanging = set(hanging or [])
+        self.release = threading.Event()
+        self.running = 0
+        self.maxRunning = 0
+        self.attempts = []
+        self.lock = threading.Lock()
+
+    def doTransfer(self, fromPfn, toPfn, stageOut, pnn, command, options, protocol, checksum):
+        with self.lock:
+            self.running += 1
+            self.maxRunning = max(self.maxRunning, self.running)
+            self.attempts.append((command, toPfn))
+        time.sleep(self.latency)
+        if toPfn in self.hanging:
+            self.release.wait()
+        with self.lock:
+            self.running -= 1
+            if self.failures.get(toPfn, 0):
+                self.failures[toPfn] -= 1
+                raise StageOutFailure("%s failed" % toPfn)
+        return toPfn if self.returnPfn else None
+
+
+class InterruptedQueue(Queue):
+    """
+    Queue interrupting the first wait for a transfer, like a stage out timeout
+    """
+    interrupted = False
+
+    def get(self, block=True, timeout=None):
+        if not self.interrupted:
+            self.interrupted = True
+            raise Alarm()
+        return Queue.get(self, block, timeout)
 
 
 class FileManagerTest(unittest.TestCase):
@@ -203,6 +258,132 @@ class FileManagerTest(unittest.TestCase):
             'lfn-prefix': self.testDir})
         wrapper(retval)
 
+    def _files(self, numFiles, pfn='/etc/hosts', checksums=None):
+        return [{'LFN': '/store/file%d.root' % idx,
+                 'PFN': pfn,
+                 'PNN': None,
+                 'StageOutCommand': None,
+                 'Checksums': checksums} for idx in range(numFiles)]
+
+    def testStageFiles(self):
+        """
+        Files are staged concurrently, with retries and fallbacks per file
+        """
+        backends = {'slow': SlowImpl(latency=0.05, failures={'/test/store/file1.root': 2,
+                                                             '/test/store/file2.root': 5}),
+                    'fallback': SlowImpl()}
+        manager = StageOutMgr(numberOfRetries=2, retryPauseTime=0.1,
+                              **{'command': 'slow', 'option': '', 'phedex-node': 'T2_XX_Slow',
+                                 'lfn-prefix': '/test'})
+        manager.fallbacks = [{'command': 'fallback', 'phedex-node': 'T2_XX_Fallback', 'lfn-prefix': '/other'}]
+        filesToStage = self._files(8)
+        filesToStage[3]['Checksums'] = {'adler32': 'abcd'}
+        with patch('WMCore.Storage.FileManager.retrieveStageOutImpl',
+                   side_effect=lambda command, **kwargs: backends[command]):
+            result = manager.stageFiles(filesToStage, maxTransfersPerBackend=3, computeChecksums=True)
+
+        self.assertEqual(result['failed'], {})
+        self.assertEqual([fileInfo['LFN'] for fileInfo in result['staged']],
+                         ['/store/file%d.root' % idx for idx in range(8)])
+        self.assertEqual(backends['slow'].maxRunning, 3)
+        # file1 succeeded on its last retry, file2 fell back to the other method
+        self.assertEqual(filesToStage[1]['PNN'], 'T2_XX_Slow')
+        self.assertEqual(filesToStage[1]['PFN'], '/test/store/file1.root')
+        self.assertEqual(filesToStage[2]['PNN'], 'T2_XX_Fallback')
+        self.assertEqual(filesToStage[2]['PFN'], '/other/store/file2.root')
+        self.assertEqual(filesToStage[2]['StageOutCommand'], 'fallback')
+        self.assertEqual(sorted(manager.completedFiles), sorted(fileInfo['LFN'] for fileInfo in filesToStage))
+        # checksums were only computed for the files without them
+        self.assertEqual(filesToStage[3]['Checksums'], {'adler32': 'abcd'})
+        self.assertEqual(sorted(filesToStage[0]['Checksums']), ['adler32', 'cksum'])
+
+        timing = result['timing']
+        self.assertEqual(timing['files'], 8)
+        self.assertEqual(timing['stagedFiles'], 8)
+        self.assertEqual(timing['attempts'], 8 + 2 + 2 + 1)
+        self.assertEqual(timing['retries'], 4)
+        self.assertEqual(timing['fallbacks'], 1)
+        self.assertTrue(timing['transferTime'] > timing['wallTime'])
+        self.assertTrue(timing['checksumTime'] > 0)
+
+    def testStageFilesFailure(self):
+        """
+        Files failing with all the methods are reported, the others are staged
+        """
+        self.testDir = tempfile.mkdtemp()
+        manager = StageOutMgr(numberOfRetries=1, retryPauseTime=0,
+                              **{'command': 'test-fail', 'option': '', 'phedex-node': 'test-fail',
+                                 'lfn-prefix': ''})
+        manager.fallbacks = [{'command': 'test-win', 'phedex-node': 'test-win', 'lfn-prefix': ''}]
+        result = manager.stageFiles(self._files(3))
+        self.assertEqual(len(result['staged']), 3)
+        self.assertEqual(result['timing']['fallbacks'], 3)
+
+        manager.fallbacks = []
+        result = manager.stageFiles(self._files(2, pfn=os.path.join(self.testDir, 'missing')),
+                                    computeChecksums=True)
+        self.assertEqual(result['staged'], [])
+        self.assertEqual(sorted(result['failed']), ['/store/file0.root', '/store/file1.root'])
+        self.assertTrue(isinstance(manager.firstException, StageOutFailure))
+        self.assertEqual(result['timing']['attempts'], 4)
+        self.assertEqual(manager.stageFiles([])['staged'], [])
+
+    def testStageFilesNoPfn(self):
+        """
+        As in stageFile, a transfer returning no PFN moves to the next method without retries
+        """
+        backends = {'empty': SlowImpl(returnPfn=False), 'fallback': SlowImpl()}
+        manager = StageOutMgr(numberOfRetries=2, retryPauseTime=0,
+                              **{'command': 'empty', 'option': '', 'phedex-node': 'T2_XX_Empty',
+                                 'lfn-prefix': '/test'})
+        manager.fallbacks = [{'command': 'fallback', 'phedex-node': 'T2_XX_Fallback', 'lfn-prefix': '/other'}]
+        with patch('WMCore.Storage.FileManager.retrieveStageOutImpl',
+                   side_effect=lambda command, **kwargs: backends[command]):
+            result = manager.stageFiles(self._files(2))
+            self.assertEqual([fileInfo['PNN'] for fileInfo in result['staged']], ['T2_XX_Fallback'] * 2)
+            self.assertEqual(len(backends['empty'].attempts), 2)
+            self.assertEqual(result['timing']['retries'], 0)
+
+            manager.fallbacks = []
+            result = manager.stageFiles(self._files(1))
+        self.assertEqual(sorted(result['failed']), ['/store/file0.root'])
+        self.assertTrue(isinstance(manager.firstException, WMCore.Storage.StageOutError.StageOutError))
+        self.assertEqual(len(backends['empty'].attempts), 3)
+
+    def testStageFilesInterrupted(self):
+        """
+        An interrupted stageFiles waits for the transfers in flight, such
+        that the files they staged can be cleaned up
+        """
+        backend = SlowImpl(latency=0.05)
+        manager = StageOutMgr(numberOfRetries=0, retryPauseTime=0,
+                              **{'command': 'slow', 'option': '', 'phedex-node': 'T2_XX_Slow',
+                                 'lfn-prefix': '/test'})
+        with patch('WMCore.Storage.FileManager.retrieveStageOutImpl', return_value=backend), \
+                patch('WMCore.Storage.FileManager.Queue', InterruptedQueue):
+            self.assertRaises(Alarm, manager.stageFiles, self._files(3), maxTransfersPerBackend=3)
+        self.assertEqual(backend.running, 0)
+        self.assertEqual(sorted(manager.completedFiles), ['/store/file%d.root' % idx for idx in range(3)])
+
+    def testStageFilesInterruptedHanging(self):
+        """
+        An interrupted stageFiles gives up on the hanging transfers after the grace time
+        """
+        backend = SlowImpl(latency=0.05, hanging=['/test/store/file1.root'])
+        manager = StageOutMgr(numberOfRetries=0, retryPauseTime=0,
+                              **{'command': 'slow', 'option': '', 'phedex-node': 'T2_XX_Slow',
+                                 'lfn-prefix': '/test'})
+        try:
+            with patch('WMCore.Storage.FileManager.retrieveStageOutImpl', return_value=backend), \
+                    patch('WMCore.Storage.FileManager.Queue', InterruptedQueue):
+                self.assertRaises(Alarm, manager.stageFiles, self._files(3), maxTransfersPerBackend=3,
+                                  interruptGraceTime=0.5)
+            # the hanging transfer is still running, the others were recorded
+            self.assertEqual(backend.running, 1)
+            self.assertEqual(sorted(manager.completedFiles), ['/store/file0.root', '/store/file2.root'])
+        finally:
+            backend.release.set()
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
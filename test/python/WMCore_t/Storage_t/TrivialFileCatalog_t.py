@@ -6,8 +6,10 @@ Test the parsing of the TFC.
 """
 
 from builtins import str
+from future.utils import viewitems
 
 import os
+import threading
 import unittest
 import nose
 import tempfile
@@ -17,7 +19,7 @@ from WMCore.WMBase import getTestBase
 
 from WMQuality.TestInit import TestInit
 
-from WMCore.Storage.TrivialFileCatalog import tfcFilename, tfcProtocol, readTFC, TrivialFileCatalog
+from WMCore.Storage.TrivialFileCatalog import tfcFilename, tfcProtocol, readTFC, TrivialFileCatalog, _isAnchored
 
 from WMCore.Services.PhEDEx.PhEDEx import PhEDEx
 
@@ -195,6 +197,145 @@ class TrivialFileCatalogTest(unittest.TestCase):
         pfn = tfc.matchLFN('srmv2', in_lfn)
         self.assertEqual(out_pfn, pfn)
 
+    def _siteTFCs(self):
+        """
+        Return the site TFCs available in the test area, keyed by site name
+        """
+        tfcs = {}
+        for site in ["T1_US_FNAL", "T2_CH_CERNBOX", "T2_ES_IFCA", "T2_PT_NCG_Lisbon",
+                     "T2_US_Florida", "T2_US_Nebraska"]:
+            tfc_file = os.path.join(getTestBase(), "WMCore_t/Storage_t",
+                                    "%s_TrivialFileCatalog.xml" % site)
+            tfcs[site] = readTFC(tfc_file)
+        return tfcs
+
+    @staticmethod
+    def _lfns(numLFNs):
+        """
+        Return a list of LFNs of different kinds
+        """
+        lfns = []
+        for idx in range(numLFNs):
+            kind = idx % 5
+            if kind == 0:
+                lfns.append("/store/data/Run2018A/SingleMuon/RAW/v1/000/315/%03d/00000/%08d.root" % (idx % 1000, idx))
+            elif kind == 1:
+                lfns.append("/store/unmerged/RunIIAutumn18/TTbar/AODSIM/v1/%08d.root" % idx)
+            elif kind == 2:
+                lfns.append("/store/unmerged/logs/prod/2018/1/1/workflow/Task/%08d.tar.gz" % idx)
+            elif kind == 3:
+                lfns.append("/store/user/fred/data/%08d.root" % idx)
+            else:
+                lfns.append("/store/temp/user/fred/%08d.root" % idx)
+        return lfns
+
+    def testCompiledMatching(self):
+        """
+        The compiled rules give the same results as scanning all the mappings,
+        with real site TFCs, including chained rules
+        """
+        lfns = self._lfns(500) + ["/castor/cern.ch/cms/store/x", "not_an_lfn", ""]
+        for site, tfc in viewitems(self._siteTFCs()):
+            for protocol in set(mapping['protocol'] for mapping in tfc['lfn-to-pfn']):
+                for lfn in lfns:
+                    pfn = tfc.matchLFN(protocol, lfn)
+                    self.assertEqual(pfn, tfc._doMatch(protocol, lfn, "lfn-to-pfn", tfc.matchLFN),
+                                     "%s %s %s" % (site, protocol, lfn))
+                    if pfn:
+                        self.assertEqual(tfc.matchPFN(protocol, pfn),
+                                         tfc._doMatch(protocol, pfn, "pfn-to-lfn", tfc.matchPFN))
+
+        # results referencing more groups than matched, or groups out of order
+        tfc = TrivialFileCatalog()
+        tfc.addMapping("direct", "/+store/(data|mc)/(.*)", "/$2/$1/$3", mapping_type="lfn-to-pfn")
+        tfc.addMapping("direct", "/+store/(temp)?/?(.*)", "/scratch/$1", mapping_type="lfn-to-pfn")
+        tfc.addMapping("stageout", "/+(.*)", "root://host//$1", chain="direct", mapping_type="lfn-to-pfn")
+        tfc.addMapping("stageout", "/+(.*)", "file://$1", mapping_type="lfn-to-pfn")
+        tfc.addMapping("broken", "(.*)", "$1", chain="unknown", mapping_type="lfn-to-pfn")
+        for lfn in ["/store/data/a/b", "/store/temp/a", "/store/other/a", "/other"]:
+            for protocol in ["direct", "stageout", "broken", "none"]:
+                self.assertEqual(tfc.matchLFN(protocol, lfn),
+                                 tfc._doMatch(protocol, lfn, "lfn-to-pfn", tfc.matchLFN))
+        self.assertEqual(tfc.matchLFN("direct", "/store/data/a/b"), "/a/b/data/$3")
+        self.assertEqual(tfc.matchLFN("stageout", "/store/data/a/b"), "root://host//a/b/data/$3")
+        self.assertEqual(tfc.matchLFN("stageout", "/other"), "file://other")
+        self.assertIsNone(tfc.matchLFN("broken", "/other"))
+
+        # chained rules whose other alternatives match further in the path
+        tfc = TrivialFileCatalog()
+        tfc.addMapping("direct", "/+(.*)", "/prefix/$1", mapping_type="lfn-to-pfn")
+        tfc.addMapping("alternation", ".*a|b", "[$1]", chain="direct", mapping_type="lfn-to-pfn")
+        tfc.addMapping("group", "(.*a|b)(.*)", "[$1][$2]", chain="direct", mapping_type="lfn-to-pfn")
+        tfc.addMapping("anchored", ".*a", "[$1]", chain="direct", mapping_type="lfn-to-pfn")
+        for protocol in ["alternation", "group", "anchored"]:
+            for lfn in ["/store/b/x", "/store/a/b", "/x/y"]:
+                self.assertEqual(tfc.matchLFN(protocol, lfn),
+                                 tfc._doMatch(protocol, lfn, "lfn-to-pfn", tfc.matchLFN))
+        self.assertEqual(tfc.matchLFN("alternation", "/store/b/x"), "[/prefix/store/]")
+        self.assertIsNone(tfc.matchLFN("anchored", "/x/y"))
+
+    def testAnchoredPatterns(self):
+        """
+        Only path-matches which can match at the start of the path only are anchored
+        """
+        for pattern in [".*", ".*/store/(.*)", "(.*)/store/(.*)", "^/store/(.*)", "((.*))a(b|c)",
+                        ".*[|](a)", ".*\\|a", ".*[]|]a", ".*/(data|mc)/(.*)"]:
+            self.assertTrue(_isAnchored(pattern), pattern)
+        for pattern in ["/+store/(.*)", "(?:.*)a", ".*a|b", "^a|b", "(.*a|b)c", "((.*)a|b)c",
+                        "(.*)(a)|b", "a.*"]:
+            self.assertFalse(_isAnchored(pattern), pattern)
+
+    def testMemo(self):
+        """
+        Translations are memoized up to memoSize, and forgotten when mappings are added
+        """
+        tfc = TrivialFileCatalog()
+        tfc.memoSize = 10
+        tfc.addMapping("direct", "/+(.*)", "/disk1/$1", mapping_type="lfn-to-pfn")
+        lfns = ["/store/file%d" % idx for idx in range(20)]
+        pfns = tfc.matchLFNs("direct", lfns)
+        self.assertEqual(pfns["/store/file3"], "/disk1/store/file3")
+        self.assertEqual(len(pfns), 20)
+        self.assertEqual(len(tfc._memo), 10)
+        self.assertEqual(tfc.matchLFNs("other", lfns[:2]), {lfns[0]: None, lfns[1]: None})
+
+        tfc.addMapping("direct", "/+disk2/(.*)", "/$1", mapping_type="pfn-to-lfn")
+        self.assertEqual(tfc.matchPFNs("direct", ["/disk2/a"]), {"/disk2/a": "/a"})
+        # a new lfn-to-pfn rule is used for the translations memoized before it
+        self.assertEqual(tfc._version, 2)
+        tfc.addMapping("other", "/+store/(.*)", "/disk3/$1", mapping_type="lfn-to-pfn")
+        self.assertEqual(tfc._version, 3)
+        self.assertEqual(tfc.matchLFN("other", lfns[0]), "/disk3/file0")
+        self.assertEqual(tfc.matchLFN("direct", "/store/file3"), "/disk1/store/file3")
+
+    def testConcurrentMatching(self):
+        """
+        Translations from several threads, while mappings are added, give
+        the same results as scanning the mappings
+        """
+        tfc = TrivialFileCatalog()
+        tfc.memoSize = 50
+        tfc.addMapping("direct", "/+store/(.*)", "/disk1/$1", mapping_type="lfn-to-pfn")
+        tfc.addMapping("stageout", "/+(.*)", "root://host//$1", chain="direct", mapping_type="lfn-to-pfn")
+        lfns = self._lfns(200)
+        expected = dict((lfn, tfc._doMatch("stageout", lfn, "lfn-to-pfn", tfc.matchLFN)) for lfn in lfns)
+        errors = []
+
+        def translate():
+            for _ in range(5):
+                if tfc.matchLFNs("stageout", lfns) != expected:
+                    errors.append("wrong translation")
+
+        threads = [threading.Thread(target=translate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for idx in range(20):
+            tfc.addMapping("other%d" % idx, "/+(.*)", "/$1", mapping_type="lfn-to-pfn")
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertTrue(len(tfc._memo) <= 50)
+
 
 if __name__ == "__main__":
     unittest.main()
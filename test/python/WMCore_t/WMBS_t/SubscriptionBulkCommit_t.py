@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+_SubscriptionBulkCommit_t_
+
+Unit tests for Subscription.bulkCommit, using mock DAOs
+which record the binds they receive.
+"""
+from __future__ import division
+
+import logging
+import threading
+import unittest
+from collections import defaultdict
+
+import mock
+
+from WMCore.DataStructs.JobGroup import JobGroup
+from WMCore.DataStructs.Run import Run
+from WMCore.WMBS.File import File
+from WMCore.WMBS.Job import Job
+from WMCore.WMBS.Subscription import Subscription
+
+
+class MockDAO(object):
+    """
+    Emulate the DAOs used by bulkCommit
+    """
+
+    def __init__(self, factory, classname):
+        self.factory = factory
+        self.classname = classname
+
+    def execute(self, *args, **kwargs):
+        factory = self.factory
+        factory.calls[self.classname] += 1
+        if self.classname == "Fileset.BulkNewReturn":
+            return list(range(1, len(kwargs['nameList']) + 1))
+        if self.classname == "JobGroup.BulkNewReturn":
+            result = []
+            for entry in kwargs['bulkInput']:
+                factory.lastJobGroupID += 1
+                result.append({'guid': entry['uid'], 'id': factory.lastJobGroupID})
+            # the database doesn't return them in the insertion order
+            return result[::-1]
+        if self.classname == "Jobs.New":
+            result = {}
+            for job in kwargs['jobList']:
+                factory.lastJobID += 1
+                result[job['name']] = factory.lastJobID
+            return result
+        if self.classname == "Masks.Save":
+            factory.binds[self.classname].extend(kwargs['mask'])
+        elif self.classname == "Jobs.AddFiles":
+            factory.binds[self.classname].extend((jobID, fileID) for jobID, fileIDs in kwargs['jobDict'].items()
+                                                 for fileID in fileIDs)
+        elif self.classname == "Subscriptions.AcquireFiles":
+            factory.binds[self.classname].extend(kwargs['file'])
+        return None
+
+
+class MockDAOFactory(object):
+    """
+    DAOFactory returning MockDAOs
+    """
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.binds = defaultdict(list)
+        self.lastJobGroupID = 0
+        self.lastJobID = 0
+
+    def __call__(self, classname):
+        return MockDAO(self, classname)
+
+
+class SubscriptionBulkCommitTest(unittest.TestCase):
+    """
+    Test Subscription.bulkCommit with mock DAOs
+    """
+
+    def setUp(self):
+        myThread = threading.currentThread()
+        self.savedThreadAttrs = dict((attr, getattr(myThread, attr, None)) for attr in ("logger", "dbi"))
+        myThread.logger = logging.getLogger()
+        myThread.dbi = mock.MagicMock()
+        self.patchers = [mock.patch.object(Subscription, attr, return_value=None)
+                         for attr in ("beginTransaction", "commitTransaction", "getDBConn", "existingTransaction")]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        myThread = threading.currentThread()
+        for attr, value in self.savedThreadAttrs.items():
+            setattr(myThread, attr, value)
+
+    @staticmethod
+    def createJobGroups(numGroups, jobsPerGroup, lumisPerJob=2):
+        """
+        Create job groups, where every job reads one file with a lumi mask,
+        and the files are shared by consecutive jobs
+        """
+        jobGroups = []
+        fileID = 0
+        for _ in range(numGroups):
+            jobs = []
+            for jobNum in range(jobsPerGroup):
+                if jobNum % 2 == 0:
+                    fileID += 1
+                    inputFile = File(lfn="/store/data/%08d.root" % fileID, size=1000, events=100)
+                    inputFile['id'] = fileID
+                    inputFile.addRun(Run(1, *range(1, 2 * lumisPerJob + 1)))
+                job = Job(files=[inputFile])
+                firstLumi = 1 + (jobNum % 2) * lumisPerJob
+                job['mask'].addRunAndLumis(run=1, lumis=[firstLumi, firstLumi + lumisPerJob - 1])
+                jobs.append(job)
+            jobGroups.append(JobGroup(jobs=jobs))
+        return jobGroups
+
+    def testBulkCommit(self):
+        """
+        Test the IDs assigned to jobGroups and jobs and the binds of each stage
+        """
+        subscription = Subscription(id=1)
+        subscription.daofactory = factory = MockDAOFactory()
+        jobGroups = self.createJobGroups(3, 4)
+        # jobs already committed are skipped
+        jobGroups[0].newjobs[0]['id'] = 1000
+        subscription.bulkCommit(jobGroups)
+
+        self.assertEqual([jobGroup.id for jobGroup in jobGroups], [1, 2, 3])
+        for jobGroup in jobGroups:
+            self.assertEqual(jobGroup.newjobs, [])
+            self.assertEqual(len(jobGroup.jobs), 4)
+            for job in jobGroup.jobs[1:]:
+                self.assertEqual(job['jobgroup'], jobGroup.id)
+        jobIDs = [job['id'] for jobGroup in jobGroups for job in jobGroup.jobs]
+        self.assertEqual(jobIDs, [1000] + list(range(1, 12)))
+
+        # one bulk call per stage
+        self.assertEqual(dict(factory.calls), {"Fileset.BulkNewReturn": 1, "JobGroup.BulkNewReturn": 1,
+                                               "Jobs.New": 1, "Masks.Save": 1, "Jobs.AddFiles": 1,
+                                               "Subscriptions.AcquireFiles": 1})
+        masks = factory.binds["Masks.Save"]
+        self.assertEqual(len(masks), 11)
+        self.assertEqual(sorted((m['jobID'], m['FirstLumi'], m['LastLumi']) for m in masks)[:2],
+                         [(1, 3, 4), (2, 1, 2)])
+        self.assertEqual(len(factory.binds["Jobs.AddFiles"]), 11)
+        # shared files are acquired only once
+        self.assertEqual(factory.binds["Subscriptions.AcquireFiles"], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(subscription.bulkCommitTimings),
+                         ["filesets", "jobGroups", "jobs", "masks", "jobFiles", "acquireFiles", "commit"])
+
+
+if __name__ == '__main__':
+    unittest.main()
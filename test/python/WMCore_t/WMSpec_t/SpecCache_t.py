@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+_SpecCache_t_
+
+Unit tests for the spec cache and the spec summaries.
+"""
+from __future__ import division
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from WMCore.WMSpec.SpecCache import SpecCache, SUMMARY_SUFFIX, getSpecCache
+from WMCore.WMSpec.WMWorkload import newWorkload
+
+
+def createSpec(specFile, name="TestWorkload", campaign="TestCampaign", numTasks=3):
+    """
+    Create and save a workload with numTasks processing tasks, each with a merge task
+    """
+    workload = newWorkload(name)
+    workload.setCampaign(campaign)
+    for idx in range(numTasks):
+        task = workload.newTask("Processing%d" % idx)
+        task.setTaskType("Processing")
+        task.setPrepID("PREP-%d" % idx)
+        task.setSplittingAlgorithm("FileBased", files_per_job=idx + 1)
+        task.setSiteWhitelist(["T2_XX_SiteA"])
+        merge = task.addTask("Merge%d" % idx)
+        merge.setTaskType("Merge")
+        merge.setSplittingAlgorithm("ParentlessMergeBySize", max_merge_size=1000)
+    workload.save(specFile)
+    return workload
+
+
+class SpecCacheTest(unittest.TestCase):
+    """
+    Test the SpecCache class
+    """
+
+    def setUp(self):
+        self.specDir = tempfile.mkdtemp()
+        self.specFile = os.path.join(self.specDir, "WMWorkload.pkl")
+        createSpec(self.specFile)
+
+    def tearDown(self):
+        shutil.rmtree(self.specDir)
+
+    def _touch(self, **kwargs):
+        """
+        Overwrite the spec with a newer modification time
+        """
+        createSpec(self.specFile, **kwargs)
+        newTime = time.time() + 10
+        os.utime(self.specFile, (newTime, newTime))
+
+    def testWorkloads(self):
+        """
+        Workloads are loaded once, and reloaded when the spec changes
+        """
+        cache = SpecCache(maxWorkloads=2)
+        workload = cache.workload(self.specFile)
+        self.assertEqual(workload.name(), "TestWorkload")
+        self.assertTrue(cache.workload(self.specFile) is workload)
+        self.assertEqual(cache.stats["workloadLoads"], 1)
+        self.assertEqual(cache.stats["workloadHits"], 1)
+
+        self._touch(name="OtherWorkload")
+        self.assertEqual(cache.workload(self.specFile).name(), "OtherWorkload")
+        self.assertEqual(cache.stats["workloadLoads"], 2)
+
+        self.assertIsNone(cache.workload(os.path.join(self.specDir, "missing.pkl")))
+
+        # the number of workloads is bounded
+        for idx in range(3):
+            specFile = os.path.join(self.specDir, "spec%d.pkl" % idx)
+            createSpec(specFile)
+            cache.workload(specFile)
+        self.assertEqual(len(cache._workloads), 2)
+        cache.resize(1)
+        self.assertEqual(list(cache._workloads), [os.path.join(self.specDir, "spec2.pkl")])
+
+    def testSummaries(self):
+        """
+        Summaries are built once, shared through the summary files and
+        rebuilt when the spec changes
+        """
+        cache = SpecCache()
+        self.assertEqual(cache.campaign(self.specFile), "TestCampaign")
+        self.assertEqual(cache.taskList(self.specFile),
+                         ["/TestWorkload/Processing0", "/TestWorkload/Processing0/Merge0",
+                          "/TestWorkload/Processing1", "/TestWorkload/Processing1/Merge1",
+                          "/TestWorkload/Processing2", "/TestWorkload/Processing2/Merge2"])
+        self.assertEqual(cache.prepID(self.specFile, "/TestWorkload/Processing1"), "PREP-1")
+        self.assertEqual(cache.taskType(self.specFile, "/TestWorkload/Processing1/Merge1"), "Merge")
+        self.assertIsNone(cache.prepID(self.specFile, "/TestWorkload/Missing"))
+        params = cache.splittingParams(self.specFile, "/TestWorkload/Processing2")
+        self.assertEqual(params["files_per_job"], 3)
+        self.assertEqual(params["siteWhitelist"], ["T2_XX_SiteA"])
+        # the splitting parameters are copies
+        params["files_per_job"] = 10
+        self.assertEqual(cache.splittingParams(self.specFile, "/TestWorkload/Processing2")["files_per_job"], 3)
+        self.assertEqual(cache.stats["summaryBuilds"], 1)
+        self.assertTrue(os.path.isfile(self.specFile + SUMMARY_SUFFIX))
+
+        # another process reads the summary file without loading the spec
+        other = SpecCache()
+        self.assertEqual(other.campaign(self.specFile), "TestCampaign")
+        self.assertEqual(other.stats["summaryLoads"], 1)
+        self.assertEqual(other.stats["workloadLoads"], 0)
+
+        # the summary file is not used once the spec changed
+        self._touch(campaign="NewCampaign")
+        self.assertEqual(other.campaign(self.specFile), "NewCampaign")
+        self.assertEqual(cache.campaign(self.specFile), "NewCampaign")
+        self.assertEqual(other.stats["summaryBuilds"], 1)
+        self.assertEqual(cache.stats["summaryLoads"], 1)
+
+        self.assertIsNone(cache.summary(os.path.join(self.specDir, "missing.pkl")))
+        self.assertEqual(cache.taskList(os.path.join(self.specDir, "missing.pkl")), [])
+        self.assertTrue(getSpecCache() is getSpecCache())
+
+        # the size of the shared cache is configurable
+        sharedCache = getSpecCache()
+        self.assertTrue(getSpecCache(maxWorkloads=50) is sharedCache)
+        self.assertEqual(sharedCache.maxWorkloads, 50)
+        sharedCache.resize(100)
+
+    def testSummaryCaching(self):
+        """
+        Building a summary does not keep the workload in memory, and the
+        number of summaries is bounded
+        """
+        cache = SpecCache(maxSummaries=2, writeSummaries=False)
+        self.assertEqual(cache.campaign(self.specFile), "TestCampaign")
+        self.assertEqual(cache.stats["summaryBuilds"], 1)
+        self.assertEqual(cache.stats["workloadLoads"], 1)
+        self.assertEqual(len(cache._workloads), 0)
+
+        # an already cached workload is used to build the summary
+        self._touch(campaign="NewCampaign")
+        cache.workload(self.specFile)
+        self.assertEqual(cache.campaign(self.specFile), "NewCampaign")
+        self.assertEqual(cache.stats["workloadLoads"], 2)
+
+        specFiles = []
+        for idx in range(3):
+            specFile = os.path.join(self.specDir, "spec%d.pkl" % idx)
+            createSpec(specFile, campaign="Campaign%d" % idx)
+            specFiles.append(specFile)
+        cache.campaign(specFiles[0])
+        cache.campaign(specFiles[1])
+        # the most recently used summaries are kept
+        cache.campaign(specFiles[0])
+        cache.campaign(specFiles[2])
+        self.assertEqual(list(cache._summaries), [specFiles[0], specFiles[2]])
+        self.assertEqual(len(cache._workloads), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
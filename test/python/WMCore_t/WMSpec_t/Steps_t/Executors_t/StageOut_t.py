@@ -357,6 +357,30 @@ class otherStageOutTexst(unittest.TestCase):
         self.assertTrue(os.path.exists(os.path.join(self.testDir, "store", "mc", "acqera", "pd", "FEVT")))
         self.assertTrue(os.path.exists(os.path.join(self.testDir, "store", "mc", "acqera", "pd", "ALCARECO")))
 
+    def testCPBackendStageOutAgainstReportParallel(self):
+        reportPath = os.path.join(self.testDir, 'UnitTests', 'WMTaskSpace', 'cmsRun1', 'Report.pkl')
+        myReport = Report()
+        myReport.unpersist(reportPath)
+        myReport.data.cmsRun1.status = 0
+        myReport.data.cmsRun1.output.FEVT.files.file0.lfn = "/store/mc/acqera/pd/FEVT/procstr/abc123.root"
+        myReport.data.cmsRun1.output.ALCARECOStreamCombined.files.file0.lfn = "/store/mc/acqera/pd/ALCARECO/procstr/abc123.root"
+        myReport.persist(reportPath)
+        executor = StageOutExecutor.StageOut()
+        executor.initialise(self.stepdata, self.job)
+        self.setLocalOverride(self.stepdata)
+        self.stepdata.override.newStageOut = True
+        self.stepdata.override.parallelStageOut = 2
+        executor.step = self.stepdata
+        executor.execute()
+
+        self.assertTrue(os.path.exists(os.path.join(self.testDir, "store", "mc", "acqera", "pd", "FEVT")))
+        self.assertTrue(os.path.exists(os.path.join(self.testDir, "store", "mc", "acqera", "pd", "ALCARECO")))
+        stageOutTiming = executor.report.retrieveStep(executor.stepName).performance.stageOut
+        self.assertEqual(stageOutTiming.stagedFiles, 2)
+        myReport.unpersist(reportPath)
+        for fileRef in myReport.getAllFileRefsFromStep('cmsRun1'):
+            self.assertTrue('adler32' in fileRef.checksums)
+
     def testCPBackendStageOutAgainstReportFailedStepNew(self):
         myReport = Report()
         myReport.unpersist(os.path.join(self.testDir, 'UnitTests', 'WMTaskSpace', 'cmsRun1', 'Report.pkl'))
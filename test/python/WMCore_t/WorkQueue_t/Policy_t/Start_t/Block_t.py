@@ -468,6 +468,26 @@ class BlockTestCase(EmulatedUnitTestCase):
 
         self.assertEqual(len(lumiMask.getLumis()), nLumis)
 
+    def testBatchedLookups(self):
+        """
+        Concurrent and batched lookups produce the same elements as serial ones
+        """
+        for runWhitelist in ([], [180899, 180992]):
+            results = []
+            for lookupArgs in (dict(LookupThreads=1, LocationBatchSize=1),
+                               dict(LookupThreads=8, LocationBatchSize=10)):
+                splitArgs = dict(self.splitArgs, **lookupArgs)
+                Tier1ReRecoWorkload = rerecoWorkload('ReRecoWorkload', rerecoArgs,
+                                                     assignArgs={'SiteWhitelist': ['T2_XX_SiteA']})
+                Tier1ReRecoWorkload.setRunWhitelist(runWhitelist)
+                task = getFirstTask(Tier1ReRecoWorkload)
+                units, rejectedWork, badWork = Block(**splitArgs)(Tier1ReRecoWorkload, task)
+                elements = [(unit['Inputs'], unit['NumberOfLumis'], unit['NumberOfFiles'],
+                             unit['NumberOfEvents'], unit['Jobs']) for unit in units]
+                results.append((elements, rejectedWork, badWork))
+            self.assertTrue(results[0][0])
+            self.assertEqual(results[0], results[1])
+
     def testGetMaskedBlocks(self):
         """
         _testGetMaskedBlocks_